@@ -9,14 +9,21 @@ from PyQt5.QtWidgets import (
     QTextEdit, QHeaderView, QAbstractItemView, QHBoxLayout, QComboBox, 
     QFrame, QGroupBox, QSplitter, QSpinBox, QCheckBox, QProgressBar, 
     QScrollArea, QCalendarWidget, QMessageBox, QProgressDialog, QFileDialog,
-    QApplication, QSpacerItem, QDialog
+    QApplication, QSpacerItem, QDialog, QCompleter
 )
 from PyQt5.QtGui import QFont, QRegExpValidator, QIntValidator, QDoubleValidator, QColor
-from PyQt5.QtCore import Qt, QDate, QTimer, QRegExp, QThread, pyqtSignal
-from typing import Optional, Dict, Any
+from PyQt5.QtCore import (
+    Qt, QDate, QTimer, QRegExp, QThread, QObject, pyqtSignal, QStringListModel, QAbstractListModel, QModelIndex
+)
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
 
+import enhanced_config as config
 import enhanced_library as lib
 import enhanced_database as db
+import delta_sync
+import offline_journal
+import reader_lookup
 import re
 import datetime
 
@@ -65,6 +72,379 @@ class DataRefreshThread(QThread):
         except Exception as e:
             self.refresh_completed.emit(False, f"{self.module_name}数据刷新失败：{str(e)}")
 
+# ====================== 表格增量同步 ======================
+class TableDeltaSync:
+    """
+    按 updated_at 水位把数据库中的变化原地应用到表格：只改动变化的单元格、
+    插入新行、删除被删除的行，不清空重建，选中行与滚动位置得以保留。
+
+    row_texts(row) 返回一行各列的显示文本；populate(rows) 用于整表加载。
+    表格显示的是筛选结果时调用 detach()，此时不做增量更新，refresh() 会重新整表加载。
+    """
+
+    def __init__(self, table: QTableWidget, entity: str, row_texts, populate):
+        self.table = table
+        self.entity = entity
+        self.row_texts = row_texts
+        self.populate = populate
+        self.tracker = delta_sync.DeltaTracker(entity)
+        self.items: Dict[str, QTableWidgetItem] = {}  # 主键 -> 第 0 列单元格
+        self.enabled = False
+
+    def refresh(self):
+        """表格正显示全部数据时只拉取增量，否则整表重新加载"""
+        if self.enabled:
+            self.sync()
+        else:
+            self.reload()
+
+    def reload(self):
+        self.tracker.reset()
+        self.enabled = True
+        self.sync()
+
+    def detach(self):
+        """表格改为显示筛选结果"""
+        self.enabled = False
+        self.tracker.reset()
+        self.items = {}
+
+    def sync(self) -> int:
+        """拉取并应用增量，返回变化的行数"""
+        if not self.enabled:
+            return 0
+        changes = self.tracker.poll()
+        if changes['full']:
+            self.populate(changes['upserts'])
+            self._reindex()
+            return len(changes['upserts'])
+        return self._apply(changes['upserts'], changes['deletes'])
+
+    def apply_keys(self, keys) -> int:
+        """
+        变更通知给出的主键：只读取这些行并原地更新；keys 为 None 时整表重新加载。
+        返回变化的行数。
+        """
+        if not self.enabled:
+            return 0
+        if keys is None:
+            self.reload()
+            return self.table.rowCount()
+        rows = delta_sync.get_rows(self.entity, keys)
+        present = {delta_sync.key_of(self.entity, row) for row in rows}
+        return self._apply(rows, [key for key in keys if key not in present])
+
+    def _apply(self, upserts, deletes) -> int:
+        if not upserts and not deletes:
+            return 0
+        table = self.table
+        sorting = table.isSortingEnabled()
+        table.setSortingEnabled(False)  # 排序开启时 setItem 会移动行，行号失效
+        table.setUpdatesEnabled(False)
+        try:
+            for key in deletes:
+                item = self.items.pop(key, None)
+                if item is not None:
+                    table.removeRow(item.row())
+            for data in upserts:
+                item = self.items.get(delta_sync.key_of(self.entity, data))
+                if item is None:
+                    row = table.rowCount()
+                    table.insertRow(row)
+                else:
+                    row = item.row()
+                self._set_row(row, data)
+        finally:
+            table.setSortingEnabled(sorting)
+            table.setUpdatesEnabled(True)
+        return len(upserts) + len(deletes)
+
+    def _set_row(self, row: int, data: Dict):
+        for col, text in enumerate(self.row_texts(data)):
+            item = self.table.item(row, col)
+            if item is None:
+                self.table.setItem(row, col, QTableWidgetItem(text))
+            elif item.text() != text:
+                item.setText(text)
+        first = self.table.item(row, 0)
+        first.setData(Qt.UserRole, data)
+        self.items[delta_sync.key_of(self.entity, data)] = first
+
+    def _reindex(self):
+        self.items = {}
+        for row in range(self.table.rowCount()):
+            item = self.table.item(row, 0)
+            data = item.data(Qt.UserRole) if item is not None else None
+            if data:
+                self.items[delta_sync.key_of(self.entity, data)] = item
+
+class ChangeSignalBridge(QObject):
+    """把 change_notifier 后台线程中的通知转为 Qt 信号，由主线程处理"""
+    rows_changed = pyqtSignal(str, object)  # 表名, 主键列表（None 表示整表重新加载）
+
+    def __init__(self, notifier, table_names, parent=None):
+        super().__init__(parent)
+        for table_name in table_names:
+            notifier.subscribe(table_name, lambda keys, name=table_name: self.rows_changed.emit(name, keys))
+
+# ====================== 输入框自动补全 ======================
+# 补全查询共用一个后台线程：请求按顺序执行，作废的请求在排队时就被跳过
+_lookup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lms-lookup")
+
+class LookupCompleter(QObject):
+    """
+    输入框的防抖、可取消自动补全。用户停止输入 debounce_ms 毫秒后在后台线程执行 lookup(text)，
+    界面线程不等待数据库。每次输入都使之前的请求作废：还在排队的请求不再执行，
+    已经在执行的请求结果到达后丢弃，补全列表始终对应输入框中的当前内容。
+    选中补全项时发出 selected(row)；程序调用 setText() 不会触发查询。
+    """
+    selected = pyqtSignal(dict)
+    _results_ready = pyqtSignal(int, str, list)
+
+    def __init__(self, line_edit: QLineEdit, lookup: Callable[[str], List[Dict]],
+                 display: Callable[[Dict], str], debounce_ms: int, min_chars: int = 1):
+        super().__init__(line_edit)
+        self.line_edit = line_edit
+        self.lookup = lookup
+        self.display = display
+        self.min_chars = min_chars
+        self.generation = 0
+        self.rows_by_text: Dict[str, Dict] = {}
+        self.model = QStringListModel(self)
+        self.completer = QCompleter(self.model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)  # 结果已由数据库筛选
+        self.completer.setWidget(line_edit)
+        self.completer.activated[str].connect(self._on_activated)
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self._submit)
+        self._results_ready.connect(self._on_results)
+        line_edit.textEdited.connect(self._on_text_edited)
+
+    def _on_text_edited(self, text: str):
+        self.generation += 1
+        if len(text.strip()) < self.min_chars:
+            self.timer.stop(); self.completer.popup().hide()
+        else:
+            self.timer.start()
+
+    def _submit(self):
+        _lookup_executor.submit(self._run, self.generation, self.line_edit.text().strip())
+
+    def _run(self, generation: int, text: str):
+        """在后台线程中执行"""
+        if generation != self.generation:
+            return  # 排队期间又有输入
+        try:
+            rows = self.lookup(text)
+        except Exception as e:
+            print(f"自动补全查询失败: {e}")
+            rows = []
+        try:
+            self._results_ready.emit(generation, text, rows)
+        except RuntimeError:
+            pass  # 输入框已销毁
+
+    def _on_results(self, generation: int, text: str, rows: list):
+        if generation != self.generation:
+            return
+        self.rows_by_text = {self.display(row): row for row in rows}
+        self.model.setStringList(list(self.rows_by_text))
+        if rows and self.line_edit.hasFocus():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def _on_activated(self, text: str):
+        row = self.rows_by_text.get(text)
+        if row is not None:
+            self.selected.emit(row)
+
+# ====================== ISBN 下拉框与自动补全 ======================
+class IsbnLookupModel(QAbstractListModel):
+    """
+    ISBN/书名列表模型：按页调用 lib.lookup_isbn_titles，视图滚动到列表底部时（canFetchMore/fetchMore）
+    才取下一页，不再一次下载全部类别。set_prefix() 换成新的 ISBN 或书名前缀并从第一页开始。
+    显示文本为“ISBN - 书名”，Qt.UserRole 为 ISBN；blank_text 不为 None 时第 0 行是空选项。
+    """
+    TITLE_ROLE = Qt.UserRole + 1
+
+    def __init__(self, parent=None, blank_text: Optional[str] = None, page_size: int = None):
+        super().__init__(parent)
+        self.blank_text = blank_text
+        self.page_size = page_size or config.ISBN_LOOKUP_PAGE_SIZE
+        self.prefix: Optional[str] = None
+        self.items: List[Dict] = []
+        self.cursor: Optional[Dict] = None  # 最后取到的一行，下一页从它之后开始（pin() 插入的行不算）
+        self.exhausted = False
+
+    def _offset(self) -> int:
+        return 0 if self.blank_text is None else 1
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._offset() + len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row() - self._offset()
+        if row < 0:
+            return self.blank_text if role in (Qt.DisplayRole, Qt.EditRole) else None
+        item = self.items[row]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return f"{item['isbn']} - {item['title']}"
+        if role == Qt.UserRole:
+            return item['isbn']
+        if role == self.TITLE_ROLE:
+            return item['title']
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        """由视图在滚动到底部时调用；查询失败只打印，不再继续翻页（重新 set_prefix 后恢复）"""
+        if parent.isValid() or self.exhausted:
+            return
+        try:
+            self._fetch_page()
+        except Exception as e:
+            print(f"加载ISBN列表失败: {e}")
+            self.exhausted = True
+
+    def _fetch_page(self):
+        page = lib.lookup_isbn_titles(self.prefix, self.cursor, self.page_size)
+        self.exhausted = len(page) < self.page_size
+        if page:
+            self.cursor = page[-1]
+        known = {item['isbn'] for item in self.items}
+        page = [item for item in page if item['isbn'] not in known]
+        if page:
+            first = self.rowCount()
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self.items.extend(page)
+            self.endInsertRows()
+
+    def set_prefix(self, prefix: Optional[str]):
+        """清空已加载的行，按新的前缀取第一页（查询失败时抛出异常，由调用方提示）"""
+        self.beginResetModel()
+        self.prefix = prefix.strip() if prefix and prefix.strip() else None
+        self.items, self.cursor, self.exhausted = [], None, False
+        self.endResetModel()
+        self._fetch_page()
+
+    def reload(self):
+        self.set_prefix(self.prefix)
+
+    def row_of(self, isbn: str) -> int:
+        for row, item in enumerate(self.items):
+            if item['isbn'] == isbn:
+                return row + self._offset()
+        return -1
+
+    def pin(self, isbn: str, title: str = '') -> int:
+        """确保列表中有该 ISBN（还没有分页加载到时插到最前面），返回它的行号"""
+        row = self.row_of(isbn)
+        if row < 0:
+            row = self._offset()
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.items.insert(0, {'isbn': isbn, 'title': title})
+            self.endInsertRows()
+        return row
+
+class IsbnCompleter(QCompleter):
+    """
+    ISBN/书名自动补全：停止输入 ISBN_LOOKUP_DEBOUNCE_MS 毫秒后按输入的 ISBN 或书名前缀取第一页，
+    弹出列表滚动到底部时再取下一页。选中补全项时发出 isbn_selected(isbn, title)。
+    """
+    isbn_selected = pyqtSignal(str, str)
+
+    def __init__(self, line_edit: QLineEdit, parent=None):
+        super().__init__(parent)
+        self.line_edit = line_edit
+        self.lookup_model = IsbnLookupModel(self)
+        self.setModel(self.lookup_model)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)  # 结果已由数据库筛选
+        self.setWidget(line_edit)
+        self.activated[QModelIndex].connect(self._on_activated)
+        # QCompleter 的代理模型在源模型追加行时整体重置，弹出列表会跳回顶部；取下一页前后保存并恢复位置
+        self._popup_position = (0, -1)
+        self.lookup_model.rowsAboutToBeInserted.connect(self._save_popup_position)
+        self.lookup_model.rowsInserted.connect(self._restore_popup_position)
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.setInterval(config.ISBN_LOOKUP_DEBOUNCE_MS)
+        self.timer.timeout.connect(self._refresh)
+        line_edit.textEdited.connect(self._on_text_edited)
+
+    def _on_text_edited(self, text: str):
+        if text.strip():
+            self.timer.start()
+        else:
+            self.timer.stop(); self.popup().hide()
+
+    def _refresh(self):
+        try:
+            self.lookup_model.set_prefix(self.line_edit.text())
+        except Exception as e:
+            print(f"ISBN自动补全查询失败: {e}")
+            return
+        if self.lookup_model.rowCount() and self.line_edit.hasFocus():
+            self.complete()
+        else:
+            self.popup().hide()
+
+    def _save_popup_position(self, *args):
+        popup = self.popup()
+        self._popup_position = (popup.verticalScrollBar().value(), popup.currentIndex().row())
+
+    def _restore_popup_position(self, *args):
+        popup = self.popup()
+        value, row = self._popup_position
+        if row >= 0:
+            popup.setCurrentIndex(self.completionModel().index(row, 0))
+        popup.verticalScrollBar().setValue(value)
+
+    def _on_activated(self, index: QModelIndex):
+        isbn = index.data(Qt.UserRole)
+        if isbn:
+            self.isbn_selected.emit(isbn, index.data(IsbnLookupModel.TITLE_ROLE) or '')
+
+class IsbnComboLookup(QObject):
+    """
+    给可编辑的 ISBN 下拉框接上分页模型（IsbnLookupModel）和按前缀查询的自动补全（IsbnCompleter）：
+    打开页面只取第一页，下拉列表滚动到底部时再取下一页；输入 ISBN 或书名的开头可以选到还没加载的类别。
+    """
+    def __init__(self, combo: QComboBox, blank_text: str = ""):
+        super().__init__(combo)
+        self.combo = combo
+        self.model = IsbnLookupModel(self, blank_text)
+        combo.setInsertPolicy(QComboBox.NoInsert)
+        combo.setModel(self.model)
+        combo.setCompleter(None)  # 默认的补全只在已加载的行中匹配
+        self.completer = IsbnCompleter(combo.lineEdit(), self)
+        self.completer.isbn_selected.connect(self.select_isbn)
+
+    def select_isbn(self, isbn: str, title: str = ''):
+        """选中该 ISBN，还没加载到时先插入"""
+        self.combo.setCurrentIndex(self.model.pin(isbn, title))
+
+    def reload(self) -> Optional[str]:
+        """
+        重新取第一页，仍然存在的 ISBN 保持选中（不发出选择变化信号），返回保持选中的 ISBN。
+        查询失败时抛出异常。
+        """
+        isbn = self.combo.currentData()
+        self.combo.blockSignals(True)
+        try:
+            self.model.reload()
+            if isbn and self.model.row_of(isbn) < 0:
+                found = lib.search_books(isbn=isbn)  # 按主键精确查询（经 catalog_cache 缓存）
+                if found:
+                    self.model.pin(isbn, found[0]['title'])
+            row = self.model.row_of(isbn) if isbn else -1
+            self.combo.setCurrentIndex(max(row, 0))
+        finally:
+            self.combo.blockSignals(False)
+        return isbn if row >= 0 else None
+
 # ====================== 读者管理模块 ======================
 class ReaderManagementWidget(QWidget):
     def __init__(self, parent=None, user_info: Optional[Dict[str, Any]] = None):
@@ -162,6 +542,16 @@ class ReaderManagementWidget(QWidget):
         """)
         form_layout = QVBoxLayout(form_frame)
         
+        quick_layout = QHBoxLayout()
+        quick_layout.addWidget(QLabel("🔎 快速查找:"))
+        self.reader_quick_search = QLineEdit(); self.reader_quick_search.setPlaceholderText("借书证号 / 姓名 / 拼音首字母 / 电话尾号，回车在表格中显示匹配的读者")
+        quick_layout.addWidget(self.reader_quick_search)
+        form_layout.addLayout(quick_layout)
+        self.reader_completer = LookupCompleter(self.reader_quick_search, reader_lookup.lookup, reader_lookup.display_text,
+                                                config.READER_LOOKUP_DEBOUNCE_MS)
+        self.reader_completer.selected.connect(self.show_looked_up_reader)
+        self.reader_quick_search.returnPressed.connect(self.quick_search_readers)
+
         reader_group = QGroupBox("📝 读者信息录入")
         reader_group_layout = QGridLayout(reader_group)
         reader_group_layout.setSpacing(15)
@@ -194,6 +584,7 @@ class ReaderManagementWidget(QWidget):
         table_layout_cat.addWidget(QLabel("📊 读者信息列表"))
         self.reader_table = QTableWidget(); self.reader_table.setColumnCount(10); self.reader_table.setHorizontalHeaderLabels(["借书证号", "姓名", "性别", "身份证号", "电话", "邮箱", "类型", "最大借阅", "当前借阅", "注册时间"])
         self.reader_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch); self.reader_table.setSelectionBehavior(QAbstractItemView.SelectRows); self.reader_table.setEditTriggers(QAbstractItemView.NoEditTriggers); self.reader_table.setAlternatingRowColors(True); self.reader_table.setSortingEnabled(True)
+        self.reader_sync = TableDeltaSync(self.reader_table, 'readers', self.reader_row_texts, self.populate_reader_table)
         table_layout_cat.addWidget(self.reader_table)
         splitter.addWidget(table_frame_cat)
         splitter.setSizes([300, 450])
@@ -305,6 +696,7 @@ class ReaderManagementWidget(QWidget):
         
         try:
             results = lib.search_readers(card_no=card_no, name=name)
+            self.reader_sync.detach()
             self.populate_reader_table(results)
             if self.parent_window: self.parent_window.show_status_message(f"🔍 找到 {len(results)} 位读者", 3000, "success")
         except Exception as e: QMessageBox.critical(self, "搜索失败", f"搜索读者失败：\n{e}")
@@ -391,32 +783,39 @@ class ReaderManagementWidget(QWidget):
         self.reader_card_number.setFocus()
 
     def load_all_readers(self):
-        try: self.populate_reader_table(lib.search_readers())
+        """显示全部读者：表格已是全部读者时只应用增量变化"""
+        try:
+            if self.reader_sync.enabled:
+                if self.reader_sync.sync(): self.update_quick_stats()
+            else: self.reader_sync.reload()
         except Exception as e: QMessageBox.critical(self, "加载失败", f"加载读者信息失败：\n{e}")
 
+    @staticmethod
+    def reader_row_texts(reader_data):
+        current_borrow = reader_data.get('current_borrow_count', 0)
+        # 修改性别映射，支持中文性别值和英文性别值
+        gender_display_map = {
+            "male": "👨 男", "female": "👩 女", "other": "🧑 其他",
+            "男": "👨 男", "女": "👩 女"  # 添加中文性别映射
+        }
+        # 使用title字段而不是reader_type字段
+        title_display = reader_data.get('title', '')
+        if title_display:
+            title_display = f"🎓 {title_display}"  # 添加图标
+        return [
+            reader_data.get('library_card_no', ''), reader_data.get('name', ''),
+            gender_display_map.get(reader_data.get('gender', ''), ''), reader_data.get('id_number', ''),
+            reader_data.get('phone', ''), reader_data.get('email', ''),
+            title_display,  # 使用title字段
+            str(reader_data.get('max_borrow_count', '')), str(current_borrow),
+            str(reader_data.get('registration_date', ''))
+        ]
+
     def populate_reader_table(self, readers):
         self.reader_table.setRowCount(0)
         for row_num, reader_data in enumerate(readers):
             self.reader_table.insertRow(row_num)
-            current_borrow = reader_data.get('current_borrow_count', 0)
-            # 修改性别映射，支持中文性别值和英文性别值
-            gender_display_map = {
-                "male": "👨 男", "female": "👩 女", "other": "🧑 其他",
-                "男": "👨 男", "女": "👩 女"  # 添加中文性别映射
-            }
-            # 使用title字段而不是reader_type字段
-            title_display = reader_data.get('title', '')
-            if title_display:
-                title_display = f"🎓 {title_display}"  # 添加图标
-            items = [
-                reader_data.get('library_card_no', ''), reader_data.get('name', ''),
-                gender_display_map.get(reader_data.get('gender', ''), ''), reader_data.get('id_number', ''),
-                reader_data.get('phone', ''), reader_data.get('email', ''),
-                title_display,  # 使用title字段
-                str(reader_data.get('max_borrow_count', '')), str(current_borrow),
-                str(reader_data.get('registration_date', ''))
-            ]
-            for col, text in enumerate(items): self.reader_table.setItem(row_num, col, QTableWidgetItem(text))
+            for col, text in enumerate(self.reader_row_texts(reader_data)): self.reader_table.setItem(row_num, col, QTableWidgetItem(text))
             self.reader_table.item(row_num, 0).setData(Qt.UserRole, reader_data)
         self.update_quick_stats()
 
@@ -466,17 +865,34 @@ class ReaderManagementWidget(QWidget):
     def batch_export_readers(self): QMessageBox.information(self, "功能提示", "批量导出功能待实现。")
     def cleanup_reader_data(self): QMessageBox.information(self, "功能提示", "数据清理功能待实现。")
     def quick_search_readers(self):
-        search_text = self.reader_card_number.text().strip() or self.reader_name.text().strip() or self.reader_phone.text().strip()
+        search_text = (self.reader_quick_search.text().strip() or self.reader_card_number.text().strip()
+                       or self.reader_name.text().strip() or self.reader_phone.text().strip())
         if not search_text: self.load_all_readers(); return
         try:
-            results = [r for r in lib.search_readers() if 
-                       search_text in r.get('name', '').lower() or 
-                       search_text in r.get('library_card_no', '') or
-                       search_text in r.get('phone', '')]
+            self.reader_completer.generation += 1  # 作废尚未返回的补全请求
+            self.reader_completer.completer.popup().hide()
+            # 补全列表只取 READER_LOOKUP_LIMIT 位，回车时表格显示的匹配上限大得多
+            limit = config.READER_LOOKUP_TABLE_LIMIT
+            results = reader_lookup.lookup(search_text, limit)
+            self.reader_sync.detach()
             self.populate_reader_table(results)
-            if self.parent_window: self.parent_window.show_status_message(f"🔍 搜索找到 {len(results)} 位读者", 2000, "info")
+            if len(results) >= limit:
+                message = f"🔍 匹配的读者超过 {limit} 位，只显示前 {limit} 位，请输入更多字符缩小范围"
+            else:
+                message = f"🔍 搜索找到 {len(results)} 位读者"
+            if self.parent_window: self.parent_window.show_status_message(message, 3000, "info")
         except Exception as e: QMessageBox.critical(self, "搜索失败", f"搜索失败：\n{e}")
+    def show_looked_up_reader(self, reader_data):
+        """补全列表中选中的读者：表格只显示该读者并载入表单"""
+        self.reader_sync.detach()
+        self.populate_reader_table([reader_data])
+        self.reader_table.selectRow(0)
+        self.load_reader_to_form()
     def export_readers(self): self.batch_export_readers()
+    def sync_tables(self):
+        if self.user_info and self.user_info.get('role') == 'admin' and self.reader_sync.sync(): self.update_quick_stats()
+    def apply_remote_changes(self, table_name, keys):
+        if table_name == 'readers' and self.user_info and self.user_info.get('role') == 'admin' and self.reader_sync.apply_keys(keys): self.update_quick_stats()
     def refresh_data(self):
         if self.user_info and self.user_info.get('role') == 'admin':
             self.load_all_readers()
@@ -558,7 +974,7 @@ class BookManagementWidget(QWidget):
         form_group_layout.addWidget(QLabel("出版社:"), 0,2); self.cat_publisher = QLineEdit(); self.cat_publisher.setPlaceholderText("出版社名称"); form_group_layout.addWidget(self.cat_publisher,0,3)
         form_group_layout.addWidget(QLabel("出版日期:"), 1,2); self.cat_publish_date = QDateEdit(QDate.currentDate()); self.cat_publish_date.setCalendarPopup(True); form_group_layout.addWidget(self.cat_publish_date,1,3)
         form_group_layout.addWidget(QLabel("价格:"), 2,2); self.cat_price = QLineEdit(); self.cat_price.setPlaceholderText("例如: 89.00"); self.cat_price.setValidator(QDoubleValidator(0.0, 9999.0, 2)); form_group_layout.addWidget(self.cat_price,2,3)
-        form_group_layout.addWidget(QLabel("计划馆藏:"), 3,2); self.cat_total_copies = QSpinBox(); self.cat_total_copies.setRange(0,1000); self.cat_total_copies.setSuffix(" 本"); form_group_layout.addWidget(self.cat_total_copies,3,3)
+        copies_hint = QLabel("馆藏数量按添加的副本自动统计"); copies_hint.setStyleSheet("color: #666; font-style: italic;"); form_group_layout.addWidget(copies_hint, 3,2,1,2)
         form_group_layout.addWidget(QLabel("图书简介:"), 4,0); self.cat_description = QTextEdit(); self.cat_description.setFixedHeight(70); self.cat_description.setPlaceholderText("图书简介..."); form_group_layout.addWidget(self.cat_description, 4,1,1,3)
         form_layout_wrapper.addWidget(form_group)
         
@@ -604,11 +1020,11 @@ class BookManagementWidget(QWidget):
         if not (self.user_info and self.user_info.get('role') == 'admin'): QMessageBox.warning(self, "权限不足", "您没有权限执行此操作。"); return
         isbn = self.cat_isbn.text().strip(); category = self.cat_category.text().strip(); title = self.cat_title.text().strip(); author = self.cat_author.text().strip()
         publisher = self.cat_publisher.text().strip() or None; publish_date_str = self.cat_publish_date.date().toString("yyyy-MM-dd")
-        price_str = self.cat_price.text().strip(); total_copies_val = self.cat_total_copies.value(); description = self.cat_description.toPlainText().strip() or None
+        price_str = self.cat_price.text().strip(); description = self.cat_description.toPlainText().strip() or None
         if not all([isbn, category, title, author]): QMessageBox.warning(self, "输入错误", "ISBN、类别、书名、作者是必填项！"); return
         try:
             price = float(price_str) if price_str else None
-            success, message = lib.add_book_category(isbn, category, title, author, publisher, publish_date_str, price, total_copies_val, description)
+            success, message = lib.add_book_category(isbn, category, title, author, publisher, publish_date_str, price, description)
             if success:
                 QMessageBox.information(self, "操作成功", message); self.clear_category_form(); self.refresh_data()
                 if self.parent_window: self.parent_window.show_status_message(f"✓ 类别 '{title}' 已添加", 3000, "success")
@@ -648,7 +1064,7 @@ class BookManagementWidget(QWidget):
     def clear_category_form(self):
         self.cat_isbn.clear(); self.cat_category.clear(); self.cat_title.clear(); self.cat_author.clear()
         self.cat_publisher.clear(); self.cat_publish_date.setDate(QDate.currentDate()); self.cat_price.clear()
-        self.cat_total_copies.setValue(0); self.cat_description.clear(); self.cat_isbn.setFocus()
+        self.cat_description.clear(); self.cat_isbn.setFocus()
 
     def load_category_to_form(self):
         if not (self.user_info and self.user_info.get('role') == 'admin'): return
@@ -660,27 +1076,16 @@ class BookManagementWidget(QWidget):
         self.cat_title.setText(cat_data.get('title', '')); self.cat_author.setText(cat_data.get('author', ''))
         self.cat_publisher.setText(cat_data.get('publisher', ''));
         p_date = cat_data.get('publish_date'); self.cat_publish_date.setDate(QDate.fromString(str(p_date), "yyyy-MM-dd") if p_date else QDate.currentDate())
-        self.cat_price.setText(str(cat_data.get('price', ''))); self.cat_total_copies.setValue(cat_data.get('total_copies', 0))
+        self.cat_price.setText(str(cat_data.get('price', '')))
         self.cat_description.setPlainText(cat_data.get('description', ''))
 
     def load_isbn_options_for_copy_tab(self):
-        current_isbn_data = self.copy_isbn_combo.currentData()
-        self.copy_isbn_combo.blockSignals(True)
-        self.copy_isbn_combo.clear()
-        self.copy_isbn_combo.addItem("- 请选择ISBN -", None)
+        if not hasattr(self, 'copy_isbn_combo'): return  # 副本页只有副本列表、没有 ISBN 下拉框时
+        if not hasattr(self, 'isbn_lookup'): self.isbn_lookup = IsbnComboLookup(self.copy_isbn_combo, "- 请选择ISBN -")
         try:
-            categories = lib.search_books()
-            for cat in categories:
-                self.copy_isbn_combo.addItem(f"{cat.get('isbn')} - {cat.get('title')}", cat.get('isbn'))
-            
-            if current_isbn_data:
-                idx = self.copy_isbn_combo.findData(current_isbn_data)
-                if idx != -1: self.copy_isbn_combo.setCurrentIndex(idx)
-                else: self.copy_book_info_label.setText("请选择ISBN"); self.populate_copy_table([])
-            else:
-                 self.copy_book_info_label.setText("请选择ISBN"); self.populate_copy_table([])
+            if not self.isbn_lookup.reload():
+                self.copy_book_info_label.setText("请选择ISBN"); self.populate_copy_table([])
         except Exception as e: QMessageBox.critical(self, "加载失败", f"加载ISBN选项失败: \n{e}")
-        finally: self.copy_isbn_combo.blockSignals(False)
         if self.copy_isbn_combo.currentIndex() > 0 :
             self.on_isbn_selected_for_copy(self.copy_isbn_combo.currentText())
 
@@ -883,6 +1288,31 @@ class BorrowManagementWidget(QWidget):
         self._build_ui() # 构建完整的UI
         self.adjust_ui_for_role() # 根据角色调整UI
 
+        # 其他前台借还书的变更通知（'borrowings'）：短时间内的多条通知合并为一次重新加载
+        self._remote_reload_timer = QTimer(self)
+        self._remote_reload_timer.setSingleShot(True)
+        self._remote_reload_timer.setInterval(500)
+        self._remote_reload_timer.timeout.connect(self._reload_after_remote_change)
+        self._stale = False
+
+    def apply_remote_changes(self, table_name, keys):
+        if table_name == 'borrowings':
+            self._remote_reload_timer.start()
+
+    def _reload_after_remote_change(self):
+        # 页面不在显示时只做标记，切换回来时再加载
+        if self.isVisible():
+            self._stale = False
+            self.load_initial_data()
+        else:
+            self._stale = True
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._stale:
+            self._stale = False
+            self.load_initial_data()
+
     def _build_ui(self):
         # 模块标题
         title_frame = QFrame()
@@ -944,10 +1374,10 @@ class BorrowManagementWidget(QWidget):
         return_form_group = QGroupBox("还书信息")
         return_form_layout = QFormLayout(return_form_group)
         self.return_book_id_input = QLineEdit()
-        self.return_book_id_input.setPlaceholderText("要归还的图书书号")
+        self.return_book_id_input.setPlaceholderText("借阅编号（见借阅历史；离线借阅为负数）")
         self.btn_process_return = QPushButton("✔️ 确认归还")
         self.btn_process_return.clicked.connect(self.process_return)
-        return_form_layout.addRow("图书书号:", self.return_book_id_input)
+        return_form_layout.addRow("借阅编号:", self.return_book_id_input)
         return_form_layout.addRow(self.btn_process_return)
         layout.addWidget(return_form_group)
         layout.addStretch()
@@ -1060,7 +1490,7 @@ class BorrowManagementWidget(QWidget):
         if self.user_info.get('role') == 'reader' and card_no != self.user_info.get('library_card_no'):
             QMessageBox.warning(self, "权限错误", "您只能为自己借书。"); return
 
-        success, message = lib.borrow_book(card_no, book_id)
+        success, message = offline_journal.borrow_book(card_no, book_id)
         if success:
             QMessageBox.information(self, "借阅成功", message)
             self.borrow_book_id_input.clear()
@@ -1100,7 +1530,7 @@ class BorrowManagementWidget(QWidget):
             QMessageBox.warning(self, "输入错误", "请输入有效的借阅ID (数字) 或图书书号。还书逻辑待完善。")
             return
 
-        success, message = lib.return_book(borrow_id_to_return) # Assumes borrowing_id
+        success, message = offline_journal.return_book(borrow_id_to_return) # Assumes borrowing_id
         if success:
             QMessageBox.information(self, "还书成功", message)
             self.return_book_id_input.clear(); self.refresh_data()
@@ -1136,7 +1566,9 @@ class BorrowManagementWidget(QWidget):
                  history = lib.get_all_borrowing_history() # Needs this func in lib
             else: # Should not happen if logic above is correct
                 history = []
-                
+
+            # 离线办理、尚未同步到数据库的借阅（负数借阅编号）排在最前，还书时按表中的编号输入
+            history = offline_journal.pending_loans(card_no, book_id) + list(history or [])
             self.populate_history_table(history)
         except AttributeError as ae: # Catch if lib functions are missing
             QMessageBox.critical(self, "功能缺失", f"查询借阅历史时发生库函数错误: {ae}")
@@ -1154,6 +1586,8 @@ class BorrowManagementWidget(QWidget):
             status_display = data.get('status', '未知')
             if data.get('status') == '已归还' and data.get('return_date'):
                 status_display = f"已归还 ({data.get('return_date')})"
+            elif data.get('status') == '待同步':
+                status_display = f"离线借阅，待同步 (应还: {data.get('due_date')})"
             elif data.get('status') == '借阅中' and data.get('due_date'):
                 due_date = QDate.fromString(str(data.get('due_date')), "yyyy-MM-dd")
                 if due_date < QDate.currentDate():
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+web_app 的 ASGI 版本（基于 Quart，路由与页面和 web_app 保持一致）。
+
+查询走 async_library 的异步连接池，单个进程即可挂起大量空闲的读者连接；
+注册等写操作仍调用同步的 enhanced_library，并放到线程中执行。
+
+运行: hypercorn asgi_app:app --bind 0.0.0.0:8000
+"""
+import asyncio
+import time
+
+from quart import Quart, request, session, redirect, url_for, render_template_string, g, jsonify, Response  # type: ignore
+
+import async_library as alib
+import enhanced_database as db
+import enhanced_library as lib
+import hashing_executor as hashing
+import metrics
+from web_app import REGISTER_FORM, LOGIN_FORM, DASHBOARD_PAGE, BOOK_LIST_PAGE, isbn_lookup_args
+
+app = Quart(__name__)
+app.secret_key = 'replace-with-a-secure-secret'
+
+@app.before_serving
+async def open_pool():
+    await alib.init_pool()
+
+@app.after_serving
+async def close_pool():
+    await alib.close_pool()
+
+@app.before_request
+async def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+async def begin_primary_pin():
+    # 与 web_app 相同：读己之写按会话生效，asyncio.to_thread 中的写入复制本请求的上下文
+    g.pinned_until = session.get('pinned_until', 0.0)
+    g.pin_token = db.begin_pin_scope(g.pinned_until)
+
+@app.teardown_request
+async def end_primary_pin(exc=None):
+    token = g.pop('pin_token', None)
+    if token is not None:
+        db.end_pin_scope(token)
+
+@app.after_request
+async def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    if g.get('pin_token') is not None:
+        pinned_until = db.current_pin_deadline()
+        if pinned_until > g.pinned_until:
+            session['pinned_until'] = pinned_until
+    return response
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/healthz')
+async def healthz():
+    result = await alib.check_health()
+    return jsonify({'status': 'ok' if result['ok'] else 'unavailable', 'database': result}), (200 if result['ok'] else 503)
+
+@app.route('/')
+async def index():
+    if 'user' in session:
+        return redirect(url_for('dashboard'))
+    return redirect(url_for('login'))
+
+@app.route('/register', methods=['GET', 'POST'])
+async def register():
+    message = ''
+    if request.method == 'POST':
+        form = await request.form
+        card_no = form.get('library_card_no', '').strip()
+        name = form.get('name', '').strip()
+        password = form.get('password', '')
+        if card_no and name and password:
+            success, msg = await asyncio.to_thread(lib.register_reader, card_no, name, password)
+            if success:
+                return redirect(url_for('login'))
+            message = msg
+        else:
+            message = '请完整填写所有字段'
+    return await render_template_string(REGISTER_FORM, message=message)
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    message = ''
+    if request.method == 'POST':
+        form = await request.form
+        username = form.get('username', '').strip()
+        password = form.get('password', '')
+        retry_after = hashing.LOGIN_THROTTLE.check(username, request.remote_addr)
+        if retry_after:
+            message = f'登录失败次数过多，请 {int(retry_after) + 1} 秒后再试'
+            return await render_template_string(LOGIN_FORM, message=message), 429
+        try:
+            user = await alib.authenticate_user(username, password)
+        except hashing.HashingBusyError as e:
+            return await render_template_string(LOGIN_FORM, message=str(e)), 503
+        if user:
+            hashing.LOGIN_THROTTLE.reset_account(username)
+            session['user'] = user
+            return redirect(url_for('dashboard'))
+        hashing.LOGIN_THROTTLE.record_failure(username, request.remote_addr)
+        message = '用户名或密码错误'
+    return await render_template_string(LOGIN_FORM, message=message)
+
+@app.route('/dashboard')
+async def dashboard():
+    user = session.get('user')
+    if not user:
+        return redirect(url_for('login'))
+    return await render_template_string(DASHBOARD_PAGE, user=user)
+
+@app.route('/books')
+async def books():
+    user = session.get('user')
+    if not user:
+        return redirect(url_for('login'))
+    book_list = await alib.search_books()
+    return await render_template_string(BOOK_LIST_PAGE, books=book_list)
+
+@app.route('/api/isbn-lookup')
+async def isbn_lookup():
+    if not session.get('user'):
+        return jsonify({'error': '请先登录'}), 401
+    prefix, after, limit = isbn_lookup_args(request.args)
+    items = await alib.lookup_isbn_titles(prefix, after, limit)
+    return jsonify({'items': items, 'has_more': len(items) >= limit})
+
+@app.route('/logout')
+async def logout():
+    session.pop('user', None)
+    return redirect(url_for('login'))
+
+if __name__ == '__main__':
+    app.run()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+异步数据访问层：enhanced_library 中读多写少函数的 asyncio 版本。
+
+基于 aiomysql 连接池，一个事件循环即可同时挂起成千上万个等待数据库的请求，
+而不必为每个请求占用一个线程。SQL 语句与 enhanced_library 共用，
+保证两条路径的查询结果一致。写操作仍使用同步的 enhanced_library。
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict
+
+import aiomysql  # type: ignore
+
+import enhanced_config as config
+import catalog_cache
+import enhanced_library as lib
+import hashing_executor
+import metrics
+import password_policy
+
+_pool: Optional[aiomysql.Pool] = None
+
+async def init_pool(minsize: int = None, maxsize: int = None):
+    """在当前事件循环中创建异步连接池（应用启动时调用）"""
+    global _pool
+    if _pool is not None:
+        return _pool
+    _pool = await aiomysql.create_pool(
+        host=config.HOST,
+        user=config.USER,
+        password=config.PASSWORD,
+        db=config.DATABASE,
+        port=config.PORT,
+        charset=config.CHARSET,
+        connect_timeout=config.DB_CONNECT_TIMEOUT,
+        autocommit=True,  # 本模块只做查询，无需显式事务
+        minsize=minsize or config.ASYNC_DB_POOL_MIN,
+        maxsize=maxsize or config.ASYNC_DB_POOL_MAX,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        cursorclass=aiomysql.DictCursor,
+    )
+    return _pool
+
+async def close_pool():
+    """关闭异步连接池（应用退出时调用）"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+def _async_pool_stats():
+    pool = _pool
+    if pool is None:
+        return {}
+    return {('size',): pool.maxsize, ('in_use',): pool.size - pool.freesize, ('idle',): pool.freesize}
+
+ASYNC_DB_POOL_CONNECTIONS = metrics.gauge(
+    "lms_async_db_pool_connections", "异步连接池状态（size/in_use/idle）", ("state",))
+ASYNC_DB_POOL_CONNECTIONS.set_function(_async_pool_stats)
+
+@asynccontextmanager
+async def get_cursor():
+    """从异步连接池借出连接并返回字典游标"""
+    if _pool is None:
+        await init_pool()
+    async with _pool.acquire() as conn:
+        metrics.DB_CONNECTIONS_IN_USE.inc()
+        try:
+            async with conn.cursor() as cur:
+                yield cur
+        finally:
+            metrics.DB_CONNECTIONS_IN_USE.dec()
+
+async def _fetchall(sql: str, params=None) -> List[Dict]:
+    start = time.perf_counter()
+    try:
+        async with get_cursor() as cur:
+            await cur.execute(sql, params)
+            return list(await cur.fetchall())
+    finally:
+        metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "async_execute")
+
+async def _fetchone(sql: str, params=None) -> Optional[Dict]:
+    start = time.perf_counter()
+    try:
+        async with get_cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchone()
+    finally:
+        metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "async_execute")
+
+async def _verify_password(password: str, password_hash: str) -> bool:
+    # bcrypt 是 CPU 密集型计算，交给哈希线程池执行以免阻塞事件循环
+    return await hashing_executor.wait_async(lib.submit_verify_password(password, password_hash))
+
+# ====================== 查询函数 ======================
+
+async def search_books(title: str = None, author: str = None, isbn: str = None, category: str = None):
+    """图书查询（异步版），返回值与 enhanced_library.search_books 相同"""
+    cache = catalog_cache.get_cache() if catalog_cache.enabled() else None
+    if cache is not None:
+        key = catalog_cache.make_key(title, author, isbn, category)
+        cached, epoch = cache.get(key)
+        if cached is not None:
+            return cached
+    sql, params = lib.build_search_books_query(title, author, isbn, category)
+    results = lib.convert_search_books_rows(await _fetchall(sql, params))
+    fallback_text = lib.keys_fallback_text(title, author, isbn, category)
+    if not results and fallback_text:
+        # 拼音与模糊查询在 Python 中计算编辑距离，放到线程中执行（同步连接）
+        results = await asyncio.to_thread(lib.search_books_by_keys, fallback_text)
+    if cache is not None:
+        cache.put(key, results, epoch)
+    return results
+
+async def lookup_isbn_titles(prefix: str = None, after: Dict = None, limit: int = None) -> List[Dict]:
+    """ISBN/书名分页查询（异步版），返回值与 enhanced_library.lookup_isbn_titles 相同"""
+    sql, params = lib.build_isbn_lookup_query(prefix.strip() if prefix else None, after, limit)
+    return await _fetchall(sql, params)
+
+async def authenticate_user(username_or_card_no: str, password: str) -> Optional[Dict]:
+    """统一用户认证（异步版）：一次查询确定账号，恰好一次密码校验"""
+    row = await _fetchone(lib.AUTH_PRINCIPAL_SQL, (username_or_card_no,))
+    password_hash = row['password_hash'] if row and row['password_hash'] else \
+        await asyncio.to_thread(lib.dummy_password_hash)
+    principal = lib.principal_from_auth_row(row, await _verify_password(password, password_hash))
+    if principal and password_policy.needs_rehash(password_hash):
+        await asyncio.to_thread(lib.upgrade_password_hash, row, password)
+    return principal
+
+async def get_reader_borrowing_history(library_card_no: str, start_date: str = None, end_date: str = None,
+                                       book_number_filter: str = None):
+    """查询读者借阅历史（异步版）"""
+    sql, params = lib.build_reader_history_query(library_card_no, start_date, end_date, book_number_filter)
+    return await _fetchall(sql, params)
+
+async def get_current_borrowings():
+    """查询当前所有借阅记录（异步版）"""
+    return await _fetchall(lib.CURRENT_BORROWINGS_SQL)
+
+async def check_health(timeout: float = None) -> dict:
+    """健康检查（异步版）：限定时间内执行 SELECT 1，不会抛出异常"""
+    if timeout is None:
+        timeout = config.HEALTHCHECK_TIMEOUT_SECONDS
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(_fetchone("SELECT 1"), timeout)
+        return {'ok': True, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': None}
+    except Exception as e:
+        metrics.DB_ERRORS.inc("healthcheck")
+        return {'ok': False, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': str(e) or type(e).__name__}
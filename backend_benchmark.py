@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储后端基准测试：用同一组 enhanced_library 调用分别测量 MySQL 与 SQLite 后端的耗时
+（添加图书/读者、图书查询、借书、还书、逾期与历史查询、读者统计）。
+
+MySQL 的数据放在独立的数据库中（默认 lms_benchmark_backend，每次重新建表），
+SQLite 的数据放在独立的文件中（默认 lms_benchmark.db，每次重新创建），都不会影响正式数据。
+两种后端都通过连接池访问（enhanced_database.init_pool）。
+
+示例：
+    python backend_benchmark.py --categories 2000 --copies 5000 --readers 1000 --loans 2000
+    python backend_benchmark.py --backend sqlite --output sqlite.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+import enhanced_config as config
+import enhanced_database as db
+import enhanced_library as lib
+
+WORDS = ['数据', '系统', '设计', '原理', '算法', '历史', '文学', '经济', '管理', '网络']
+
+
+def prepare_mysql(database: str):
+    """重新创建基准数据库并执行 enhanced_schema.sql（跳过其中切换到正式库的语句）"""
+    if database == config.DATABASE:
+        raise ValueError("基准数据不能放在正式数据库中")
+    from catalog_benchmark import connect
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cur.execute(f"CREATE DATABASE `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        conn.commit()
+    finally:
+        conn.close()
+    schema_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "enhanced_schema.sql")
+    with open(schema_path, encoding='utf-8') as f:
+        lines = [line for line in f.read().splitlines()
+                 if not line.upper().startswith(("CREATE DATABASE", "USE "))]
+    scratch_path = os.path.join(os.path.dirname(schema_path), f".{database}_schema.sql")
+    with open(scratch_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    try:
+        with db.get_connection() as conn:
+            db.execute_sql_file(scratch_path, conn)
+    finally:
+        os.remove(scratch_path)
+
+
+def use_backend(backend: str, args):
+    config.DB_BACKEND = backend
+    if backend == 'sqlite':
+        config.SQLITE_PATH = args.sqlite_path
+        import sqlite_backend
+        for suffix in ('', '-wal', '-shm'):
+            path = sqlite_backend.database_path() + suffix
+            if os.path.exists(path):
+                os.remove(path)
+        db.init_pool()
+    else:
+        config.DATABASE = args.mysql_database
+        db.init_pool()
+        with contextlib.redirect_stdout(io.StringIO()):
+            prepare_mysql(args.mysql_database)
+
+
+def timed(samples: Dict[str, List[float]], name: str, func: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    samples.setdefault(name, []).append(time.perf_counter() - start)
+    return result
+
+
+def latest_open_borrowing(library_card_no: str):
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MAX(borrowing_id) AS borrowing_id FROM borrowings "
+                        "WHERE library_card_no = %s AND return_date IS NULL", (library_card_no,))
+            return cur.fetchone()['borrowing_id']
+
+
+def run_workload(args) -> Dict[str, Dict]:
+    samples: Dict[str, List[float]] = {}
+    rng = random.Random(args.random_seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(args.categories):
+            timed(samples, '添加类别', lib.add_book_category, f"BM{i:010d}", rng.choice(['计算机', '文学', '历史']),
+                  ''.join(rng.sample(WORDS, 3)), f"作者{i % 97}")
+        for i in range(args.copies):
+            timed(samples, '添加副本', lib.add_book_copy, f"BM{rng.randrange(args.categories):010d}", f"BC{i:09d}")
+        for i in range(args.readers):
+            timed(samples, '添加读者', lib.add_reader, f"BR{i:08d}", f"读者{i}", max_borrow_count=args.loans)
+
+    copies = [f"BC{i:09d}" for i in range(args.copies)]
+    rng.shuffle(copies)
+    for i in range(min(args.loans, len(copies))):
+        card_no = f"BR{rng.randrange(args.readers):08d}"
+        ok, _ = timed(samples, '借书', lib.borrow_book, card_no, copies[i])
+        if ok and rng.random() < 0.7:
+            timed(samples, '还书', lib.return_book, latest_open_borrowing(card_no))
+
+    for _ in range(args.repeat):
+        card_no = f"BR{rng.randrange(args.readers):08d}"
+        timed(samples, '图书查询', lib.search_books, title=rng.choice(WORDS))
+        timed(samples, 'ISBN 查询', lib.search_books, isbn=f"BM{rng.randrange(args.categories):010d}")
+        timed(samples, '逾期图书', lib.get_overdue_books)
+        timed(samples, '当前借阅', lib.get_current_borrowings)
+        timed(samples, '读者历史', lib.get_reader_borrowing_history, card_no)
+        timed(samples, '读者查询', lib.search_readers, card_no=card_no)
+        timed(samples, '读者统计', lib.get_reader_statistics_summary, card_no)
+        timed(samples, '借阅排行', lib.get_book_borrowing_ranks)
+        start_date = (date.today() - timedelta(days=30)).isoformat()
+        timed(samples, '借阅统计', lib.get_borrowing_statistics, start_date, date.today().isoformat())
+
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def summarize(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {'count': len(values), 'median_ms': statistics.median(values) * 1000,
+            'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            'total_s': sum(values)}
+
+
+def print_report(results: Dict[str, Dict[str, Dict]]):
+    backends = list(results)
+    print(f"\n{'操作':<10}" + "".join(f"{backend + ' 中位数':>18}{backend + ' p95':>14}" for backend in backends))
+    for name in results[backends[0]]:
+        line = f"{name:<10}"
+        for backend in backends:
+            stats = results[backend].get(name)
+            line += f"{stats['median_ms']:>16.2f}ms{stats['p95_ms']:>12.2f}ms" if stats else f"{'-':>18}{'-':>14}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 MySQL 与 SQLite 存储后端的常用操作耗时")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite', 'both'], default='both')
+    parser.add_argument('--mysql-database', default='lms_benchmark_backend', help='MySQL 基准数据库（每次重建）')
+    parser.add_argument('--sqlite-path', default='lms_benchmark.db', help='SQLite 基准数据库文件（每次重建）')
+    parser.add_argument('--categories', type=int, default=1000, help='图书类别数')
+    parser.add_argument('--copies', type=int, default=3000, help='图书副本数')
+    parser.add_argument('--readers', type=int, default=500, help='读者数')
+    parser.add_argument('--loans', type=int, default=1000, help='借书次数（约 70% 随后归还）')
+    parser.add_argument('--repeat', type=int, default=50, help='每个查询的执行次数')
+    parser.add_argument('--random-seed', type=int, default=42, help='随机数种子，便于复现')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    # 查询缓存会掩盖后端差异
+    config.CATALOG_CACHE_ENABLED = False
+    backends = ['mysql', 'sqlite'] if args.backend == 'both' else [args.backend]
+    results = {}
+    for backend in backends:
+        print(f"正在测试 {backend} 后端...")
+        use_backend(backend, args)
+        try:
+            results[backend] = run_workload(args)
+        finally:
+            db.close_pool()
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图书拼音与模糊查询：按书名、作者的前缀查找图书类别，支持汉字、全拼、拼音首字母、繁体输入，容忍少量错字。
+
+每个类别的书名和作者预先生成检索键，写入 book_search_keys 表（search_key 列有索引）：
+规范化文本（简体、小写、去掉标点空格）、全拼（需要 pypinyin）、拼音首字母，
+从字段开头及每个标点、空格之后各生成一组（见 search_keys.text_keys）。
+enhanced_library.add_book_category 与 import_book_categories 在同一事务中写入检索键；
+示例数据和升级前已有的类别由 enhanced_database.init_db 补上检索键（index_missing）；
+直接改动过数据库中的书名、作者时用 --reindex 重建。
+
+查询分两步：
+1. 前缀扫描：search_key LIKE '输入%'，只读索引范围的开头 BOOK_SEARCH_CANDIDATES 行；
+2. 结果不足时做模糊补充：用输入的前一半做前缀扫描取候选（最多 BOOK_SEARCH_FUZZY_CANDIDATES 行），
+   计算输入与候选键前缀的编辑距离（超过上限即停止计算），保留距离不超过上限的候选。
+   上限随输入长度增加（2 个字符以内为 0，5 个以内为 1，更长为 BOOK_SEARCH_MAX_DISTANCE），
+   输入的前一半需要正确。
+结果按 (编辑距离, 键类型, 书名优先于作者, 键长度) 排序。
+
+示例：
+    python book_search.py sjjg
+    python book_search.py 數據結構
+    python book_search.py --reindex
+"""
+import argparse
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import enhanced_config as config
+import job_checkpoints
+import metrics
+import search_keys
+from enhanced_database import get_connection, get_read_connection
+
+KEY_LENGTH = 100  # 与 book_search_keys.search_key 的长度一致
+KIND_RANK = {'text': 0, 'pinyin': 1, 'initials': 2}
+FIELD_RANK = {'title': 0, 'author': 1}
+REINDEX_JOB = 'book_search_reindex'
+
+BOOK_SEARCH_SECONDS = metrics.histogram(
+    "lms_book_search_seconds", "图书拼音与模糊查询的耗时", ("phase",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+
+# ====================== 检索键维护 ======================
+
+def category_keys(isbn: str, title: str, author: str) -> List[Tuple[str, str, str, str]]:
+    """一个类别的检索键行 [(isbn, field_name, kind, search_key)]"""
+    rows = []
+    for field_name, value in (('title', title), ('author', author)):
+        for kind, key in search_keys.text_keys(value, KEY_LENGTH):
+            rows.append((isbn, field_name, kind, key))
+    return rows
+
+
+def index_categories(cur, categories: Iterable[Tuple[str, str, str]]) -> int:
+    """在调用方的事务中重写一批类别 (isbn, title, author) 的检索键，返回写入的行数"""
+    categories = list(categories)
+    if not categories:
+        return 0
+    placeholders = ", ".join(["%s"] * len(categories))
+    cur.execute(f"DELETE FROM book_search_keys WHERE isbn IN ({placeholders})", [c[0] for c in categories])
+    rows = [row for isbn, title, author in categories for row in category_keys(isbn, title, author)]
+    if rows:
+        cur.executemany("INSERT INTO book_search_keys (isbn, field_name, kind, search_key) VALUES (%s, %s, %s, %s)", rows)
+    return len(rows)
+
+
+def reindex(batch_size: int = 1000) -> int:
+    """按 ISBN 分批重建全部类别的检索键（每批一个事务，中断后从断点继续），返回处理的类别数"""
+    position, stats = job_checkpoints.load(REINDEX_JOB)
+    last_isbn, done = position or '', stats.get('categories', 0)
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT isbn, title, author FROM book_categories WHERE isbn > %s ORDER BY isbn LIMIT %s",
+                            (last_isbn, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                index_categories(cur, [(r['isbn'], r['title'], r['author']) for r in rows])
+                conn.commit()
+        last_isbn, done = rows[-1]['isbn'], done + len(rows)
+        job_checkpoints.save(REINDEX_JOB, last_isbn, {'categories': done})
+    job_checkpoints.clear(REINDEX_JOB)
+    return done
+
+
+def index_missing(batch_size: int = 1000) -> int:
+    """
+    只为还没有检索键的类别生成检索键（示例数据、直接写入数据库的类别），返回处理的类别数。
+    由 enhanced_database.init_db 调用；已有检索键的类别需要重建时用 reindex()。
+    """
+    last_isbn, done = '', 0
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT isbn, title, author FROM book_categories bc
+                    WHERE isbn > %s AND NOT EXISTS (SELECT 1 FROM book_search_keys k WHERE k.isbn = bc.isbn)
+                    ORDER BY isbn LIMIT %s
+                """, (last_isbn, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    return done
+                index_categories(cur, [(r['isbn'], r['title'], r['author']) for r in rows])
+                conn.commit()
+        last_isbn, done = rows[-1]['isbn'], done + len(rows)
+
+
+# ====================== 查询 ======================
+
+def allowed_distance(query: str) -> int:
+    if len(query) <= 2:
+        return 0
+    if len(query) <= 5:
+        return min(1, config.BOOK_SEARCH_MAX_DISTANCE)
+    return config.BOOK_SEARCH_MAX_DISTANCE
+
+
+def prefix_distance(query: str, key: str, bound: int) -> int:
+    """query 与 key 的某个前缀之间的最小编辑距离；超过 bound 时提前结束并返回 bound + 1"""
+    key = key[:len(query) + bound]
+    previous = list(range(len(key) + 1))
+    for i, query_char in enumerate(query, 1):
+        current = [i]
+        for j, key_char in enumerate(key, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (query_char != key_char)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return min(min(previous), bound + 1)
+
+
+def _scan(cur, prefix: str, limit: int, phase: str) -> List[Dict]:
+    start = time.perf_counter()
+    cur.execute("SELECT isbn, field_name, kind, search_key FROM book_search_keys "
+                "WHERE search_key LIKE %s ESCAPE '!' LIMIT %s", (search_keys.like_prefix(prefix), limit))
+    rows = cur.fetchall()
+    BOOK_SEARCH_SECONDS.observe(time.perf_counter() - start, phase)
+    return rows
+
+
+def _rank(best: Dict[str, Tuple], rows: Sequence[Dict], query: str, bound: int):
+    """记录每个 ISBN 最好的排序键"""
+    for row in rows:
+        key = row['search_key']
+        distance = 0 if key.startswith(query) else prefix_distance(query, key, bound)
+        if distance > bound:
+            continue
+        score = (distance, KIND_RANK[row['kind']], FIELD_RANK[row['field_name']], len(key))
+        if row['isbn'] not in best or score < best[row['isbn']]:
+            best[row['isbn']] = score
+
+
+def search(text: str, limit: int = None) -> List[Dict]:
+    """
+    按书名、作者前缀查找图书类别，返回按相关度排序的行（isbn、category、title、author、publisher、
+    total_copies、available_copies），额外带 match_distance（编辑距离，0 为前缀完全匹配）。
+    """
+    limit = limit or config.BOOK_SEARCH_LIMIT
+    query = search_keys.normalize_text(text)[:KEY_LENGTH]
+    if not query:
+        return []
+    bound = allowed_distance(query)
+    best: Dict[str, Tuple] = {}
+    with get_read_connection() as conn:
+        with conn.cursor() as cur:
+            _rank(best, _scan(cur, query, config.BOOK_SEARCH_CANDIDATES, 'prefix'), query, 0)
+            if len(best) < limit and bound > 0:
+                stem = query[:max(1, len(query) // 2)]
+                _rank(best, _scan(cur, stem, config.BOOK_SEARCH_FUZZY_CANDIDATES, 'fuzzy'), query, bound)
+            isbns = sorted(best, key=lambda isbn: (best[isbn], isbn))[:limit]
+            if not isbns:
+                return []
+            placeholders = ", ".join(["%s"] * len(isbns))
+            cur.execute(f"""
+                SELECT isbn, category, title, author, publisher, total_copies, available_copies
+                FROM book_categories WHERE isbn IN ({placeholders})
+            """, isbns)
+            rows = {row['isbn']: row for row in cur.fetchall()}
+    results = []
+    for isbn in isbns:
+        if isbn in rows:  # 检索键与类别之间的删除竞争
+            rows[isbn]['match_distance'] = best[isbn][0]
+            results.append(rows[isbn])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图书拼音与模糊查询：查询、重建检索键")
+    parser.add_argument('text', nargs='?', help='书名或作者的开头：汉字、全拼、拼音首字母，可有少量错字')
+    parser.add_argument('--reindex', action='store_true', help='重建全部类别的检索键')
+    parser.add_argument('--limit', type=int, help='最多返回的类别数')
+    args = parser.parse_args()
+
+    if args.reindex:
+        print(f"已重建 {reindex()} 个类别的检索键"
+              + ("" if search_keys.pinyin_available() else "（未安装 pypinyin，只有首字母，没有全拼）"))
+    if args.text:
+        start = time.perf_counter()
+        results = search(args.text, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in results:
+            print(f"[{row['match_distance']}] {row['isbn']}  {row['title']}  {row['author']}")
+        print(f"共 {len(results)} 条，用时 {elapsed:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图书拼音与模糊查询基准测试：生成大规模目录（默认 50 万个类别），通过 import_book_categories
+批量导入（同时写入检索键），再测量 book_search.search 各种输入的耗时与命中率，
+并与 search_books 的 LIKE '%x%' 书名查询对比。
+
+数据放在独立的 MySQL 数据库（默认 lms_benchmark_search，每次重新建表）或 SQLite 文件中，
+不会影响正式数据（见 backend_benchmark.use_backend）。
+
+示例：
+    python book_search_benchmark.py --categories 500000
+    python book_search_benchmark.py --backend sqlite --categories 100000 --output search.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import book_search
+import enhanced_config as config
+import enhanced_database as db
+import enhanced_library as lib
+import search_keys
+from backend_benchmark import use_backend
+
+WORDS = ['数据', '系统', '设计', '原理', '算法', '历史', '文学', '经济', '管理', '网络', '程序', '语言',
+         '理论', '实践', '分析', '工程', '科学', '艺术', '哲学', '教程', '结构', '机器', '学习', '计算',
+         '软件', '操作', '编译', '图论', '概率', '统计', '中国', '世界', '文化', '社会', '心理', '音乐']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰红建国志文'
+CATEGORIES = ['计算机', '文学', '历史', '经济', '管理', '艺术', '哲学', '数学', '物理', '化学']
+SIMPLIFIED_TO_TRADITIONAL = {s: t for t, s in search_keys.TRADITIONAL_TO_SIMPLIFIED.items()}
+
+
+def generate(count: int, rng: random.Random) -> List[Dict]:
+    categories = []
+    for i in range(count):
+        title = ''.join(rng.sample(WORDS, rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            title += '：' + ''.join(rng.sample(WORDS, 2))
+        title += f" 第{i % 10 + 1}版"
+        author = rng.choice(SURNAMES) + ''.join(rng.sample(GIVEN, rng.randint(1, 2)))
+        categories.append({'isbn': f"S{i:012d}", 'category': rng.choice(CATEGORIES), 'title': title, 'author': author})
+    return categories
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """把后一半中的一个字换成别的字（编辑距离 1，前一半保持正确）"""
+    position = rng.randrange(len(text) // 2 + 1, len(text))
+    replacement = rng.choice([c for c in ''.join(WORDS) if c != text[position]])
+    return text[:position] + replacement + text[position + 1:]
+
+
+def build_cases(categories: List[Dict], samples: int, rng: random.Random) -> Dict[str, List]:
+    """每种输入方式的 [(输入, 期望命中的 ISBN)]"""
+    cases: Dict[str, List] = {}
+    for item in rng.sample(categories, min(samples, len(categories))):
+        text = search_keys.normalize_text(item['title'])
+        cases.setdefault('书名前缀', []).append((text[:2], None))
+        cases.setdefault('书名首字母', []).append((search_keys.initials(text)[:4], None))
+        if search_keys.pinyin_available():
+            cases.setdefault('书名全拼', []).append((search_keys.full_pinyin(text)[:8], None))
+        cases.setdefault('作者前缀', []).append((item['author'][:2], None))
+        cases.setdefault('繁体输入', []).append(
+            (''.join(SIMPLIFIED_TO_TRADITIONAL.get(c, c) for c in text[:6]), item['isbn']))
+        cases.setdefault('错字（距离 1）', []).append((typo(text[:8], rng), item['isbn']))
+    return cases
+
+
+def time_calls(func: Callable, cases: List, limit: int) -> Dict:
+    timings, hits, expected = [], 0, 0
+    for text, isbn in cases:
+        start = time.perf_counter()
+        rows = func(text)
+        timings.append((time.perf_counter() - start) * 1000)
+        if isbn is not None:
+            expected += 1
+            hits += any(row['isbn'] == isbn for row in rows[:limit])
+    timings.sort()
+    return {'count': len(timings), 'median_ms': statistics.median(timings),
+            'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            'hit_rate': hits / expected if expected else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量图书拼音与模糊查询在大目录上的耗时")
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default='mysql')
+    parser.add_argument('--mysql-database', default='lms_benchmark_search', help='MySQL 基准数据库（每次重建）')
+    parser.add_argument('--sqlite-path', default='lms_benchmark_search.db', help='SQLite 基准数据库文件（每次重建）')
+    parser.add_argument('--categories', type=int, default=500000, help='生成的图书类别数')
+    parser.add_argument('--samples', type=int, default=200, help='每种输入方式的查询次数')
+    parser.add_argument('--legacy-samples', type=int, default=20, help='LIKE 书名查询的执行次数（较慢）')
+    parser.add_argument('--random-seed', type=int, default=42, help='随机数种子，便于复现')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    config.CATALOG_CACHE_ENABLED = False
+    rng = random.Random(args.random_seed)
+    use_backend(args.backend, args)
+    try:
+        categories = generate(args.categories, rng)
+        start = time.perf_counter()
+        for offset in range(0, len(categories), 50000):
+            lib.import_book_categories(categories[offset:offset + 50000])
+            print(f"已导入 {min(offset + 50000, len(categories))} 个类别")
+        import_seconds = time.perf_counter() - start
+        print(f"导入 {len(categories)} 个类别（含检索键）用时 {import_seconds:.1f} 秒\n")
+
+        limit = config.BOOK_SEARCH_LIMIT
+        results = {}
+        for name, cases in build_cases(categories, args.samples, rng).items():
+            results[name] = time_calls(book_search.search, cases, limit)
+        legacy_cases = [(search_keys.normalize_text(item['title'])[:2], None)
+                        for item in rng.sample(categories, min(args.legacy_samples, len(categories)))]
+        results["LIKE '%x%' 书名"] = time_calls(lambda text: lib.search_books(title=text), legacy_cases, limit)
+    finally:
+        db.close_pool()
+
+    print(f"{'输入方式':<16}{'次数':>6}{'中位数':>12}{'p95':>12}{'命中率':>10}")
+    for name, stats in results.items():
+        hit_rate = f"{stats['hit_rate']:.0%}" if stats['hit_rate'] is not None else '-'
+        print(f"{name:<16}{stats['count']:>6}{stats['median_ms']:>10.2f}ms{stats['p95_ms']:>10.2f}ms{hit_rate:>10}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'import_seconds': import_seconds, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
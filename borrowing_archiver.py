@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+借阅记录归档：把归还超过 BORROWING_ARCHIVE_AFTER_DAYS 天的借阅记录分批移入 borrowings_archive。
+
+借阅信息表（borrowings）只保留未归还和近期归还的记录，逾期检查、当前借阅、活跃读者
+等日常查询的数据量不再随历史增长；借阅历史、排行榜、历史总数由 enhanced_library
+同时查询两张表（UNION ALL）或读取 borrowing_archive_totals 汇总表，调用方无需区分。
+
+每批一个短事务：按主键做键集分页锁定 n 行 → 复制到归档表 → 累加读者/图书的归档次数
+→ 从借阅信息表删除 → 提交。一批失败整体回滚，不会出现记录既不在原表也不在归档表，
+或同时出现在两张表中的情况。每批之间暂停 BORROWING_ARCHIVE_PAUSE_SECONDS 秒，
+并在 job_checkpoints 表中保存进度，中断后从断点继续。
+
+当前最大的 borrowing_id 不归档：InnoDB（MySQL 8.0 之前）重启后按表中最大主键重新计算
+AUTO_INCREMENT，若最大的记录被移走，新借阅可能重用归档表中已有的编号。
+
+用法：
+    python borrowing_archiver.py --dry-run         # 只统计可归档的记录数
+    python borrowing_archiver.py                   # 归档
+    python borrowing_archiver.py --days 730 --batch-size 200
+web_app 的生产入口（gunicorn、waitress）会调用 start_background() 定期归档；
+多个进程同时执行时，通过 MySQL 的 GET_LOCK 保证同一时间只有一个进程在归档。
+"""
+import argparse
+import threading
+import time
+from typing import Dict, List
+
+import enhanced_config as config
+import job_checkpoints
+import metrics
+from enhanced_database import get_connection
+
+JOB_NAME = "borrowing_archive"
+LOCK_NAME = "lms_borrowing_archive"
+COLUMNS = ("borrowing_id, library_card_no, book_number, borrow_date, due_date, return_date, "
+           "fine_amount, status, created_at, updated_at")
+
+ARCHIVED_ROWS = metrics.counter("lms_borrowings_archived_total", "移入归档表的借阅记录数")
+
+ELIGIBLE_SQL = """
+    FROM borrowings
+    WHERE borrowing_id > %s AND borrowing_id < %s
+      AND return_date IS NOT NULL AND return_date < CURDATE() - INTERVAL %s DAY
+"""
+
+
+def count_eligible(days: int = None) -> int:
+    """可归档的记录数（不含当前最大编号的记录）"""
+    days = days if days is not None else config.BORROWING_ARCHIVE_AFTER_DAYS
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(borrowing_id), 0) AS max_id FROM borrowings")
+            max_id = cur.fetchone()['max_id']
+            cur.execute("SELECT COUNT(*) AS n" + ELIGIBLE_SQL, (0, max_id, days))
+            return cur.fetchone()['n']
+
+
+def archive(days: int = None, batch_size: int = None, pause_seconds: float = None,
+            resume: bool = True, max_batches: int = None) -> Dict:
+    """
+    分批归档，返回 {'archived', 'batches', 'completed'}。
+    max_batches 限制本次执行的批数，未完成时保留断点。
+    """
+    days = days if days is not None else config.BORROWING_ARCHIVE_AFTER_DAYS
+    if days < 30:
+        # 活跃读者统计按最近 30 天的借阅计算，只查询借阅信息表
+        raise ValueError("归档期限不能少于 30 天")
+    batch_size = batch_size or config.BORROWING_ARCHIVE_BATCH_SIZE
+    pause_seconds = pause_seconds if pause_seconds is not None else config.BORROWING_ARCHIVE_PAUSE_SECONDS
+
+    position, stats = job_checkpoints.load(JOB_NAME) if resume else (None, {})
+    last_id = int(position) if position else 0
+    archived = int(stats.get('archived', 0))
+    batches = 0
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(borrowing_id), 0) AS max_id FROM borrowings")
+            max_id = cur.fetchone()['max_id']
+            conn.commit()
+            while max_batches is None or batches < max_batches:
+                moved, last_id = _archive_batch(conn, cur, last_id, max_id, days, batch_size)
+                if moved == 0:
+                    job_checkpoints.clear(JOB_NAME)
+                    return {'archived': archived, 'batches': batches, 'completed': True}
+                archived += moved
+                batches += 1
+                ARCHIVED_ROWS.inc(amount=moved)
+                job_checkpoints.save(JOB_NAME, str(last_id), {'archived': archived})
+                time.sleep(pause_seconds)
+    return {'archived': archived, 'batches': batches, 'completed': False}
+
+
+def _archive_batch(conn, cur, last_id: int, max_id: int, days: int, batch_size: int):
+    """在一个事务中移动一批记录，返回 (移动的行数, 本批最后一个主键)"""
+    try:
+        cur.execute("SELECT borrowing_id" + ELIGIBLE_SQL + " ORDER BY borrowing_id LIMIT %s FOR UPDATE",
+                    (last_id, max_id, days, batch_size))
+        ids = [row['borrowing_id'] for row in cur.fetchall()]
+        if not ids:
+            conn.commit()
+            return 0, last_id
+        placeholders = ", ".join(["%s"] * len(ids))
+        cur.execute(f"""
+            INSERT INTO borrowings_archive ({COLUMNS})
+            SELECT {COLUMNS} FROM borrowings WHERE borrowing_id IN ({placeholders})
+        """, ids)
+        add_to_totals(cur, ids)
+        cur.execute(f"DELETE FROM borrowings WHERE borrowing_id IN ({placeholders})", ids)
+        conn.commit()
+        return len(ids), ids[-1]
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def add_to_totals(cur, ids: List[int], kinds=('reader', 'book')):
+    """
+    把 borrowings 中这些借阅累加到 borrowing_archive_totals，须在删除这些行的同一事务中、
+    删除之前调用。排行榜和历史总数 = 借阅信息表中的记录 + 汇总表中的次数。
+    """
+    placeholders = ", ".join(["%s"] * len(ids))
+    columns = {'reader': 'library_card_no', 'book': 'book_number'}
+    for kind in kinds:
+        cur.execute(f"""
+            INSERT INTO borrowing_archive_totals (kind, row_key, borrow_count)
+            SELECT %s, {columns[kind]}, COUNT(*) FROM borrowings
+            WHERE borrowing_id IN ({placeholders}) GROUP BY {columns[kind]}
+            ON DUPLICATE KEY UPDATE borrow_count = borrow_count + VALUES(borrow_count)
+        """, [kind] + list(ids))
+
+
+def archive_if_leader() -> bool:
+    """取得数据库命名锁后执行一次归档；其他进程正在执行时直接返回 False"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cur.fetchone()['acquired']:
+                return False
+            try:
+                result = archive()
+                if result['archived']:
+                    print(f"借阅归档：已移入归档表 {result['archived']} 条记录")
+                return True
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+_thread = None
+
+
+def start_background(interval_seconds: float = None):
+    """启动后台归档线程（每个进程最多一个，可重复调用）"""
+    global _thread
+    if _thread is not None or not config.BORROWING_ARCHIVE_ENABLED:
+        return
+    interval = interval_seconds or config.BORROWING_ARCHIVE_INTERVAL_SECONDS
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                archive_if_leader()
+            except Exception as e:
+                print(f"借阅归档失败: {e}")
+
+    _thread = threading.Thread(target=run, name="lms-borrowing-archiver", daemon=True)
+    _thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把归还已久的借阅记录分批移入归档表")
+    parser.add_argument('--days', type=int, default=None, help="归还超过多少天的记录归档")
+    parser.add_argument('--batch-size', type=int, default=None, help="每批移动的行数")
+    parser.add_argument('--pause', type=float, default=None, help="每批之间暂停的秒数")
+    parser.add_argument('--max-batches', type=int, default=None, help="本次最多执行的批数，未完成时保留断点")
+    parser.add_argument('--restart', action='store_true', help="忽略上次的断点，从头扫描")
+    parser.add_argument('--dry-run', action='store_true', help="只统计可归档的记录数")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(f"可归档的借阅记录: {count_eligible(args.days)} 条")
+        return
+    result = archive(days=args.days, batch_size=args.batch_size, pause_seconds=args.pause,
+                     resume=not args.restart, max_batches=args.max_batches)
+    status = "已完成" if result['completed'] else "未完成（下次从断点继续）"
+    print(f"{status}：本次 {result['batches']} 批，累计归档 {result['archived']} 条记录")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+借阅归档基准测试：借阅历史逐年增长时，对比“不归档”（全部记录留在借阅信息表）与
+“归档”（归还超过 BORROWING_ARCHIVE_AFTER_DAYS 天的记录移入归档表）两种情况下日常查询的耗时。
+
+数据生成在两个独立的数据库中（默认 lms_benchmark 与 lms_benchmark_flat），表结构从正式库复制
+（CREATE TABLE ... LIKE，不复制触发器和外键），不会影响正式数据。
+第 1 步生成最近一年的借阅（含未归还和逾期的记录），之后每一步再往前补一年已归还的历史，
+每一步结束后两种情况各测一次：日常查询只读借阅信息表，读者借阅历史同时查询两张表。
+
+示例：
+    python borrowing_benchmark.py --years 5 --rows-per-year 500000
+    python borrowing_benchmark.py --years 3 --readers 5000 --repeat 20 --output archive.json
+"""
+import argparse
+import json
+import random
+from typing import Dict, List, Tuple
+
+import enhanced_config as config
+import enhanced_library as lib
+from catalog_benchmark import connect, time_query
+
+HOT_QUERIES = {
+    '逾期未还': ("SELECT borrowing_id, library_card_no, book_number, due_date FROM borrowings "
+                 "WHERE return_date IS NULL AND due_date < CURDATE()"),
+    '读者当前借阅': ("SELECT COUNT(*) AS n FROM borrowings "
+                     "WHERE library_card_no = %s AND return_date IS NULL"),
+    '活跃读者': ("SELECT COUNT(DISTINCT library_card_no) AS n FROM borrowings "
+                 "WHERE borrow_date >= CURDATE() - INTERVAL 30 DAY"),
+    '借阅总览': "SELECT status, COUNT(*) AS n FROM borrowings GROUP BY status",
+}
+
+
+def prepare(database: str):
+    if database == config.DATABASE:
+        raise ValueError("基准数据不能生成在正式数据库中")
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            cur.execute(f"USE `{database}`")
+            for table in ('borrowings', 'borrowings_archive'):
+                cur.execute(f"DROP TABLE IF EXISTS {table}")
+                cur.execute(f"CREATE TABLE {table} LIKE `{config.DATABASE}`.{table}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def generate_year(year_index: int, rows: int, readers: int, books: int) -> List[Tuple]:
+    """生成往前第 year_index 年（0 为最近一年）的借阅记录"""
+    result = []
+    for _ in range(rows):
+        days_ago = year_index * 365 + random.randrange(365)
+        duration = random.randint(1, 60)
+        returned = year_index > 0 or days_ago > 60 or random.random() < 0.7
+        return_days_ago = max(days_ago - duration, 0)
+        result.append((f"R{random.randrange(readers):08d}", f"C{random.randrange(books):011d}",
+                       days_ago, days_ago - 30,
+                       return_days_ago if returned else None,
+                       '已归还' if returned else '借阅中'))
+    return result
+
+
+def insert_rows(cur, rows: List[Tuple], batch_size: int = 5000):
+    sql = """
+        INSERT INTO borrowings (library_card_no, book_number, borrow_date, due_date, return_date, status)
+        VALUES (%s, %s, CURDATE() - INTERVAL %s DAY, CURDATE() - INTERVAL %s DAY,
+                CURDATE() - INTERVAL %s DAY, %s)
+    """
+    for i in range(0, len(rows), batch_size):
+        cur.executemany(sql, rows[i:i + batch_size])
+
+
+def move_to_archive(cur, days: int):
+    """与 borrowing_archiver 相同的条件，一次性移动（基准库没有并发写入，不必分批）"""
+    cur.execute("SELECT COALESCE(MAX(borrowing_id), 0) AS max_id FROM borrowings")
+    max_id = cur.fetchone()['max_id']
+    condition = "borrowing_id < %s AND return_date IS NOT NULL AND return_date < CURDATE() - INTERVAL %s DAY"
+    cur.execute(f"""
+        INSERT INTO borrowings_archive (borrowing_id, library_card_no, book_number, borrow_date, due_date,
+                                        return_date, fine_amount, status, created_at, updated_at)
+        SELECT borrowing_id, library_card_no, book_number, borrow_date, due_date,
+               return_date, fine_amount, status, created_at, updated_at
+        FROM borrowings WHERE {condition}
+    """, (max_id, days))
+    cur.execute(f"DELETE FROM borrowings WHERE {condition}", (max_id, days))
+
+
+def measure(cur, reader: str, repeat: int) -> Dict:
+    cur.execute("ANALYZE TABLE borrowings, borrowings_archive")
+    cur.fetchall()
+    cur.execute("SELECT (SELECT COUNT(*) FROM borrowings) AS hot, (SELECT COUNT(*) FROM borrowings_archive) AS archived")
+    sizes = cur.fetchone()
+    timings = {}
+    for name, sql in HOT_QUERIES.items():
+        timings[name] = time_query(cur, sql, [reader] if '%s' in sql else [], repeat)
+    source, params = lib.borrowings_with_archive("library_card_no = %s", [reader])
+    timings['读者借阅历史'] = time_query(cur, f"SELECT * FROM {source} b ORDER BY b.borrow_date DESC", params, repeat)
+    return {'hot_rows': sizes['hot'], 'archived_rows': sizes['archived'], 'queries': timings}
+
+
+def run(database: str, years: int, rows_per_year: int, readers: int, books: int, days: int, repeat: int) -> Dict:
+    flat_database = f"{database}_flat"
+    prepare(database)
+    prepare(flat_database)
+    archived_conn, flat_conn = connect(database), connect(flat_database)
+    reader = f"R{random.randrange(readers):08d}"
+    steps = []
+    try:
+        with archived_conn.cursor() as archived_cur, flat_conn.cursor() as flat_cur:
+            for year_index in range(years):
+                rows = generate_year(year_index, rows_per_year, readers, books)
+                for conn, cur in ((flat_conn, flat_cur), (archived_conn, archived_cur)):
+                    insert_rows(cur, rows)
+                    conn.commit()
+                move_to_archive(archived_cur, days)
+                archived_conn.commit()
+                step = {'years': year_index + 1,
+                        'flat': measure(flat_cur, reader, repeat),
+                        'archived': measure(archived_cur, reader, repeat)}
+                steps.append(step)
+                print_step(step)
+    finally:
+        archived_conn.close()
+        flat_conn.close()
+    return {'rows_per_year': rows_per_year, 'readers': readers, 'archive_after_days': days,
+            'repeat': repeat, 'steps': steps}
+
+
+def print_step(step: Dict):
+    flat, archived = step['flat'], step['archived']
+    print(f"\n历史 {step['years']} 年：不归档 {flat['hot_rows']} 行；"
+          f"归档 {archived['hot_rows']} 行 + 归档表 {archived['archived_rows']} 行")
+    print(f"{'查询':<10}{'不归档中位数':>14}{'归档中位数':>14}")
+    for name in flat['queries']:
+        print(f"{name:<10}{flat['queries'][name]['median_ms']:>12.1f}ms"
+              f"{archived['queries'][name]['median_ms']:>12.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比借阅历史增长时归档与不归档的日常查询耗时")
+    parser.add_argument('--database', default='lms_benchmark',
+                        help='基准数据所在的数据库（不能是正式库），不归档的数据放在 <database>_flat')
+    parser.add_argument('--years', type=int, default=5, help='生成的历史年数')
+    parser.add_argument('--rows-per-year', type=int, default=200000, help='每年的借阅记录数')
+    parser.add_argument('--readers', type=int, default=20000, help='读者数')
+    parser.add_argument('--books', type=int, default=100000, help='图书副本数')
+    parser.add_argument('--days', type=int, default=None, help='归档期限（天），默认取配置')
+    parser.add_argument('--repeat', type=int, default=10, help='每个查询的执行次数')
+    parser.add_argument('--random-seed', type=int, default=42, help='随机数种子，便于复现')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    random.seed(args.random_seed)
+    days = args.days if args.days is not None else config.BORROWING_ARCHIVE_AFTER_DAYS
+    result = run(args.database, args.years, args.rows_per_year, args.readers, args.books, days, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
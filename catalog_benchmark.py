@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图书查询基准测试：对比旧的查询方式（LEFT JOIN books 并逐副本 SUM 汇总）与
+直接读取触发器维护的计数列。
+
+数据生成在独立的数据库中（默认 lms_benchmark），表结构从正式库复制（CREATE TABLE ... LIKE，
+不复制触发器），生成副本后一次性汇总写入计数列，不会影响正式数据。
+
+示例：
+    python catalog_benchmark.py --seed --categories 100000 --copies 2000000
+    python catalog_benchmark.py --repeat 20 --output counters.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import pymysql
+
+import enhanced_config as config
+import enhanced_library as lib
+
+WORDS = ['数据', '系统', '设计', '原理', '算法', '历史', '文学', '经济', '管理', '网络',
+         '程序', '语言', '理论', '实践', '分析', '工程', '科学', '艺术', '哲学', '教程']
+CATEGORIES = ['计算机', '文学', '历史', '经济', '管理', '艺术', '哲学', '数学', '物理', '化学']
+
+# 旧的查询方式（计数改为触发器维护之前的 build_search_books_query）
+LEGACY_SEARCH_SQL = """
+    SELECT
+        bc.isbn, bc.category, bc.title, bc.author, bc.publisher,
+        bc.publish_date, bc.price, bc.total_copies, bc.description,
+        COALESCE(SUM(CASE WHEN b.book_number IS NOT NULL THEN 1 ELSE 0 END), 0) as actual_total_copies,
+        COALESCE(SUM(CASE WHEN b.is_available = '可借' THEN 1 ELSE 0 END), 0) as actual_available_copies
+    FROM book_categories bc
+    LEFT JOIN books b ON bc.isbn = b.isbn
+    WHERE 1=1
+"""
+LEGACY_GROUP_BY = (" GROUP BY bc.isbn, bc.category, bc.title, bc.author, bc.publisher, bc.publish_date,"
+                   " bc.price, bc.total_copies, bc.description ORDER BY bc.title")
+
+
+def legacy_query(title=None, author=None, isbn=None, category=None) -> Tuple[str, list]:
+    sql, params = LEGACY_SEARCH_SQL, []
+    for column, value in (('title', title), ('author', author), ('category', category)):
+        if value:
+            sql += f" AND bc.{column} LIKE %s"
+            params.append(f"%{value}%")
+    if isbn:
+        sql += " AND bc.isbn = %s"
+        params.append(isbn)
+    return sql + LEGACY_GROUP_BY, params
+
+
+def connect(database: str = None):
+    return pymysql.connect(host=config.HOST, user=config.USER, password=config.PASSWORD, port=config.PORT,
+                           database=database, charset=config.CHARSET, autocommit=False,
+                           cursorclass=pymysql.cursors.DictCursor)
+
+
+def seed(database: str, categories: int, copies: int, batch_size: int = 10000):
+    """在独立数据库中生成 categories 个类别、copies 个副本（约 30% 处于借出状态）"""
+    if database == config.DATABASE:
+        raise ValueError("基准数据不能生成在正式数据库中")
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+            cur.execute(f"USE `{database}`")
+            cur.execute("DROP TABLE IF EXISTS books")
+            cur.execute("DROP TABLE IF EXISTS book_categories")
+            cur.execute(f"CREATE TABLE book_categories LIKE `{config.DATABASE}`.book_categories")
+            cur.execute(f"CREATE TABLE books LIKE `{config.DATABASE}`.books")
+
+            rows = []
+            for i in range(categories):
+                rows.append((f"B{i:012d}", random.choice(CATEGORIES),
+                             ''.join(random.sample(WORDS, 3)) + f" 第{i % 10 + 1}版",
+                             f"作者{random.randint(1, categories // 10 + 1)}"))
+                if len(rows) >= batch_size:
+                    _insert_categories(cur, rows)
+                    rows = []
+            _insert_categories(cur, rows)
+            conn.commit()
+            print(f"已生成 {categories} 个图书类别")
+
+            rows = []
+            for i in range(copies):
+                rows.append((f"C{i:011d}", f"B{random.randrange(categories):012d}",
+                             '不可借' if random.random() < 0.3 else '可借'))
+                if len(rows) >= batch_size:
+                    cur.executemany("INSERT INTO books (book_number, isbn, is_available) VALUES (%s, %s, %s)", rows)
+                    conn.commit()
+                    rows = []
+            if rows:
+                cur.executemany("INSERT INTO books (book_number, isbn, is_available) VALUES (%s, %s, %s)", rows)
+            conn.commit()
+            print(f"已生成 {copies} 个图书副本")
+
+            # 复制的表没有触发器，一次性写入计数列
+            cur.execute("""
+                UPDATE book_categories bc
+                JOIN (SELECT isbn, COUNT(*) AS total, SUM(is_available = '可借') AS available
+                      FROM books GROUP BY isbn) t ON t.isbn = bc.isbn
+                SET bc.total_copies = t.total, bc.available_copies = t.available
+            """)
+            conn.commit()
+            cur.execute("ANALYZE TABLE book_categories, books")
+    finally:
+        conn.close()
+
+
+def _insert_categories(cur, rows):
+    if rows:
+        cur.executemany("""
+            INSERT INTO book_categories (isbn, category, title, author, total_copies, available_copies)
+            VALUES (%s, %s, %s, %s, 0, 0)
+        """, rows)
+
+
+def build_cases(cur) -> List[Tuple[str, Dict]]:
+    cur.execute("SELECT isbn, title, author FROM book_categories ORDER BY RAND() LIMIT 1")
+    sample = cur.fetchone()
+    return [
+        ("全部类别", {}),
+        ("书名模糊", {'title': random.choice(WORDS)}),
+        ("作者模糊", {'author': sample['author']}),
+        ("类别模糊", {'category': random.choice(CATEGORIES)}),
+        ("ISBN 精确", {'isbn': sample['isbn']}),
+    ]
+
+
+def time_query(cur, sql: str, params: list, repeat: int) -> Dict:
+    samples, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        rows = len(cur.fetchall())
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {'rows': rows, 'median_ms': statistics.median(samples) * 1000,
+            'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            'min_ms': samples[0] * 1000}
+
+
+def run(database: str, repeat: int) -> Dict:
+    conn = connect(database)
+    results = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) AS n FROM book_categories")
+            categories = cur.fetchone()['n']
+            cur.execute("SELECT COUNT(*) AS n FROM books")
+            copies = cur.fetchone()['n']
+            print(f"数据规模: {categories} 个类别, {copies} 个副本, 每个查询执行 {repeat} 次\n")
+            for name, filters in build_cases(cur):
+                legacy = time_query(cur, *legacy_query(**filters), repeat)
+                counters = time_query(cur, *lib.build_search_books_query(**filters), repeat)
+                results[name] = {'filters': filters, 'legacy': legacy, 'counters': counters}
+    finally:
+        conn.close()
+    return {'categories': categories, 'copies': copies, 'repeat': repeat, 'cases': results}
+
+
+def print_report(result: Dict):
+    print(f"{'查询':<10}{'行数':>8}{'旧方式中位数':>14}{'计数列中位数':>14}{'加速比':>10}")
+    for name, case in result['cases'].items():
+        legacy, counters = case['legacy'], case['counters']
+        speedup = legacy['median_ms'] / counters['median_ms'] if counters['median_ms'] else float('inf')
+        print(f"{name:<10}{counters['rows']:>8}{legacy['median_ms']:>12.1f}ms{counters['median_ms']:>12.1f}ms"
+              f"{speedup:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比图书查询的旧方式（关联汇总）与计数列方式")
+    parser.add_argument('--database', default='lms_benchmark', help='基准数据所在的数据库（不能是正式库）')
+    parser.add_argument('--seed', action='store_true', help='重新生成基准数据')
+    parser.add_argument('--categories', type=int, default=100000, help='生成的图书类别数')
+    parser.add_argument('--copies', type=int, default=2000000, help='生成的图书副本数')
+    parser.add_argument('--repeat', type=int, default=10, help='每个查询的执行次数')
+    parser.add_argument('--random-seed', type=int, default=42, help='随机数种子，便于复现')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    args = parser.parse_args()
+
+    random.seed(args.random_seed)
+    if args.seed:
+        seed(args.database, args.categories, args.copies)
+    result = run(args.database, args.repeat)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
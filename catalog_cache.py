@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+图书目录查询结果缓存（search_books）。
+
+- 以规范化后的查询参数为键，按 LRU 淘汰，超过 TTL 的结果自动失效；
+- 写操作按 ISBN 精确失效：只清除结果中包含该 ISBN 的条目，以及新增图书类别后
+  其查询条件可能匹配到新记录的条目；
+- 缓存在进程内，其他进程（另一台前台电脑、gunicorn 的其他工作进程）的写入
+  不会通知到本进程，最长 CATALOG_CACHE_TTL_SECONDS 秒后可见；订阅了
+  change_notifier 的进程（GUI）在收到借还书、副本变化的通知后立即失效。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import enhanced_config as config
+import metrics
+
+CacheKey = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+CACHE_NAME = "catalog"
+CATALOG_CACHE_ENTRIES = metrics.gauge("lms_catalog_cache_entries", "图书目录缓存当前条目数")
+CATALOG_CACHE_INVALIDATIONS = metrics.counter(
+    "lms_catalog_cache_invalidations_total", "图书目录缓存失效的条目数", ("reason",))
+
+
+def make_key(title: str = None, author: str = None, isbn: str = None, category: str = None) -> CacheKey:
+    """
+    与 build_search_books_query 的语义一致：None 与空串都表示不限制；
+    LIKE 在 utf8mb4_unicode_ci 下不区分大小写，因此大小写不同的查询共用一个条目。
+    """
+    return (title.lower() if title else None, author.lower() if author else None,
+            isbn or None, category.lower() if category else None)
+
+
+class CatalogCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._keys_by_isbn: Dict[str, set] = {}
+        self._epoch = 0  # 每次失效加一，用于丢弃失效前开始、失效后才返回的查询结果
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Tuple[Optional[List[Dict]], int]:
+        """返回 (结果副本或 None, 当前 epoch)；未命中时把 epoch 传给 put()"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.CACHE_REQUESTS.inc(CACHE_NAME, "hit")
+                return [dict(row) for row in entry[1]], self._epoch
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(CACHE_NAME, "miss")
+            return None, self._epoch
+
+    def put(self, key: CacheKey, rows: List[Dict], epoch: int):
+        with self._lock:
+            if epoch != self._epoch:
+                return  # 查询期间发生过写操作，结果可能已过时，不缓存
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, [dict(row) for row in rows])
+            for row in rows:
+                self._keys_by_isbn.setdefault(row['isbn'], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: CacheKey):
+        _, rows = self._entries.pop(key)
+        for row in rows:
+            keys = self._keys_by_isbn.get(row['isbn'])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_isbn[row['isbn']]
+
+    def invalidate_isbns(self, isbns: Iterable[str], reason: str = "write"):
+        """某些 ISBN 的副本数或可借数发生变化：清除结果中包含它们的条目"""
+        with self._lock:
+            self._epoch += 1
+            keys = set()
+            for isbn in isbns:
+                keys |= self._keys_by_isbn.get(isbn, set())
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+        if keys:
+            CATALOG_CACHE_INVALIDATIONS.inc(reason, amount=len(keys))
+
+    def invalidate_new_category(self, isbn: str, category: str, title: str, author: str):
+        """新增图书类别：清除查询条件可能匹配到该记录的条目"""
+        row = {'title': (title or '').lower(), 'author': (author or '').lower(),
+               'isbn': isbn, 'category': (category or '').lower()}
+        with self._lock:
+            self._epoch += 1
+            keys = [key for key in self._entries if _key_matches(key, row)]
+            for key in keys:
+                self._remove(key)
+        if keys:
+            CATALOG_CACHE_INVALIDATIONS.inc("new_category", amount=len(keys))
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._keys_by_isbn.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0}
+
+
+def _like_matches(pattern: Optional[str], value: str) -> bool:
+    if pattern is None:
+        return True
+    if '%' in pattern or '_' in pattern:
+        return True  # 含 LIKE 通配符时无法简单判断，保守地视为匹配
+    return pattern in value
+
+
+def _key_matches(key: CacheKey, row: Dict) -> bool:
+    title, author, isbn, category = key
+    return (_like_matches(title, row['title']) and _like_matches(author, row['author']) and
+            (isbn is None or isbn == row['isbn']) and _like_matches(category, row['category']))
+
+
+_cache = CatalogCache(config.CATALOG_CACHE_MAX_ENTRIES, config.CATALOG_CACHE_TTL_SECONDS)
+CATALOG_CACHE_ENTRIES.set_function(lambda: len(_cache._entries))
+
+
+def get_cache() -> CatalogCache:
+    return _cache
+
+
+def enabled() -> bool:
+    return config.CATALOG_CACHE_ENABLED
+
+
+def invalidate_isbns(isbns: Iterable[str], reason: str = "write"):
+    _cache.invalidate_isbns(isbns, reason)
+
+
+def invalidate_new_category(isbn: str, category: str, title: str, author: str):
+    _cache.invalidate_new_category(isbn, category, title, author)
+
+
+def on_remote_change(isbns: Optional[List[str]]):
+    """change_notifier 的订阅回调：其他进程修改了这些 ISBN；None 表示需要全部失效"""
+    if isbns is None:
+        _cache.clear()
+    else:
+        _cache.invalidate_isbns(isbns, "remote")
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+图书目录内存快照：供 GUI 按键即搜，不经过网络访问数据库。
+
+整个目录（书名、作者、类别、ISBN、可借数量）一次加载到内存，按列存放：
+每个可搜索列预先转成小写并用 '\\x00' 连接成一个大字符串，子串查找由 str.find
+在 C 层扫描整列完成，再用二分查找把命中位置映射回行号（命中行很多时改为逐行推导，
+前面的条件已把候选行缩得很小时只检查候选行）；ISBN 精确匹配走字典。
+数字列用 array 存放。查询语义与 search_books 一致（书名/作者/类别模糊匹配，
+ISBN 精确匹配），结果按书名排序。
+
+后台线程每 CATALOG_SNAPSHOT_POLL_SECONDS 秒通过 delta_sync 增量刷新（借还书由触发器
+更新可借数量，也会刷新 updated_at；删除由 row_tombstones 记录），每
+CATALOG_SNAPSHOT_FULL_RELOAD_SECONDS 秒全量重载一次作为兜底；收到 change_notifier 的
+变更通知时立即增量刷新。
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+import change_notifier
+import delta_sync
+import enhanced_config as config
+import enhanced_library as lib
+import metrics
+
+SEPARATOR = '\x00'
+
+SNAPSHOT_SEARCH_SECONDS = metrics.histogram(
+    "lms_catalog_snapshot_search_seconds", "内存目录快照的查询耗时",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+SNAPSHOT_ROWS = metrics.gauge("lms_catalog_snapshot_rows", "内存目录快照中的图书类别数")
+
+
+class _Column:
+    """一个可搜索的文本列：小写值列表 + 拼接串 + 每行起始偏移"""
+
+    def __init__(self, values: List[str]):
+        self.values = [(v or '').lower().replace(SEPARATOR, ' ') for v in values]
+        self.offsets = array('l')
+        position = 0
+        for value in self.values:
+            self.offsets.append(position)
+            position += len(value) + 1
+        # 以分隔符开头，便于做前缀匹配：查找 '\x00' + 前缀
+        self.blob = SEPARATOR + SEPARATOR.join(self.values)
+
+    def match(self, needle: str, prefix: bool = False, candidates: Optional[set] = None) -> set:
+        needle = needle.lower()
+        values = self.values
+        if candidates is not None and len(candidates) * 8 < len(values):
+            # 候选行已经很少，直接逐行检查比扫描整列更快
+            if prefix:
+                return {i for i in candidates if values[i].startswith(needle)}
+            return {i for i in candidates if needle in values[i]}
+        pattern = SEPARATOR + needle if prefix else needle
+        blob = self.blob
+        if blob.count(pattern) * 8 > len(values):
+            # 命中很多行时，逐个定位的开销超过整列推导式
+            if prefix:
+                hits = {i for i, v in enumerate(values) if v.startswith(needle)}
+            else:
+                hits = {i for i, v in enumerate(values) if needle in v}
+            return hits if candidates is None else hits & candidates
+        offsets = self.offsets
+        hits = set()
+        start = blob.find(pattern)
+        while start != -1:
+            # blob 中第 i 行的内容从 offsets[i] + 1 开始（前面有一个分隔符）
+            row = bisect_right(offsets, start if prefix else start - 1) - 1
+            hits.add(row)
+            # 从下一行的起点继续查找，同一行只计一次
+            next_row_start = offsets[row + 1] if row + 1 < len(offsets) else len(blob)
+            start = blob.find(pattern, max(next_row_start, start + 1))
+        return hits if candidates is None else hits & candidates
+
+
+class _Columns:
+    """一次构建、只读的列集合；刷新时整体替换，查询线程无需加锁"""
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = rows
+        self.title = _Column([r.get('title') for r in rows])
+        self.author = _Column([r.get('author') for r in rows])
+        self.category = _Column([r.get('category') for r in rows])
+        self.available = array('i', (int(r.get('available_copies') or 0) for r in rows))
+        self.total = array('i', (int(r.get('actual_total_copies') or 0) for r in rows))
+        self.row_by_isbn = {r['isbn']: i for i, r in enumerate(rows)}
+
+
+class CatalogSnapshot:
+    def __init__(self):
+        self._columns: Optional[_Columns] = None
+        self._rows_by_isbn: Dict[str, Dict] = {}
+        self._tracker = delta_sync.DeltaTracker('book_categories')
+        self._loaded_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._columns is not None
+
+    def start(self):
+        """在后台线程中加载快照并开始增量刷新（可重复调用）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lms-catalog-snapshot", daemon=True)
+            self._thread.start()
+            if config.CHANGE_NOTIFY_ENABLED:
+                change_notifier.get_notifier().subscribe('book_categories', self._on_remote_change)
+
+    def _on_remote_change(self, isbns):
+        # 在通知线程中执行：收到变更通知后立即增量刷新，不必等下一次轮询
+        if self.ready:
+            self.refresh(full=isbns is None)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"刷新图书目录快照失败: {e}")
+            time.sleep(config.CATALOG_SNAPSHOT_POLL_SECONDS)
+
+    def refresh(self, full: bool = False):
+        """增量刷新（含删除）；首次调用或距上次全量加载超过设定时间时全量加载"""
+        with self._refresh_lock:
+            if full or time.monotonic() - self._loaded_at > config.CATALOG_SNAPSHOT_FULL_RELOAD_SECONDS:
+                self._tracker.reset()
+            changes = self._tracker.poll()
+            if changes['full']:
+                self._rows_by_isbn = {r['isbn']: r for r in changes['upserts']}
+                self._loaded_at = time.monotonic()
+            elif changes['upserts'] or changes['deletes']:
+                for row in changes['upserts']:
+                    self._rows_by_isbn[row['isbn']] = row
+                for isbn in changes['deletes']:
+                    self._rows_by_isbn.pop(isbn, None)
+            else:
+                return
+            self._rebuild()
+
+    def _rebuild(self):
+        rows = sorted(self._rows_by_isbn.values(), key=lambda r: r.get('title') or '')
+        self._columns = _Columns(rows)
+        SNAPSHOT_ROWS.set(len(rows))
+
+    def search(self, title: str = None, author: str = None, isbn: str = None, category: str = None,
+               prefix: bool = False) -> List[Dict]:
+        """
+        在内存中查询，参数语义与 search_books 相同；prefix=True 时书名/作者/类别按前缀匹配。
+        返回的行字典与快照共享，调用方只能读取，不能修改。
+        """
+        columns = self._columns
+        if columns is None:
+            raise RuntimeError("目录快照尚未加载")
+        start = time.perf_counter()
+        candidates = None
+        if isbn:
+            row = columns.row_by_isbn.get(isbn)
+            candidates = {row} if row is not None else set()
+        for column, needle in ((columns.title, title), (columns.author, author), (columns.category, category)):
+            if needle and (candidates is None or candidates):
+                candidates = column.match(needle, prefix, candidates)
+        rows = columns.rows
+        results = list(rows) if candidates is None else [rows[i] for i in sorted(candidates)]
+        SNAPSHOT_SEARCH_SECONDS.observe(time.perf_counter() - start)
+        return results
+
+    def availability(self, isbn: str) -> Optional[int]:
+        columns = self._columns
+        if columns is None:
+            return None
+        row = columns.row_by_isbn.get(isbn)
+        return None if row is None else columns.available[row]
+
+
+_snapshot = CatalogSnapshot()
+
+
+def get_snapshot() -> CatalogSnapshot:
+    return _snapshot
+
+
+def search_books(title: str = None, author: str = None, isbn: str = None, category: str = None) -> List[Dict]:
+    """快照已加载时在内存中查询，否则回退到 enhanced_library.search_books；两者都在没有结果时改用拼音与模糊查询"""
+    if config.CATALOG_SNAPSHOT_ENABLED and _snapshot.ready:
+        results = _snapshot.search(title, author, isbn, category)
+        fallback_text = lib.keys_fallback_text(title, author, isbn, category)
+        if not results and fallback_text:
+            # 子串没有命中时与 search_books 一样改用拼音与模糊查询（查询数据库中的检索键）
+            results = lib.search_books_by_keys(fallback_text)
+        return results
+    return lib.search_books(title=title, author=author, isbn=isbn, category=category)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+变更通知：按序号读取 change_log 表，把其他客户端的借还书、图书副本变化推送给订阅者。
+
+change_log 由触发器写入（见 enhanced_schema.sql），seq 单调递增。每次轮询只执行一条
+按主键范围的查询（seq > 上次读到的序号），没有变化时几乎没有开销。
+
+AUTO_INCREMENT 在插入时分配、在提交时才可见，后分配的序号可能先提交。读到的序号
+出现空洞时，把缺失的序号记下来，之后的查询一并读取它们；超过
+CHANGE_NOTIFY_GAP_TIMEOUT_SECONDS 仍未出现的视为事务已回滚，不再等待。
+
+订阅者回调在通知线程中执行，参数为发生变化的主键列表（已去重）；
+参数为 None 表示通知中断过久（期间的日志可能已被清理），订阅者应整表重新加载。
+GUI 通过 additional_widgets.ChangeSignalBridge 转到主线程。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import enhanced_config as config
+import metrics
+from enhanced_database import get_connection
+
+CHANGE_NOTIFICATIONS = metrics.counter(
+    "lms_change_notifications_total", "变更通知推送的行数", ("table",))
+
+Subscriber = Callable[[Optional[List[str]]], None]
+
+
+class ChangeNotifier:
+    def __init__(self, poll_seconds: float = None, batch_size: int = None):
+        self.poll_seconds = poll_seconds if poll_seconds is not None else config.CHANGE_NOTIFY_POLL_SECONDS
+        self.batch_size = batch_size or config.CHANGE_NOTIFY_BATCH_SIZE
+        self.last_seq: Optional[int] = None
+        self._missing: Dict[int, float] = {}  # 尚未提交的序号 -> 首次发现缺失的时间
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_success = time.monotonic()
+        self._last_purge = 0.0
+
+    def subscribe(self, table_name: str, callback: Subscriber):
+        with self._lock:
+            self._subscribers.setdefault(table_name, []).append(callback)
+
+    def unsubscribe(self, table_name: str, callback: Subscriber):
+        with self._lock:
+            callbacks = self._subscribers.get(table_name, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def start(self):
+        """启动后台线程（可重复调用）；只通知启动之后发生的变化"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lms-change-notifier", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # 一批读满说明积压较多，立即继续读取
+                while self.poll() >= self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"读取变更日志失败: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def poll(self) -> int:
+        """读取一批新变更并通知订阅者，返回读到的日志行数"""
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                if self.last_seq is None:
+                    cur.execute("SELECT COALESCE(MAX(seq), 0) AS seq FROM change_log")
+                    self.last_seq = cur.fetchone()['seq']
+                    self._last_success = time.monotonic()
+                    return 0
+                sql = "SELECT seq, table_name, row_key FROM change_log WHERE seq > %s"
+                params = [self.last_seq]
+                if self._missing:
+                    sql += " OR seq IN (" + ", ".join(["%s"] * len(self._missing)) + ")"
+                    params.extend(self._missing)
+                cur.execute(sql + " ORDER BY seq LIMIT %s", params + [self.batch_size])
+                rows = cur.fetchall()
+        now = time.monotonic()
+        if now - self._last_success > config.CHANGE_LOG_RETENTION_HOURS * 3600:
+            # 长时间未能读取（如休眠），期间的日志可能已被清理，通知订阅者整表重新加载
+            self._last_success = now
+            self._missing.clear()
+            with self._lock:
+                tables = list(self._subscribers)
+            self._notify({table: None for table in tables})
+            self._maybe_purge()
+            return len(rows)
+        self._last_success = now
+        self._track_gaps(rows, now)
+        changed: Dict[str, Optional[List[str]]] = {}
+        for row in rows:
+            keys = changed.setdefault(row['table_name'], [])
+            if row['row_key'] not in keys:
+                keys.append(row['row_key'])
+        self._notify(changed)
+        self._maybe_purge()
+        return len(rows)
+
+    def _track_gaps(self, rows: List[Dict], now: float):
+        for row in rows:
+            seq = row['seq']
+            self._missing.pop(seq, None)
+            if seq > self.last_seq:
+                for gap in range(self.last_seq + 1, seq):
+                    self._missing.setdefault(gap, now)
+                self.last_seq = seq
+        timeout = config.CHANGE_NOTIFY_GAP_TIMEOUT_SECONDS
+        for seq in [seq for seq, since in self._missing.items() if now - since > timeout]:
+            del self._missing[seq]
+
+    def _notify(self, changed: Dict[str, Optional[List[str]]]):
+        for table_name, keys in changed.items():
+            with self._lock:
+                callbacks = list(self._subscribers.get(table_name, []))
+            if keys is not None:
+                CHANGE_NOTIFICATIONS.inc(table_name, amount=len(keys))
+            for callback in callbacks:
+                try:
+                    callback(keys)
+                except Exception as e:
+                    print(f"处理变更通知失败 ({table_name}): {e}")
+
+    def _maybe_purge(self):
+        # 每个进程每小时最多清理一次
+        now = time.monotonic()
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        try:
+            purge_change_log()
+        except Exception as e:
+            print(f"清理变更日志失败: {e}")
+
+
+def purge_change_log(retention_hours: float = None) -> int:
+    """删除超过保留期的变更日志，返回删除的行数"""
+    if retention_hours is None:
+        retention_hours = config.CHANGE_LOG_RETENTION_HOURS
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM change_log WHERE changed_at < NOW() - INTERVAL %s HOUR",
+                        (retention_hours,))
+            conn.commit()
+            return cur.rowcount
+
+
+_notifier: Optional[ChangeNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> ChangeNotifier:
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = ChangeNotifier()
+        return _notifier
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冗余计数列的完整性核对：按主键分批重新统计，报告并（可选）修复偏差。
+
+核对的计数列：
+- book_categories.total_copies / available_copies  —— 与 books 表的副本数、可借数比较；
+- readers.current_borrow_count                      —— 与 borrowings 中未归还的借阅数比较。
+
+这些计数平时由触发器维护（见 enhanced_schema.sql），以下情况可能产生偏差：
+- 旧版本数据库中的馆藏数量是手工填写的“计划数量”，add_book_copy 还会在其上再累加；
+- 绕过触发器的修改（如临时关闭触发器导入数据、直接修改数据文件）。
+偏差会让 CHECK 约束拒绝正常操作（例如可借数量超过馆藏数量时借还书失败）。
+
+扫描方式：按主键做键集分页（key > 上一批的最后一个主键 ORDER BY key LIMIT n），
+每批一条只读的一致性读汇总查询，不加锁；发现偏差的行再逐行在短事务中加锁、重新统计并修复，
+加锁顺序与借还书触发器一致（先明细表后计数表），不会互相死锁。
+每批之间暂停 COUNTER_RECONCILE_PAUSE_SECONDS 秒，并在 job_checkpoints 表中保存进度，
+中断后下一次从断点继续。
+
+用法：
+    python counter_reconciliation.py                      # 只报告偏差
+    python counter_reconciliation.py --fix                # 报告并修复
+    python counter_reconciliation.py --check readers --fix --batch-size 500
+    python counter_reconciliation.py --restart            # 忽略断点，从头扫描
+web_app 的生产入口（gunicorn、waitress）会调用 start_background() 定期核对修复；
+也可以用 cron / 计划任务定时执行 --fix。多个进程同时执行时，
+通过 MySQL 的 GET_LOCK 保证同一时间只有一个进程在核对。
+"""
+import argparse
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pymysql
+
+import catalog_cache
+import enhanced_config as config
+import job_checkpoints
+import metrics
+from enhanced_database import get_connection
+
+LOCK_NAME = 'lms_counter_reconciliation'
+
+COUNTER_DRIFT = metrics.counter(
+    "lms_counter_drift_total", "核对时发现计数与实际不一致的行数", ("table",))
+COUNTER_REPAIRED = metrics.counter(
+    "lms_counter_repaired_total", "核对任务修复的行数", ("table",))
+COUNTER_SCANNED = metrics.counter(
+    "lms_counter_scanned_total", "核对任务扫描的行数", ("table",))
+
+# 锁等待超过该秒数的修复放弃，留待下一轮（开馆期间不长时间阻塞借还书）
+REPAIR_LOCK_WAIT_SECONDS = 3
+
+
+class CounterCheck:
+    """一张表的计数核对：键集分页扫描 + 单行加锁修复"""
+
+    def __init__(self, name: str, table: str, key: str, drift_sql: str, recount_sql: str,
+                 update_sql: str, counters: Dict[str, str]):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.drift_sql = drift_sql        # 参数 (下界, 上界)，返回偏差行
+        self.recount_sql = recount_sql    # 参数 (主键,)，加共享锁重新统计
+        self.update_sql = update_sql      # 参数为重新统计的各列值 + 主键
+        self.counters = counters          # 计数列 -> 实际值列
+
+    @property
+    def job_name(self) -> str:
+        return f"counter_reconciliation:{self.name}"
+
+    def next_upper_bound(self, cur, lower: str, batch_size: int) -> Optional[str]:
+        cur.execute(f"SELECT MAX(k) AS upper FROM (SELECT {self.key} AS k FROM {self.table} "
+                    f"WHERE {self.key} > %s ORDER BY {self.key} LIMIT %s) t", (lower, batch_size))
+        return cur.fetchone()['upper']
+
+    def repair(self, row_key: str) -> bool:
+        """在一个短事务中加锁、重新统计并更新，返回是否做了修改"""
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET SESSION innodb_lock_wait_timeout = %s", (REPAIR_LOCK_WAIT_SECONDS,))
+                try:
+                    cur.execute(self.recount_sql, (row_key,))
+                    actual = cur.fetchone()
+                    values = [int(actual[column]) for column in self.counters.values()]
+                    cur.execute(self.update_sql, values + [row_key] + values)
+                    changed = cur.rowcount > 0
+                    conn.commit()
+                finally:
+                    cur.execute("SET SESSION innodb_lock_wait_timeout = DEFAULT")
+        return changed
+
+
+CATEGORY_CHECK = CounterCheck(
+    name='book_categories', table='book_categories', key='isbn',
+    drift_sql="""
+        SELECT bc.isbn AS row_key, bc.total_copies, bc.available_copies,
+               COUNT(b.book_number) AS actual_total_copies,
+               COALESCE(SUM(b.is_available = '可借'), 0) AS actual_available_copies
+        FROM book_categories bc
+        LEFT JOIN books b ON b.isbn = bc.isbn
+        WHERE bc.isbn > %s AND bc.isbn <= %s
+        GROUP BY bc.isbn
+        HAVING bc.total_copies <> actual_total_copies OR bc.available_copies <> actual_available_copies
+    """,
+    recount_sql="""
+        SELECT COUNT(*) AS actual_total_copies,
+               COALESCE(SUM(is_available = '可借'), 0) AS actual_available_copies
+        FROM books WHERE isbn = %s LOCK IN SHARE MODE
+    """,
+    update_sql="""
+        UPDATE book_categories SET total_copies = %s, available_copies = %s
+        WHERE isbn = %s AND (total_copies <> %s OR available_copies <> %s)
+    """,
+    counters={'total_copies': 'actual_total_copies', 'available_copies': 'actual_available_copies'},
+)
+
+READER_CHECK = CounterCheck(
+    name='readers', table='readers', key='library_card_no',
+    drift_sql="""
+        SELECT r.library_card_no AS row_key, r.current_borrow_count, r.max_borrow_count,
+               COUNT(br.borrowing_id) AS actual_current_borrow_count
+        FROM readers r
+        LEFT JOIN borrowings br ON br.library_card_no = r.library_card_no AND br.return_date IS NULL
+        WHERE r.library_card_no > %s AND r.library_card_no <= %s
+        GROUP BY r.library_card_no
+        HAVING r.current_borrow_count <> actual_current_borrow_count
+    """,
+    recount_sql="""
+        SELECT COUNT(*) AS actual_current_borrow_count
+        FROM borrowings WHERE library_card_no = %s AND return_date IS NULL LOCK IN SHARE MODE
+    """,
+    update_sql="""
+        UPDATE readers SET current_borrow_count = %s
+        WHERE library_card_no = %s AND current_borrow_count <> %s
+    """,
+    counters={'current_borrow_count': 'actual_current_borrow_count'},
+)
+
+CHECKS = {check.name: check for check in (CATEGORY_CHECK, READER_CHECK)}
+
+
+def scan(check: CounterCheck, fix: bool = False, batch_size: int = None, pause_seconds: float = None,
+         resume: bool = True, max_batches: int = None, on_drift=None) -> Dict:
+    """
+    分批扫描一张表。返回 {'scanned', 'drifted', 'repaired', 'failed', 'completed', 'rows'}，
+    rows 为本次发现的偏差行（含当前计数与实际值）。
+    max_batches 用于限制单次运行的批数，未扫描完时保留断点，下次继续。
+    """
+    batch_size = batch_size or config.COUNTER_RECONCILE_BATCH_SIZE
+    pause_seconds = config.COUNTER_RECONCILE_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    position, stats = job_checkpoints.load(check.job_name) if resume else (None, {})
+    lower = position or ''
+    totals = {'scanned': 0, 'drifted': 0, 'repaired': 0, 'failed': 0}
+    for field in totals:
+        totals[field] = int(stats.get(field, 0))
+    rows: List[Dict] = []
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                upper = check.next_upper_bound(cur, lower, batch_size)
+                if upper is None:
+                    break
+                cur.execute(f"SELECT COUNT(*) AS n FROM {check.table} WHERE {check.key} > %s AND {check.key} <= %s",
+                            (lower, upper))
+                scanned = cur.fetchone()['n']
+                cur.execute(check.drift_sql, (lower, upper))
+                drifted = cur.fetchall()
+            conn.rollback()  # 结束一致性读快照，不长时间持有
+        totals['scanned'] += scanned
+        totals['drifted'] += len(drifted)
+        COUNTER_SCANNED.inc(check.name, amount=scanned)
+        COUNTER_DRIFT.inc(check.name, amount=len(drifted))
+        for row in drifted:
+            rows.append(row)
+            if on_drift is not None:
+                on_drift(check, row)
+            if fix:
+                _repair_row(check, row, totals)
+        lower = upper
+        batches += 1
+        job_checkpoints.save(check.job_name, lower, totals)
+        if pause_seconds:
+            time.sleep(pause_seconds)
+    else:
+        return dict(totals, completed=False, rows=rows)
+    job_checkpoints.clear(check.job_name)
+    return dict(totals, completed=True, rows=rows)
+
+
+def _repair_row(check: CounterCheck, row: Dict, totals: Dict):
+    try:
+        if check.repair(row['row_key']):
+            totals['repaired'] += 1
+            COUNTER_REPAIRED.inc(check.name)
+            if check is CATEGORY_CHECK:
+                catalog_cache.invalidate_isbns([row['row_key']], "reconcile")
+    except pymysql.Error as e:
+        # 锁等待超时留待下一轮；实际借阅数超过可借上限时 CHECK 约束拒绝修复，需人工处理
+        totals['failed'] += 1
+        print(f"修复 {check.table}.{row['row_key']} 的计数失败: {e}")
+
+
+def reconcile(fix: bool = False, checks: List[str] = None, **kwargs) -> Dict[str, Dict]:
+    """依次核对各表，返回 {表名: scan() 的结果}"""
+    return {name: scan(CHECKS[name], fix=fix, **kwargs) for name in (checks or list(CHECKS))}
+
+
+def reconcile_if_leader() -> bool:
+    """取得数据库命名锁后执行一次核对与修复；其他进程正在执行时直接返回 False"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cur.fetchone()['acquired']:
+                return False
+            try:
+                for name, result in reconcile(fix=True).items():
+                    if result['drifted']:
+                        print(f"计数核对 {name}：扫描 {result['scanned']} 行，"
+                              f"发现 {result['drifted']} 行有偏差，已修复 {result['repaired']} 行")
+                return True
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+_thread = None
+
+
+def start_background(interval_seconds: float = None):
+    """启动后台核对线程（每个进程最多一个，可重复调用）"""
+    global _thread
+    if _thread is not None or not config.COUNTER_RECONCILE_ENABLED:
+        return
+    interval = interval_seconds or config.COUNTER_RECONCILE_INTERVAL_SECONDS
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                reconcile_if_leader()
+            except Exception as e:
+                print(f"计数核对失败: {e}")
+
+    _thread = threading.Thread(target=run, name="lms-counter-reconciliation", daemon=True)
+    _thread.start()
+
+
+def print_drift(check: CounterCheck, row: Dict):
+    changes = ", ".join(f"{column} {row[column]} -> {row[actual]}" for column, actual in check.counters.items())
+    print(f"{check.table}.{row['row_key']}: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="核对并修复冗余计数列（图书馆藏/可借数量、读者已借数量）")
+    parser.add_argument('--fix', action='store_true', help="修复发现的偏差（默认只报告）")
+    parser.add_argument('--check', choices=list(CHECKS) + ['all'], default='all', help="要核对的表")
+    parser.add_argument('--batch-size', type=int, default=None, help="每批扫描的行数")
+    parser.add_argument('--pause', type=float, default=None, help="每批之间暂停的秒数")
+    parser.add_argument('--max-batches', type=int, default=None, help="本次最多扫描的批数，未完成时保留断点")
+    parser.add_argument('--restart', action='store_true', help="忽略上次的断点，从头扫描")
+    args = parser.parse_args()
+
+    checks = list(CHECKS) if args.check == 'all' else [args.check]
+    for name in checks:
+        result = scan(CHECKS[name], fix=args.fix, batch_size=args.batch_size, pause_seconds=args.pause,
+                      resume=not args.restart, max_batches=args.max_batches, on_drift=print_drift)
+        status = "已完成" if result['completed'] else "未完成（下次从断点继续）"
+        print(f"[{name}] {status}：扫描 {result['scanned']} 行，偏差 {result['drifted']} 行" +
+              (f"，修复 {result['repaired']} 行，失败 {result['failed']} 行" if args.fix else "（使用 --fix 修复）"))
+
+
+if __name__ == '__main__':
+    main()
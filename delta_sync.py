@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+增量同步：返回某个水位（时间点）之后新增、修改或删除的行，供界面原地更新表格。
+
+- 新增与修改：按各表的 updated_at 列查询（借还书时触发器会更新相关行的 updated_at）；
+- 删除：由删除触发器写入 row_tombstones 表。
+
+updated_at 只精确到秒，且事务提交时间晚于 updated_at，因此下一次的水位取数据库当前时间
+往前 SYNC_OVERLAP_SECONDS 秒，重叠区间内的行会被重复返回（按主键覆盖即可，是幂等的）。
+水位早于删除记录的保留期时返回 full=True，调用方应整表重新加载。
+"""
+import time
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+import enhanced_config as config
+import enhanced_library as lib
+from enhanced_database import get_connection
+
+# 实体名（即表名，也是 row_tombstones.table_name）-> 主键列
+ENTITIES = {
+    'book_categories': 'isbn',
+    'books': 'book_number',
+    'readers': 'library_card_no',
+}
+
+BOOK_COPIES_SQL = """
+    SELECT b.book_number, b.isbn, bc.title, b.is_available, b.status, b.created_at
+    FROM books b
+    LEFT JOIN book_categories bc ON b.isbn = bc.isbn
+"""
+
+# 与存储过程 GetReaderInfo 的返回列一致
+READERS_SQL = """
+    SELECT r.*,
+           GROUP_CONCAT(CONCAT(bc.title, ' (', b.book_number, ')') SEPARATOR ', ') AS unreturned_books
+    FROM readers r
+    LEFT JOIN borrowings br ON r.library_card_no = br.library_card_no AND br.return_date IS NULL
+    LEFT JOIN books b ON br.book_number = b.book_number
+    LEFT JOIN book_categories bc ON b.isbn = bc.isbn
+"""
+
+_last_purge = 0.0
+
+
+def key_of(entity: str, row: Dict) -> str:
+    return row[ENTITIES[entity]]
+
+
+def _fetch_rows(cur, entity: str, since=None, keys: Sequence[str] = None) -> List[Dict]:
+    """since 与 keys 都为 None 时返回整表"""
+    if entity == 'book_categories':
+        sql, params = lib.build_search_books_query(updated_since=since, isbns=keys)
+        cur.execute(sql, params)
+        return lib.convert_search_books_rows(cur.fetchall())
+    if entity == 'books':
+        base, group, order = BOOK_COPIES_SQL, "", " ORDER BY b.book_number"
+        alias = 'b'
+    elif entity == 'readers':
+        base, group, order = READERS_SQL, " GROUP BY r.library_card_no", ""
+        alias = 'r'
+    else:
+        raise ValueError(f"不支持增量同步的实体: {entity}")
+    conditions, params = [], []
+    if since is not None:
+        conditions.append(f"{alias}.updated_at >= %s")
+        params.append(since)
+    if keys is not None:
+        if not keys:
+            return []
+        conditions.append(f"{alias}.{ENTITIES[entity]} IN (" + ", ".join(["%s"] * len(keys)) + ")")
+        params.extend(keys)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    cur.execute(base + where + group + order, params)
+    return cur.fetchall()
+
+
+def get_rows(entity: str, keys: Sequence[str]) -> List[Dict]:
+    """按主键读取若干行的当前数据（已被删除的行不在结果中）"""
+    if entity not in ENTITIES:
+        raise ValueError(f"不支持增量同步的实体: {entity}")
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            return _fetch_rows(cur, entity, keys=list(keys))
+
+
+def get_changes(entity: str, since=None) -> Dict:
+    """
+    返回 {'watermark': 下一次调用使用的水位, 'full': 是否为整表数据,
+          'upserts': [新增或修改后的行], 'deletes': [被删除行的主键]}。
+    since 为 None（首次加载）或早于删除记录保留期时返回整表（full=True）。
+    """
+    if entity not in ENTITIES:
+        raise ValueError(f"不支持增量同步的实体: {entity}")
+    _maybe_purge_tombstones()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            # 先取水位再查数据，查询期间发生的修改会在下一次调用中再次读到
+            cur.execute("SELECT NOW() - INTERVAL %s SECOND AS watermark, "
+                        "NOW() - INTERVAL %s DAY AS horizon",
+                        (config.SYNC_OVERLAP_SECONDS, config.SYNC_TOMBSTONE_RETENTION_DAYS))
+            bounds = {key: _as_datetime(value) for key, value in cur.fetchone().items()}
+            full = since is None or since < bounds['horizon']
+            upserts = _fetch_rows(cur, entity, None if full else since)
+            deletes = []
+            if not full:
+                cur.execute("SELECT DISTINCT row_key FROM row_tombstones "
+                            "WHERE table_name = %s AND deleted_at >= %s", (entity, since))
+                alive = {key_of(entity, row) for row in upserts}
+                # 删除后又重新插入的行以当前数据为准
+                deletes = [row['row_key'] for row in cur.fetchall() if row['row_key'] not in alive]
+    return {'watermark': bounds['watermark'], 'full': full, 'upserts': upserts, 'deletes': deletes}
+
+
+def _as_datetime(value):
+    # SQLite 后端的计算列没有声明类型，NOW() - INTERVAL 返回的是文本
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def purge_tombstones(retention_days: int = None) -> int:
+    """删除超过保留期的删除记录，返回删除的行数"""
+    if retention_days is None:
+        retention_days = config.SYNC_TOMBSTONE_RETENTION_DAYS
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM row_tombstones WHERE deleted_at < NOW() - INTERVAL %s DAY",
+                        (retention_days,))
+            conn.commit()
+            return cur.rowcount
+
+
+def _maybe_purge_tombstones():
+    # 每个进程每小时最多清理一次，避免另设定时任务
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < 3600:
+        return
+    _last_purge = now
+    try:
+        purge_tombstones()
+    except Exception as e:
+        print(f"清理删除记录失败: {e}")
+
+
+class DeltaTracker:
+    """记录一个表格视图的水位，每次 poll() 只返回上次之后的变化"""
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.watermark = None
+
+    def reset(self):
+        self.watermark = None
+
+    def poll(self) -> Dict:
+        changes = get_changes(self.entity, self.watermark)
+        self.watermark = changes['watermark']
+        return changes
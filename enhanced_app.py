@@ -103,12 +103,11 @@ def add_book_category():
     publisher = prompt_string("出版社 (可选): ", False)
     publish_date = prompt_date("出版日期", False)
     price = prompt_float("价格 (可选): ", False)
-    total_copies = prompt_int("馆藏数量: ")
     description = prompt_string("图书简介 (可选): ", False)
     
     try:
         lib.add_book_category(isbn, category, title, author, publisher, 
-                             publish_date, price, total_copies, description)
+                             publish_date, price, description)
     except Exception as e:
         print(f"添加失败：{e}")
 
@@ -5,8 +5,134 @@ DATABASE = 'library_management'
 PORT = 3306
 CHARSET = 'utf8mb4'
 
+# 存储后端：'mysql'，或 'sqlite'（单机前台/测试，不需要 MySQL 服务器，见 sqlite_backend.py）
+DB_BACKEND = 'mysql'
+SQLITE_PATH = 'library_management.db'  # 相对路径相对于程序目录；':memory:' 为进程内共享的内存数据库
+SQLITE_CACHE_SIZE_MB = 64  # 每条连接的页缓存大小
+SQLITE_MMAP_SIZE_MB = 256  # 内存映射读取的最大字节数（MB），0 表示不使用
+SQLITE_BUSY_TIMEOUT_MS = 5000  # 等待其他连接释放写锁的最长时间（毫秒）
+
 # 业务配置
 DEFAULT_BORROW_DAYS = 30  # 默认借阅天数
 FINE_PER_DAY = 0.5  # 每天罚金
 
-MAX_BORROW_BOOKS = 5  # 默认最大借书数量 
+MAX_BORROW_BOOKS = 5  # 默认最大借书数量
+
+# 运维配置
+HEALTHCHECK_TIMEOUT_SECONDS = 2  # /healthz 检查数据库的超时时间（秒）
+
+# 连接池与 Web 服务配置（仅在调用 enhanced_database.init_pool() 后生效）
+DB_POOL_SIZE = 10  # 每个进程的最大连接数，应不小于该进程的线程数
+DB_POOL_RECYCLE_SECONDS = 3600  # 连接最长复用时间，避免被 MySQL wait_timeout 断开
+DB_POOL_ACQUIRE_TIMEOUT = 5  # 等待空闲连接的最长时间（秒）
+WEB_BIND = '0.0.0.0:8000'  # 生产模式监听地址
+WEB_WORKERS = 0  # 工作进程数，0 表示按 CPU 核数 * 2 + 1 计算
+WEB_THREADS = 8  # 每个工作进程的线程数
+ASYNC_DB_POOL_MIN = 1  # asgi_app 异步连接池最小连接数
+ASYNC_DB_POOL_MAX = 20  # asgi_app 异步连接池最大连接数（连接数而非并发请求数的上限）
+
+# 密码哈希与登录限流
+HASH_WORKERS = 2  # 同时进行 bcrypt 计算的线程数，建议不超过 CPU 核数的一半
+HASH_QUEUE_LIMIT = 32  # 哈希线程池允许排队的任务数，超出后直接拒绝
+HASH_WAIT_TIMEOUT = 10  # 等待哈希结果的最长时间（秒），超时按线程池繁忙处理（登录返回 503）
+LOGIN_THROTTLE_WINDOW_SECONDS = 60  # 登录限流的统计窗口（秒）
+LOGIN_THROTTLE_PER_ACCOUNT = 5  # 每个账号在窗口内最多失败次数
+LOGIN_THROTTLE_PER_IP = 30  # 每个来源 IP 在窗口内最多失败次数
+
+# 密码哈希策略（修改后，旧哈希会在用户下次登录成功时自动按新策略重算）
+PASSWORD_HASH_ALGORITHM = 'bcrypt'  # bcrypt 或 pbkdf2_sha256
+PASSWORD_BCRYPT_ROUNDS = 12  # bcrypt 代价因子，每加 1 耗时翻倍
+PASSWORD_PBKDF2_ITERATIONS = 600000  # pbkdf2_sha256 迭代次数
+
+# web_app 服务端会话
+SESSION_TTL_SECONDS = 8 * 3600  # 会话在无访问后多久过期
+SESSION_MEMORY_MAX_ENTRIES = 10000  # 进程内会话 LRU 的最大条目数
+SESSION_REDIS_URL = ''  # 例如 'redis://localhost:6379/0'；为空时使用进程内存储（仅限单进程部署）
+SESSION_LOCAL_CACHE_SECONDS = 5  # 使用 Redis 时本地缓存会话的秒数，0 表示不缓存
+SESSION_REVOCATION_POLL_SECONDS = 10  # 拉取读者冻结/管理员停用状态的间隔（秒）
+
+# 图书目录查询缓存（search_books）
+CATALOG_CACHE_ENABLED = True
+CATALOG_CACHE_MAX_ENTRIES = 256  # 最多缓存的不同查询条件数
+CATALOG_CACHE_TTL_SECONDS = 30  # 其他进程/电脑的写入最多延迟这么久可见
+
+# GUI 图书目录内存快照
+CATALOG_SNAPSHOT_ENABLED = True
+CATALOG_SNAPSHOT_POLL_SECONDS = 5  # 增量刷新间隔（秒）
+CATALOG_SNAPSHOT_FULL_RELOAD_SECONDS = 600  # 全量重载间隔（秒），用于清除已删除的类别
+
+# 增量同步配置（GUI 表格按 updated_at 水位原地更新）
+SYNC_OVERLAP_SECONDS = 5  # 水位回退的秒数，覆盖 updated_at 的秒级精度与事务提交延迟
+SYNC_TOMBSTONE_RETENTION_DAYS = 7  # 删除记录保留天数，水位更早的客户端整表重新加载
+SYNC_POLL_SECONDS = 30  # 主窗口轮询增量变化的间隔（秒）
+
+# 变更通知配置（change_log 表）
+CHANGE_NOTIFY_ENABLED = True
+CHANGE_NOTIFY_POLL_SECONDS = 1  # 读取变更日志的间隔（秒），每次只执行一条按主键范围的查询
+CHANGE_NOTIFY_BATCH_SIZE = 1000  # 每次最多读取的日志行数
+CHANGE_NOTIFY_GAP_TIMEOUT_SECONDS = 30  # 序号空洞等待提交的最长时间，超过视为事务已回滚
+CHANGE_LOG_RETENTION_HOURS = 24  # 变更日志保留小时数
+
+# 冗余计数列核对（counter_reconciliation.py）
+COUNTER_RECONCILE_ENABLED = True
+COUNTER_RECONCILE_INTERVAL_SECONDS = 3600  # 后台核对并修复计数偏差的间隔（秒）
+COUNTER_RECONCILE_BATCH_SIZE = 1000  # 每批按主键扫描的行数
+COUNTER_RECONCILE_PAUSE_SECONDS = 0.05  # 每批之间暂停的秒数，避免开馆期间占满数据库
+
+# 借阅记录归档（borrowing_archiver.py）
+BORROWING_ARCHIVE_ENABLED = True
+BORROWING_ARCHIVE_AFTER_DAYS = 365  # 归还超过多少天的借阅记录移入归档表（不少于 30 天，活跃读者统计只查借阅信息表）
+BORROWING_ARCHIVE_BATCH_SIZE = 500  # 每批移动的行数（一批一个事务）
+BORROWING_ARCHIVE_PAUSE_SECONDS = 0.1  # 每批之间暂停的秒数
+BORROWING_ARCHIVE_INTERVAL_SECONDS = 86400  # 后台归档的间隔（秒）
+
+# 数据保留期清理（retention_job.py）
+RETENTION_ENABLED = False  # 是否在生产入口后台定期清理（删除数据，默认关闭）
+RETENTION_BORROWING_DAYS = 1825  # 归还超过多少天的借阅记录删除
+RETENTION_CANCELLED_READER_DAYS = 365  # 注销超过多少天（期间未修改）的读者进行处理
+RETENTION_READER_ACTION = 'anonymize'  # 'anonymize' 清除个人信息保留借阅记录，'purge' 连同借阅记录一起删除
+RETENTION_BATCH_SIZE = 200  # 每批处理的行数（一批一个事务）
+RETENTION_PAUSE_SECONDS = 0.2  # 每批之间暂停的秒数
+RETENTION_LOCK_WAIT_SECONDS = 2  # 清理事务的锁等待超时（秒），超时后退避重试，不长时间阻塞借还书
+RETENTION_MAX_RETRIES = 5  # 同一批连续锁等待超时的最多重试次数，超过后本次清理停止
+RETENTION_INTERVAL_SECONDS = 86400  # 后台清理的间隔（秒）
+
+# 读写分离（只读副本，见 enhanced_database.get_read_connection）
+REPLICA_HOST = None  # 只读副本地址，None 表示不使用副本，所有查询读主库
+REPLICA_PORT = 3306
+REPLICA_USER = None  # None 表示与主库相同；需要 SELECT 和 REPLICATION CLIENT 权限
+REPLICA_PASSWORD = None  # None 表示与主库相同
+REPLICA_POOL_SIZE = 10  # 每个进程到副本的最大连接数
+REPLICA_MAX_LAG_SECONDS = 5  # 复制延迟超过该值（秒）时改为读主库
+REPLICA_LAG_CHECK_SECONDS = 2  # 复制延迟的检查间隔（秒）
+
+# 离线借还书日志（见 offline_journal.py，仅 GUI 前台使用）
+OFFLINE_JOURNAL_ENABLED = False
+OFFLINE_JOURNAL_MODE = 'fallback'  # fallback：数据库不可用时才写入日志；always：先写日志再后台回放
+OFFLINE_JOURNAL_PATH = 'offline_journal.db'  # 本机日志与可借状态快照，相对路径相对于程序目录
+OFFLINE_REPLAY_INTERVAL_SECONDS = 2  # 回放待同步操作的间隔（秒），受理新操作时立即回放
+OFFLINE_SNAPSHOT_REFRESH_SECONDS = 60  # 可借状态快照的增量刷新间隔（秒）
+
+# 连接超时与熔断（见 enhanced_database.CircuitBreaker）
+DB_CONNECT_TIMEOUT = 3  # 建立连接的超时时间（秒）
+DB_READ_TIMEOUT = 30  # 等待查询结果的超时时间（秒），应大于最慢的报表查询
+DB_WRITE_TIMEOUT = 30  # 发送请求的超时时间（秒）
+DB_BREAKER_FAILURE_THRESHOLD = 3  # 连续多少次连接类错误后熔断
+DB_BREAKER_RESET_SECONDS = 10  # 熔断后多少秒放行一次探测
+
+# 读者快速查找（见 reader_lookup.py）
+READER_LOOKUP_LIMIT = 20  # 每次最多返回的读者数
+READER_LOOKUP_TABLE_LIMIT = 1000  # 回车在表格中显示匹配读者时最多返回的读者数
+READER_LOOKUP_DEBOUNCE_MS = 150  # 停止输入多少毫秒后才查询
+READER_LOOKUP_MIN_PHONE_DIGITS = 4  # 按电话尾号查询至少输入的位数
+
+# 图书拼音与模糊查询（见 book_search.py）
+BOOK_SEARCH_LIMIT = 20  # 每次最多返回的类别数
+BOOK_SEARCH_CANDIDATES = 200  # 前缀扫描最多读取的检索键行数
+BOOK_SEARCH_FUZZY_CANDIDATES = 2000  # 模糊补充最多读取的候选行数（按编辑距离重排）
+BOOK_SEARCH_MAX_DISTANCE = 2  # 较长输入允许的最大编辑距离
+
+# ISBN/书名轻量查询（见 enhanced_library.lookup_isbn_titles，下拉框与自动补全使用）
+ISBN_LOOKUP_PAGE_SIZE = 50  # 每页的类别数，下拉列表滚动到底部时再取下一页
+ISBN_LOOKUP_MAX_PAGE_SIZE = 200  # 调用方（含 /api/isbn-lookup）可请求的最大页大小
+ISBN_LOOKUP_DEBOUNCE_MS = 150  # 停止输入多少毫秒后才按前缀查询
@@ -1,34 +1,536 @@
 import pymysql
 from contextlib import contextmanager
+from contextvars import ContextVar
 import enhanced_config as config
 import os
+import queue
+import threading
+import time
+from typing import Optional
+import metrics
+
+class TimedDictCursor(pymysql.cursors.DictCursor):
+    """在 DictCursor 基础上记录每条语句的执行耗时"""
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        except pymysql.Error:
+            metrics.DB_ERRORS.inc("execute")
+            raise
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "execute")
+
+    def callproc(self, procname, args=()):
+        start = time.perf_counter()
+        try:
+            return super().callproc(procname, args)
+        except pymysql.Error:
+            metrics.DB_ERRORS.inc("callproc")
+            raise
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "callproc")
+
+def _connect():
+    """按配置建立一条新的数据库连接"""
+    if config.DB_BACKEND == 'sqlite':
+        import sqlite_backend  # 仅在使用 SQLite 后端时需要
+        return sqlite_backend.connect()
+    start = time.perf_counter()
+    try:
+        conn = pymysql.connect(
+            host=config.HOST,
+            user=config.USER,
+            password=config.PASSWORD,
+            database=config.DATABASE,
+            port=config.PORT,
+            cursorclass=TimedDictCursor,
+            autocommit=False,
+            charset=config.CHARSET,
+            connect_timeout=config.DB_CONNECT_TIMEOUT,
+            read_timeout=config.DB_READ_TIMEOUT,
+            write_timeout=config.DB_WRITE_TIMEOUT
+        )
+    except pymysql.Error:
+        metrics.DB_ERRORS.inc("connect")
+        raise
+    metrics.DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
+    return conn
+
+# ====================== 熔断 ======================
+#
+# 数据库无响应时，每次调用都要等到连接或读写超时才失败，界面刷新一次要调用几十次，会长时间卡住。
+# 连续 DB_BREAKER_FAILURE_THRESHOLD 次连接类错误后熔断器打开，之后 get_connection() 不访问网络，
+# 立即抛出 CircuitOpenError；打开 DB_BREAKER_RESET_SECONDS 秒后进入半开状态，只放行一次调用
+# 作为探测，成功则恢复，失败则重新打开。
+
+CONNECTION_ERROR_CODES = {2002, 2003, 2006, 2013, 2055}  # 无法连接、连接已断开、读写超时
+
+DB_BREAKER_STATE = metrics.gauge("lms_db_breaker_state", "数据库熔断器状态（0 关闭，1 半开，2 打开）")
+DB_BREAKER_REJECTIONS = metrics.counter("lms_db_breaker_rejections_total", "熔断器打开期间直接失败的调用数")
+
+class CircuitOpenError(pymysql.err.OperationalError):
+    """熔断器打开期间的调用直接失败；是 OperationalError 的子类，现有的连接错误处理不必修改"""
+
+class PoolExhaustedError(pymysql.err.OperationalError):
+    """连接池已耗尽：本进程并发过高，不代表数据库故障，不计入熔断"""
+
+def is_connection_error(error: Exception) -> bool:
+    """是否为连接类错误（数据库不可达、连接断开、超时），SQL 本身的错误不算"""
+    if isinstance(error, (CircuitOpenError, PoolExhaustedError)):
+        return False
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) \
+        and error.args[0] in CONNECTION_ERROR_CODES
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"数据库熔断器: {self.state} -> {state}")
+        self.state = state
+        DB_BREAKER_STATE.set(self._STATE_VALUES[state])
+
+    def before_call(self):
+        """允许调用时返回，否则抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_seconds:
+                self._set_state(self.HALF_OPEN)
+                self.probe_started_at = now
+                return  # 本次调用即为探测
+            if self.state == self.HALF_OPEN and now - self.probe_started_at >= self.reset_seconds:
+                self.probe_started_at = now
+                return  # 上一次探测迟迟没有结果，再放行一次
+        DB_BREAKER_REJECTIONS.inc()
+        raise CircuitOpenError(2003, f"数据库暂不可用（{self.retry_in():.0f} 秒后重试）：{self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and
+                                                self.failures >= self.failure_threshold):
+                self._set_state(self.OPEN)
+                self.opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        """距下一次探测的秒数（未打开时为 0）"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def status(self) -> dict:
+        return {'state': self.state, 'failures': self.failures, 'retry_in': self.retry_in(),
+                'last_error': self.last_error}
+
+_breaker = CircuitBreaker(config.DB_BREAKER_FAILURE_THRESHOLD, config.DB_BREAKER_RESET_SECONDS)
+
+def breaker_status() -> dict:
+    """
+    熔断器状态：{'state': 'closed'/'half_open'/'open', 'failures': 连续失败次数,
+    'retry_in': 距下一次探测的秒数, 'last_error': 最近一次连接错误}。只读内存，不访问数据库。
+    """
+    return _breaker.status()
+
+# ====================== 连接池 ======================
+
+class ConnectionPool:
+    """
+    进程内连接池（线程安全）。
+    连接按需创建，最多 size 条；归还时回滚未提交的事务，超过 recycle_seconds 的连接会被重建。
+    连接池不能跨 fork 共享，多进程部署时应在每个工作进程 fork 之后再调用 init_pool()。
+    """
+
+    def __init__(self, size: int, recycle_seconds: int, acquire_timeout: float, connect=None):
+        self.size = size
+        self.connect = connect or _connect
+        self.recycle_seconds = recycle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue()  # 后进先出，让热连接优先被复用
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            metrics.DB_ERRORS.inc("pool_exhausted")
+            raise PoolExhaustedError(2003, f"数据库连接池已耗尽（{self.size} 条连接均在使用中）")
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    candidate, created_at = self._idle.get_nowait()
+                except queue.Empty:
+                    conn, created_at = self.connect(), time.monotonic()
+                    break
+                if time.monotonic() - created_at > self.recycle_seconds or not candidate.open:
+                    self._close_quietly(candidate)
+                    continue
+                conn = candidate
+            with self._lock:
+                self._in_use += 1
+            return conn, created_at
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, created_at, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if broken or not conn.open:
+                self._close_quietly(conn)
+            else:
+                try:
+                    conn.rollback()  # 丢弃调用方未提交的事务，避免污染下一位使用者
+                    self._idle.put((conn, created_at))
+                except pymysql.Error:
+                    self._close_quietly(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(conn)
+
+    def stats(self) -> dict:
+        return {'size': self.size, 'in_use': self._in_use, 'idle': self._idle.qsize()}
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+_pool: Optional[ConnectionPool] = None
+
+def init_pool(size: int = None):
+    """初始化当前进程的连接池。多进程服务器应在 post_fork 钩子中调用。"""
+    global _pool
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.close()
+    _pool = ConnectionPool(size or config.DB_POOL_SIZE, config.DB_POOL_RECYCLE_SECONDS,
+                           config.DB_POOL_ACQUIRE_TIMEOUT)
+
+def close_pool():
+    """关闭当前进程的连接池（工作进程退出时调用）"""
+    global _pool, _replica_pool
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.close()
+    _pool = None
+    if _replica_pool is not None and _replica_pool.pid == os.getpid():
+        _replica_pool.close()
+    _replica_pool = None
+
+def _pool_stats():
+    pool = _pool
+    if pool is None:
+        return {}
+    stats = pool.stats()
+    return {(key,): value for key, value in stats.items()}
+
+DB_POOL_CONNECTIONS = metrics.gauge("lms_db_pool_connections", "连接池状态（size/in_use/idle）", ("state",))
+DB_POOL_CONNECTIONS.set_function(_pool_stats)
 
 @contextmanager
 def get_connection():
     """
     上下文管理器：获取并自动关闭数据库连接。
+    若当前进程已调用 init_pool()，则从连接池借出连接并在结束时归还。
+    熔断器打开时立即抛出 CircuitOpenError。
+    """
+    if config.DB_BACKEND != 'mysql':
+        with _get_connection() as conn:
+            yield conn
+        return
+    _breaker.before_call()
+    try:
+        with _get_connection() as conn:
+            yield conn
+    except Exception as e:
+        if is_connection_error(e):
+            _breaker.record_failure(e)
+        elif not isinstance(e, PoolExhaustedError):
+            _breaker.record_success()  # 已经拿到连接，SQL 或调用方自身的错误不说明数据库故障
+        raise
+    _breaker.record_success()
+
+@contextmanager
+def _get_connection():
+    pool = _pool
+    if pool is not None and pool.pid != os.getpid():
+        # 连接池是在父进程中创建的（fork 之后未重新初始化），不能复用父进程的套接字
+        pool = None
+    if pool is None:
+        conn = _connect()
+        metrics.DB_CONNECTIONS_IN_USE.inc()
+        try:
+            yield conn
+        finally:
+            metrics.DB_CONNECTIONS_IN_USE.dec()
+            conn.close()
+        return
+
+    conn, created_at = pool.acquire()
+    metrics.DB_CONNECTIONS_IN_USE.inc()
+    broken = False
+    try:
+        yield conn
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+        broken = True  # 连接可能已断开，不放回连接池
+        raise
+    finally:
+        metrics.DB_CONNECTIONS_IN_USE.dec()
+        pool.release(conn, created_at, broken)
+
+# ====================== 读写分离 ======================
+#
+# 配置了 REPLICA_HOST 时，报表类只读查询（借阅历史、统计、排行、读者查询）通过 get_read_connection()
+# 发往只读副本，借还书等写操作和写前检查仍使用 get_connection()（主库）。
+# 以下情况改为读主库：
+# - 副本复制延迟超过 REPLICA_MAX_LAG_SECONDS，或复制线程已停止、副本无法连接；
+# - 同一会话刚写入过（pin_primary），在 REPLICA_MAX_LAG_SECONDS + REPLICA_LAG_CHECK_SECONDS 秒内
+#   副本不一定已经应用这次写入：只有延迟不超过上限时才读副本，而延迟最多在上次检查之后继续增长
+#   REPLICA_LAG_CHECK_SECONDS 秒，超过这个窗口后副本一定已包含这次写入（读己之写）。
+#
+# 读己之写只对写入的那个会话有意义。Web 入口在每个请求开始时用 begin_pin_scope() 设置本请求的
+# 读主库期限（取自服务端会话，保存在 contextvar 中），请求结束时用 end_pin_scope() 取回新的期限
+# 存回会话：一个读者借书之后只有他自己的后续请求读主库，其他会话照常读副本；同一会话的下一个请求
+# 落到其他进程也能生效（期限按墙上时钟保存）。
+# 没有设置请求范围时（GUI、命令行脚本、后台线程）期限是进程级的：GUI 每个进程只有一个操作员，
+# 进程内的所有页面本来就属于同一个会话。
+
+_pin_scope: ContextVar[Optional[dict]] = ContextVar('lms_primary_pin_scope', default=None)
+
+DB_READ_ROUTING = metrics.counter("lms_db_read_routing_total", "只读查询的路由（replica/primary 及原因）",
+                                  ("target", "reason"))
+DB_REPLICA_LAG = metrics.gauge("lms_db_replica_lag_seconds", "最近一次检查到的副本复制延迟（秒），-1 表示不可用")
+
+_replica_pool: Optional[ConnectionPool] = None
+_replica_lock = threading.Lock()
+_replica_state = {'checked_at': 0.0, 'lag': None, 'error': None}
+_process_pin = {'until': 0.0}  # 没有请求范围时使用（time.time()）
+
+def replica_enabled() -> bool:
+    return bool(config.REPLICA_HOST) and config.DB_BACKEND == 'mysql'
+
+def _connect_replica():
+    """建立一条到只读副本的连接（未单独配置的账号信息与主库相同）"""
+    start = time.perf_counter()
+    try:
+        conn = pymysql.connect(
+            host=config.REPLICA_HOST,
+            user=config.REPLICA_USER or config.USER,
+            password=config.REPLICA_PASSWORD or config.PASSWORD,
+            database=config.DATABASE,
+            port=config.REPLICA_PORT,
+            cursorclass=TimedDictCursor,
+            autocommit=True,  # 只读，不需要事务；每条查询看到副本上的最新数据
+            charset=config.CHARSET,
+            connect_timeout=config.HEALTHCHECK_TIMEOUT_SECONDS
+        )
+    except pymysql.Error:
+        metrics.DB_ERRORS.inc("replica_connect")
+        raise
+    metrics.DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
+    return conn
+
+def _get_replica_pool() -> ConnectionPool:
+    global _replica_pool
+    with _replica_lock:
+        if _replica_pool is None or _replica_pool.pid != os.getpid():
+            _replica_pool = ConnectionPool(config.REPLICA_POOL_SIZE, config.DB_POOL_RECYCLE_SECONDS,
+                                           config.DB_POOL_ACQUIRE_TIMEOUT, connect=_connect_replica)
+        return _replica_pool
+
+def read_replica_lag(conn) -> Optional[float]:
+    """读取副本的复制延迟（秒）；不是副本或复制线程已停止时返回 None"""
+    with conn.cursor() as cur:
+        try:
+            cur.execute("SHOW REPLICA STATUS")  # MySQL 8.0.22+
+        except pymysql.err.ProgrammingError:
+            cur.execute("SHOW SLAVE STATUS")
+        row = cur.fetchone()
+    if not row:
+        return None
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return None if lag is None else float(lag)
+
+def replica_status(force: bool = False) -> dict:
+    """
+    返回 {'lag': 秒或 None, 'error': 错误信息或 None, 'checked_at': monotonic 时间}。
+    每 REPLICA_LAG_CHECK_SECONDS 秒最多检查一次（由需要读副本的线程顺带执行）。
     """
-    conn = pymysql.connect(
-        host=config.HOST,
-        user=config.USER,
-        password=config.PASSWORD,
-        database=config.DATABASE,
-        port=config.PORT,
-        cursorclass=pymysql.cursors.DictCursor,
-        autocommit=False,
-        charset=config.CHARSET
-    )
+    now = time.monotonic()
+    if not force and now - _replica_state['checked_at'] < config.REPLICA_LAG_CHECK_SECONDS:
+        return dict(_replica_state)
+    with _replica_lock:
+        if not force and now - _replica_state['checked_at'] < config.REPLICA_LAG_CHECK_SECONDS:
+            return dict(_replica_state)
+        _replica_state['checked_at'] = now  # 检查期间其他线程直接使用上一次的结果
+    pool = _get_replica_pool()
+    lag, error = None, None
+    try:
+        conn, created_at = pool.acquire()
+        broken = False
+        try:
+            lag = read_replica_lag(conn)
+            if lag is None:
+                error = "副本未在复制（复制线程已停止或未配置复制）"
+        except pymysql.Error as e:
+            broken, error = True, str(e)
+        finally:
+            pool.release(conn, created_at, broken)
+    except pymysql.Error as e:
+        error = str(e)
+    _replica_state.update(lag=lag, error=error, checked_at=time.monotonic())
+    DB_REPLICA_LAG.set(-1 if lag is None else lag)
+    return dict(_replica_state)
+
+def begin_pin_scope(pinned_until: float = None):
+    """
+    开始一个请求范围：此后 pin_primary 只影响当前请求（及其复制了上下文的线程），
+    pinned_until 为会话中保存的期限（time.time()）。返回交给 end_pin_scope 的令牌，
+    请求结束前用 current_pin_deadline() 取回新的期限存回会话。
+    """
+    return _pin_scope.set({'until': pinned_until or 0.0})
+
+def current_pin_deadline() -> float:
+    """当前请求（或本进程）的读主库期限；请求结束前由调用方存回会话"""
+    return (_pin_scope.get() or _process_pin)['until']
+
+def end_pin_scope(token):
+    _pin_scope.reset(token)
+
+def pin_primary(seconds: float = None):
+    """当前会话刚写入数据：在副本一定追上之前，它的只读查询也读主库"""
+    if seconds is None:
+        seconds = config.REPLICA_MAX_LAG_SECONDS + config.REPLICA_LAG_CHECK_SECONDS
+    pin = _pin_scope.get() or _process_pin
+    pin['until'] = max(pin['until'], time.time() + seconds)
+
+def _read_target() -> tuple:
+    """返回 (是否读副本, 原因)"""
+    if not replica_enabled():
+        return False, "disabled"
+    if time.time() < current_pin_deadline():
+        return False, "pinned"
+    status = replica_status()
+    if status['error'] is not None:
+        return False, "unavailable"
+    if status['lag'] > config.REPLICA_MAX_LAG_SECONDS:
+        return False, "lagging"
+    return True, "ok"
+
+@contextmanager
+def get_read_connection():
+    """
+    只读查询使用的连接：满足条件时来自只读副本，否则与 get_connection() 相同（主库）。
+    调用方不能在这条连接上写入。
+    """
+    use_replica, reason = _read_target()
+    if use_replica:
+        pool = _get_replica_pool()
+        try:
+            conn, created_at = pool.acquire()
+        except pymysql.Error as e:
+            # 副本连不上：在下一次检查之前都读主库
+            _replica_state.update(error=str(e), checked_at=time.monotonic())
+            use_replica, reason = False, "unavailable"
+    if not use_replica:
+        DB_READ_ROUTING.inc("primary", reason)
+        with get_connection() as conn:
+            yield conn
+        return
+    DB_READ_ROUTING.inc("replica", reason)
+    metrics.DB_CONNECTIONS_IN_USE.inc()
+    broken = False
     try:
         yield conn
+    except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        metrics.DB_CONNECTIONS_IN_USE.dec()
+        pool.release(conn, created_at, broken)
+
+def check_health(timeout: float = None) -> dict:
+    """
+    健康检查：在限定时间内建立连接并执行 SELECT 1。
+    返回 {'ok': bool, 'latency_ms': float, 'error': str|None}，不会抛出异常。
+    """
+    if config.DB_BACKEND == 'sqlite':
+        import sqlite_backend
+        return sqlite_backend.check_health()
+    if timeout is None:
+        timeout = config.HEALTHCHECK_TIMEOUT_SECONDS
+    start = time.perf_counter()
+    try:
+        conn = pymysql.connect(
+            host=config.HOST,
+            user=config.USER,
+            password=config.PASSWORD,
+            database=config.DATABASE,
+            port=config.PORT,
+            charset=config.CHARSET,
+            connect_timeout=timeout,
+            read_timeout=timeout,
+            write_timeout=timeout
+        )
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+        finally:
+            conn.close()
+        return {'ok': True, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': None}
+    except Exception as e:
+        metrics.DB_ERRORS.inc("healthcheck")
+        return {'ok': False, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': str(e)}
 
 def init_db():
     """
     初始化数据库：
     1. 确保数据库存在（如果不存在则尝试创建）。
     2. 执行 enhanced_schema.sql 文件以创建所有必要的表。
+    使用 SQLite 后端时执行 sqlite_schema.sql。
     """
+    if config.DB_BACKEND == 'sqlite':
+        import sqlite_backend
+        with get_connection() as conn:
+            sqlite_backend.init_schema(conn)
+        print(f"SQLite 数据库 '{sqlite_backend.database_path()}' 表结构初始化完成。")
+        fill_search_keys()
+        return
     try:
         # 步骤1: 尝试连接到数据库，如果不存在则尝试创建数据库
         conn_no_db = pymysql.connect(
@@ -60,6 +562,7 @@ def init_db():
             print(f"正在执行 SQL schema 文件: {schema_file_path}...")
             execute_sql_file(schema_file_path, conn) # 传递连接对象
             print("数据库表结构初始化完成。")
+        fill_search_keys()
 
     except pymysql.Error as e:
         print(f"数据库初始化失败: {e}")
@@ -72,6 +575,20 @@ def init_db():
         print(f"数据库初始化过程中发生未知错误: {e}")
         raise
 
+def fill_search_keys():
+    """
+    为示例数据和升级前已有的行补上检索键：读者的检索列（见 reader_lookup.fill_missing）
+    和图书类别的检索键（见 book_search.index_missing）
+    """
+    import book_search  # 这两个模块依赖本模块，在函数内导入
+    import reader_lookup
+    filled = reader_lookup.fill_missing()
+    if filled:
+        print(f"已为 {filled} 位读者补上检索列。")
+    indexed = book_search.index_missing()
+    if indexed:
+        print(f"已为 {indexed} 个图书类别生成检索键。")
+
 def execute_sql_file(file_path, connection):
     """
     执行SQL文件
@@ -128,6 +645,9 @@ def execute_sql_file(file_path, connection):
                     error_str = str(e)
                     if "CREATE INDEX" in statement and ("already exists" in error_str or "Duplicate key name" in error_str):
                         print(f"索引可能已存在，忽略错误: {statement[:100]}...")
+                    elif "ADD COLUMN" in statement.upper() and "Duplicate column name" in error_str:
+                        # 为旧库补列的 ALTER TABLE，列已存在说明已经升级过
+                        print(f"列已存在，忽略错误: {statement[:100]}...")
                     else:
                         print(f"执行SQL语句时出错 (语句 {i+1}): {statement[:100]}...")
                         print(f"错误信息: {e}")
@@ -1,20 +1,45 @@
 from datetime import date, timedelta
-from typing import Optional, List, Dict, Any
-from enhanced_database import get_connection
+from typing import Optional, List, Dict, Any, Sequence
+from enhanced_database import get_connection, get_read_connection, pin_primary
 import enhanced_config as config
-import bcrypt # 导入 bcrypt 库
+import os
+import re
+import time
+from concurrent.futures import Future
+import metrics
+import hashing_executor
+import password_policy
+import catalog_cache
+import search_keys
+import book_search
 
 # ====================== 用户认证与密码管理 ======================
 
+def _timed_hash(password: str) -> str:
+    start = time.perf_counter()
+    try:
+        return password_policy.hash_password(password)
+    finally:
+        metrics.BCRYPT_SECONDS.observe(time.perf_counter() - start, "hash")
+
+def _timed_verify(plain_password: str, hashed_password: str) -> bool:
+    start = time.perf_counter()
+    try:
+        return password_policy.verify_password(plain_password, hashed_password)
+    finally:
+        metrics.BCRYPT_SECONDS.observe(time.perf_counter() - start, "verify")
+
 def hash_password(password: str) -> str:
-    """使用 bcrypt 哈希密码"""
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')
+    """按当前密码策略（见 password_policy）哈希密码（在哈希线程池中计算）"""
+    return hashing_executor.run(_timed_hash, password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证明文密码与哈希密码是否匹配"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    """验证明文密码与哈希密码是否匹配（在哈希线程池中计算）"""
+    return hashing_executor.run(_timed_verify, plain_password, hashed_password)
+
+def submit_verify_password(plain_password: str, hashed_password: str) -> Future:
+    """异步提交密码校验，返回 Future（供 asyncio 代码 wrap_future 后 await）"""
+    return hashing_executor.submit(_timed_verify, plain_password, hashed_password)
 
 def create_admin_user(username: str, password: str, full_name: str = "", email: str = ""):
     """创建管理员用户（如果尚不存在）"""
@@ -55,66 +80,149 @@ def set_reader_password(library_card_no: str, password: str):
                 conn.rollback()
                 return False
 
+# 认证查询与结果转换（同步与异步数据访问路径共用）
+ADMIN_AUTH_SQL = """
+    SELECT user_id, username, password_hash, role, full_name, email, is_active 
+    FROM users WHERE username = %s AND role = 'admin'
+"""
+
+READER_AUTH_SQL = """
+    SELECT library_card_no, name, password_hash, status 
+    FROM readers WHERE library_card_no = %s
+"""
+
+def admin_principal(admin_data: Dict) -> Dict:
+    """把 users 表记录转换为登录后的用户信息字典"""
+    return {
+        'user_id': admin_data['user_id'],
+        'username': admin_data['username'],
+        'role': 'admin',
+        'full_name': admin_data.get('full_name', admin_data['username']),
+        'email': admin_data.get('email')
+    }
+
+def reader_principal(reader_data: Dict) -> Dict:
+    """把 readers 表记录转换为登录后的用户信息字典"""
+    return {
+        'library_card_no': reader_data['library_card_no'],
+        'name': reader_data['name'],
+        'role': 'reader' 
+    }
+
 def authenticate_admin(username: str, password: str) -> Optional[Dict]:
     """验证管理员身份"""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT user_id, username, password_hash, role, full_name, email, is_active 
-                FROM users WHERE username = %s AND role = 'admin'
-            """, (username,))
+            cur.execute(ADMIN_AUTH_SQL, (username,))
             admin_data = cur.fetchone()
             if admin_data and admin_data['is_active'] and verify_password(password, admin_data['password_hash']):
                 # 返回包含角色的字典
-                return {
-                    'user_id': admin_data['user_id'],
-                    'username': admin_data['username'],
-                    'role': 'admin',
-                    'full_name': admin_data.get('full_name', admin_data['username']),
-                    'email': admin_data.get('email')
-                }
+                return admin_principal(admin_data)
             return None
 
 def authenticate_reader(library_card_no: str, password: str) -> Optional[Dict]:
     """验证读者身份"""
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT library_card_no, name, password_hash, status 
-                FROM readers WHERE library_card_no = %s
-            """, (library_card_no,))
+            cur.execute(READER_AUTH_SQL, (library_card_no,))
             reader_data = cur.fetchone()
             if reader_data and reader_data['status'] == '正常' and reader_data['password_hash'] and \
                verify_password(password, reader_data['password_hash']):
-                return {
-                    'library_card_no': reader_data['library_card_no'],
-                    'name': reader_data['name'],
-                    'role': 'reader' 
-                }
+                return reader_principal(reader_data)
             return None
 
+AUTH_PRINCIPAL_SQL = """
+    SELECT principal_type, password_hash, is_enabled, user_id, username, full_name, email,
+           library_card_no, name
+    FROM auth_principals WHERE login_name = %s
+    ORDER BY is_enabled DESC, principal_type = 'admin' DESC
+    LIMIT 1
+"""
+
+_dummy_hash: Optional[str] = None
+
+def dummy_password_hash() -> str:
+    """
+    账号不存在或没有密码时用于校验的哈希值。
+    无论账号是否存在都做一次同等代价的校验，避免通过响应时间枚举账号。
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(os.urandom(16).hex())
+    return _dummy_hash
+
+def principal_from_auth_row(row: Optional[Dict], password_ok: bool) -> Optional[Dict]:
+    """根据 auth_principals 查询结果与密码校验结果得出登录用户信息"""
+    if not row or not row['is_enabled'] or not password_ok:
+        return None
+    if row['principal_type'] == 'admin':
+        return admin_principal(row)
+    return reader_principal(row)
+
+def store_upgraded_password_hash(cur, row: Dict, password: str) -> bool:
+    """
+    按当前策略重新计算密码哈希并写回 users 或 readers 表（不提交，由调用方提交）。
+    仅当库中哈希仍是登录时读到的旧值才更新，避免覆盖期间被修改的新密码。
+    """
+    new_hash = hash_password(password)
+    if row['principal_type'] == 'admin':
+        cur.execute("UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+                    (new_hash, row['user_id'], row['password_hash']))
+    else:
+        cur.execute("UPDATE readers SET password_hash = %s WHERE library_card_no = %s AND password_hash = %s",
+                    (new_hash, row['library_card_no'], row['password_hash']))
+    if cur.rowcount:
+        password_policy.PASSWORD_REHASHED.inc(config.PASSWORD_HASH_ALGORITHM)
+    return cur.rowcount > 0
+
+def upgrade_password_hash(row: Dict, password: str) -> bool:
+    """在独立事务中升级密码哈希（供异步认证路径在线程中调用）"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            try:
+                updated = store_upgraded_password_hash(cur, row, password)
+                conn.commit()
+                return updated
+            except Exception as e:
+                conn.rollback()
+                print(f"升级密码哈希失败: {e}")
+                return False
+
 def authenticate_user(username_or_card_no: str, password: str) -> Optional[Dict]:
     """
     统一用户认证函数。
-    根据输入首先尝试作为管理员认证，如果失败，则尝试作为读者认证。
+    通过 auth_principals 视图一次查询同时匹配管理员与读者（同名时可用账号优先、管理员优先），
+    每次登录恰好进行一次密码校验。若存储的哈希与当前密码策略不一致，
+    登录成功后在同一事务内按新策略重新计算并写回。
     """
-    # 尝试管理员认证
-    admin_info = authenticate_admin(username_or_card_no, password)
-    if admin_info:
-        return admin_info
-
-    # 尝试读者认证
-    reader_info = authenticate_reader(username_or_card_no, password)
-    if reader_info:
-        return reader_info
-            
-    return None # 用户名/借书证号不存在或密码错误
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(AUTH_PRINCIPAL_SQL, (username_or_card_no,))
+            row = cur.fetchone()
+            if row and row['is_enabled'] and row['password_hash'] and \
+               password_policy.needs_rehash(row['password_hash']):
+                principal = principal_from_auth_row(row, verify_password(password, row['password_hash']))
+                if principal:
+                    try:
+                        store_upgraded_password_hash(cur, row, password)
+                        conn.commit()
+                    except Exception as e:
+                        # 升级失败不影响本次登录，下次登录时会再次尝试
+                        conn.rollback()
+                        print(f"升级密码哈希失败: {e}")
+                return principal
+    # 连接已归还，再做耗时的密码校验
+    password_hash = row['password_hash'] if row and row['password_hash'] else dummy_password_hash()
+    return principal_from_auth_row(row, verify_password(password, password_hash))
 
 def register_reader(library_card_no: str, name: str, password: str, gender: str = '男', 
                     birth_date: str = None, id_card: str = None, title: str = None,
                     department: str = None, address: str = None, phone: str = None) -> tuple[bool, str]:
     """注册新读者"""
-    hashed_pwd = hash_password(password)
+    try:
+        hashed_pwd = hash_password(password)
+    except hashing_executor.HashingBusyError as e:
+        return False, str(e)
     
     max_borrow_count = config.MAX_BORROW_BOOKS
 
@@ -131,14 +239,18 @@ def register_reader(library_card_no: str, name: str, password: str, gender: str
                     if cur.fetchone():
                         return False, "身份证号已存在。"
 
+                keys = search_keys.reader_keys(name, phone or '')
                 cur.execute("""
                     INSERT INTO readers 
                     (library_card_no, name, password_hash, gender, birth_date, id_card, title,
-                     max_borrow_count, current_borrow_count, department, address, phone, status, registration_date)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s, '正常', CURDATE())
+                     max_borrow_count, current_borrow_count, department, address, phone, status, registration_date,
+                     name_pinyin, name_initials, phone_reversed)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s, '正常', CURDATE(), %s, %s, %s)
                 """, (library_card_no, name, hashed_pwd, gender, birth_date, id_card, title,
-                      max_borrow_count, department, address, phone))
+                      max_borrow_count, department, address, phone,
+                      keys['name_pinyin'], keys['name_initials'], keys['phone_reversed']))
                 conn.commit()
+                pin_primary()  # 随后的列表刷新要能看到这次写入
                 return True, f"读者 '{name}' ({library_card_no}) 注册成功！"
             except Exception as e:
                 conn.rollback()
@@ -153,62 +265,182 @@ def register_reader(library_card_no: str, name: str, password: str, gender: str
 
 def add_book_category(isbn: str, category: str, title: str, author: str, 
                      publisher: str = None, publish_date: str = None, 
-                     price: float = None, total_copies: int = 1, description: str = None):
-    """添加新的图书类别信息"""
+                     price: float = None, description: str = None):
+    """
+    添加新的图书类别信息。
+    馆藏数量与可借数量由 books 表的触发器维护，新类别从 0 开始，每添加一个副本（add_book_copy）加一。
+    """
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO book_categories 
                 (isbn, category, title, author, publisher, publish_date, price, 
                  total_copies, available_copies, description)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, 0, 0, %s)
             """, (isbn, category, title, author, publisher, publish_date, 
-                  price, total_copies, total_copies, description))
+                  price, description))
+            book_search.index_categories(cur, [(isbn, title, author)])
             conn.commit()
+            catalog_cache.invalidate_new_category(isbn, category, title, author)
             print(f"成功添加图书类别：{title}")
 
+def import_book_categories(categories: Sequence[Dict], batch_size: int = 1000) -> int:
+    """
+    批量导入图书类别。每项包含 isbn、category、title、author，可选 publisher、publish_date、price、description。
+    每批一个事务，同时写入检索键（见 book_search）；已存在的 ISBN 跳过。返回新增的类别数。
+    """
+    imported = 0
+    for start in range(0, len(categories), batch_size):
+        batch = categories[start:start + batch_size]
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                placeholders = ", ".join(["%s"] * len(batch))
+                cur.execute(f"SELECT isbn FROM book_categories WHERE isbn IN ({placeholders})",
+                            [item['isbn'] for item in batch])
+                existing = {row['isbn'] for row in cur.fetchall()}
+                new = list({item['isbn']: item for item in batch if item['isbn'] not in existing}.values())
+                if not new:
+                    continue
+                cur.executemany("""
+                    INSERT INTO book_categories 
+                    (isbn, category, title, author, publisher, publish_date, price, 
+                     total_copies, available_copies, description)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 0, 0, %s)
+                """, [(item['isbn'], item['category'], item['title'], item['author'], item.get('publisher'),
+                       item.get('publish_date'), item.get('price'), item.get('description')) for item in new])
+                book_search.index_categories(cur, [(item['isbn'], item['title'], item['author']) for item in new])
+                conn.commit()
+        for item in new:
+            catalog_cache.invalidate_new_category(item['isbn'], item['category'], item['title'], item['author'])
+        imported += len(new)
+    return imported
+
+def build_search_books_query(title: str = None, author: str = None, isbn: str = None, category: str = None,
+                             updated_since=None, isbns: Sequence[str] = None):
+    """
+    构造图书查询语句，返回 (sql, params)。
+    updated_since 用于只取该时间之后修改过的类别，isbns 用于按一组 ISBN 精确查询。
+    副本数与可借数直接读取触发器维护的计数列，不关联 books 表汇总；
+    actual_* 两列保留为别名，兼容旧的调用方。
+    """
+    sql = """
+        SELECT 
+            bc.isbn, bc.category, bc.title, bc.author, bc.publisher, 
+            bc.publish_date, bc.price, bc.total_copies, bc.available_copies, bc.description,
+            bc.total_copies AS actual_total_copies, 
+            bc.available_copies AS actual_available_copies
+        FROM book_categories bc
+        WHERE 1=1
+    """
+    params = []
+    
+    if title:
+        sql += " AND bc.title LIKE %s"
+        params.append(f"%{title}%")
+    if author:
+        sql += " AND bc.author LIKE %s"
+        params.append(f"%{author}%")
+    if isbn:
+        sql += " AND bc.isbn = %s" # ISBN通常是精确匹配
+        params.append(isbn)
+    if category:
+        sql += " AND bc.category LIKE %s"
+        params.append(f"%{category}%")
+    if updated_since is not None:
+        sql += " AND bc.updated_at >= %s"
+        params.append(updated_since)
+    if isbns is not None:
+        if isbns:
+            sql += " AND bc.isbn IN (" + ", ".join(["%s"] * len(isbns)) + ")"
+            params.extend(isbns)
+        else:
+            sql += " AND 1=0"
+    
+    sql += " ORDER BY bc.title"
+    return sql, params
+
+def convert_search_books_rows(rows) -> List[Dict]:
+    """将查询结果转换为字典列表（可借数量已由触发器维护，无需再修正）"""
+    return [dict(row) for row in rows]
+
 def search_books(title: str = None, author: str = None, isbn: str = None, category: str = None):
-    """图书查询功能，支持模糊查询。包含实际副本数和可借阅数。"""
+    """图书查询功能，支持模糊查询。包含副本数和可借阅数。结果经 catalog_cache 缓存。"""
+    if catalog_cache.enabled():
+        key = catalog_cache.make_key(title, author, isbn, category)
+        cached, epoch = catalog_cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+    sql, params = build_search_books_query(title, author, isbn, category)
     with get_connection() as conn:
         with conn.cursor() as cur:
-            sql = """
-                SELECT 
-                    bc.isbn, bc.category, bc.title, bc.author, bc.publisher, 
-                    bc.publish_date, bc.price, bc.total_copies, bc.description,
-                    COALESCE(SUM(CASE WHEN b.book_number IS NOT NULL THEN 1 ELSE 0 END), 0) as actual_total_copies, 
-                    COALESCE(SUM(CASE WHEN b.is_available = '可借' THEN 1 ELSE 0 END), 0) as actual_available_copies
-                FROM book_categories bc
-                LEFT JOIN books b ON bc.isbn = b.isbn
-                WHERE 1=1
-            """
-            params = []
-            
-            if title:
-                sql += " AND bc.title LIKE %s"
-                params.append(f"%{title}%")
-            if author:
-                sql += " AND bc.author LIKE %s"
-                params.append(f"%{author}%")
-            if isbn:
-                sql += " AND bc.isbn = %s" # ISBN通常是精确匹配
-                params.append(isbn)
-            if category:
-                sql += " AND bc.category LIKE %s"
-                params.append(f"%{category}%")
-            
-            sql += " GROUP BY bc.isbn, bc.category, bc.title, bc.author, bc.publisher, bc.publish_date, bc.price, bc.total_copies, bc.description ORDER BY bc.title"
-            
             cur.execute(sql, params)
-            # 将查询结果转换为字典列表，并确保 available_copies 是整数
-            results = []
-            for row in cur.fetchall():
-                row_dict = dict(row)
-                # 更新 book_categories 表中的 available_copies 字段，使其与实际可借数量一致
-                # 注意：这应该由触发器或后端逻辑在借还书时自动处理，此处仅为查询时修正显示
-                # 更好的做法是 schema 中的 available_copies 字段始终准确
-                row_dict['available_copies'] = row_dict.get('actual_available_copies', 0)
-                results.append(row_dict)
-            return results
+            results = convert_search_books_rows(cur.fetchall())
+    fallback_text = keys_fallback_text(title, author, isbn, category)
+    if not results and fallback_text:
+        results = search_books_by_keys(fallback_text)
+    if catalog_cache.enabled():
+        catalog_cache.get_cache().put(key, results, epoch)
+    return results
+
+def keys_fallback_text(title: str = None, author: str = None, isbn: str = None, category: str = None) -> Optional[str]:
+    """只按书名或只按作者查询时返回该文本：LIKE 没有结果时改用 search_books_by_keys；其他组合返回 None"""
+    if isbn or category or bool(title) == bool(author):
+        return None
+    return title or author
+
+def search_books_by_keys(text: str, limit: int = None) -> List[Dict]:
+    """
+    按拼音、拼音首字母、繁体或带少量错字的书名/作者开头查询（book_search），
+    返回与 search_books 相同的列并按相关度排序，额外带 match_distance（0 为前缀完全匹配）。
+    """
+    matches = book_search.search(text, limit)
+    if not matches:
+        return []
+    sql, params = build_search_books_query(isbns=[row['isbn'] for row in matches])
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = {row['isbn']: row for row in convert_search_books_rows(cur.fetchall())}
+    return [dict(rows[m['isbn']], match_distance=m['match_distance']) for m in matches if m['isbn'] in rows]
+
+ISBN_PREFIX_PATTERN = re.compile(r'[0-9Xx-]+')
+
+def build_isbn_lookup_query(prefix: str = None, after: Dict = None, limit: int = None):
+    """
+    构造 ISBN/书名轻量查询，返回 (sql, params)。只取 isbn、title 两列，不读计数列和描述。
+    prefix 由数字、X、连字符组成时按 ISBN 前缀筛选、按 ISBN 排序（主键）；
+    否则按书名前缀筛选、按 (书名, ISBN) 排序（idx_book_title）。
+    after 为上一页的最后一行，从它之后继续（键集分页：翻到后面的页不用扫描前面的行）。
+    """
+    limit = max(1, min(limit or config.ISBN_LOOKUP_PAGE_SIZE, config.ISBN_LOOKUP_MAX_PAGE_SIZE))
+    by_isbn = bool(prefix) and ISBN_PREFIX_PATTERN.fullmatch(prefix) is not None
+    sql = "SELECT isbn, title FROM book_categories WHERE 1=1"
+    params = []
+    if prefix:
+        sql += f" AND {'isbn' if by_isbn else 'title'} LIKE %s ESCAPE '!'"
+        params.append(search_keys.like_prefix(prefix))
+    if after:
+        if by_isbn:
+            sql += " AND isbn > %s"
+            params.append(after['isbn'])
+        else:
+            sql += " AND title >= %s AND (title > %s OR isbn > %s)"
+            params.extend([after['title'], after['title'], after['isbn']])
+    sql += " ORDER BY isbn" if by_isbn else " ORDER BY title, isbn"
+    sql += " LIMIT %s"
+    params.append(limit)
+    return sql, params
+
+def lookup_isbn_titles(prefix: str = None, after: Dict = None, limit: int = None) -> List[Dict]:
+    """
+    下拉框与自动补全用的 ISBN/书名分页查询，返回 [{'isbn', 'title'}]，最多 limit 行。
+    取下一页时把上一页的最后一行作为 after 传入；不足 limit 行说明已经没有更多。
+    """
+    sql, params = build_isbn_lookup_query(prefix.strip() if prefix else None, after, limit)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return [dict(row) for row in cur.fetchall()]
 
 # ====================== 具体图书管理 ======================
 
@@ -221,21 +453,14 @@ def add_book_copy(isbn: str, book_number: str):
             if not cur.fetchone():
                 raise ValueError("该ISBN不存在，请先添加图书类别信息")
             
-            # 添加具体图书
+            # 添加具体图书（类别表的总数和可借数由触发器更新）
             cur.execute("""
                 INSERT INTO books (book_number, isbn, is_available, status)
                 VALUES (%s, %s, '可借', '正常')
             """, (book_number, isbn))
             
-            # 更新类别表的总数和可借数
-            cur.execute("""
-                UPDATE book_categories 
-                SET total_copies = total_copies + 1, 
-                    available_copies = available_copies + 1
-                WHERE isbn = %s
-            """, (isbn,))
-            
             conn.commit()
+            catalog_cache.invalidate_isbns([isbn])
             print(f"成功添加图书副本：{book_number}")
 
 def update_book_status(book_number: str, status: str):
@@ -245,7 +470,11 @@ def update_book_status(book_number: str, status: str):
             cur.execute("""
                 UPDATE books SET status = %s WHERE book_number = %s
             """, (status, book_number))
+            cur.execute("SELECT isbn FROM books WHERE book_number = %s", (book_number,))
+            book = cur.fetchone()
             conn.commit()
+            if book:
+                catalog_cache.invalidate_isbns([book['isbn']])
             print(f"图书 {book_number} 状态已更新为：{status}")
 
 # ====================== 读者管理 ======================
@@ -278,15 +507,18 @@ def add_reader(library_card_no: str, name: str, gender: str = '男',
                     if cur.fetchone():
                         return False, "身份证号已存在。"
                 
+                keys = search_keys.reader_keys(name, phone or '')
                 cur.execute("""
                     INSERT INTO readers 
                     (library_card_no, name, gender, birth_date, id_card, title,
                      max_borrow_count, current_borrow_count, department, address, phone, 
-                     password_hash, status, registration_date)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s, %s, '正常', CURDATE())
+                     password_hash, status, registration_date, name_pinyin, name_initials, phone_reversed)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, 0, %s, %s, %s, %s, '正常', CURDATE(), %s, %s, %s)
                 """, (library_card_no, name, gender, birth_date, id_card, title,
-                      max_borrow_count, department, address, phone, password_hash_val))
+                      max_borrow_count, department, address, phone, password_hash_val,
+                      keys['name_pinyin'], keys['name_initials'], keys['phone_reversed']))
                 conn.commit()
+                pin_primary()
                 return True, f"读者 '{name}' ({library_card_no}) 添加成功！"
             except Exception as e:
                 conn.rollback()
@@ -298,7 +530,7 @@ def add_reader(library_card_no: str, name: str, gender: str = '男',
 
 def search_readers(card_no: str = None, name: str = None, department: str = None):
     """读者信息查询"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.callproc('GetReaderInfo', (card_no, name, department))
             results = cur.fetchall()
@@ -347,6 +579,12 @@ def update_reader_info(library_card_no: str, **kwargs):
             if not set_clause_parts: # 如果没有有效的字段更新（比如只提供了空密码）
                 return False, "没有有效的更新信息。"
 
+            # 姓名、电话变化时同步更新检索列（见 reader_lookup）
+            phone = (kwargs.get('phone') or '') if 'phone' in kwargs else None
+            for key, value in search_keys.reader_keys(kwargs.get('name'), phone).items():
+                set_clause_parts.append(f"{key} = %s")
+                values.append(value)
+
             set_clause = ", ".join(set_clause_parts)
             values.append(library_card_no)
             
@@ -357,6 +595,7 @@ def update_reader_info(library_card_no: str, **kwargs):
                 if cur.rowcount == 0:
                     return False, "未找到该读者，或信息未发生变化。"
                 conn.commit()
+                pin_primary()
                 return True, f"读者 {library_card_no} 信息已更新。"
             except Exception as e:
                 conn.rollback()
@@ -364,8 +603,9 @@ def update_reader_info(library_card_no: str, **kwargs):
 
 # ====================== 借阅管理 ======================
 
-def borrow_book(library_card_no: str, book_number: str, days: int = None) -> tuple[bool, str]:
-    """借书处理。返回 (操作是否成功, 消息)"""
+def borrow_book(library_card_no: str, book_number: str, days: int = None,
+                borrow_date: date = None) -> tuple[bool, str]:
+    """借书处理。返回 (操作是否成功, 消息)。borrow_date 用于补录离线办理的借阅，默认为当天。"""
     if days is None:
         days = config.DEFAULT_BORROW_DAYS
         
@@ -381,7 +621,7 @@ def borrow_book(library_card_no: str, book_number: str, days: int = None) -> tup
             if reader['current_borrow_count'] >= reader['max_borrow_count']:
                 return False, "已达到借书数量限制。"
             
-            cur.execute("SELECT is_available, status FROM books WHERE book_number = %s", (book_number,))
+            cur.execute("SELECT isbn, is_available, status FROM books WHERE book_number = %s", (book_number,))
             book = cur.fetchone()
             
             if not book:
@@ -391,27 +631,30 @@ def borrow_book(library_card_no: str, book_number: str, days: int = None) -> tup
             if book['status'] != '正常': # Schema 使用 '正常'
                  return False, f"图书 '{book_number}' 状态异常 ({book['status']})，无法借出。"
 
-            due_date = date.today() + timedelta(days=days)
+            due_date = (borrow_date or date.today()) + timedelta(days=days)
             try:
                 cur.execute("""
-                    INSERT INTO borrowings (library_card_no, book_number, due_date, status)
-                    VALUES (%s, %s, %s, '借阅中') 
-                """, (library_card_no, book_number, due_date))
+                    INSERT INTO borrowings (library_card_no, book_number, borrow_date, due_date, status)
+                    VALUES (%s, %s, COALESCE(%s, CURDATE()), %s, '借阅中') 
+                """, (library_card_no, book_number, borrow_date, due_date))
                 # 触发器会自动处理 books 和 readers 表的更新
                 conn.commit()
+                pin_primary()
+                catalog_cache.invalidate_isbns([book['isbn']])
                 return True, f"借书成功！书号: {book_number}, 应还日期: {due_date.strftime('%Y-%m-%d')}。"
             except Exception as e:
                 conn.rollback()
                 return False, f"借书失败: {e}"
 
-def return_book(borrowing_id: int) -> tuple[bool, str]:
-    """还书处理。返回 (操作是否成功, 消息)"""
+def return_book(borrowing_id: int, return_date: date = None) -> tuple[bool, str]:
+    """还书处理。返回 (操作是否成功, 消息)。return_date 用于补录离线办理的还书，罚金按该日期计算。"""
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT library_card_no, book_number, due_date, status
-                FROM borrowings 
-                WHERE borrowing_id = %s
+                SELECT br.library_card_no, br.book_number, br.due_date, br.status, bk.isbn
+                FROM borrowings br
+                JOIN books bk ON br.book_number = bk.book_number
+                WHERE br.borrowing_id = %s
             """, (borrowing_id,))
             borrowing = cur.fetchone()
             
@@ -421,7 +664,7 @@ def return_book(borrowing_id: int) -> tuple[bool, str]:
                 return False, "该书已归还。"
             
             fine_amount = 0
-            today = date.today()
+            today = return_date or date.today()
             # 确保 due_date 是 date 类型
             due_date_obj = borrowing['due_date']
             if isinstance(due_date_obj, str):
@@ -439,6 +682,8 @@ def return_book(borrowing_id: int) -> tuple[bool, str]:
                 """, (today, fine_amount, borrowing_id))
                 # 触发器会自动处理 books 和 readers 表的更新
                 conn.commit()
+                pin_primary()
+                catalog_cache.invalidate_isbns([borrowing['isbn']])
                 message = f"还书成功！书号: {borrowing['book_number']}."
                 if fine_amount > 0:
                     message += f" 产生逾期罚金: {fine_amount:.2f}元。"
@@ -451,78 +696,96 @@ def return_book(borrowing_id: int) -> tuple[bool, str]:
 
 def get_overdue_books():
     """查询逾期未归还图书"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT * FROM overdue_books")
             return cur.fetchall()
 
+CURRENT_BORROWINGS_SQL = """
+    SELECT b.borrowing_id, b.library_card_no, r.name as reader_name,
+           b.book_number, bc.title as book_title, bc.author,
+           b.borrow_date, b.due_date, b.status, -- 直接使用 borrowings.status
+           CASE 
+               WHEN b.return_date IS NULL AND b.due_date < CURRENT_DATE THEN DATEDIFF(CURRENT_DATE, b.due_date)
+               ELSE 0 
+           END as overdue_days 
+    FROM borrowings b
+    JOIN readers r ON b.library_card_no = r.library_card_no
+    JOIN books bk ON b.book_number = bk.book_number
+    JOIN book_categories bc ON bk.isbn = bc.isbn
+    WHERE b.return_date IS NULL
+    ORDER BY b.due_date
+"""
+
 def get_current_borrowings():
     """查询当前所有借阅记录"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT b.borrowing_id, b.library_card_no, r.name as reader_name,
-                       b.book_number, bc.title as book_title, bc.author,
-                       b.borrow_date, b.due_date, b.status, -- 直接使用 borrowings.status
-                       CASE 
-                           WHEN b.return_date IS NULL AND b.due_date < CURRENT_DATE THEN DATEDIFF(CURRENT_DATE, b.due_date)
-                           ELSE 0 
-                       END as overdue_days 
-                FROM borrowings b
-                JOIN readers r ON b.library_card_no = r.library_card_no
-                JOIN books bk ON b.book_number = bk.book_number
-                JOIN book_categories bc ON bk.isbn = bc.isbn
-                WHERE b.return_date IS NULL
-                ORDER BY b.due_date
-            """)
+            cur.execute(CURRENT_BORROWINGS_SQL)
             return cur.fetchall()
 
 def get_unreturned_readers_by_book(book_number: str):
     """根据图书编号查询未归还读者"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.callproc('GetUnreturnedReadersByBook', (book_number,))
             return cur.fetchall()
 
 def get_borrowing_statistics(start_date: str, end_date: str):
     """统计指定时间段的借阅次数"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.callproc('GetBorrowingStats', (start_date, end_date))
             return cur.fetchall()
 
+BORROWING_COLUMNS = "borrowing_id, library_card_no, book_number, borrow_date, due_date, return_date, fine_amount, status"
+
+def borrowings_with_archive(where: str = "1=1", params: Sequence = ()):
+    """
+    借阅信息表与归档表（borrowings_archive）的 UNION ALL，用作 FROM 中的派生表，返回 (sql, params)。
+    where 使用不带表别名的列名，分别加在两个分支上，两张表各自走索引。
+    """
+    sql = (f"(SELECT {BORROWING_COLUMNS} FROM borrowings WHERE {where} "
+           f"UNION ALL SELECT {BORROWING_COLUMNS} FROM borrowings_archive WHERE {where})")
+    return sql, list(params) * 2
+
+def build_reader_history_query(library_card_no: str, start_date: str = None, end_date: str = None, book_number_filter: str = None):
+    """构造读者借阅历史查询语句（含已归档的记录），返回 (sql, params)"""
+    conditions = ["library_card_no = %s"]
+    params = [library_card_no]
+    
+    if start_date:
+        conditions.append("borrow_date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("borrow_date <= %s")
+        params.append(end_date)
+    if book_number_filter:
+        conditions.append("book_number = %s")
+        params.append(book_number_filter)
+        
+    source, params = borrowings_with_archive(" AND ".join(conditions), params)
+    sql = f"""
+        SELECT b.borrowing_id, bc.category, bc.title, bc.author, b.book_number,
+               b.borrow_date, b.due_date, b.return_date, b.fine_amount, b.status
+        FROM {source} b
+        JOIN books bk ON b.book_number = bk.book_number
+        JOIN book_categories bc ON bk.isbn = bc.isbn
+        ORDER BY b.borrow_date DESC
+    """
+    return sql, params
+
 def get_reader_borrowing_history(library_card_no: str, start_date: str = None, end_date: str = None, book_number_filter: str = None):
     """查询读者借阅历史"""
-    with get_connection() as conn:
+    sql, params = build_reader_history_query(library_card_no, start_date, end_date, book_number_filter)
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
-            sql = """
-                SELECT b.borrowing_id, bc.category, bc.title, bc.author, b.book_number,
-                       b.borrow_date, b.due_date, b.return_date, b.fine_amount, b.status
-                FROM borrowings b
-                JOIN books bk ON b.book_number = bk.book_number
-                JOIN book_categories bc ON bk.isbn = bc.isbn
-                WHERE b.library_card_no = %s
-            """
-            params = [library_card_no]
-            
-            if start_date:
-                sql += " AND b.borrow_date >= %s"
-                params.append(start_date)
-            if end_date:
-                sql += " AND b.borrow_date <= %s"
-                params.append(end_date)
-            if book_number_filter:
-                sql += " AND b.book_number = %s"
-                params.append(book_number_filter)
-                
-            sql += " ORDER BY b.borrow_date DESC"
-            
             cur.execute(sql, params)
             return cur.fetchall()
 
 def get_reader_statistics_summary(reader_id: Optional[str] = None) -> Dict[str, Any]:
     """获取读者借阅统计摘要"""
-    with get_connection() as conn:
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             # 基础参数
             params = []
@@ -541,24 +804,36 @@ def get_reader_statistics_summary(reader_id: Optional[str] = None) -> Dict[str,
             """, params)
             current_borrowings = cur.fetchone()['current_borrowings']
             
-            # 历史借阅总数
+            # 历史借阅总数：借阅信息表 + 已归档记录的次数汇总
             cur.execute(f"""
                 SELECT COUNT(*) AS total_borrowings
                 FROM borrowings bo
                 {where_clause}
             """, params)
             total_borrowings = cur.fetchone()['total_borrowings']
+            cur.execute(f"""
+                SELECT COALESCE(SUM(borrow_count), 0) AS archived_borrowings
+                FROM borrowing_archive_totals
+                WHERE kind = 'reader' {"AND row_key = %s" if reader_id else ""}
+            """, params)
+            total_borrowings += int(cur.fetchone()['archived_borrowings'])
             
-            # 最近一次借阅
+            # 最近一次借阅（两张表各取最近一条再比较）
+            # 各自的 LIMIT 放在派生表中：SQLite 不支持带括号的 UNION 成员
             cur.execute(f"""
                 SELECT bo.borrow_date, bc.title
-                FROM borrowings bo 
+                FROM (
+                    SELECT * FROM (SELECT bo.borrow_date, bo.book_number FROM borrowings bo {where_clause}
+                                   ORDER BY bo.borrow_date DESC LIMIT 1) AS latest_current
+                    UNION ALL
+                    SELECT * FROM (SELECT bo.borrow_date, bo.book_number FROM borrowings_archive bo {where_clause}
+                                   ORDER BY bo.borrow_date DESC LIMIT 1) AS latest_archived
+                ) bo
                 JOIN books b ON bo.book_number = b.book_number
                 JOIN book_categories bc ON b.isbn = bc.isbn
-                {where_clause}
                 ORDER BY bo.borrow_date DESC
                 LIMIT 1
-            """, params)
+            """, params * 2)
             latest_borrow = cur.fetchone()
             
             # 逾期图书数
@@ -593,7 +868,7 @@ def get_reader_statistics_summary(reader_id: Optional[str] = None) -> Dict[str,
             """)
             teacher_readers = cur.fetchone()['teacher_readers']
             
-            # 添加活跃读者数量统计（过去30天内有借阅记录的读者）
+            # 添加活跃读者数量统计（过去30天内有借阅记录的读者；归档期限远大于 30 天，只查借阅信息表）
             cur.execute("""
                 SELECT COUNT(DISTINCT library_card_no) AS active_readers
                 FROM borrowings
@@ -623,10 +898,18 @@ def get_reader_statistics_summary(reader_id: Optional[str] = None) -> Dict[str,
             }
 
 def get_all_borrowing_history(start_date: str = None, end_date: str = None):
-    """获取所有借阅历史记录"""
-    with get_connection() as conn:
+    """获取所有借阅历史记录（含已归档的记录）"""
+    conditions, params = ["1=1"], []
+    if start_date:
+        conditions.append("borrow_date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("borrow_date <= %s")
+        params.append(end_date)
+    source, params = borrowings_with_archive(" AND ".join(conditions), params)
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
-            sql = """
+            sql = f"""
                 SELECT 
                     bo.borrowing_id, 
                     bo.library_card_no, 
@@ -643,39 +926,31 @@ def get_all_borrowing_history(start_date: str = None, end_date: str = None):
                         WHEN bo.return_date > bo.due_date THEN '已还(逾期)'
                         ELSE '已还'
                     END AS status
-                FROM borrowings bo
+                FROM {source} bo
                 JOIN readers r ON bo.library_card_no = r.library_card_no
                 JOIN books b ON bo.book_number = b.book_number
                 JOIN book_categories bc ON b.isbn = bc.isbn
-                WHERE 1=1
+                ORDER BY bo.borrow_date DESC
             """
             
-            params = []
-            
-            if start_date:
-                sql += " AND bo.borrow_date >= %s"
-                params.append(start_date)
-            
-            if end_date:
-                sql += " AND bo.borrow_date <= %s"
-                params.append(end_date)
-                
-            sql += " ORDER BY bo.borrow_date DESC"
-            
             cur.execute(sql, params)
             return cur.fetchall()
 
 def get_reader_borrowing_ranks():
-    """获取读者借阅排行榜"""
-    with get_connection() as conn:
+    """获取读者借阅排行榜（已归档的借阅按汇总表计入）"""
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT 
                     r.library_card_no,
                     r.name,
-                    COUNT(bo.borrowing_id) AS borrow_count
+                    COALESCE(SUM(c.borrow_count), 0) AS borrow_count
                 FROM readers r
-                LEFT JOIN borrowings bo ON r.library_card_no = bo.library_card_no
+                LEFT JOIN (
+                    SELECT library_card_no, COUNT(*) AS borrow_count FROM borrowings GROUP BY library_card_no
+                    UNION ALL
+                    SELECT row_key, borrow_count FROM borrowing_archive_totals WHERE kind = 'reader'
+                ) c ON r.library_card_no = c.library_card_no
                 GROUP BY r.library_card_no, r.name
                 ORDER BY borrow_count DESC
                 LIMIT 10
@@ -683,17 +958,21 @@ def get_reader_borrowing_ranks():
             return cur.fetchall()
 
 def get_book_borrowing_ranks():
-    """获取图书借阅排行榜"""
-    with get_connection() as conn:
+    """获取图书借阅排行榜（已归档的借阅按汇总表计入）"""
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT 
                     bc.isbn,
                     bc.title,
-                    COUNT(bo.borrowing_id) AS borrow_count
+                    COALESCE(SUM(c.borrow_count), 0) AS borrow_count
                 FROM book_categories bc
                 JOIN books b ON bc.isbn = b.isbn
-                LEFT JOIN borrowings bo ON b.book_number = bo.book_number
+                LEFT JOIN (
+                    SELECT book_number, COUNT(*) AS borrow_count FROM borrowings GROUP BY book_number
+                    UNION ALL
+                    SELECT row_key, borrow_count FROM borrowing_archive_totals WHERE kind = 'book'
+                ) c ON b.book_number = c.book_number
                 GROUP BY bc.isbn, bc.title
                 ORDER BY borrow_count DESC
                 LIMIT 10
@@ -713,22 +992,23 @@ def get_reader_current_borrow_count(library_card_no: str) -> int:
             return result['current_count'] if result else 0
 
 def get_reader_total_borrow_history_count(library_card_no: str) -> int:
-    """获取读者历史借阅总数"""
-    with get_connection() as conn:
+    """获取读者历史借阅总数（含已归档的借阅）"""
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT COUNT(*) AS total_count
-                FROM borrowings
-                WHERE library_card_no = %s
-            """, (library_card_no,))
+                SELECT (SELECT COUNT(*) FROM borrowings WHERE library_card_no = %s) +
+                       COALESCE((SELECT borrow_count FROM borrowing_archive_totals
+                                 WHERE kind = 'reader' AND row_key = %s), 0) AS total_count
+            """, (library_card_no, library_card_no))
             result = cur.fetchone()
             return result['total_count'] if result else 0
 
 def get_book_borrowing_history(book_number: str):
-    """根据图书编号查询借阅历史"""
-    with get_connection() as conn:
+    """根据图书编号查询借阅历史（含已归档的记录）"""
+    source, params = borrowings_with_archive("book_number = %s", [book_number])
+    with get_read_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
+            cur.execute(f"""
                 SELECT 
                     b.borrowing_id, 
                     b.library_card_no, 
@@ -745,11 +1025,10 @@ def get_book_borrowing_history(book_number: str):
                         WHEN b.return_date > b.due_date THEN '已还(逾期)'
                         ELSE '已还'
                     END AS status
-                FROM borrowings b
+                FROM {source} b
                 JOIN readers r ON b.library_card_no = r.library_card_no
                 JOIN books bk ON b.book_number = bk.book_number
                 JOIN book_categories bc ON bk.isbn = bc.isbn
-                WHERE b.book_number = %s
                 ORDER BY b.borrow_date DESC
-            """, (book_number,))
+            """, params)
             return cur.fetchall() 
\ No newline at end of file
@@ -12,8 +12,8 @@ CREATE TABLE IF NOT EXISTS book_categories (
     publisher VARCHAR(255) COMMENT '出版社',
     publish_date DATE COMMENT '出版日期',
     price DECIMAL(10,2) COMMENT '价格',
-    total_copies INT NOT NULL DEFAULT 1 COMMENT '馆藏数量',
-    available_copies INT NOT NULL DEFAULT 1 COMMENT '可借数量',
+    total_copies INT NOT NULL DEFAULT 0 COMMENT '馆藏数量（由 books 触发器维护）',
+    available_copies INT NOT NULL DEFAULT 0 COMMENT '可借数量（由 books 触发器维护）',
     description TEXT COMMENT '图书简介',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -31,6 +31,7 @@ CREATE TABLE IF NOT EXISTS books (
     is_available ENUM('可借', '不可借') NOT NULL DEFAULT '可借' COMMENT '是否可借',
     status ENUM('正常', '损坏', '遗失') NOT NULL DEFAULT '正常' COMMENT '图书状态',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
     FOREIGN KEY (isbn) REFERENCES book_categories(isbn) ON DELETE CASCADE
 );
@@ -51,6 +52,9 @@ CREATE TABLE IF NOT EXISTS readers (
     registration_date DATE DEFAULT (CURRENT_DATE()) COMMENT '注册日期',
     status ENUM('正常', '冻结', '注销') NOT NULL DEFAULT '正常' COMMENT '读者状态',
     password_hash VARCHAR(255) NULL COMMENT '读者密码哈希值',
+    name_pinyin VARCHAR(255) NULL COMMENT '检索列：姓名全拼（见 search_keys.py）',
+    name_initials VARCHAR(100) NULL COMMENT '检索列：姓名拼音首字母',
+    phone_reversed VARCHAR(20) NULL COMMENT '检索列：倒序的电话号码，尾号查询走前缀索引',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
@@ -81,6 +85,33 @@ CREATE TABLE IF NOT EXISTS borrowings (
     CONSTRAINT chk_return_date CHECK (return_date IS NULL OR return_date >= borrow_date)
 );
 
+-- 4a. 借阅归档表：归还超过 BORROWING_ARCHIVE_AFTER_DAYS 天的借阅记录由 borrowing_archiver.py 分批移入，
+--     借阅信息表只保留未归还和近期归还的记录；历史查询同时查询两张表（UNION ALL）
+CREATE TABLE IF NOT EXISTS borrowings_archive (
+    borrowing_id INT PRIMARY KEY COMMENT '借阅记录ID（与原记录相同）',
+    library_card_no VARCHAR(20) NOT NULL COMMENT '借书证号',
+    book_number VARCHAR(20) NOT NULL COMMENT '借阅书号',
+    borrow_date DATE COMMENT '借出日期',
+    due_date DATE NOT NULL COMMENT '应还日期',
+    return_date DATE NOT NULL COMMENT '归还日期',
+    fine_amount DECIMAL(10,2) DEFAULT 0 COMMENT '罚金',
+    status ENUM('借阅中', '已归还', '逾期', '遗失') NOT NULL COMMENT '借阅状态',
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '归档时间',
+    INDEX idx_archive_reader_date (library_card_no, borrow_date),
+    INDEX idx_archive_book_date (book_number, borrow_date),
+    INDEX idx_archive_borrow_date (borrow_date)
+) COMMENT '已归档的借阅记录（无外键，读者或图书删除后历史仍保留，由保留期任务清理）';
+
+-- 4b. 归档借阅次数汇总：排行榜与历史总数直接累加，不必扫描归档表
+CREATE TABLE IF NOT EXISTS borrowing_archive_totals (
+    kind ENUM('reader', 'book') NOT NULL COMMENT '汇总维度',
+    row_key VARCHAR(20) NOT NULL COMMENT '借书证号或图书书号',
+    borrow_count INT NOT NULL DEFAULT 0 COMMENT '已归档的借阅次数',
+    PRIMARY KEY (kind, row_key)
+) COMMENT '已归档借阅记录的次数汇总';
+
 -- 新增：用户表 (主要用于管理员)
 CREATE TABLE IF NOT EXISTS users (
     user_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -94,6 +125,53 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) COMMENT '用户信息表，包含管理员和可能的其他类型用户';
 
+-- 删除记录表：记录被删除行的主键，客户端据此增量同步删除操作（见 delta_sync.py）
+CREATE TABLE IF NOT EXISTS row_tombstones (
+    tombstone_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL COMMENT '被删除行所在的表',
+    row_key VARCHAR(64) NOT NULL COMMENT '被删除行的主键',
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '删除时间',
+    INDEX idx_tombstone_table_time (table_name, deleted_at)
+) COMMENT '删除记录表，由删除触发器写入，定期清理';
+
+-- 变更日志：借还书及图书副本变化由触发器写入，各前台客户端按 seq 递增读取（见 change_notifier.py）
+CREATE TABLE IF NOT EXISTS change_log (
+    seq BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '单调递增的变更序号',
+    table_name VARCHAR(64) NOT NULL COMMENT '发生变化的表',
+    row_key VARCHAR(64) NOT NULL COMMENT '发生变化的行的主键',
+    action ENUM('insert', 'update', 'delete') NOT NULL COMMENT '变更类型',
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '变更时间',
+    INDEX idx_change_log_time (changed_at)
+) COMMENT '变更日志表，由触发器写入，定期清理';
+
+-- 后台维护任务的断点：分批执行的任务每完成一批记录一次进度，中断后从断点继续（见 job_checkpoints.py）
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_name VARCHAR(64) PRIMARY KEY COMMENT '任务名',
+    position VARCHAR(255) NOT NULL COMMENT '已处理到的位置（键集分页的最后一个主键）',
+    stats TEXT COMMENT '累计统计（JSON）',
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '本轮开始时间',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) COMMENT '维护任务断点表';
+
+-- 图书检索键：书名、作者的规范化文本、全拼、拼音首字母，按前缀查询（见 book_search.py）
+CREATE TABLE IF NOT EXISTS book_search_keys (
+    isbn VARCHAR(20) NOT NULL COMMENT 'ISBN',
+    field_name ENUM('title', 'author') NOT NULL COMMENT '来源列',
+    kind ENUM('text', 'pinyin', 'initials') NOT NULL COMMENT '检索键类型',
+    search_key VARCHAR(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL COMMENT '检索键（简体、小写、无标点空格）',
+    PRIMARY KEY (isbn, field_name, kind, search_key),
+    INDEX idx_book_search_key (search_key),
+    FOREIGN KEY (isbn) REFERENCES book_categories(isbn) ON DELETE CASCADE
+) COMMENT '图书检索键表，由 enhanced_library 写入类别时维护';
+
+-- 旧版本数据库升级：books 表补充 updated_at 列（列已存在时 init_db 会忽略该错误）
+ALTER TABLE books ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+-- 旧版本数据库升级：readers 表补充读者快速查找用的检索列（已有数据用 reader_lookup.py --backfill 补齐）
+ALTER TABLE readers ADD COLUMN name_pinyin VARCHAR(255) NULL COMMENT '检索列：姓名全拼（见 search_keys.py）';
+ALTER TABLE readers ADD COLUMN name_initials VARCHAR(100) NULL COMMENT '检索列：姓名拼音首字母';
+ALTER TABLE readers ADD COLUMN phone_reversed VARCHAR(20) NULL COMMENT '检索列：倒序的电话号码，尾号查询走前缀索引';
+
 -- 可选：为管理员表插入一个初始管理员账户 (密码为 admin123, 请在实际使用中修改并妥善保管)
 -- 注意：密码哈希值应由后端生成，此处仅为示例。
 -- INSERT INTO users (username, password_hash, role, full_name, email) 
@@ -109,6 +187,14 @@ CREATE INDEX idx_book_category ON book_categories(category);
 CREATE INDEX idx_book_number ON books(book_number);
 CREATE INDEX idx_reader_name ON readers(name);
 CREATE INDEX idx_borrowing_dates ON borrowings(borrow_date, due_date);
+CREATE INDEX idx_borrowing_return_date ON borrowings(return_date);
+CREATE INDEX idx_reader_updated_at ON readers(updated_at);
+CREATE INDEX idx_user_updated_at ON users(updated_at);
+CREATE INDEX idx_category_updated_at ON book_categories(updated_at);
+CREATE INDEX idx_book_updated_at ON books(updated_at);
+CREATE INDEX idx_reader_name_pinyin ON readers(name_pinyin);
+CREATE INDEX idx_reader_name_initials ON readers(name_initials);
+CREATE INDEX idx_reader_phone_reversed ON readers(phone_reversed);
 
 -- 视图：到期未归还图书信息
 DROP VIEW IF EXISTS overdue_books;
@@ -129,6 +215,38 @@ JOIN readers r ON b.library_card_no = r.library_card_no
 WHERE b.return_date IS NULL 
 AND b.due_date < CURRENT_DATE;
 
+-- 视图：统一登录身份（管理员与读者），登录时一次查询即可确定账号归属
+-- login_name 分别对应 users.username（唯一索引）与 readers 主键，
+-- MySQL 8.0.29+ 会把 WHERE login_name = ? 下推到 UNION ALL 的两个分支，各走一次索引点查
+DROP VIEW IF EXISTS auth_principals;
+CREATE VIEW auth_principals AS
+SELECT 
+    'admin' AS principal_type,
+    u.username AS login_name,
+    u.password_hash,
+    (u.is_active = TRUE) AS is_enabled,
+    u.user_id,
+    u.username,
+    u.full_name,
+    u.email,
+    NULL AS library_card_no,
+    NULL AS name
+FROM users u
+WHERE u.role = 'admin'
+UNION ALL
+SELECT 
+    'reader' AS principal_type,
+    r.library_card_no AS login_name,
+    r.password_hash,
+    (r.status = '正常' AND r.password_hash IS NOT NULL) AS is_enabled,
+    NULL AS user_id,
+    NULL AS username,
+    NULL AS full_name,
+    NULL AS email,
+    r.library_card_no,
+    r.name
+FROM readers r;
+
 -- 存储过程：根据图书编号查询未归还读者
 DELIMITER //
 DROP PROCEDURE IF EXISTS GetUnreturnedReadersByBook //
@@ -179,10 +297,13 @@ BEGIN
     SELECT 
         bc.category,
         COUNT(*) as borrow_count
-    FROM borrowings b
+    FROM (
+        SELECT book_number FROM borrowings WHERE borrow_date BETWEEN start_date AND end_date
+        UNION ALL
+        SELECT book_number FROM borrowings_archive WHERE borrow_date BETWEEN start_date AND end_date
+    ) b
     JOIN books bk ON b.book_number = bk.book_number
     JOIN book_categories bc ON bk.isbn = bc.isbn
-    WHERE b.borrow_date BETWEEN start_date AND end_date
     GROUP BY bc.category
     ORDER BY borrow_count DESC;
 END //
@@ -195,17 +316,11 @@ CREATE TRIGGER tr_after_borrow_insert
 AFTER INSERT ON borrowings
 FOR EACH ROW
 BEGIN
-    -- 更新图书状态为不可借
+    -- 更新图书状态为不可借（类别表的可借数量由 books 的触发器维护）
     UPDATE books 
     SET is_available = '不可借' 
     WHERE book_number = NEW.book_number;
     
-    -- 更新ISBN类别表的可借数量
-    UPDATE book_categories bc
-    JOIN books b ON bc.isbn = b.isbn
-    SET bc.available_copies = bc.available_copies - 1
-    WHERE b.book_number = NEW.book_number;
-    
     -- 更新读者已借数量
     UPDATE readers 
     SET current_borrow_count = current_borrow_count + 1
@@ -222,17 +337,11 @@ FOR EACH ROW
 BEGIN
     -- 如果是还书操作（return_date从NULL变为有值）
     IF OLD.return_date IS NULL AND NEW.return_date IS NOT NULL THEN
-        -- 更新图书状态为可借
+        -- 更新图书状态为可借（类别表的可借数量由 books 的触发器维护）
         UPDATE books 
         SET is_available = '可借' 
         WHERE book_number = NEW.book_number;
         
-        -- 更新ISBN类别表的可借数量
-        UPDATE book_categories bc
-        JOIN books b ON bc.isbn = b.isbn
-        SET bc.available_copies = bc.available_copies + 1
-        WHERE b.book_number = NEW.book_number;
-        
         -- 更新读者已借数量
         UPDATE readers 
         SET current_borrow_count = current_borrow_count - 1
@@ -241,6 +350,58 @@ BEGIN
 END //
 DELIMITER ;
 
+-- 触发器：维护类别表的馆藏数量与可借数量，图书查询直接读取这两个计数，不再关联 books 表汇总
+-- 计数偏差由 counter_reconciliation.py 定期检查修复
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_insert_counts //
+CREATE TRIGGER tr_after_book_insert_counts
+AFTER INSERT ON books
+FOR EACH ROW
+BEGIN
+    UPDATE book_categories
+    SET total_copies = total_copies + 1,
+        available_copies = available_copies + IF(NEW.is_available = '可借', 1, 0)
+    WHERE isbn = NEW.isbn;
+END //
+DELIMITER ;
+
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_update_counts //
+CREATE TRIGGER tr_after_book_update_counts
+AFTER UPDATE ON books
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.isbn <=> NEW.isbn) THEN
+        UPDATE book_categories
+        SET total_copies = total_copies - 1,
+            available_copies = available_copies - IF(OLD.is_available = '可借', 1, 0)
+        WHERE isbn = OLD.isbn;
+        UPDATE book_categories
+        SET total_copies = total_copies + 1,
+            available_copies = available_copies + IF(NEW.is_available = '可借', 1, 0)
+        WHERE isbn = NEW.isbn;
+    ELSEIF NOT (OLD.is_available <=> NEW.is_available) THEN
+        UPDATE book_categories
+        SET available_copies = available_copies + IF(NEW.is_available = '可借', 1, -1)
+        WHERE isbn = NEW.isbn;
+    END IF;
+END //
+DELIMITER ;
+
+-- 删除类别时级联删除的副本不会触发该触发器（类别行本身也已删除，无需维护）
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_delete_counts //
+CREATE TRIGGER tr_after_book_delete_counts
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    UPDATE book_categories
+    SET total_copies = total_copies - 1,
+        available_copies = available_copies - IF(OLD.is_available = '可借', 1, 0)
+    WHERE isbn = OLD.isbn;
+END //
+DELIMITER ;
+
 -- 触发器：删除读者前检查是否有未归还图书
 DELIMITER //
 DROP TRIGGER IF EXISTS tr_before_reader_delete //
@@ -262,11 +423,112 @@ BEGIN
 END //
 DELIMITER ;
 
--- 插入示例数据
+-- 触发器：删除图书类别前记录删除（其副本会被外键级联删除，级联删除不会触发 books 的触发器，因此一并记录）
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_before_category_delete_tombstone //
+CREATE TRIGGER tr_before_category_delete_tombstone
+BEFORE DELETE ON book_categories
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key)
+    SELECT 'books', book_number FROM books WHERE isbn = OLD.isbn;
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('book_categories', OLD.isbn);
+END //
+DELIMITER ;
+
+-- 触发器：删除图书副本后记录删除
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_delete_tombstone //
+CREATE TRIGGER tr_after_book_delete_tombstone
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('books', OLD.book_number);
+END //
+DELIMITER ;
+
+-- 触发器：删除读者后记录删除
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_reader_delete_tombstone //
+CREATE TRIGGER tr_after_reader_delete_tombstone
+AFTER DELETE ON readers
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('readers', OLD.library_card_no);
+END //
+DELIMITER ;
+
+-- 触发器：借阅记录变化写入变更日志（读者的已借数量随之变化）
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_borrow_insert_log //
+CREATE TRIGGER tr_after_borrow_insert_log
+AFTER INSERT ON borrowings
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('borrowings', NEW.borrowing_id, 'insert'),
+        ('readers', NEW.library_card_no, 'update');
+END //
+DELIMITER ;
+
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_borrow_update_log //
+CREATE TRIGGER tr_after_borrow_update_log
+AFTER UPDATE ON borrowings
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('borrowings', NEW.borrowing_id, 'update'),
+        ('readers', NEW.library_card_no, 'update');
+END //
+DELIMITER ;
+
+-- 触发器：图书副本变化写入变更日志（副本增减或可借状态变化时，所属类别的数量也随之变化）
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_insert_log //
+CREATE TRIGGER tr_after_book_insert_log
+AFTER INSERT ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('books', NEW.book_number, 'insert'),
+        ('book_categories', NEW.isbn, 'update');
+END //
+DELIMITER ;
+
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_update_log //
+CREATE TRIGGER tr_after_book_update_log
+AFTER UPDATE ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES ('books', NEW.book_number, 'update');
+    IF NOT (OLD.is_available <=> NEW.is_available) OR NOT (OLD.isbn <=> NEW.isbn) THEN
+        INSERT INTO change_log (table_name, row_key, action) VALUES ('book_categories', NEW.isbn, 'update');
+    END IF;
+    IF NOT (OLD.isbn <=> NEW.isbn) THEN
+        INSERT INTO change_log (table_name, row_key, action) VALUES ('book_categories', OLD.isbn, 'update');
+    END IF;
+END //
+DELIMITER ;
+
+DELIMITER //
+DROP TRIGGER IF EXISTS tr_after_book_delete_log //
+CREATE TRIGGER tr_after_book_delete_log
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('books', OLD.book_number, 'delete'),
+        ('book_categories', OLD.isbn, 'update');
+END //
+DELIMITER ;
+
+-- 插入示例数据（类别的馆藏数量与可借数量从 0 开始，插入副本时由触发器累加）
 INSERT IGNORE INTO book_categories (isbn, category, title, author, publisher, publish_date, price, total_copies, available_copies, description) VALUES 
-('9787111421900', '计算机', 'Java核心技术', '凯·霍斯特曼', '机械工业出版社', '2020-01-01', 89.90, 5, 5, 'Java编程经典教材'),
-('9787121315633', '计算机', 'Python编程从入门到实践', '埃里克·马瑟斯', '人民邮电出版社', '2019-03-01', 69.90, 3, 3, 'Python入门首选'),
-('9787508688923', '文学', '百年孤独', '加西亚·马尔克斯', '中信出版社', '2017-08-01', 45.00, 2, 2, '魔幻现实主义代表作');
+('9787111421900', '计算机', 'Java核心技术', '凯·霍斯特曼', '机械工业出版社', '2020-01-01', 89.90, 0, 0, 'Java编程经典教材'),
+('9787121315633', '计算机', 'Python编程从入门到实践', '埃里克·马瑟斯', '人民邮电出版社', '2019-03-01', 69.90, 0, 0, 'Python入门首选'),
+('9787508688923', '文学', '百年孤独', '加西亚·马尔克斯', '中信出版社', '2017-08-01', 45.00, 0, 0, '魔幻现实主义代表作');
 
 INSERT IGNORE INTO books (book_number, isbn, is_available, status) VALUES 
 ('BK001', '9787111421900', '可借', '正常'),
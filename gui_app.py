@@ -8,16 +8,88 @@ from PyQt5.QtWidgets import (
     QProgressBar, QScrollArea, QCalendarWidget, QFileDialog, QProgressDialog, QGraphicsDropShadowEffect,
     QDialog, QDialogButtonBox, QStyledItemDelegate
 )
-from PyQt5.QtGui import QFont, QIcon, QPalette, QPixmap, QBrush, QColor, QMovie, QLinearGradient
+from PyQt5.QtGui import QFont, QIcon, QPalette, QPixmap, QBrush, QColor, QMovie, QLinearGradient, QGradient
 from PyQt5.QtCore import Qt, QDate, QTimer, QThread, pyqtSignal, QPropertyAnimation, QEasingCurve, QRect, QSize
 from typing import Optional, Dict, Any
 
-import enhanced_database as db
-import enhanced_library as lib
+import enhanced_config as config
+import functools
+import importlib
 import os
+import threading
 import shutil
 import datetime
 import json
+import time
+
+class LazyModule:
+    """
+    延迟导入的模块：第一次访问属性时才执行 import，之后直接转发到真正的模块。
+    预热线程与界面线程可能同时第一次访问同一个模块（如预热时切换到读者管理页），导入在锁内进行，
+    后到的线程等待导入完成，不会拿到只执行了一半的模块（importlib.util.LazyLoader 在 Python 3.11
+    及之前没有这个保证）。真正的模块照常放在 sys.modules 中，其他模块 import 时不经过这里。
+    导入失败（找不到文件或模块自身出错）时异常在首次访问处抛出，下次访问重新尝试。
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    try:
+                        self._module = importlib.import_module(self._name)
+                    except ImportError:
+                        raise
+                    except Exception as e:
+                        # 模块自身执行出错也统一为 ImportError，调用方只需处理一种异常
+                        raise ImportError(f"加载模块 {self._name} 失败: {e}") from e
+                module = self._module
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    延迟导入：返回的模块在第一次访问其属性时才真正执行。
+    登录框和主窗口先显示出来，数据库驱动、业务模块和各管理页面用到时才加载。
+    """
+    return LazyModule(name)
+
+db = lazy_import('enhanced_database')
+lib = lazy_import('enhanced_library')
+hashing_executor = lazy_import('hashing_executor')
+catalog_cache = lazy_import('catalog_cache')
+catalog_snapshot = lazy_import('catalog_snapshot')
+change_notifier = lazy_import('change_notifier')
+offline_journal = lazy_import('offline_journal')
+
+# ====================== 启动预热线程 ======================
+class WarmupThread(QThread):
+    """窗口显示之后在后台完成启动时的耗时工作：初始化数据库、导入各管理页面的模块、加载目录快照"""
+    warmup_finished = pyqtSignal(object)  # 数据库错误，成功时为 None
+
+    def run(self):
+        error = None
+        try:
+            db.init_db()
+        except Exception as e:
+            error = e
+        try:
+            # 预先生成另一个主题的样式表，切换主题时只需应用
+            MainWindow.build_stylesheet(True)
+            MainWindow.build_stylesheet(False)
+            # 访问一个属性即触发真正的导入，首次切换页面时不必再等待（与界面线程同时访问时由 LazyModule 加锁）
+            lib.search_books
+            if error is None and config.CATALOG_SNAPSHOT_ENABLED:
+                catalog_snapshot.get_snapshot().start()
+            additional_widgets.ReaderManagementWidget
+        except Exception as e:
+            print(f"启动预热失败: {e}")
+        self.warmup_finished.emit(error)
 
 # ====================== 数据备份线程 ======================
 class BackupThread(QThread):
@@ -80,6 +152,8 @@ class BackupThread(QThread):
 
 # ========================== 主窗口 ==========================
 class MainWindow(QMainWindow):
+    warmed_up = pyqtSignal()  # 启动预热完成（数据库已检查，后台同步已启动）
+
     def __init__(self, user_info: Dict[str, Any]): # 接受 user_info
         super().__init__()
         self.user_info = user_info # 保存用户信息
@@ -95,26 +169,83 @@ class MainWindow(QMainWindow):
         
         # 设置窗口背景渐变
         self.setAutoFillBackground(True)
-        self.background_brush = QBrush(QColor("#f5f7fa"))
         self.update_background_gradient()
         
         self.apply_enhanced_stylesheet()
 
-        self.init_ui() # init_ui 中会创建所有 widgets
-        self.check_db_connection()
-        
-        # 初始化动画
-        self.setup_animations()
+        self.init_ui() # init_ui 只创建欢迎页，各管理页面在首次切换时创建（见 module_widget）
 
         # 根据用户角色调整UI
         self.adjust_ui_for_role()
 
-    def update_background_gradient(self):
-        """更新主窗口背景渐变"""
-        palette = self.palette()
-        if not self.dark_theme:
+        # 连接数据库、启动后台同步等耗时的工作在窗口显示之后进行（见 warm_up）
+        self.warmup_thread = None
+        self.warmup_scheduled = False
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.warmup_scheduled:
+            self.warmup_scheduled = True
+            QTimer.singleShot(0, self.warm_up)  # 排在首次绘制之后
+
+    def warm_up(self):
+        """窗口显示后的预热：在后台线程中检查数据库并导入各页面的模块，完成后启动同步与离线日志"""
+        self.setup_db_status_indicator()
+        self.statusBar().showMessage("正在连接数据库...")
+        self.warmup_thread = WarmupThread()
+        self.warmup_thread.warmup_finished.connect(self.on_warmup_finished)
+        self.warmup_thread.start()
+
+    def on_warmup_finished(self, error):
+        """预热完成（在界面线程中执行）：启动后台同步，显示数据库检查结果"""
+        # 订阅变更日志：其他前台电脑借还书后，各页面表格只更新变化的行
+        if config.CHANGE_NOTIFY_ENABLED:
+            notifier = change_notifier.get_notifier()
+            notifier.subscribe('book_categories', catalog_cache.on_remote_change)
+            try:
+                self.change_bridge = additional_widgets.ChangeSignalBridge(notifier, ('book_categories', 'books', 'readers', 'borrowings'), self)
+                self.change_bridge.rows_changed.connect(self.on_remote_rows_changed)
+            except ImportError as e:
+                # 页面表格改由定时增量同步兜底；切换到管理页面时会再次提示导入错误
+                print(f"变更通知未接入页面表格: {e}")
+            notifier.start()
+
+        # 定时把其他前台电脑的修改增量同步到当前页面的表格（变更日志未覆盖的修改由此兜底）
+        self.delta_sync_timer = QTimer(self)
+        self.delta_sync_timer.timeout.connect(self.sync_visible_tables)
+        self.delta_sync_timer.start(int(config.SYNC_POLL_SECONDS * 1000))
+
+        # 离线借还书日志：数据库不可用时前台照常借还书，恢复连接后由后台线程回放
+        if config.OFFLINE_JOURNAL_ENABLED:
+            offline_journal.get_journal().start()
+            self.offline_status_label = QLabel()
+            self.offline_status_label.linkActivated.connect(self.show_offline_conflicts)
+            self.statusBar().addPermanentWidget(self.offline_status_label)
+            self.offline_status_timer = QTimer(self)
+            self.offline_status_timer.timeout.connect(self.update_offline_status)
+            self.offline_status_timer.start(2000)
+
+        self.warmed_up.emit()
+        if error is None:
+            self.statusBar().showMessage("数据库连接成功 ✓")
+            QTimer.singleShot(3000, lambda: self.statusBar().showMessage("系统就绪"))
+        elif isinstance(error, db.CircuitOpenError):
+            self.update_db_status()
+        else:
+            self.statusBar().showMessage("数据库连接失败 ✗")
+            self.update_db_status()
+            QMessageBox.critical(self, "数据库连接错误", f"无法连接到数据库:\n{error}\n\n请检查配置并确保MySQL服务正在运行。")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def background_gradient_brush(is_dark: bool) -> QBrush:
+        """
+        每个主题的背景渐变只创建一次。坐标按 ObjectBoundingMode 取控件大小的比例（0~1），
+        窗口缩放时由 Qt 自动拉伸，不必在 resizeEvent 中重建画刷、重设调色板（那会触发整窗重新 polish）。
+        """
+        if not is_dark:
             # 多色水平渐变效果
-            gradient = QLinearGradient(0, 0, self.width(), 0)
+            gradient = QLinearGradient(0, 0, 1, 0)
             gradient.setColorAt(0.0, QColor("#6a11cb"))
             gradient.setColorAt(0.25, QColor("#2575fc"))
             gradient.setColorAt(0.5, QColor("#ff8008"))
@@ -122,32 +253,27 @@ class MainWindow(QMainWindow):
             gradient.setColorAt(1.0, QColor("#36d1dc"))
         else:
             # 深色模式保留原双色垂直渐变
-            gradient = QLinearGradient(0, 0, 0, self.height())
+            gradient = QLinearGradient(0, 0, 0, 1)
             gradient.setColorAt(0, QColor("#181818"))
             gradient.setColorAt(1, QColor("#0f0f0f"))
-        
-        self.background_brush = QBrush(gradient)
+        gradient.setCoordinateMode(QGradient.ObjectBoundingMode)
+        return QBrush(gradient)
+
+    def update_background_gradient(self):
+        """按当前主题设置主窗口背景渐变（只在切换主题时调用）"""
+        self.background_brush = self.background_gradient_brush(self.dark_theme)
+        palette = self.palette()
         palette.setBrush(QPalette.Window, self.background_brush)
         self.setPalette(palette)
-    
-    def resizeEvent(self, event):
-        """窗口大小改变时更新背景"""
-        super().resizeEvent(event)
-        self.update_background_gradient()
-
-    def setup_animations(self):
-        """设置UI动画效果"""
-        self.fade_timer = QTimer()
-        self.fade_timer.timeout.connect(self.update_animations)
-        self.fade_timer.start(50)
-
-    def update_animations(self):
-        """更新动画效果"""
-        pass  # 可以在这里添加自定义动画逻辑
 
     def apply_enhanced_stylesheet(self):
-        """全面升级的UI样式表，打造精致、现代、专业的视觉体验"""
-        is_dark = self.dark_theme
+        """应用当前主题的样式表；样式表文本按主题预先生成并缓存（见 build_stylesheet）"""
+        self.setStyleSheet(self.build_stylesheet(self.dark_theme))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def build_stylesheet(is_dark: bool) -> str:
+        """全面升级的UI样式表，打造精致、现代、专业的视觉体验。结果只与主题有关，每个主题只生成一次。"""
         theme_colors = {
             # Primary Palette (Blue Tones)
             'primary': '#007bff' if not is_dark else '#008cff',  # Brighter blue for dark
@@ -639,7 +765,7 @@ class MainWindow(QMainWindow):
                 not stripped.startswith('/*') and not stripped.endswith('*/')):
                 continue
             filtered_lines.append(line)
-        self.setStyleSheet('\n'.join(filtered_lines))
+        return '\n'.join(filtered_lines)
 
     def init_ui(self):
         self.stacked_widget = QStackedWidget()
@@ -657,20 +783,45 @@ class MainWindow(QMainWindow):
 
         self.statusBar().showMessage("系统就绪")
 
-        # 初始化所有管理界面
-        self.book_management_widget = BookManagementWidget(self, self.user_info)
-        self.reader_management_widget = ReaderManagementWidget(self, self.user_info)
-        self.borrow_management_widget = BorrowManagementWidget(self, self.user_info)
-        self.query_statistics_widget = QueryStatisticsWidget(self, self.user_info)
-        
-        self.stacked_widget.addWidget(self.book_management_widget)
-        self.stacked_widget.addWidget(self.reader_management_widget)
-        self.stacked_widget.addWidget(self.borrow_management_widget)
-        self.stacked_widget.addWidget(self.query_statistics_widget)
+        # 管理页面在首次切换到时才创建（创建时会查询数据库），见 module_widget
+        self.module_widgets: Dict[str, QWidget] = {}
 
         # 默认显示欢迎页面或基于角色的特定页面
         self.stacked_widget.setCurrentIndex(0) # 欢迎页面是第一个添加的
 
+    def module_widget(self, name: str) -> Optional[QWidget]:
+        """
+        返回管理页面（'book'、'reader'、'borrow'、'statistics'），第一次调用时创建。
+        各页面用到的 additional_widgets 在这里第一次导入，导入失败时提示并返回 None（下次切换时重试）。
+        """
+        widget = self.module_widgets.get(name)
+        if widget is None:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                if name == 'book':
+                    widget_class = BookManagementWidget
+                else:
+                    widget_class = getattr(additional_widgets, {
+                        'reader': 'ReaderManagementWidget',
+                        'borrow': 'BorrowManagementWidget',
+                        'statistics': 'QueryStatisticsWidget',
+                    }[name])
+                widget = widget_class(self, self.user_info)
+                widget.adjust_ui_for_role()
+            except ImportError as e:
+                widget = None
+                import_error = e
+            finally:
+                QApplication.restoreOverrideCursor()
+            if widget is None:
+                QMessageBox.critical(self, "模块导入错误",
+                                     f"无法加载附加模块 (additional_widgets.py)：\n{import_error}\n\n"
+                                     "请确保该文件与主程序在同一目录或已正确安装。")
+                return None
+            self.stacked_widget.addWidget(widget)
+            self.module_widgets[name] = widget
+        return widget
+
     def create_toolbar(self):
         """创建增强版工具栏"""
         toolbar = QToolBar("主工具栏")
@@ -865,40 +1016,166 @@ class MainWindow(QMainWindow):
         }
         # 如果需要，可以更细致地管理整个菜单对象 file_menu, help_menu
 
+    def setup_db_status_indicator(self):
+        """状态栏常驻显示熔断器状态（只读内存），数据库恢复时自动同步当前页面"""
+        if hasattr(self, 'db_status_label'):
+            return
+        self.db_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.db_status_label)
+        self.db_breaker_state = db.breaker_status()['state']
+        self.db_status_timer = QTimer(self)
+        self.db_status_timer.timeout.connect(self.update_db_status)
+        self.db_status_timer.start(5000)
+
     def check_db_connection(self):
+        """检查数据库连接，返回是否可用；熔断器打开时不访问网络，立即按不可用处理"""
+        self.setup_db_status_indicator()
+        if db.breaker_status()['state'] == db.CircuitBreaker.OPEN:
+            self.update_db_status()
+            return False
         try:
             db.init_db()
             self.statusBar().showMessage("数据库连接成功 ✓")
             QTimer.singleShot(3000, lambda: self.statusBar().showMessage("系统就绪"))
+            return True
+        except db.CircuitOpenError:
+            self.update_db_status()
+            return False
         except Exception as e:
             QMessageBox.critical(self, "数据库连接错误", f"无法连接到数据库:\n{e}\n\n请检查配置并确保MySQL服务正在运行。")
             self.statusBar().showMessage("数据库连接失败 ✗")
+            self.update_db_status()
+            return False
+
+    def update_db_status(self):
+        status = db.breaker_status()
+        if status['state'] == db.CircuitBreaker.OPEN:
+            self.db_status_label.setText(f"🔴 数据库不可用，{status['retry_in']:.0f} 秒后重试")
+            self.db_status_label.setToolTip(status['last_error'] or "")
+        elif status['state'] == db.CircuitBreaker.HALF_OPEN:
+            self.db_status_label.setText("🟡 正在重新连接数据库...")
+        else:
+            self.db_status_label.setText("")
+            if self.db_breaker_state != db.CircuitBreaker.CLOSED:
+                self.show_status_message("数据库连接已恢复 ✓", 3000, "success")
+                self.sync_visible_tables()
+        self.db_breaker_state = status['state']
+        # 熔断期间每秒刷新倒计时，正常时降低频率，空闲时几乎不占 CPU
+        self.db_status_timer.setInterval(1000 if status['state'] != db.CircuitBreaker.CLOSED else 5000)
 
     def show_about_dialog(self):
         QMessageBox.about(self, "关于智慧图书管理系统",
                             "智慧图书管理系统 GUI 版\n版本 2.0\n\n基于 PyQt5 和 MySQL 开发\n提供完整的图书管理方案\n\n© 数据库期中项目")
 
     # 视图切换方法
+    def show_module(self, name: str, message: str):
+        widget = self.module_widget(name)
+        if widget is not None:
+            self.stacked_widget.setCurrentWidget(widget)
+            self.statusBar().showMessage(message)
+
     def show_book_management_view(self):
-        self.stacked_widget.setCurrentWidget(self.book_management_widget)
-        self.statusBar().showMessage("图书管理模块")
+        self.show_module('book', "图书管理模块")
 
     def show_reader_management_view(self):
-        self.stacked_widget.setCurrentWidget(self.reader_management_widget)
-        self.statusBar().showMessage("读者管理模块")
+        self.show_module('reader', "读者管理模块")
 
     def show_borrow_management_view(self):
-        self.stacked_widget.setCurrentWidget(self.borrow_management_widget)
-        self.statusBar().showMessage("借阅管理模块")
+        self.show_module('borrow', "借阅管理模块")
 
     def show_query_statistics_view(self):
-        self.stacked_widget.setCurrentWidget(self.query_statistics_widget)
-        self.statusBar().showMessage("查询统计模块")
+        self.show_module('statistics', "查询统计模块")
+
+    def on_remote_rows_changed(self, table_name, keys):
+        # 还没有创建的页面不必更新，创建时会加载最新数据；借阅页面收到 'borrowings' 的变更后重新加载借阅列表
+        for widget in filter(None, (self.module_widgets.get(name) for name in ('book', 'reader', 'borrow'))):
+            try:
+                widget.apply_remote_changes(table_name, keys)
+            except Exception as e:
+                print(f"应用变更通知失败 ({table_name}): {e}")
+
+    def sync_visible_tables(self):
+        """只同步当前显示的页面，其他页面切换回来后下一次同步会一并补上"""
+        widget = self.stacked_widget.currentWidget()
+        if hasattr(widget, 'sync_tables'):
+            try:
+                widget.sync_tables()
+            except Exception as e:
+                print(f"增量同步失败: {e}")
+
+    def update_offline_status(self):
+        """在状态栏显示离线日志中待同步与冲突的操作数（只读本机日志文件）"""
+        try:
+            summary = offline_journal.get_journal().summary()
+        except Exception as e:
+            print(f"读取离线日志状态失败: {e}")
+            return
+        parts = []
+        if summary['pending']:
+            parts.append(f"⏳ 待同步 {summary['pending']} 笔")
+        if summary['conflict']:
+            parts.append(f"<a href='conflicts'>⚠️ 冲突 {summary['conflict']} 笔</a>")
+        self.offline_status_label.setText("  ".join(parts))
+
+    def show_offline_conflicts(self, _link=None):
+        """列出离线日志中回放冲突的操作；管理员处理冲突原因后可以把选中的操作重新回放"""
+        journal = offline_journal.get_journal()
+        dialog = QDialog(self)
+        dialog.setWindowTitle("离线借还书冲突")
+        dialog.resize(760, 360)
+        layout = QVBoxLayout(dialog)
+        table = QTableWidget(0, 6)
+        table.setHorizontalHeaderLabels(["日志编号", "操作", "借书证号", "书号", "受理日期", "数据库返回"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        layout.addWidget(table)
+
+        def load():
+            conflicts = journal.conflicts()
+            table.setRowCount(len(conflicts))
+            for row, op in enumerate(conflicts):
+                values = (op['op_id'], "借书" if op['kind'] == 'borrow' else "还书", op['library_card_no'],
+                          op['book_number'], op['op_date'], op['message'] or "")
+                for col, value in enumerate(values):
+                    table.setItem(row, col, QTableWidgetItem(str(value)))
+
+        def retry_selected():
+            rows = sorted({index.row() for index in table.selectedIndexes()})
+            if not rows:
+                QMessageBox.information(dialog, "提示", "请先选择要重新回放的操作。")
+                return
+            for row in rows:
+                journal.retry(int(table.item(row, 0).text()))
+            load()
+            self.update_offline_status()
+
+        buttons = QHBoxLayout()
+        retry_button = QPushButton("🔁 重新回放选中的操作")
+        retry_button.setEnabled(self.user_info.get('role') == 'admin')
+        retry_button.clicked.connect(retry_selected)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(dialog.accept)
+        buttons.addWidget(retry_button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        load()
+        dialog.exec_()
 
     # 工具栏操作
     def refresh_all_data(self):
         """完善的数据刷新功能"""
+        if db.breaker_status()['state'] == db.CircuitBreaker.OPEN:
+            self.show_status_message("数据库暂不可用，稍后再刷新", 3000, "warning")
+            return
         try:
+            # 用户主动刷新时丢弃目录缓存，立即看到其他前台电脑的修改
+            catalog_cache.get_cache().clear()
+            if catalog_snapshot.get_snapshot().ready:
+                catalog_snapshot.get_snapshot().refresh(full=True)
+
             # 创建进度对话框
             progress = QProgressDialog("正在刷新数据...", "取消", 0, 100, self)
             progress.setWindowTitle("数据刷新")
@@ -909,13 +1186,13 @@ class MainWindow(QMainWindow):
             
             # 刷新步骤
             steps = [
-                ("正在刷新图书管理数据...", 25),
-                ("正在刷新读者管理数据...", 50), 
-                ("正在刷新借阅管理数据...", 75),
-                ("正在刷新查询统计数据...", 100)
+                ("正在刷新图书管理数据...", 25, 'book'),
+                ("正在刷新读者管理数据...", 50, 'reader'),
+                ("正在刷新借阅管理数据...", 75, 'borrow'),
+                ("正在刷新查询统计数据...", 100, 'statistics')
             ]
             
-            for i, (message, value) in enumerate(steps):
+            for message, value, name in steps:
                 if progress.wasCanceled():
                     break
                     
@@ -923,15 +1200,9 @@ class MainWindow(QMainWindow):
                 progress.setValue(value)
                 QApplication.processEvents()
                 
-                # 根据当前模块刷新对应数据
-                if i == 0:
-                    self.book_management_widget.refresh_data()
-                elif i == 1:
-                    self.reader_management_widget.refresh_data()
-                elif i == 2:
-                    self.borrow_management_widget.refresh_data()
-                elif i == 3:
-                    self.query_statistics_widget.refresh_data()
+                # 只刷新已经创建的页面，其余页面创建时会加载最新数据
+                if name in self.module_widgets:
+                    self.module_widgets[name].refresh_data()
                 
                 # 模拟处理时间
                 QTimer.singleShot(200, lambda: None)
@@ -1056,10 +1327,19 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(timeout, lambda: self.statusBar().setStyleSheet(original_style))
 
     def toggle_theme(self):
-        """切换主题"""
+        """
+        切换主题。样式表规则（颜色，包括 palette() 引用）在控件 polish 时解析，换主题只能给窗口设置另一份
+        样式表，Qt 会重新 polish 整个控件树，单独切换调色板或动态属性不会让已 polish 的控件换色。
+        能省的开销都已省去：两套样式表文本与渐变画刷已缓存，尚未打开的管理页面还没有创建，
+        切换期间暂停重绘，polish 完成后整窗只绘制一次。
+        """
         self.dark_theme = not self.dark_theme
-        self.apply_enhanced_stylesheet()
-        self.update_background_gradient()
+        self.setUpdatesEnabled(False)
+        try:
+            self.update_background_gradient()
+            self.apply_enhanced_stylesheet()
+        finally:
+            self.setUpdatesEnabled(True)
         self.show_status_message(f"已切换到{'深色' if self.dark_theme else '浅色'}主题", 2000)
 
     def import_data(self):
@@ -1191,17 +1471,10 @@ class MainWindow(QMainWindow):
             # (如果管理了分隔符，也设置其可见性)
             # 管理员可以访问所有主界面
 
-            # 确保传递user_info到所有子模块
-            self.book_management_widget.user_info = self.user_info
-            self.reader_management_widget.user_info = self.user_info
-            self.borrow_management_widget.user_info = self.user_info
-            self.query_statistics_widget.user_info = self.user_info
-            
-            # 确保所有子模块调用其adjust_ui_for_role方法
-            self.book_management_widget.adjust_ui_for_role()
-            self.reader_management_widget.adjust_ui_for_role()
-            self.borrow_management_widget.adjust_ui_for_role()
-            self.query_statistics_widget.adjust_ui_for_role()
+            # 确保传递user_info到所有子模块（尚未创建的页面在创建时使用当前的 user_info）
+            for widget in self.module_widgets.values():
+                widget.user_info = self.user_info
+                widget.adjust_ui_for_role()
 
         elif role == 'reader':
             self.statusBar().showMessage(f"读者 '{self.user_info.get('name', '用户')}' 已登录。欢迎！", 5000)
@@ -1231,17 +1504,10 @@ class MainWindow(QMainWindow):
             if self.menu_actions.get("file_new"): # 检查是否存在
                  self.menu_actions["file_new"].setVisible(False)
 
-            # 传递user_info到所有子模块
-            self.book_management_widget.user_info = self.user_info
-            self.reader_management_widget.user_info = self.user_info
-            self.borrow_management_widget.user_info = self.user_info
-            self.query_statistics_widget.user_info = self.user_info
-            
-            # 确保所有子模块调用其adjust_ui_for_role方法
-            self.book_management_widget.adjust_ui_for_role()
-            self.reader_management_widget.adjust_ui_for_role()
-            self.borrow_management_widget.adjust_ui_for_role()
-            self.query_statistics_widget.adjust_ui_for_role()
+            # 传递user_info到所有子模块（尚未创建的页面在创建时使用当前的 user_info）
+            for widget in self.module_widgets.values():
+                widget.user_info = self.user_info
+                widget.adjust_ui_for_role()
 
             # 调整欢迎页上的快速操作按钮
             self.adjust_welcome_actions_for_reader()
@@ -1396,6 +1662,23 @@ class SystemSettingsDialog(QMessageBox):
         self.setIcon(QMessageBox.Information)
 
 # ====================== 登录对话框 ======================
+class LoginThread(QThread):
+    """后台登录线程：数据库查询与密码校验都不在界面线程中执行"""
+    login_finished = pyqtSignal(object, str)  # 用户信息或 None, 错误信息
+
+    def __init__(self, username, password):
+        super().__init__()
+        self.username = username
+        self.password = password
+
+    def run(self):
+        try:
+            self.login_finished.emit(lib.authenticate_user(self.username, self.password), "")
+        except hashing_executor.HashingBusyError as e:
+            self.login_finished.emit(None, str(e))
+        except Exception as e:
+            self.login_finished.emit(None, f"登录时发生错误：{e}")
+
 class LoginDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1444,16 +1727,34 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "登录失败", "账号和密码不能为空！")
             return
 
-        # 使用统一认证函数
-        authenticated_user_info = lib.authenticate_user(username, password)
+        retry_after = hashing_executor.LOGIN_THROTTLE.check(username)
+        if retry_after:
+            QMessageBox.warning(self, "登录失败", f"登录失败次数过多，请 {int(retry_after) + 1} 秒后再试。")
+            return
 
-        if authenticated_user_info:
+        # 密码校验耗时较长，放到后台线程执行，避免界面卡顿
+        self.login_button.setEnabled(False)
+        self.login_button.setText("登录中...")
+        self.login_thread = LoginThread(username, password)
+        self.login_thread.login_finished.connect(self.on_login_finished)
+        self.login_thread.start()
+
+    def on_login_finished(self, authenticated_user_info, error_message):
+        username = self.login_thread.username
+        self.login_button.setEnabled(True)
+        self.login_button.setText("登录")
+
+        if error_message:
+            QMessageBox.warning(self, "登录失败", error_message)
+        elif authenticated_user_info:
+            hashing_executor.LOGIN_THROTTLE.reset_account(username)
             self.user_info = authenticated_user_info
             role_display = "管理员" if self.user_info.get('role') == 'admin' else "读者"
             user_identifier = self.user_info.get('full_name') or self.user_info.get('name') or self.user_info.get('username')
             QMessageBox.information(self, "登录成功", f"{role_display} '{user_identifier}' 登录成功！")
             self.accept()
         else:
+            hashing_executor.LOGIN_THROTTLE.record_failure(username)
             QMessageBox.warning(self, "登录失败", "账号或密码错误，或账户状态异常。")
 
     def handle_show_registration(self):
@@ -1600,16 +1901,9 @@ class RegistrationDialog(QDialog):
         return self._registered_card_no
 
 # ====================== 导入附加模块 ======================
-# 确保 ReaderManagementWidget, BorrowManagementWidget, QueryStatisticsWidget 的导入路径正确
-# 如果它们在同一目录下，可以直接导入
-try:
-    from additional_widgets import ReaderManagementWidget, BorrowManagementWidget, QueryStatisticsWidget
-except ImportError:
-    # 处理可能的ImportError，例如如果文件不在PYTHONPATH或当前目录
-    QMessageBox.critical(None, "模块导入错误", 
-                         "无法加载附加模块 (additional_widgets.py)。\n"
-                         "请确保该文件与主程序在同一目录或已正确安装。")
-    sys.exit(1)
+# ReaderManagementWidget, BorrowManagementWidget, QueryStatisticsWidget 等在 additional_widgets.py 中，
+# 首次创建这些页面（或启动预热）时才真正执行导入；导入失败在 module_widget 等首次使用处提示
+additional_widgets = lazy_import('additional_widgets')
 
 # ====================== 图书管理模块 ======================
 class BookManagementWidget(QWidget):
@@ -1638,6 +1932,11 @@ class BookManagementWidget(QWidget):
         self.init_copy_tab()
 
         self.layout.addWidget(self.tabs)
+
+        # 后台加载图书目录快照，加载完成后搜索在内存中完成
+        self.catalog_snapshot = catalog_snapshot.get_snapshot()
+        self.catalog_snapshot.start()
+        self.live_search_connected = False
         
     def adjust_ui_for_role(self):
         """根据用户角色调整UI界面"""
@@ -1657,12 +1956,17 @@ class BookManagementWidget(QWidget):
         form_fields = [
             self.cat_isbn, self.cat_category, self.cat_title, self.cat_author,
             self.cat_publisher, self.cat_publish_date, self.cat_price,
-            self.cat_total_copies, self.cat_description
+            self.cat_description
         ]
         
         # 读者只能使用表单进行搜索，不能添加/编辑
         if is_reader:
             self.btn_search_category.setText("🔍 搜索图书")
+            # 读者输入时即时搜索（快照在内存中查询，不访问数据库）
+            if not self.live_search_connected:
+                for field in (self.cat_isbn, self.cat_title, self.cat_author, self.cat_category):
+                    field.textChanged.connect(self.search_categories)
+                self.live_search_connected = True
             # 禁用不必要的表单字段，但保留搜索相关字段
             for field in form_fields:
                 if field in [self.cat_isbn, self.cat_title, self.cat_author, self.cat_category]:
@@ -1704,6 +2008,18 @@ class BookManagementWidget(QWidget):
         self.refresh_copies()
         self.load_isbn_options()
 
+    def sync_tables(self):
+        """应用其他客户端的增量修改（显示筛选结果的表格不受影响）"""
+        self.category_sync.sync()
+        self.copy_sync.sync()
+
+    def apply_remote_changes(self, table_name, keys):
+        """变更通知：只更新发生变化的行"""
+        if table_name == 'book_categories':
+            self.category_sync.apply_keys(keys)
+        elif table_name == 'books':
+            self.copy_sync.apply_keys(keys)
+
     def init_category_tab(self):
         main_layout = QVBoxLayout(self.tab_category)
         main_layout.setSpacing(20)
@@ -1759,10 +2075,10 @@ class BookManagementWidget(QWidget):
         self.cat_price.setPlaceholderText("例如：89.00")
         form_group_layout.addWidget(self.cat_price, 2, 3)
 
-        form_group_layout.addWidget(QLabel("馆藏数量:"), 3, 2)
-        self.cat_total_copies = QLineEdit()
-        self.cat_total_copies.setPlaceholderText("数字")
-        form_group_layout.addWidget(self.cat_total_copies, 3, 3)
+        # 馆藏数量由触发器按副本统计，不在表单中填写
+        copies_hint = QLabel("馆藏数量按“图书副本管理”中添加的副本自动统计")
+        copies_hint.setStyleSheet("color: #666; font-style: italic;")
+        form_group_layout.addWidget(copies_hint, 3, 2, 1, 2)
 
         # 描述跨列
         form_group_layout.addWidget(QLabel("图书简介:"), 4, 0)
@@ -1809,6 +2125,8 @@ class BookManagementWidget(QWidget):
         self.category_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.category_table.setAlternatingRowColors(True)
         self.category_table.setSortingEnabled(True)
+        self.category_sync = additional_widgets.TableDeltaSync(self.category_table, 'book_categories',
+                                            self.category_row_texts, self.populate_category_table)
         
         table_layout.addWidget(self.category_table)
         splitter.addWidget(table_frame)
@@ -1846,7 +2164,9 @@ class BookManagementWidget(QWidget):
         copy_group_layout.addWidget(QLabel("选择ISBN:"), 0, 0)
         self.copy_isbn_combo = QComboBox()
         self.copy_isbn_combo.setEditable(True)
-        self.copy_isbn_combo.currentTextChanged.connect(self.on_isbn_selected)
+        # 分页加载 ISBN 选项，输入 ISBN 或书名开头时按前缀补全（不再一次下载全部类别）
+        self.isbn_lookup = additional_widgets.IsbnComboLookup(self.copy_isbn_combo, "")
+        self.copy_isbn_combo.currentIndexChanged.connect(self.on_isbn_selected)
         copy_group_layout.addWidget(self.copy_isbn_combo, 0, 1)
 
         # 显示选中ISBN的信息
@@ -1904,6 +2224,7 @@ class BookManagementWidget(QWidget):
         self.copy_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.copy_table.setAlternatingRowColors(True)
         self.copy_table.setSortingEnabled(True)
+        self.copy_sync = additional_widgets.TableDeltaSync(self.copy_table, 'books', self.copy_row_texts, self.populate_copy_table)
         
         table_layout.addWidget(self.copy_table)
         splitter.addWidget(table_frame)
@@ -1930,25 +2251,24 @@ class BookManagementWidget(QWidget):
         publisher = self.cat_publisher.text().strip() or None
         publish_date_str = self.cat_publish_date.date().toString("yyyy-MM-dd")
         price_str = self.cat_price.text().strip()
-        total_copies_str = self.cat_total_copies.text().strip()
         description = self.cat_description.toPlainText().strip() or None
 
-        if not all([isbn, category, title, author, total_copies_str]):
-            QMessageBox.warning(self, "输入错误", "ISBN、类别、书名、作者和馆藏数量是必填项！")
+        if not all([isbn, category, title, author]):
+            QMessageBox.warning(self, "输入错误", "ISBN、类别、书名和作者是必填项！")
             return
         
         try:
             price = float(price_str) if price_str else None
-            total_copies = int(total_copies_str)
-            if total_copies < 0 or (price is not None and price < 0):
-                raise ValueError("数量和价格不能为负")
+            if price is not None and price < 0:
+                raise ValueError("价格不能为负")
         except ValueError as ve:
-            QMessageBox.warning(self, "输入错误", f"价格或馆藏数量格式不正确: {ve}")
+            QMessageBox.warning(self, "输入错误", f"价格格式不正确: {ve}")
             return
 
         try:
             lib.add_book_category(isbn, category, title, author, publisher, 
-                                 publish_date_str, price, total_copies, description)
+                                 publish_date_str, price, description)
+            self.refresh_catalog_snapshot()
             QMessageBox.information(self, "操作成功", f"图书类别 '{title}' 添加成功！")
             self.clear_category_form()
             self.load_all_categories()
@@ -1963,37 +2283,65 @@ class BookManagementWidget(QWidget):
         category = self.cat_category.text().strip() or None
         title = self.cat_title.text().strip() or None
         author = self.cat_author.text().strip() or None
+        if not any([isbn, category, title, author]):
+            self.load_all_categories()
+            return
         
         try:
-            results = lib.search_books(title=title, author=author, isbn=isbn, category=category)
+            start = time.perf_counter()
+            results = catalog_snapshot.search_books(title=title, author=author, isbn=isbn, category=category)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.category_sync.detach()
             self.populate_category_table(results)
+            # 书名或作者没有直接命中时，结果来自拼音、首字母与模糊查询（带 match_distance）
+            fuzzy_note = "，按拼音/模糊匹配" if results and 'match_distance' in results[0] else ""
             if self.parent_window: 
-                self.parent_window.statusBar().showMessage(f"🔍 搜索完成，找到 {len(results)} 条记录", 3000)
+                self.parent_window.statusBar().showMessage(
+                    f"🔍 搜索完成，找到 {len(results)} 条记录（{elapsed_ms:.1f} ms{fuzzy_note}）", 3000)
         except Exception as e:
             QMessageBox.critical(self, "查询失败", f"搜索图书类别失败：\n{e}")
 
+    def refresh_catalog_snapshot(self):
+        """本机写入后立即增量刷新快照，不必等待后台轮询"""
+        try:
+            if self.catalog_snapshot.ready:
+                self.catalog_snapshot.refresh()
+        except Exception as e:
+            print(f"刷新图书目录快照失败: {e}")
+
     def load_all_categories(self):
+        """显示全部图书类别：表格已是全部类别时只应用增量变化"""
         try:
-            results = lib.search_books()
-            self.populate_category_table(results)
+            self.category_sync.refresh()
         except Exception as e:
             QMessageBox.critical(self, "加载失败", f"加载图书类别失败：\n{e}")
 
     def populate_category_table(self, categories):
+        self.category_table.setUpdatesEnabled(False)  # 批量填充期间暂停重绘
+        try:
+            self._fill_category_table(categories)
+        finally:
+            self.category_table.setUpdatesEnabled(True)
+
+    @staticmethod
+    def category_row_texts(cat_data):
+        return [
+            cat_data.get('isbn', ''),
+            cat_data.get('category', ''),
+            cat_data.get('title', ''),
+            cat_data.get('author', ''),
+            cat_data.get('publisher', ''),
+            str(cat_data.get('publish_date', '')),
+            str(cat_data.get('price', '')),
+            str(cat_data.get('total_copies', '')),
+            str(cat_data.get('available_copies', ''))
+        ]
+
+    def _fill_category_table(self, categories):
         self.category_table.setRowCount(0)
         for row_num, cat_data in enumerate(categories):
             self.category_table.insertRow(row_num)
-            items = [
-                cat_data.get('isbn', ''),
-                cat_data.get('category', ''),
-                cat_data.get('title', ''),
-                cat_data.get('author', ''),
-                cat_data.get('publisher', ''),
-                str(cat_data.get('publish_date', '')),
-                str(cat_data.get('price', '')),
-                str(cat_data.get('total_copies', '')),
-                str(cat_data.get('available_copies', ''))
-            ]
+            items = self.category_row_texts(cat_data)
             
             for col, item_text in enumerate(items):
                 item = QTableWidgetItem(item_text)
@@ -2009,7 +2357,6 @@ class BookManagementWidget(QWidget):
         self.cat_publisher.clear()
         self.cat_publish_date.setDate(QDate.currentDate())
         self.cat_price.clear()
-        self.cat_total_copies.clear()
         self.cat_description.clear()
         self.cat_isbn.setFocus()
 
@@ -2039,31 +2386,23 @@ class BookManagementWidget(QWidget):
             self.cat_publish_date.setDate(QDate.currentDate())
             
         self.cat_price.setText(str(cat_data.get('price', '')))
-        self.cat_total_copies.setText(str(cat_data.get('total_copies', '')))
         self.cat_description.setPlainText(cat_data.get('description', ''))
 
     # ==================== 图书副本管理方法 ====================
     def load_isbn_options(self):
-        """加载所有可用的ISBN到下拉框"""
+        """重新加载ISBN下拉框的第一页（其余各页在下拉列表滚动到底部时加载），保留当前选中的ISBN"""
         try:
-            categories = lib.search_books()
-            self.copy_isbn_combo.clear()
-            self.copy_isbn_combo.addItem("", "")  # 空选项
-            
-            for cat in categories:
-                isbn = cat.get('isbn', '')
-                title = cat.get('title', '')
-                display_text = f"{isbn} - {title}"
-                self.copy_isbn_combo.addItem(display_text, isbn)
+            self.isbn_lookup.reload()
         except Exception as e:
             QMessageBox.critical(self, "加载失败", f"加载ISBN选项失败：\n{e}")
+        self.on_isbn_selected()  # 刷新选中图书的库存信息
 
     def on_isbn_selected(self):
         """当选择ISBN时显示图书信息"""
         current_data = self.copy_isbn_combo.currentData()
         if current_data:
             try:
-                results = lib.search_books(isbn=current_data)
+                results = catalog_snapshot.search_books(isbn=current_data)  # 快照就绪时在内存中查询
                 if results:
                     book_info = results[0]
                     info_text = f"📖 {book_info.get('title', '')} | 👤 {book_info.get('author', '')} | 📚 库存: {book_info.get('available_copies', 0)}/{book_info.get('total_copies', 0)}"
@@ -2094,6 +2433,7 @@ class BookManagementWidget(QWidget):
 
         try:
             lib.add_book_copy(isbn, book_number)
+            self.refresh_catalog_snapshot()
             QMessageBox.information(self, "操作成功", f"图书副本 '{book_number}' 添加成功！")
             self.copy_book_number.clear()
             self.refresh_copies()
@@ -2104,56 +2444,46 @@ class BookManagementWidget(QWidget):
             QMessageBox.critical(self, "操作失败", f"添加图书副本失败：\n{e}")
 
     def refresh_copies(self):
-        """刷新副本列表"""
+        """刷新副本列表：表格已是全部副本时只应用增量变化"""
         try:
-            # 获取所有图书副本（这里需要修改 enhanced_library.py 来提供这个功能）
-            # 暂时通过数据库直接查询
-            from enhanced_database import get_connection
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT b.book_number, b.isbn, bc.title, b.is_available, b.status, b.created_at
-                        FROM books b
-                        LEFT JOIN book_categories bc ON b.isbn = bc.isbn
-                        ORDER BY b.book_number
-                    """)
-                    results = cur.fetchall()
-                    
-            self.populate_copy_table(results)
+            self.copy_sync.refresh()
         except Exception as e:
             QMessageBox.critical(self, "加载失败", f"刷新副本列表失败：\n{e}")
 
+    @staticmethod
+    def copy_row_texts(copy_data):
+        # 状态转换
+        is_available = copy_data.get('is_available', '')
+        if is_available == 'available':
+            is_available_text = '✅ 可借'
+        else:
+            is_available_text = '❌ 不可借'
+            
+        status = copy_data.get('status', '')
+        if status == 'normal':
+            status_text = '🟢 正常'
+        elif status == 'damaged':
+            status_text = '🟡 损坏'
+        elif status == 'lost':
+            status_text = '🔴 遗失'
+        else:
+            status_text = status
+        
+        return [
+            copy_data.get('book_number', ''),
+            copy_data.get('isbn', ''),
+            copy_data.get('title', ''),
+            is_available_text,
+            status_text,
+            str(copy_data.get('created_at', ''))
+        ]
+
     def populate_copy_table(self, copies):
         """填充副本表格"""
         self.copy_table.setRowCount(0)
         for row_num, copy_data in enumerate(copies):
             self.copy_table.insertRow(row_num)
-            
-            # 状态转换
-            is_available = copy_data.get('is_available', '')
-            if is_available == 'available':
-                is_available_text = '✅ 可借'
-            else:
-                is_available_text = '❌ 不可借'
-                
-            status = copy_data.get('status', '')
-            if status == 'normal':
-                status_text = '🟢 正常'
-            elif status == 'damaged':
-                status_text = '🟡 损坏'
-            elif status == 'lost':
-                status_text = '🔴 遗失'
-            else:
-                status_text = status
-            
-            items = [
-                copy_data.get('book_number', ''),
-                copy_data.get('isbn', ''),
-                copy_data.get('title', ''),
-                is_available_text,
-                status_text,
-                str(copy_data.get('created_at', ''))
-            ]
+            items = self.copy_row_texts(copy_data)
             
             for col, item_text in enumerate(items):
                 item = QTableWidgetItem(item_text)
@@ -2174,10 +2504,8 @@ class BookManagementWidget(QWidget):
 
         # 设置ISBN
         isbn = copy_data.get('isbn', '')
-        for i in range(self.copy_isbn_combo.count()):
-            if self.copy_isbn_combo.itemData(i) == isbn:
-                self.copy_isbn_combo.setCurrentIndex(i)
-                break
+        if isbn:
+            self.isbn_lookup.select_isbn(isbn, copy_data.get('title', ''))
                 
         self.copy_book_number.setText(copy_data.get('book_number', ''))
         
@@ -2231,6 +2559,7 @@ class BookManagementWidget(QWidget):
                     """, (isbn,))
                     results = cur.fetchall()
                     
+            self.copy_sync.detach()
             self.populate_copy_table(results)
             if self.parent_window:
                 self.parent_window.statusBar().showMessage(f"🔍 找到 {len(results)} 个副本", 3000)
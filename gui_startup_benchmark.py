@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GUI 启动耗时基准测试：每次在新的子进程中启动主窗口（跳过登录，以管理员身份），测量
+- 导入 gui_app 的耗时；
+- 创建主窗口（MainWindow.__init__）的耗时；
+- 首次绘制：从进程开始到主窗口第一次收到绘制事件；
+- 可交互：从进程开始到首次绘制之后事件循环第一次空闲（此时已能响应点击和键盘）；
+- 预热完成：从进程开始到 MainWindow.warmed_up（数据库已检查、后台同步已启动）。
+
+--eager 在显示窗口之前创建全部管理页面，相当于按需创建之前的启动方式，用于对比。
+需要能连接数据库（管理页面创建时会查询数据）；连接失败的错误框改为打印，不阻塞计时。
+
+示例：
+    python gui_startup_benchmark.py --runs 5
+    python gui_startup_benchmark.py --runs 5 --eager --output eager.json
+"""
+import time
+
+PROCESS_START = time.perf_counter()
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULES = ('book', 'reader', 'borrow', 'statistics')
+USER_INFO = {'role': 'admin', 'username': 'benchmark', 'full_name': '启动基准测试'}
+
+
+def run_child(eager: bool):
+    """在当前进程中启动一次主窗口，把各阶段耗时（毫秒）以 JSON 输出到标准输出"""
+    from PyQt5.QtCore import QEvent, QObject, QTimer
+    from PyQt5.QtWidgets import QApplication, QMessageBox
+
+    timings = {}
+
+    def mark(name):
+        timings.setdefault(name, (time.perf_counter() - PROCESS_START) * 1000)
+
+    app = QApplication(sys.argv)
+    start = time.perf_counter()
+    import gui_app
+    timings['import_ms'] = (time.perf_counter() - start) * 1000
+    QMessageBox.critical = staticmethod(lambda parent, title, text, *args: print(f"{title}: {text}", file=sys.stderr))
+
+    start = time.perf_counter()
+    window = gui_app.MainWindow(USER_INFO)
+    if eager:
+        for name in MODULES:
+            window.module_widget(name)
+    timings['construct_ms'] = (time.perf_counter() - start) * 1000
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and obj is window and 'first_paint_ms' not in timings:
+                mark('first_paint_ms')
+                QTimer.singleShot(0, lambda: mark('interactive_ms'))
+            return False
+
+    paint_filter = FirstPaint()
+    window.installEventFilter(paint_filter)
+
+    def warmed_up():
+        mark('warmed_up_ms')
+        app.quit()
+
+    window.warmed_up.connect(warmed_up)
+    window.show()
+    app.exec_()
+    print(json.dumps(timings))
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    result = {}
+    for key in ('import_ms', 'construct_ms', 'first_paint_ms', 'interactive_ms', 'warmed_up_ms'):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            result[key] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量 GUI 主窗口的首次绘制、可交互与预热耗时")
+    parser.add_argument('--runs', type=int, default=5, help='启动次数（每次一个新进程）')
+    parser.add_argument('--eager', action='store_true', help='显示窗口前创建全部管理页面（对比用）')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.eager)
+        return
+
+    runs = []
+    for i in range(args.runs):
+        command = [sys.executable, __file__, '--child'] + (['--eager'] if args.eager else [])
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+        if completed.returncode != 0 or not lines:
+            print(f"第 {i + 1} 次启动失败：\n{completed.stderr}")
+            continue
+        runs.append(json.loads(lines[-1]))
+        print(f"第 {i + 1} 次: " + ", ".join(f"{k}={v:.0f}" for k, v in runs[-1].items()))
+
+    summary = summarize(runs)
+    mode = "全部页面预先创建" if args.eager else "按需创建"
+    print(f"\n{mode}，{len(runs)} 次启动（毫秒）：")
+    for key, stats in summary.items():
+        print(f"{key:<16}中位数 {stats['median']:>8.1f}  最小 {stats['min']:>8.1f}  最大 {stats['max']:>8.1f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'eager': args.eager, 'runs': runs, 'summary': summary}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
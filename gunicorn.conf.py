@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置：多进程 + 多线程（gthread）运行 web_app。
+
+- preload_app：主进程预先导入应用，工作进程 fork 后共享只读内存，启动更快。
+- post_fork：每个工作进程在 fork 之后各自创建连接池，连接不会跨进程共享。
+- 平滑重载：kill -HUP <主进程PID>，旧工作进程处理完在途请求后退出。
+
+用法: gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import multiprocessing
+import os
+
+import enhanced_config as config
+
+bind = os.environ.get('LMS_WEB_BIND', config.WEB_BIND)
+workers = int(os.environ.get('LMS_WEB_WORKERS', config.WEB_WORKERS)) or multiprocessing.cpu_count() * 2 + 1
+threads = int(os.environ.get('LMS_WEB_THREADS', config.WEB_THREADS))
+worker_class = 'gthread'
+preload_app = True
+
+timeout = 30  # 单个请求的最长处理时间
+graceful_timeout = 30  # 重载/停止时等待在途请求完成的时间
+keepalive = 5
+max_requests = 5000  # 定期重启工作进程，防止内存缓慢增长
+max_requests_jitter = 500
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    import enhanced_database as db
+    # 每个线程同时最多占用一条连接，连接池不小于线程数即可避免排队
+    db.init_pool(max(config.DB_POOL_SIZE, threads))
+    server.log.info("工作进程 %s 已初始化数据库连接池", worker.pid)
+    import counter_reconciliation
+    # 每个工作进程都启动，同一时间只有取得数据库命名锁的进程执行核对/归档
+    counter_reconciliation.start_background()
+    import borrowing_archiver
+    borrowing_archiver.start_background()
+    import retention_job
+    retention_job.start_background()
+
+
+def worker_exit(server, worker):
+    import enhanced_database as db
+    db.close_pool()
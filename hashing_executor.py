@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+密码哈希专用线程池与登录限流。
+
+bcrypt 每次计算要占用一个 CPU 核约数百毫秒。所有哈希/校验都在这个独立线程池中
+执行（bcrypt 计算期间会释放 GIL），并发数固定为 HASH_WORKERS，排队数超过
+HASH_QUEUE_LIMIT 时直接拒绝。这样一波集中登录最多占用固定数量的核，
+图书浏览等请求仍然有 CPU 可用。
+
+调用方式：
+- 同步代码（web_app、脚本）：run(fn, *args) 提交后阻塞等待结果；
+- asyncio 代码：await wait_async(submit(fn, *args))；
+- GUI：把登录放到后台线程执行，结果通过 Qt 信号回到界面线程。
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+import enhanced_config as config
+import metrics
+
+
+class HashingBusyError(RuntimeError):
+    """哈希线程池排队已满，或等待超过 HASH_WAIT_TIMEOUT，本次请求被拒绝"""
+
+
+HASH_REJECTED = metrics.counter("lms_hash_rejected_total", "因哈希线程池排队已满而被拒绝的请求数")
+HASH_TIMED_OUT = metrics.counter("lms_hash_timed_out_total", "等待哈希结果超过 HASH_WAIT_TIMEOUT 的请求数")
+HASH_EXECUTOR_TASKS = metrics.gauge("lms_hash_executor_tasks", "哈希线程池任务数（running/queued/limit）", ("state",))
+LOGIN_THROTTLED = metrics.counter("lms_login_throttled_total", "被限流拒绝的登录请求数", ("scope",))
+
+
+class HashingExecutor:
+    """并发数与排队长度都有上限的线程池"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lms-hash")
+        self._lock = threading.Lock()
+        self._pending = 0  # 已提交但尚未完成的任务数（运行中 + 排队中）
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                HASH_REJECTED.inc()
+                raise HashingBusyError("登录请求过多，请稍后再试")
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._task_done(None)
+            raise
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        pending = self._pending
+        running = min(pending, self.workers)
+        return {'running': running, 'queued': pending - running, 'limit': self.workers + self.queue_limit}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_executor: Optional[HashingExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> HashingExecutor:
+    """返回当前进程的哈希线程池（按需创建；线程不能跨 fork 继承，fork 后会重新创建）"""
+    global _executor
+    executor = _executor
+    if executor is not None and executor.pid == os.getpid():
+        return executor
+    with _executor_lock:
+        if _executor is None or _executor.pid != os.getpid():
+            _executor = HashingExecutor(config.HASH_WORKERS, config.HASH_QUEUE_LIMIT)
+        return _executor
+
+
+def submit(fn: Callable, *args) -> Future:
+    """提交到哈希线程池，返回 concurrent.futures.Future；排队已满时抛出 HashingBusyError"""
+    return get_executor().submit(fn, *args)
+
+
+def _timed_out(future: Future) -> HashingBusyError:
+    future.cancel()  # 还在排队时不再执行
+    HASH_TIMED_OUT.inc()
+    return HashingBusyError("登录请求过多，请稍后再试")
+
+
+def run(fn: Callable, *args, timeout: float = None):
+    """提交到哈希线程池并等待结果（供同步代码使用）；超过 timeout 秒时抛出 HashingBusyError"""
+    if timeout is None:
+        timeout = config.HASH_WAIT_TIMEOUT
+    future = submit(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        raise _timed_out(future) from None
+
+
+async def wait_async(future: Future, timeout: float = None):
+    """在事件循环中等待 submit() 返回的 Future（供 asyncio 代码使用）；超过 timeout 秒时抛出 HashingBusyError"""
+    if timeout is None:
+        timeout = config.HASH_WAIT_TIMEOUT
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        raise _timed_out(future) from None
+
+
+def _executor_stats():
+    executor = _executor
+    if executor is None or executor.pid != os.getpid():
+        return {}
+    return {(key,): value for key, value in executor.stats().items()}
+
+
+HASH_EXECUTOR_TASKS.set_function(_executor_stats)
+
+# ====================== 登录限流 ======================
+
+
+class LoginThrottle:
+    """
+    滑动窗口限流：同一账号、同一来源 IP 在 window 秒内的失败登录次数分别不能超过上限。
+    在进行任何 bcrypt 计算之前检查，被限流的请求不消耗哈希线程池。
+    只统计失败次数，同一机房大量读者正常登录不会互相影响；这类突发由线程池的并发上限兜底。
+    """
+
+    def __init__(self, window_seconds: float, per_account: int, per_ip: int, max_keys: int = 10000):
+        self.window_seconds = window_seconds
+        self.limits = {'account': per_account, 'ip': per_ip}
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures: Dict[Tuple[str, str], deque] = {}
+
+    @staticmethod
+    def _keys(account: str, ip: Optional[str]):
+        keys = [('account', account.lower())]
+        if ip:
+            keys.append(('ip', ip))
+        return keys
+
+    def check(self, account: str, ip: Optional[str] = None) -> float:
+        """允许登录时返回 0，被限流时返回建议等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(account, ip):
+                failures = self._prune(key, now)
+                if failures is not None and len(failures) >= self.limits[key[0]]:
+                    LOGIN_THROTTLED.inc(key[0])
+                    return max(failures[0] + self.window_seconds - now, 0.1)
+        return 0.0
+
+    def record_failure(self, account: str, ip: Optional[str] = None):
+        now = time.monotonic()
+        with self._lock:
+            for key in self._keys(account, ip):
+                self._failures.setdefault(key, deque()).append(now)
+            if len(self._failures) > self.max_keys:
+                self._evict(now)
+
+    def reset_account(self, account: str):
+        """登录成功后清除该账号的失败计数"""
+        with self._lock:
+            self._failures.pop(('account', account.lower()), None)
+
+    def _prune(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def _evict(self, now):
+        # 先清理过期的键；仍然过多时丢弃最早插入的键，防止被随机账号名撑爆内存
+        for key in list(self._failures):
+            self._prune(key, now)
+        while len(self._failures) > self.max_keys:
+            del self._failures[next(iter(self._failures))]
+
+
+LOGIN_THROTTLE = LoginThrottle(config.LOGIN_THROTTLE_WINDOW_SECONDS,
+                               config.LOGIN_THROTTLE_PER_ACCOUNT,
+                               config.LOGIN_THROTTLE_PER_IP)
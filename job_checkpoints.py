@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+分批维护任务的断点：按主键顺序分批处理的任务每完成一批保存一次位置，
+进程退出或被中断后，下一次从断点继续，而不是从头扫描。
+
+断点保存在数据库的 job_checkpoints 表中，多台机器上运行同一任务时共享进度。
+"""
+import json
+from typing import Dict, Optional, Tuple
+
+from enhanced_database import get_connection
+
+
+def load(job_name: str) -> Tuple[Optional[str], Dict]:
+    """返回 (上次处理到的位置, 累计统计)；没有断点时返回 (None, {})"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT position, stats FROM job_checkpoints WHERE job_name = %s", (job_name,))
+            row = cur.fetchone()
+    if row is None:
+        return None, {}
+    return row['position'], json.loads(row['stats'] or '{}')
+
+
+def save(job_name: str, position: str, stats: Dict = None):
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO job_checkpoints (job_name, position, stats) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE position = VALUES(position), stats = VALUES(stats)
+            """, (job_name, position, json.dumps(stats or {}, ensure_ascii=False, default=str)))
+            conn.commit()
+
+
+def clear(job_name: str):
+    """任务完整结束后清除断点，下一轮从头开始"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM job_checkpoints WHERE job_name = %s", (job_name,))
+            conn.commit()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+web_app 压测脚本：模拟读者注册、登录、浏览图书的混合会话。
+
+仅依赖标准库，每个虚拟用户使用独立的 CookieJar 保持会话。结果按操作类型
+统计吞吐量、p50/p95/p99 延迟与错误率，可保存为 JSON 并与上一次结果对比。
+
+示例：
+    python web_app.py                      # 另开终端启动被测服务
+    python load_test.py --users 50 --duration 60 --mix register=1,login=3,browse=6 \\
+        --output run_a.json
+    python load_test.py --users 50 --duration 60 --compare run_a.json
+"""
+import argparse
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Dict, List, Optional
+
+DEFAULT_PASSWORD = "loadtest123"
+
+
+class Recorder:
+    """线程安全地记录每次请求的延迟与结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, op: str, latency: float, ok: bool):
+        with self._lock:
+            self.samples.setdefault(op, []).append(latency)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class VirtualUser:
+    """一个带独立 Cookie 的虚拟读者"""
+
+    def __init__(self, base_url: str, recorder: Recorder, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def _request(self, op: str, path: str, form: Optional[dict] = None, expect_path: Optional[str] = None) -> bool:
+        data = urllib.parse.urlencode(form).encode('utf-8') if form is not None else None
+        start = time.perf_counter()
+        ok = False
+        try:
+            with self.opener.open(self.base_url + path, data=data, timeout=self.timeout) as resp:
+                resp.read()
+                # 重定向会被自动跟随，用最终落地的路径判断业务是否成功
+                ok = resp.status == 200 and (expect_path is None or urllib.parse.urlparse(resp.geturl()).path == expect_path)
+        except (urllib.error.URLError, OSError):
+            ok = False
+        self.recorder.record(op, time.perf_counter() - start, ok)
+        return ok
+
+    def register(self, card_no: str) -> bool:
+        return self._request('register', '/register',
+                             {'library_card_no': card_no, 'name': f'压测{card_no}', 'password': DEFAULT_PASSWORD},
+                             expect_path='/login')
+
+    def login(self, card_no: str) -> bool:
+        return self._request('login', '/login',
+                             {'username': card_no, 'password': DEFAULT_PASSWORD},
+                             expect_path='/dashboard')
+
+    def browse(self, pages: int) -> bool:
+        ok = True
+        for _ in range(pages):
+            ok = self._request('browse', '/books', expect_path='/books') and ok
+        return ok
+
+    def logout(self):
+        self._request('logout', '/logout', expect_path='/login')
+
+
+def new_card_no() -> str:
+    # readers.library_card_no 为 VARCHAR(20)
+    return 'LT' + uuid.uuid4().hex[:12].upper()
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('register', 'login', 'browse'):
+            raise argparse.ArgumentTypeError(f"未知的会话类型: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_session(kind: str, user: VirtualUser, accounts: List[str], accounts_lock: threading.Lock, pages: int):
+    """执行一个完整会话：register 会话注册后登录浏览，login 会话只登录，browse 会话登录后浏览多页"""
+    if kind == 'register':
+        card_no = new_card_no()
+        if user.register(card_no):
+            with accounts_lock:
+                accounts.append(card_no)
+            if user.login(card_no):
+                user.browse(1)
+        return
+    with accounts_lock:
+        card_no = random.choice(accounts) if accounts else None
+    if card_no is None:
+        return
+    if not user.login(card_no):
+        return
+    if kind == 'browse':
+        user.browse(pages)
+    user.logout()
+
+
+def worker(args, mix, accounts, accounts_lock, recorder, stop_at, session_counter):
+    kinds, weights = zip(*mix.items())
+    while time.time() < stop_at:
+        user = VirtualUser(args.url, recorder, args.timeout)
+        run_session(random.choices(kinds, weights)[0], user, accounts, accounts_lock, args.pages)
+        with accounts_lock:
+            session_counter[0] += 1
+        if args.think_time:
+            time.sleep(random.uniform(0, args.think_time))
+
+
+def summarize(recorder: Recorder, elapsed: float, args) -> dict:
+    ops = {}
+    for op, values in sorted(recorder.samples.items()):
+        values = sorted(values)
+        errors = recorder.errors.get(op, 0)
+        ops[op] = {
+            'count': len(values),
+            'errors': errors,
+            'error_rate': errors / len(values) if values else 0.0,
+            'throughput_rps': len(values) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    total = sum(o['count'] for o in ops.values())
+    return {
+        'config': {'url': args.url, 'users': args.users, 'duration': args.duration,
+                   'mix': args.mix, 'pages': args.pages, 'think_time': args.think_time},
+        'elapsed_seconds': elapsed,
+        'total_requests': total,
+        'total_throughput_rps': total / elapsed if elapsed else 0.0,
+        'operations': ops,
+    }
+
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    print(f"\n总请求: {result['total_requests']}  耗时: {result['elapsed_seconds']:.1f}s  "
+          f"吞吐: {result['total_throughput_rps']:.1f} req/s")
+    header = f"{'操作':<10}{'请求数':>8}{'错误率':>9}{'req/s':>9}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for op, s in result['operations'].items():
+        print(f"{op:<10}{s['count']:>8}{s['error_rate']:>8.1%}{s['throughput_rps']:>9.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}")
+        base = (baseline or {}).get('operations', {}).get(op)
+        if base:
+            def delta(key):
+                return (s[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+            print(f"{'  vs 基线':<10}{'':>8}{s['error_rate'] - base['error_rate']:>+8.1%}{delta('throughput_rps'):>+8.1f}%"
+                  f"{delta('p50_ms'):>+8.1f}%{delta('p95_ms'):>+8.1f}%{delta('p99_ms'):>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="web_app 登录与图书浏览压测")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='被测服务地址')
+    parser.add_argument('--users', type=int, default=20, help='并发虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='压测持续时间（秒）')
+    parser.add_argument('--mix', default='register=1,login=3,browse=6', help='会话类型权重')
+    parser.add_argument('--pages', type=int, default=3, help='browse 会话中浏览图书列表的次数')
+    parser.add_argument('--seed-accounts', type=int, default=20, help='压测前预先注册的账号数')
+    parser.add_argument('--think-time', type=float, default=0.0, help='会话之间的随机停顿上限（秒）')
+    parser.add_argument('--timeout', type=float, default=10.0, help='单次请求超时（秒）')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子，便于复现')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的 JSON 结果对比')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = parse_mix(args.mix)
+
+    print(f"预注册 {args.seed_accounts} 个账号...")
+    accounts: List[str] = []
+    accounts_lock = threading.Lock()
+    seed_recorder = Recorder()
+    for _ in range(args.seed_accounts):
+        card_no = new_card_no()
+        if VirtualUser(args.url, seed_recorder, args.timeout).register(card_no):
+            accounts.append(card_no)
+    if args.seed_accounts and not accounts:
+        print("预注册全部失败，请确认 web_app 与数据库已启动。")
+        return
+
+    print(f"开始压测: {args.users} 个并发用户, {args.duration:.0f} 秒, 混合比例 {mix}")
+    recorder = Recorder()
+    session_counter = [0]
+    stop_at = time.time() + args.duration
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True,
+                                args=(args, mix, accounts, accounts_lock, recorder, stop_at, session_counter))
+               for _ in range(args.users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    result = summarize(recorder, elapsed, args)
+    result['sessions'] = session_counter[0]
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+轻量级运行指标模块：计数器、仪表与直方图，并导出为 Prometheus 文本格式。
+
+热路径上只做一次 bisect 和几次整数加法（加一把无竞争锁），单次记录开销在
+亚微秒级，不依赖 prometheus_client 等第三方库。
+"""
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple, Union
+
+# 默认的耗时桶（秒），覆盖从数据库点查到 bcrypt 校验的范围
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_REGISTRY: List["_Metric"] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    type_name = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """
+    仪表：既可以直接 set/inc/dec，也可以注册回调在导出时取值。
+    回调返回数字（无标签）或 {标签值元组: 数字} 字典。
+    """
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, label_names=()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: List[Callable[[], Union[float, Dict[Tuple[str, ...], float]]]] = []
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set_function(self, fn: Callable[[], Union[float, Dict[Tuple[str, ...], float]]]):
+        """注册导出时调用的取值函数（可注册多个，结果合并）"""
+        self._callbacks.append(fn)
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for fn in self._callbacks:
+            try:
+                result = fn()
+            except Exception:
+                continue  # 取值失败不影响其它指标的导出
+            if isinstance(result, dict):
+                values.update(result)
+            else:
+                values[()] = result
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    """直方图：按桶计数，导出时再累加成 Prometheus 的累计桶"""
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值元组 -> [各桶计数..., +Inf桶计数, 总和, 总数]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _REGISTRY_LOCK:
+        for existing in _REGISTRY:
+            if existing.name == metric.name:
+                return existing  # 模块被重复导入时复用已注册的指标
+        _REGISTRY.append(metric)
+    return metric
+
+
+def counter(name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+    return _register(Counter(name, help_text, label_names))
+
+
+def gauge(name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+    return _register(Gauge(name, help_text, label_names))
+
+
+def histogram(name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, label_names, buckets))
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式 (0.0.4) 导出全部指标"""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ====================== 通用指标 ======================
+# 各模块共享的指标在此定义，避免名称分散在各处
+
+HTTP_REQUEST_SECONDS = histogram(
+    "lms_http_request_duration_seconds", "Web 请求耗时（按路由、方法、状态码）",
+    ("route", "method", "status"))
+DB_QUERY_SECONDS = histogram(
+    "lms_db_query_duration_seconds", "数据库语句执行耗时", ("kind",))
+DB_CONNECT_SECONDS = histogram(
+    "lms_db_connect_duration_seconds", "建立数据库连接耗时")
+DB_CONNECTIONS_IN_USE = gauge(
+    "lms_db_connections_in_use", "当前正在使用的数据库连接数")
+DB_ERRORS = counter(
+    "lms_db_errors_total", "数据库连接或执行错误次数", ("stage",))
+BCRYPT_SECONDS = histogram(
+    "lms_bcrypt_duration_seconds", "密码哈希与校验耗时", ("op",))
+CACHE_REQUESTS = counter(
+    "lms_cache_requests_total", "缓存访问次数（按缓存名与结果）", ("cache", "result"))
+CACHE_HIT_RATIO = gauge(
+    "lms_cache_hit_ratio", "缓存命中率", ("cache",))
+
+
+def _cache_hit_ratios():
+    totals: Dict[str, List[float]] = {}
+    for (cache_name, result), count in list(CACHE_REQUESTS._values.items()):
+        entry = totals.setdefault(cache_name, [0, 0])
+        entry[0 if result == "hit" else 1] += count
+    return {(name, ): (hits / (hits + misses) if hits + misses else 0.0)
+            for name, (hits, misses) in totals.items()}
+
+
+CACHE_HIT_RATIO.set_function(_cache_hit_ratios)
@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+"""
+离线借还书日志：数据库（或到数据库的网络）不可用时，前台仍可办理借书、还书。
+
+- 操作先写入本机的 SQLite 日志文件（OFFLINE_JOURNAL_PATH，每次提交都落盘），再由后台线程
+  按受理顺序回放到数据库（enhanced_library.borrow_book / return_book，保留受理时的借还日期）；
+- 受理时用本机保存的可借状态快照做乐观校验（读者状态与借书数量、图书是否可借、借阅是否未还），
+  并立即更新快照，同一台前台连续办理的业务互相可见；
+- 快照在没有待回放操作时通过 delta_sync 增量刷新，水位保存在日志文件中，重启后继续增量刷新；
+- 回放时数据库拒绝的操作（例如离线期间图书已在其他前台借出）标记为冲突，不阻塞后续操作，
+  由管理员在日志中查看（conflicts）后人工处理或重新回放（retry），入口为主窗口状态栏的冲突提示
+  或命令行 python offline_journal.py --conflicts / --retry OP_ID。
+- 离线办理、尚未回放的借阅使用负数借阅编号（-op_id），受理消息和借阅页面的表格都显示这个编号，
+  还书时输入它即可；正数编号只能是快照中数据库已有的借阅。
+
+OFFLINE_JOURNAL_MODE：
+- 'fallback'：没有待回放的操作时直接访问数据库，连接失败时转为写入日志；
+- 'always'：所有借还书都先写入日志，由后台线程立即回放，前台办理耗时与网络无关
+  （数据库的最终结果稍后才能确认，冲突在回放时才发现）。
+
+回放至少执行一次：进程在数据库提交之后、日志标记之前退出时，重启后会再次回放；
+借书时读者已借有同一本书、还书时借阅已归还的操作视为已执行（状态 skipped），不会重复借还。
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import pymysql
+
+import delta_sync
+import enhanced_config as config
+import enhanced_database as db
+import enhanced_library as lib
+import metrics
+from enhanced_database import get_connection
+
+JOURNAL_OPERATIONS = metrics.counter(
+    "lms_offline_journal_operations_total", "离线日志受理与回放的操作数", ("kind", "result"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    op_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    op_uuid TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL CHECK (kind IN ('borrow', 'return')),
+    library_card_no TEXT NOT NULL,
+    book_number TEXT NOT NULL,
+    borrowing_id INTEGER,              -- 还书：数据库中的借阅编号；借阅本身也是离线办理的为负数
+    op_date TEXT NOT NULL,             -- 受理日期（借书日期或还书日期）
+    due_date TEXT,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'applied', 'skipped', 'conflict')),
+    message TEXT,
+    created_at TEXT NOT NULL,
+    applied_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_operations_status ON operations (status, op_id);
+
+CREATE TABLE IF NOT EXISTS snapshot_books (
+    book_number TEXT PRIMARY KEY,
+    isbn TEXT,
+    title TEXT,
+    is_available TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_readers (
+    library_card_no TEXT PRIMARY KEY,
+    name TEXT,
+    status TEXT NOT NULL,
+    current_borrow_count INTEGER NOT NULL,
+    max_borrow_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_loans (
+    borrowing_id INTEGER PRIMARY KEY,  -- 离线办理、尚未回放的借阅为 -op_id
+    library_card_no TEXT NOT NULL,
+    book_number TEXT NOT NULL,
+    due_date TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshot_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 连接数据库失败时 pymysql 抛出的异常；数据库返回的业务错误不在此列。
+# 连接池耗尽（PoolExhaustedError）虽然也是 OperationalError 的子类，但只说明本进程并发过高，
+# 不能据此转为离线办理，受理时直接抛给调用方（见 _is_offline_error）
+OFFLINE_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+
+
+def _is_offline_error(error: Exception) -> bool:
+    return isinstance(error, OFFLINE_ERRORS) and not isinstance(error, db.PoolExhaustedError)
+
+
+class OfflineJournal:
+    def __init__(self, path: str = None):
+        path = path or config.OFFLINE_JOURNAL_PATH
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        self.path = path
+        self._lock = threading.Lock()        # 保护受理与快照写入，不在持有时访问数据库
+        self._replay_lock = threading.Lock()  # 同一时间只有一个线程回放
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._trackers = {entity: delta_sync.DeltaTracker(entity) for entity in ('books', 'readers')}
+        with closing(self._open()) as conn:
+            conn.executescript(SCHEMA)
+            for entity, tracker in self._trackers.items():
+                row = conn.execute("SELECT value FROM snapshot_meta WHERE key = ?",
+                                   (f"watermark:{entity}",)).fetchone()
+                tracker.watermark = datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = FULL")  # 受理成功即已落盘，断电也不丢
+        return conn
+
+    # ====================== 受理 ======================
+
+    def pending_count(self) -> int:
+        with closing(self._open()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM operations WHERE status = 'pending'").fetchone()[0]
+
+    def borrow_book(self, library_card_no: str, book_number: str, days: int = None) -> tuple[bool, str]:
+        """与 enhanced_library.borrow_book 相同的接口；按 OFFLINE_JOURNAL_MODE 直接办理或写入日志"""
+        if config.OFFLINE_JOURNAL_MODE != 'always' and self.pending_count() == 0:
+            try:
+                return lib.borrow_book(library_card_no, book_number, days)
+            except OFFLINE_ERRORS as e:
+                if not _is_offline_error(e):
+                    raise
+                print(f"数据库不可用，借书转为离线办理: {e}")
+        return self.enqueue_borrow(library_card_no, book_number, days)
+
+    def return_book(self, borrowing_id: int) -> tuple[bool, str]:
+        """与 enhanced_library.return_book 相同的接口；离线办理的借阅使用负数编号"""
+        if config.OFFLINE_JOURNAL_MODE != 'always' and self.pending_count() == 0 and borrowing_id > 0:
+            try:
+                return lib.return_book(borrowing_id)
+            except OFFLINE_ERRORS as e:
+                if not _is_offline_error(e):
+                    raise
+                print(f"数据库不可用，还书转为离线办理: {e}")
+        return self.enqueue_return(borrowing_id)
+
+    def enqueue_borrow(self, library_card_no: str, book_number: str, days: int = None) -> tuple[bool, str]:
+        if days is None:
+            days = config.DEFAULT_BORROW_DAYS
+        today = date.today()
+        due_date = today + timedelta(days=days)
+        with self._lock, closing(self._open()) as conn:
+            reader = conn.execute("SELECT * FROM snapshot_readers WHERE library_card_no = ?",
+                                  (library_card_no,)).fetchone()
+            book = conn.execute("SELECT * FROM snapshot_books WHERE book_number = ?", (book_number,)).fetchone()
+            if reader is None:
+                return False, "读者不存在（本地快照）。"
+            if reader['status'] != '正常':
+                return False, "读者状态异常，无法借书。"
+            if reader['current_borrow_count'] >= reader['max_borrow_count']:
+                return False, "已达到借书数量限制。"
+            if book is None:
+                return False, "图书不存在（本地快照）。"
+            if book['is_available'] != '可借':
+                return False, f"图书 '{book_number}' 当前不可借 (状态: {book['is_available']}, 物理状态: {book['status']})。"
+            if book['status'] != '正常':
+                return False, f"图书 '{book_number}' 状态异常 ({book['status']})，无法借出。"
+
+            with conn:
+                op_id = self._insert_operation(conn, 'borrow', library_card_no, book_number, None,
+                                               today, due_date)
+                conn.execute("UPDATE snapshot_books SET is_available = '不可借' WHERE book_number = ?",
+                             (book_number,))
+                conn.execute("UPDATE snapshot_readers SET current_borrow_count = current_borrow_count + 1 "
+                             "WHERE library_card_no = ?", (library_card_no,))
+                conn.execute("INSERT INTO snapshot_loans (borrowing_id, library_card_no, book_number, due_date) "
+                             "VALUES (?, ?, ?, ?)", (-op_id, library_card_no, book_number, due_date.isoformat()))
+        JOURNAL_OPERATIONS.inc("borrow", "accepted")
+        self._wakeup.set()
+        return True, (f"借书已受理（离线办理，待同步）！借阅编号: {-op_id}（还书时输入此编号）, "
+                      f"书号: {book_number}, 应还日期: {due_date.strftime('%Y-%m-%d')}。")
+
+    def enqueue_return(self, borrowing_id: int) -> tuple[bool, str]:
+        today = date.today()
+        with self._lock, closing(self._open()) as conn:
+            loan = conn.execute("SELECT * FROM snapshot_loans WHERE borrowing_id = ?", (borrowing_id,)).fetchone()
+            if loan is None:
+                if borrowing_id > 0 and conn.execute(
+                        "SELECT 1 FROM snapshot_loans WHERE borrowing_id = ?", (-borrowing_id,)).fetchone():
+                    # 多半是把离线借阅的编号漏了负号，不能按正数去还数据库中另一笔借阅
+                    return False, (f"借阅编号 {borrowing_id} 不在本地快照中；"
+                                   f"离线办理的借阅编号为负数，是否要归还 {-borrowing_id}？")
+                return False, "借阅记录不存在或已归还（本地快照）。"
+            with conn:
+                op_id = self._insert_operation(conn, 'return', loan['library_card_no'], loan['book_number'],
+                                               borrowing_id, today, None)
+                conn.execute("DELETE FROM snapshot_loans WHERE borrowing_id = ?", (borrowing_id,))
+                conn.execute("UPDATE snapshot_books SET is_available = '可借' WHERE book_number = ?",
+                             (loan['book_number'],))
+                conn.execute("UPDATE snapshot_readers SET current_borrow_count = MAX(current_borrow_count - 1, 0) "
+                             "WHERE library_card_no = ?", (loan['library_card_no'],))
+        JOURNAL_OPERATIONS.inc("return", "accepted")
+        self._wakeup.set()
+        message = f"还书已受理（离线办理，待同步）！借阅编号: {borrowing_id}, 书号: {loan['book_number']}."
+        if loan['due_date'] and date.fromisoformat(loan['due_date']) < today:
+            overdue_days = (today - date.fromisoformat(loan['due_date'])).days
+            message += f" 产生逾期罚金: {overdue_days * config.FINE_PER_DAY:.2f}元。"
+        return True, message
+
+    @staticmethod
+    def _insert_operation(conn, kind: str, library_card_no: str, book_number: str,
+                          borrowing_id: Optional[int], op_date: date, due_date: Optional[date]) -> int:
+        cur = conn.execute("""
+            INSERT INTO operations (op_uuid, kind, library_card_no, book_number, borrowing_id,
+                                    op_date, due_date, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (uuid.uuid4().hex, kind, library_card_no, book_number, borrowing_id, op_date.isoformat(),
+              due_date.isoformat() if due_date else None, datetime.now().isoformat(timespec='seconds')))
+        return cur.lastrowid
+
+    # ====================== 回放 ======================
+
+    def replay(self, max_operations: int = None) -> Dict[str, int]:
+        """
+        按受理顺序回放待处理的操作，返回各结果的数量。
+        数据库仍不可用时停止，剩余操作留待下一次回放。
+        """
+        result = {'applied': 0, 'skipped': 0, 'conflict': 0, 'remaining': 0}
+        with self._replay_lock:
+            while max_operations is None or sum(result.values()) < max_operations:
+                with closing(self._open()) as conn:
+                    op = conn.execute("SELECT * FROM operations WHERE status = 'pending' "
+                                      "ORDER BY op_id LIMIT 1").fetchone()
+                if op is None:
+                    break
+                try:
+                    status, message = self._apply(op)
+                except OFFLINE_ERRORS as e:
+                    print(f"回放离线日志暂停，数据库仍不可用: {e}")
+                    break
+                with closing(self._open()) as conn, conn:
+                    conn.execute("UPDATE operations SET status = ?, message = ?, applied_at = ? WHERE op_id = ?",
+                                 (status, message, datetime.now().isoformat(timespec='seconds'), op['op_id']))
+                JOURNAL_OPERATIONS.inc(op['kind'], status)
+                result[status] += 1
+                if status == 'conflict':
+                    print(f"离线日志第 {op['op_id']} 号与数据库冲突: {message}")
+        result['remaining'] = self.pending_count()
+        return result
+
+    def _apply(self, op) -> tuple:
+        """执行一条日志操作，返回 (状态, 消息)；连接失败时抛出 OFFLINE_ERRORS"""
+        op_date = date.fromisoformat(op['op_date'])
+        if op['kind'] == 'borrow':
+            if self._open_borrowing_id(op['library_card_no'], op['book_number']) is not None:
+                return 'skipped', "读者已借有该书（操作已执行过）"
+            days = (date.fromisoformat(op['due_date']) - op_date).days
+            ok, message = lib.borrow_book(op['library_card_no'], op['book_number'], days, borrow_date=op_date)
+            return ('applied' if ok else 'conflict'), message
+
+        borrowing_id = op['borrowing_id']
+        if borrowing_id < 0:
+            # 借阅本身也是离线办理的：回放借书之后按读者和书号找到数据库中的借阅编号
+            borrowing_id = self._open_borrowing_id(op['library_card_no'], op['book_number'])
+            if borrowing_id is None:
+                return 'conflict', "找不到对应的借阅记录（离线借书未成功同步）"
+        ok, message = lib.return_book(borrowing_id, return_date=op_date)
+        if not ok and message == "该书已归还。":
+            return 'skipped', message
+        return ('applied' if ok else 'conflict'), message
+
+    @staticmethod
+    def _open_borrowing_id(library_card_no: str, book_number: str) -> Optional[int]:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(borrowing_id) AS borrowing_id FROM borrowings "
+                            "WHERE library_card_no = %s AND book_number = %s AND return_date IS NULL",
+                            (library_card_no, book_number))
+                return cur.fetchone()['borrowing_id']
+
+    def conflicts(self) -> List[Dict]:
+        with closing(self._open()) as conn:
+            return [dict(row) for row in conn.execute(
+                "SELECT * FROM operations WHERE status = 'conflict' ORDER BY op_id")]
+
+    def retry(self, op_id: int) -> bool:
+        """把一条冲突操作重新标记为待回放（管理员处理冲突原因之后）"""
+        with closing(self._open()) as conn, conn:
+            cur = conn.execute("UPDATE operations SET status = 'pending', message = NULL "
+                               "WHERE op_id = ? AND status = 'conflict'", (op_id,))
+        self._wakeup.set()
+        return cur.rowcount == 1
+
+    def pending_loans(self, library_card_no: str = None, book_number: str = None) -> List[Dict]:
+        """离线办理、尚未回放的借阅（借阅编号为 -op_id），字段与借阅历史查询的结果相同"""
+        sql = """
+            SELECT l.borrowing_id, l.library_card_no, l.book_number, b.title AS book_title,
+                   o.op_date AS borrow_date, l.due_date
+            FROM snapshot_loans l
+            JOIN operations o ON o.op_id = -l.borrowing_id
+            LEFT JOIN snapshot_books b ON b.book_number = l.book_number
+            WHERE l.borrowing_id < 0
+        """
+        params = []
+        if library_card_no:
+            sql += " AND l.library_card_no = ?"
+            params.append(library_card_no)
+        if book_number:
+            sql += " AND l.book_number = ?"
+            params.append(book_number)
+        with closing(self._open()) as conn:
+            rows = conn.execute(sql + " ORDER BY l.borrowing_id", params).fetchall()
+        return [dict(row, status='待同步', return_date=None) for row in rows]
+
+    def summary(self) -> Dict:
+        with closing(self._open()) as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM operations GROUP BY status").fetchall())
+            row = conn.execute("SELECT value FROM snapshot_meta WHERE key = 'refreshed_at'").fetchone()
+        return {'pending': counts.get('pending', 0), 'conflict': counts.get('conflict', 0),
+                'snapshot_at': row[0] if row else None}
+
+    # ====================== 可借状态快照 ======================
+
+    def refresh_snapshot(self) -> bool:
+        """
+        从数据库增量刷新快照，返回是否已刷新。
+        有待回放的操作时不刷新：数据库里还没有这些操作，刷新会覆盖本地受理后的状态。
+        """
+        with closing(self._open()) as conn:
+            last_op_id = conn.execute("SELECT COALESCE(MAX(op_id), 0) FROM operations").fetchone()[0]
+        if self.pending_count():
+            return False
+        previous = {entity: tracker.watermark for entity, tracker in self._trackers.items()}
+        stored = False
+        try:
+            changes = {entity: tracker.poll() for entity, tracker in self._trackers.items()}
+            with get_connection() as db_conn:
+                with db_conn.cursor() as cur:
+                    cur.execute("SELECT borrowing_id, library_card_no, book_number, due_date FROM borrowings "
+                                "WHERE return_date IS NULL")
+                    loans = cur.fetchall()
+            stored = self._store_snapshot(last_op_id, changes, loans)
+            return stored
+        finally:
+            if not stored:
+                # 没有写入快照：水位回到刷新之前，下次重新读取这段变化
+                for entity, tracker in self._trackers.items():
+                    tracker.watermark = previous[entity]
+
+    def _store_snapshot(self, last_op_id: int, changes: Dict, loans: List[Dict]) -> bool:
+        with self._lock, closing(self._open()) as conn:
+            if conn.execute("SELECT COALESCE(MAX(op_id), 0) FROM operations").fetchone()[0] != last_op_id:
+                return False  # 刷新期间又受理了新操作，这次读到的数据不包含它们
+            with conn:
+                self._store_changes(conn, changes['books'], 'snapshot_books', 'book_number',
+                                    ('book_number', 'isbn', 'title', 'is_available', 'status'))
+                self._store_changes(conn, changes['readers'], 'snapshot_readers', 'library_card_no',
+                                    ('library_card_no', 'name', 'status', 'current_borrow_count',
+                                     'max_borrow_count'))
+                conn.execute("DELETE FROM snapshot_loans")
+                conn.executemany("INSERT INTO snapshot_loans (borrowing_id, library_card_no, book_number, due_date) "
+                                 "VALUES (?, ?, ?, ?)",
+                                 [(r['borrowing_id'], r['library_card_no'], r['book_number'],
+                                   r['due_date'].isoformat() if r['due_date'] else None) for r in loans])
+                for entity, tracker in self._trackers.items():
+                    conn.execute("INSERT OR REPLACE INTO snapshot_meta (key, value) VALUES (?, ?)",
+                                 (f"watermark:{entity}", tracker.watermark.isoformat()))
+                conn.execute("INSERT OR REPLACE INTO snapshot_meta (key, value) VALUES ('refreshed_at', ?)",
+                             (datetime.now().isoformat(timespec='seconds'),))
+        return True
+
+    @staticmethod
+    def _store_changes(conn, changes: Dict, table: str, key: str, columns: tuple):
+        if changes['full']:
+            conn.execute(f"DELETE FROM {table}")
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                         [tuple(row.get(column) for column in columns) for row in changes['upserts']])
+        conn.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(k,) for k in changes['deletes']])
+
+    # ====================== 后台线程 ======================
+
+    def start(self):
+        """启动后台线程：有待回放的操作时回放，否则定期刷新快照（可重复调用）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lms-offline-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_refresh = 0.0
+        while True:
+            try:
+                if self.replay()['remaining'] == 0 and \
+                        time.monotonic() - last_refresh >= config.OFFLINE_SNAPSHOT_REFRESH_SECONDS:
+                    if self.refresh_snapshot():
+                        last_refresh = time.monotonic()
+            except Exception as e:
+                print(f"离线日志后台任务失败: {e}")
+            self._wakeup.wait(config.OFFLINE_REPLAY_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+
+_journal: Optional[OfflineJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> OfflineJournal:
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = OfflineJournal()
+        return _journal
+
+
+def borrow_book(library_card_no: str, book_number: str, days: int = None) -> tuple[bool, str]:
+    """启用离线日志时经日志办理，否则直接调用 enhanced_library.borrow_book"""
+    if config.OFFLINE_JOURNAL_ENABLED:
+        return get_journal().borrow_book(library_card_no, book_number, days)
+    return lib.borrow_book(library_card_no, book_number, days)
+
+
+def return_book(borrowing_id: int) -> tuple[bool, str]:
+    if config.OFFLINE_JOURNAL_ENABLED:
+        return get_journal().return_book(borrowing_id)
+    return lib.return_book(borrowing_id)
+
+
+def pending_loans(library_card_no: str = None, book_number: str = None) -> List[Dict]:
+    """未启用离线日志时为空列表"""
+    if config.OFFLINE_JOURNAL_ENABLED:
+        return get_journal().pending_loans(library_card_no, book_number)
+    return []
+
+
+# ====================== 命令行 ======================
+
+def main():
+    parser = argparse.ArgumentParser(description="离线借还书日志：查看状态与冲突、重新回放冲突操作")
+    parser.add_argument('--conflicts', action='store_true', help="列出回放时与数据库冲突的操作")
+    parser.add_argument('--retry', type=int, nargs='+', metavar='OP_ID', help="把冲突操作重新标记为待回放")
+    parser.add_argument('--replay', action='store_true', help="立即回放待处理的操作")
+    args = parser.parse_args()
+
+    journal = get_journal()
+    for op_id in args.retry or []:
+        print(f"第 {op_id} 号：" + ("已重新标记为待回放" if journal.retry(op_id) else "不是冲突状态的操作"))
+    if args.replay:
+        result = journal.replay()
+        print(f"回放完成：成功 {result['applied']}，已执行过 {result['skipped']}，"
+              f"冲突 {result['conflict']}，剩余 {result['remaining']}")
+    if args.conflicts:
+        for op in journal.conflicts():
+            print(f"第 {op['op_id']} 号 [{op['kind']}] 借书证号 {op['library_card_no']} 书号 {op['book_number']} "
+                  f"受理于 {op['op_date']}：{op['message']}")
+    summary = journal.summary()
+    print(f"待同步 {summary['pending']} 笔，冲突 {summary['conflict']} 笔，快照刷新于 {summary['snapshot_at'] or '从未'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+密码哈希策略：按配置选择算法与计算代价，并判断已存储的哈希是否需要升级。
+
+支持的算法：
+- bcrypt：          $2b$<rounds>$...（默认，rounds 由 PASSWORD_BCRYPT_ROUNDS 指定）
+- pbkdf2_sha256：   pbkdf2_sha256$<iterations>$<salt>$<hash>（仅依赖 hashlib）
+
+校验时根据哈希前缀自动识别算法，因此修改策略后旧哈希依然可以登录；
+登录成功时若 needs_rehash() 为真，调用方应按新策略重新计算并写回。
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+import bcrypt  # type: ignore
+
+import enhanced_config as config
+import metrics
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+PBKDF2_PREFIX = 'pbkdf2_sha256$'
+
+PASSWORD_REHASHED = metrics.counter(
+    "lms_password_rehash_total", "登录时按新策略重新计算密码哈希的次数", ("algorithm",))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+def hash_password(password: str) -> str:
+    """按当前策略计算密码哈希"""
+    algorithm = config.PASSWORD_HASH_ALGORITHM
+    if algorithm == 'bcrypt':
+        salt = bcrypt.gensalt(rounds=config.PASSWORD_BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    if algorithm == 'pbkdf2_sha256':
+        salt = os.urandom(16)
+        iterations = config.PASSWORD_PBKDF2_ITERATIONS
+        return f"{PBKDF2_PREFIX}{iterations}${_b64encode(salt)}${_b64encode(_pbkdf2(password, salt, iterations))}"
+    raise ValueError(f"不支持的密码哈希算法: {algorithm}")
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """校验密码，算法由哈希前缀决定；无法识别的哈希一律视为不匹配"""
+    if stored_hash.startswith(BCRYPT_PREFIXES):
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+    if stored_hash.startswith(PBKDF2_PREFIX):
+        try:
+            _, iterations, salt, expected = stored_hash.split('$')
+            actual = _pbkdf2(password, _b64decode(salt), int(iterations))
+            return hmac.compare_digest(actual, _b64decode(expected))
+        except ValueError:
+            return False
+    return False
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """已存储的哈希是否与当前策略（算法与代价）不一致"""
+    algorithm = config.PASSWORD_HASH_ALGORITHM
+    if algorithm == 'bcrypt':
+        if not stored_hash.startswith(BCRYPT_PREFIXES):
+            return True
+        try:
+            return int(stored_hash[4:6]) != config.PASSWORD_BCRYPT_ROUNDS
+        except ValueError:
+            return True
+    if algorithm == 'pbkdf2_sha256':
+        if not stored_hash.startswith(PBKDF2_PREFIX):
+            return True
+        try:
+            return int(stored_hash.split('$')[1]) != config.PASSWORD_PBKDF2_ITERATIONS
+        except (IndexError, ValueError):
+            return True
+    return False
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读者快速查找：输入框自动补全用的轻量查询。
+
+按输入的形式选择查询方式，每种方式都是对一个索引列的前缀范围扫描，只取前 READER_LOOKUP_LIMIT 行：
+- 借书证号前缀：library_card_no LIKE 'R2024%'（主键）；
+- 姓名前缀：name LIKE '张%'（idx_reader_name）；
+- 拼音首字母 / 全拼前缀：name_initials LIKE 'zs%'、name_pinyin LIKE 'zhangs%'；
+- 电话尾号：phone_reversed LIKE '8765%'（倒序存放，尾号查询变成前缀查询）。
+几种方式合并成一条 UNION ALL 语句，一次往返；不再像 GetReaderInfo 那样下载全部读者
+再在 Python 中过滤，也不用无法走索引的 LIKE '%x%'。
+
+检索列（name_pinyin、name_initials、phone_reversed）由 enhanced_library 在新增、修改读者时维护，
+示例数据和升级前已有的读者由 enhanced_database.init_db 补齐（fill_missing）；
+安装 pypinyin 后执行一次 --backfill 可补上全拼。
+
+示例：
+    python reader_lookup.py zs
+    python reader_lookup.py --backfill
+    python reader_lookup.py --benchmark 200
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import enhanced_config as config
+import metrics
+import search_keys
+from enhanced_database import get_connection, get_read_connection
+
+# 补全列表与读者表格用到的列（不含密码哈希与检索列）
+LOOKUP_COLUMNS = ("library_card_no, name, gender, birth_date, id_card, title, max_borrow_count, "
+                  "current_borrow_count, department, address, phone, registration_date, status")
+
+READER_LOOKUP_SECONDS = metrics.histogram(
+    "lms_reader_lookup_seconds", "读者快速查找的耗时", ("match",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+
+def lookup_conditions(text: str) -> List[Tuple[str, str, str]]:
+    """根据输入选择查询方式，返回 [(方式, 列名, 前缀)]，排在前面的方式优先"""
+    text = text.strip()
+    if not text:
+        return []
+    folded = text.lower()
+    conditions = []
+    if re.fullmatch(r'[0-9A-Za-z-]+', text):
+        conditions.append(('card', 'library_card_no', text))
+    if search_keys.has_cjk(text):
+        conditions.append(('name', 'name', text))
+    elif re.fullmatch(r'[a-z]+', folded):
+        conditions.append(('initials', 'name_initials', folded))
+        conditions.append(('pinyin', 'name_pinyin', folded))
+        conditions.append(('name', 'name', text))  # 外文姓名
+    if text.isdigit() and len(text) >= config.READER_LOOKUP_MIN_PHONE_DIGITS:
+        conditions.append(('phone', 'phone_reversed', text[::-1]))
+    return conditions
+
+
+def lookup(text: str, limit: int = None) -> List[Dict]:
+    """
+    按借书证号前缀、姓名前缀、拼音、电话尾号查找读者，最多返回 limit 行。
+    每行额外带有 match 字段（card/name/initials/pinyin/phone），表示命中的方式。
+    """
+    limit = limit or config.READER_LOOKUP_LIMIT
+    conditions = lookup_conditions(text)
+    if not conditions:
+        return []
+    parts, params = [], []
+    for rank, (_, column, prefix) in enumerate(conditions):
+        # 子查询各自限制行数：每种方式只读索引范围的开头一段
+        parts.append(f"SELECT * FROM (SELECT {LOOKUP_COLUMNS}, {rank} AS match_rank FROM readers "
+                     f"WHERE {column} LIKE %s ESCAPE '!' LIMIT %s) AS m{rank}")
+        params.extend([search_keys.like_prefix(prefix), limit])
+    start = time.perf_counter()
+    with get_read_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(" UNION ALL ".join(parts), params)
+            rows = cur.fetchall()
+    READER_LOOKUP_SECONDS.observe(time.perf_counter() - start, conditions[0][0])
+
+    results, seen = [], set()
+    for row in sorted(rows, key=lambda r: (r['match_rank'], r['library_card_no'])):
+        if row['library_card_no'] in seen:
+            continue
+        seen.add(row['library_card_no'])
+        row['match'] = conditions[row.pop('match_rank')][0]
+        results.append(row)
+    return results[:limit]
+
+
+def display_text(reader: Dict) -> str:
+    """补全列表中的一行：借书证号 姓名 部门 电话尾号"""
+    parts = [reader['library_card_no'], reader.get('name') or '']
+    if reader.get('department'):
+        parts.append(reader['department'])
+    if reader.get('phone'):
+        parts.append(f"尾号{reader['phone'][-4:]}")
+    return "  ".join(parts)
+
+
+# ====================== 检索列维护 ======================
+
+def backfill(batch_size: int = 500) -> int:
+    """
+    重新计算全部读者的检索列，只更新与存放值不同的行，返回更新的行数。
+    按主键分批，每批一个短事务；MySQL 下保留原来的 updated_at
+    （SQLite 的 updated_at 由触发器维护，补齐的行会更新 updated_at）。
+    """
+    last_key, updated = '', 0
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT library_card_no, name, phone, name_pinyin, name_initials, phone_reversed
+                    FROM readers WHERE library_card_no > %s ORDER BY library_card_no LIMIT %s
+                """, (last_key, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    return updated
+                for row in rows:
+                    keys = search_keys.reader_keys(row['name'], row['phone'] or '')
+                    if all(row[column] == value for column, value in keys.items()):
+                        continue
+                    cur.execute("""
+                        UPDATE readers SET name_pinyin = %s, name_initials = %s, phone_reversed = %s,
+                            updated_at = updated_at
+                        WHERE library_card_no = %s
+                    """, (keys['name_pinyin'], keys['name_initials'], keys['phone_reversed'],
+                          row['library_card_no']))
+                    updated += cur.rowcount
+                conn.commit()
+        last_key = rows[-1]['library_card_no']
+
+
+def fill_missing(batch_size: int = 500) -> int:
+    """
+    只为缺少检索列的读者（示例数据、升级前已有或直接写入数据库的读者）计算检索列，返回更新的行数。
+    由 enhanced_database.init_db 调用；安装 pypinyin 后补全拼仍需执行 --backfill。
+    """
+    last_key, updated = '', 0
+    while True:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT library_card_no, name, phone FROM readers
+                    WHERE library_card_no > %s
+                      AND (name_initials IS NULL OR (phone_reversed IS NULL AND phone IS NOT NULL AND phone <> ''))
+                    ORDER BY library_card_no LIMIT %s
+                """, (last_key, batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    return updated
+                for row in rows:
+                    keys = search_keys.reader_keys(row['name'], row['phone'] or '')
+                    if keys['name_initials'] is None and keys['phone_reversed'] is None:
+                        continue  # 姓名中没有可转换的字、也没有电话，下次仍会选中，但不必写入
+                    cur.execute("""
+                        UPDATE readers SET name_pinyin = %s, name_initials = %s, phone_reversed = %s,
+                            updated_at = updated_at
+                        WHERE library_card_no = %s
+                    """, (keys['name_pinyin'], keys['name_initials'], keys['phone_reversed'],
+                          row['library_card_no']))
+                    updated += cur.rowcount
+                conn.commit()
+        last_key = rows[-1]['library_card_no']
+
+
+# ====================== 命令行 ======================
+
+def benchmark(samples: int) -> Dict[str, Dict[str, float]]:
+    """用已有读者构造各种方式的查询，统计每种方式的耗时（毫秒）"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT library_card_no, name, phone, name_initials FROM readers")
+            readers = cur.fetchall()
+    rng = random.Random(42)
+    queries: Dict[str, List[str]] = {}
+    for reader in rng.sample(readers, min(samples, len(readers))):
+        queries.setdefault('card', []).append(reader['library_card_no'][:-2] or reader['library_card_no'])
+        queries.setdefault('name', []).append(reader['name'][:1])
+        if reader['name_initials']:
+            queries.setdefault('initials', []).append(reader['name_initials'][:2])
+        if reader['phone'] and len(reader['phone']) >= config.READER_LOOKUP_MIN_PHONE_DIGITS:
+            queries.setdefault('phone', []).append(reader['phone'][-config.READER_LOOKUP_MIN_PHONE_DIGITS:])
+    result = {}
+    for kind, texts in queries.items():
+        timings = []
+        for text in texts:
+            start = time.perf_counter()
+            lookup(text)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        result[kind] = {'count': len(timings), 'median_ms': statistics.median(timings),
+                        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))]}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="读者快速查找：查询、补齐检索列、测量耗时")
+    parser.add_argument('text', nargs='?', help='借书证号前缀、姓名前缀、拼音首字母或电话尾号')
+    parser.add_argument('--backfill', action='store_true', help='重新计算并补齐全部读者的检索列')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='用 N 个已有读者构造查询并统计耗时')
+    args = parser.parse_args()
+
+    if args.backfill:
+        print(f"已更新 {backfill()} 位读者的检索列"
+              + ("" if search_keys.pinyin_available() else "（未安装 pypinyin，全拼列留空）"))
+    if args.text:
+        for reader in lookup(args.text):
+            print(f"[{reader['match']:<8}] {display_text(reader)}")
+    if args.benchmark:
+        for kind, stats in benchmark(args.benchmark).items():
+            print(f"{kind:<10}{stats['count']:>6} 次  中位数 {stats['median_ms']:>7.2f}ms  p95 {stats['p95_ms']:>7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查读写分离配置：显示副本的复制延迟和只读查询当前的路由；
+--verify 在主库写入一条标记（job_checkpoints 表），验证读己之写：
+写入后的固定窗口内只读查询读主库，标记同步到副本后、窗口结束时只读查询改读副本且能看到标记。
+
+本机用两个 MySQL 实例测试（主库 3306，副本 3307，副本已配置复制），在 enhanced_config.py 中设置
+REPLICA_HOST = '127.0.0.1'、REPLICA_PORT = 3307，然后：
+    python replica_check.py
+    python replica_check.py --verify
+在副本上执行 STOP REPLICA SQL_THREAD 后再运行，只读查询应回退到主库（原因 unavailable）。
+"""
+import argparse
+import sys
+import time
+import uuid
+
+import enhanced_config as config
+import enhanced_database as db
+import job_checkpoints
+
+MARKER_JOB = 'replica_check'
+
+
+def server_id(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT @@server_id AS server_id")
+        return cur.fetchone()['server_id']
+
+
+def read_route():
+    """返回 (只读查询实际使用的服务器 server_id, 路由原因)"""
+    _, reason = db._read_target()
+    with db.get_read_connection() as conn:
+        return server_id(conn), reason
+
+
+def replica_has_marker(token: str) -> bool:
+    pool = db._get_replica_pool()
+    conn, created_at = pool.acquire()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT position FROM job_checkpoints WHERE job_name = %s", (MARKER_JOB,))
+            row = cur.fetchone()
+        return row is not None and row['position'] == token
+    finally:
+        pool.release(conn, created_at)
+
+
+def show_status():
+    status = db.replica_status(force=True)
+    print(f"主库: {config.HOST}:{config.PORT}  副本: {config.REPLICA_HOST}:{config.REPLICA_PORT}")
+    if status['error']:
+        print(f"副本不可用: {status['error']}")
+    else:
+        print(f"复制延迟: {status['lag']:.0f} 秒（上限 {config.REPLICA_MAX_LAG_SECONDS} 秒）")
+    target, reason = read_route()
+    print(f"只读查询路由: server_id={target}（{reason}）")
+
+
+def verify(timeout: float) -> bool:
+    with db.get_connection() as conn:
+        primary_id = server_id(conn)
+    token = uuid.uuid4().hex
+    written_at = time.monotonic()
+    job_checkpoints.save(MARKER_JOB, token)
+    db.pin_primary()
+    try:
+        target, reason = read_route()
+        if target != primary_id:
+            print(f"失败：刚写入后只读查询没有读主库（server_id={target}）")
+            return False
+        print(f"写入后只读查询读主库（{reason}）")
+
+        while not replica_has_marker(token):
+            if time.monotonic() - written_at > timeout:
+                print(f"失败：{timeout} 秒内标记没有同步到副本")
+                return False
+            time.sleep(0.1)
+        print(f"标记已同步到副本，用时 {time.monotonic() - written_at:.2f} 秒")
+
+        window = config.REPLICA_MAX_LAG_SECONDS + config.REPLICA_LAG_CHECK_SECONDS
+        time.sleep(max(0.0, written_at + window - time.monotonic()) + 0.1)
+        target, reason = read_route()
+        if target == primary_id:
+            print(f"失败：固定窗口（{window} 秒）结束后只读查询仍读主库（{reason}）")
+            return False
+        print(f"固定窗口结束后只读查询读副本（server_id={target}）")
+        return True
+    finally:
+        job_checkpoints.clear(MARKER_JOB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查只读副本的复制延迟与只读查询路由")
+    parser.add_argument('--verify', action='store_true', help='写入标记，验证读己之写与回退')
+    parser.add_argument('--timeout', type=float, default=30, help='等待标记同步到副本的最长时间（秒）')
+    args = parser.parse_args()
+
+    if not db.replica_enabled():
+        print("未配置只读副本（enhanced_config.REPLICA_HOST），所有查询读主库")
+        sys.exit(1)
+    show_status()
+    if args.verify and not verify(args.timeout):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据保留期清理：分批删除久远的借阅记录，删除或匿名化已注销的读者。
+
+清理内容：
+- 借阅记录：归还超过 RETENTION_BORROWING_DAYS 天的记录，从 borrowings_archive 和 borrowings 中删除
+  （borrowing_archive_totals 中的借阅次数不扣减；直接从 borrowings 删除、未经归档的记录在同一事务中
+  先累加到汇总表，排行榜与历史总数保持不变）；
+- 读者：状态为“注销”且超过 RETENTION_CANCELLED_READER_DAYS 天未修改、没有未归还图书的读者。
+  RETENTION_READER_ACTION = 'anonymize' 时清除姓名、身份证号、联系方式等个人信息，保留借书证号
+  和借阅记录（统计不受影响）；= 'purge' 时先分批删除其借阅记录，再删除读者本身。
+
+直接执行一条大 DELETE 会通过 ON DELETE CASCADE 连带删除借阅记录、逐行触发 tr_before_reader_delete，
+长时间锁住表。这里改为：
+- 按主键做键集分页（key > 上一批的最后一个主键 ORDER BY key LIMIT n），候选行用不加锁的一致性读选出；
+- 每批一个短事务，删除读者前先分批删掉它的借阅记录，级联删除时已没有子行；
+- 事务使用较短的锁等待超时（RETENTION_LOCK_WAIT_SECONDS），遇到锁等待超时或死锁时回滚、
+  退避并把批大小减半重试，连续失败 RETENTION_MAX_RETRIES 次后停止，下次从断点继续；
+  成功后批大小逐步恢复；
+- 每批之间暂停 RETENTION_PAUSE_SECONDS 秒，进度保存在 job_checkpoints 表中。
+
+用法：
+    python retention_job.py --dry-run                 # 只统计待清理的行数
+    python retention_job.py                           # 按配置清理
+    python retention_job.py --phase readers --action purge --batch-size 50
+多个进程同时执行时，通过 MySQL 的 GET_LOCK 保证同一时间只有一个进程在清理。
+"""
+import argparse
+import threading
+import time
+from typing import Callable, Dict, List
+
+import pymysql
+
+import borrowing_archiver
+import enhanced_config as config
+import job_checkpoints
+import metrics
+import search_keys
+from enhanced_database import get_connection
+
+LOCK_NAME = 'lms_retention_job'
+ANONYMIZED_NAME = '已注销读者'
+
+# 锁等待超时、死锁：回滚后可以重试
+RETRYABLE_ERRORS = (1205, 1213)
+
+RETENTION_ROWS = metrics.counter(
+    "lms_retention_rows_total", "保留期清理处理的行数", ("phase", "action"))
+RETENTION_RETRIES = metrics.counter(
+    "lms_retention_retries_total", "保留期清理因锁等待超时或死锁重试的次数", ("phase",))
+
+
+class LockContention(Exception):
+    """连续多次锁等待超时，本次清理停止，下次从断点继续"""
+
+
+def _run_in_transaction(work: Callable, *args):
+    """使用较短的锁等待超时执行一个事务，返回 work(cur, *args) 的结果"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET SESSION innodb_lock_wait_timeout = %s", (config.RETENTION_LOCK_WAIT_SECONDS,))
+            try:
+                result = work(cur, *args)
+                conn.commit()
+                return result
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.execute("SET SESSION innodb_lock_wait_timeout = DEFAULT")
+
+
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, pymysql.err.MySQLError) and bool(error.args) and error.args[0] in RETRYABLE_ERRORS
+
+
+class Phase:
+    """一类清理：按主键分批选出候选行，每批在一个短事务中处理"""
+
+    def __init__(self, name: str, table: str, key: str, where_sql: str, params: Callable[[], List],
+                 initial_lower):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.where_sql = where_sql          # 候选行条件（表别名 r），参数为 params()
+        self.params = params
+        self.initial_lower = initial_lower  # 小于所有主键的初始下界
+
+    @property
+    def job_name(self) -> str:
+        return f"retention:{self.name}"
+
+    def next_batch(self, lower, batch_size: int) -> List:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT r.{self.key} AS row_key FROM {self.table} r
+                    WHERE {self.where_sql} AND r.{self.key} > %s
+                    ORDER BY r.{self.key} LIMIT %s
+                """, self.params() + [lower, batch_size])
+                keys = [row['row_key'] for row in cur.fetchall()]
+            conn.rollback()  # 结束一致性读快照
+        return keys
+
+    def count(self) -> int:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT COUNT(*) AS n FROM {self.table} r WHERE {self.where_sql}", self.params())
+                return cur.fetchone()['n']
+
+    def process(self, cur, keys: List, action: str) -> int:
+        raise NotImplementedError
+
+
+class BorrowingPhase(Phase):
+    def __init__(self, table: str):
+        super().__init__(
+            name=table, table=table, key='borrowing_id',
+            where_sql="r.return_date IS NOT NULL AND r.return_date < CURDATE() - INTERVAL %s DAY",
+            params=lambda: [config.RETENTION_BORROWING_DAYS], initial_lower=0)
+
+    def process(self, cur, keys: List, action: str) -> int:
+        placeholders = ", ".join(["%s"] * len(keys))
+        # 再次带上条件并锁定，候选选出后被修改过的行不删除
+        cur.execute(f"""
+            SELECT borrowing_id FROM {self.table}
+            WHERE borrowing_id IN ({placeholders})
+              AND return_date IS NOT NULL AND return_date < CURDATE() - INTERVAL %s DAY
+            ORDER BY borrowing_id FOR UPDATE
+        """, keys + [config.RETENTION_BORROWING_DAYS])
+        ids = [row['borrowing_id'] for row in cur.fetchall()]
+        if not ids:
+            return 0
+        if self.table == 'borrowings':
+            # 归档表中的记录已计入汇总表；直接删除未归档的记录前先计入，排行榜不变
+            borrowing_archiver.add_to_totals(cur, ids)
+        cur.execute(f"DELETE FROM {self.table} WHERE borrowing_id IN ({', '.join(['%s'] * len(ids))})", ids)
+        return cur.rowcount
+
+
+class ReaderPhase(Phase):
+    ELIGIBLE = """
+        r.status = '注销' AND r.updated_at < NOW() - INTERVAL %s DAY
+        AND NOT EXISTS (SELECT 1 FROM borrowings br
+                        WHERE br.library_card_no = r.library_card_no AND br.return_date IS NULL)
+    """
+
+    def __init__(self):
+        super().__init__(
+            name='readers', table='readers', key='library_card_no',
+            where_sql=self.ELIGIBLE + " AND (%s = 'purge' OR r.name <> %s)",
+            params=lambda: [config.RETENTION_CANCELLED_READER_DAYS, config.RETENTION_READER_ACTION,
+                            ANONYMIZED_NAME], initial_lower='')
+
+    def process(self, cur, keys: List, action: str) -> int:
+        placeholders = ", ".join(["%s"] * len(keys))
+        # 先锁定仍符合条件的读者（按主键顺序加锁），借还书同时进行时以加锁后的状态为准
+        cur.execute(f"""
+            SELECT library_card_no FROM readers r
+            WHERE r.library_card_no IN ({placeholders}) AND {self.ELIGIBLE}
+            ORDER BY r.library_card_no FOR UPDATE
+        """, keys + [config.RETENTION_CANCELLED_READER_DAYS])
+        locked = [row['library_card_no'] for row in cur.fetchall()]
+        if not locked:
+            return 0
+        placeholders = ", ".join(["%s"] * len(locked))
+        if action == 'anonymize':
+            keys = search_keys.reader_keys(ANONYMIZED_NAME)
+            cur.execute(f"""
+                UPDATE readers
+                SET name = %s, id_card = NULL, birth_date = NULL, title = NULL, department = NULL,
+                    address = NULL, phone = NULL, password_hash = NULL,
+                    name_pinyin = %s, name_initials = %s, phone_reversed = NULL
+                WHERE library_card_no IN ({placeholders})
+            """, [ANONYMIZED_NAME, keys['name_pinyin'], keys['name_initials']] + locked)
+            return cur.rowcount
+        # 借阅记录已由 _delete_reader_borrowings 分批删完，这里的级联删除只剩零星新归还的行
+        cur.execute(f"DELETE FROM borrowings_archive WHERE library_card_no IN ({placeholders})", locked)
+        cur.execute(f"DELETE FROM borrowing_archive_totals WHERE kind = 'reader' AND row_key IN ({placeholders})",
+                    locked)
+        cur.execute(f"DELETE FROM readers WHERE library_card_no IN ({placeholders})", locked)
+        return cur.rowcount
+
+
+BORROWINGS_ARCHIVE_PHASE = BorrowingPhase('borrowings_archive')
+BORROWINGS_PHASE = BorrowingPhase('borrowings')
+READERS_PHASE = ReaderPhase()
+PHASES = {phase.name: phase for phase in (BORROWINGS_ARCHIVE_PHASE, BORROWINGS_PHASE, READERS_PHASE)}
+
+
+def _delete_reader_borrowings(library_card_no: str, batch_size: int):
+    """删除读者前分批删除其已归还的借阅记录，每批一个短事务"""
+    for table in ('borrowings', 'borrowings_archive'):
+        while True:
+            deleted = _with_retries(READERS_PHASE.name, lambda cur: _delete_limited(cur, table, library_card_no,
+                                                                                   batch_size))
+            RETENTION_ROWS.inc(table, 'purge', amount=deleted)
+            if deleted < batch_size:
+                break
+            time.sleep(config.RETENTION_PAUSE_SECONDS)
+
+
+def _delete_limited(cur, table: str, library_card_no: str, batch_size: int) -> int:
+    cur.execute(f"""
+        SELECT borrowing_id FROM {table} WHERE library_card_no = %s AND return_date IS NOT NULL
+        ORDER BY borrowing_id LIMIT %s FOR UPDATE
+    """, (library_card_no, batch_size))
+    ids = [row['borrowing_id'] for row in cur.fetchall()]
+    if not ids:
+        return 0
+    if table == 'borrowings':
+        # 读者的汇总随读者一起删除，图书的借阅次数保留
+        borrowing_archiver.add_to_totals(cur, ids, kinds=('book',))
+    cur.execute(f"DELETE FROM {table} WHERE borrowing_id IN ({', '.join(['%s'] * len(ids))})", ids)
+    return cur.rowcount
+
+
+def _with_retries(phase_name: str, work: Callable[..., int], on_retry: Callable[[], None] = None) -> int:
+    """锁等待超时或死锁时退避重试，连续失败 RETENTION_MAX_RETRIES 次后抛出 LockContention"""
+    delay = config.RETENTION_PAUSE_SECONDS or 0.1
+    for attempt in range(config.RETENTION_MAX_RETRIES + 1):
+        try:
+            return _run_in_transaction(work)
+        except pymysql.Error as e:
+            if not _is_retryable(e) or attempt == config.RETENTION_MAX_RETRIES:
+                if _is_retryable(e):
+                    raise LockContention(f"{phase_name}: 连续 {attempt + 1} 次锁等待超时") from e
+                raise
+            RETENTION_RETRIES.inc(phase_name)
+            if on_retry is not None:
+                on_retry()
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+    return 0
+
+
+def run_phase(phase: Phase, action: str = None, batch_size: int = None, resume: bool = True,
+              max_batches: int = None) -> Dict:
+    """
+    分批处理一类清理，返回 {'processed', 'batches', 'completed', 'stopped'}。
+    锁竞争严重时提前停止（stopped 为原因），断点保留，下次继续。
+    """
+    action = action or config.RETENTION_READER_ACTION
+    if action not in ('anonymize', 'purge'):
+        raise ValueError("RETENTION_READER_ACTION 只能是 'anonymize' 或 'purge'")
+    configured_size = batch_size or config.RETENTION_BATCH_SIZE
+    size = configured_size
+    position, stats = job_checkpoints.load(phase.job_name) if resume else (None, {})
+    if position is None:
+        lower = phase.initial_lower
+    else:
+        lower = type(phase.initial_lower)(position)
+    processed = int(stats.get('processed', 0))
+    batches = 0
+    phase_action = action if phase is READERS_PHASE else 'purge'
+    while max_batches is None or batches < max_batches:
+        keys = phase.next_batch(lower, size)
+        if not keys:
+            job_checkpoints.clear(phase.job_name)
+            return {'processed': processed, 'batches': batches, 'completed': True, 'stopped': None}
+
+        def shrink():
+            nonlocal size, keys
+            size = max(1, size // 2)
+            keys = keys[:size]
+
+        try:
+            if phase is READERS_PHASE and phase_action == 'purge':
+                for key in keys:
+                    _delete_reader_borrowings(key, size)
+            done = _with_retries(phase.name, lambda cur: phase.process(cur, keys, phase_action), shrink)
+        except LockContention as e:
+            print(f"保留期清理暂停: {e}")
+            return {'processed': processed, 'batches': batches, 'completed': False, 'stopped': str(e)}
+        processed += done
+        RETENTION_ROWS.inc(phase.name, phase_action, amount=done)
+        lower = keys[-1]
+        batches += 1
+        job_checkpoints.save(phase.job_name, str(lower), {'processed': processed})
+        # 顺利完成后逐步恢复批大小
+        size = min(configured_size, size * 2)
+        time.sleep(config.RETENTION_PAUSE_SECONDS)
+    return {'processed': processed, 'batches': batches, 'completed': False, 'stopped': None}
+
+
+def run_all(**kwargs) -> Dict[str, Dict]:
+    """先清理借阅记录，再处理读者（删除读者时需要处理的借阅记录更少）"""
+    results = {}
+    for name, phase in PHASES.items():
+        results[name] = run_phase(phase, **kwargs)
+        if results[name]['stopped']:
+            break
+    return results
+
+
+def run_if_leader() -> bool:
+    """取得数据库命名锁后执行一次清理；其他进程正在执行时直接返回 False"""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, 0) AS acquired", (LOCK_NAME,))
+            if not cur.fetchone()['acquired']:
+                return False
+            try:
+                for name, result in run_all().items():
+                    if result['processed']:
+                        print(f"保留期清理 {name}：处理 {result['processed']} 行")
+                return True
+            finally:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+_thread = None
+
+
+def start_background(interval_seconds: float = None):
+    """启动后台清理线程（每个进程最多一个，可重复调用）；RETENTION_ENABLED 为 False 时不启动"""
+    global _thread
+    if _thread is not None or not config.RETENTION_ENABLED:
+        return
+    interval = interval_seconds or config.RETENTION_INTERVAL_SECONDS
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                run_if_leader()
+            except Exception as e:
+                print(f"保留期清理失败: {e}")
+
+    _thread = threading.Thread(target=run, name="lms-retention-job", daemon=True)
+    _thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分批清理久远的借阅记录，删除或匿名化已注销的读者")
+    parser.add_argument('--phase', choices=list(PHASES) + ['all'], default='all', help="要执行的清理")
+    parser.add_argument('--action', choices=['anonymize', 'purge'], default=None,
+                        help="已注销读者的处理方式（默认取配置）")
+    parser.add_argument('--batch-size', type=int, default=None, help="每批处理的行数")
+    parser.add_argument('--max-batches', type=int, default=None, help="本次最多执行的批数，未完成时保留断点")
+    parser.add_argument('--restart', action='store_true', help="忽略上次的断点，从头扫描")
+    parser.add_argument('--dry-run', action='store_true', help="只统计待清理的行数")
+    args = parser.parse_args()
+
+    names = list(PHASES) if args.phase == 'all' else [args.phase]
+    if args.action:
+        config.RETENTION_READER_ACTION = args.action
+    for name in names:
+        if args.dry_run:
+            print(f"[{name}] 待处理 {PHASES[name].count()} 行")
+            continue
+        result = run_phase(PHASES[name], batch_size=args.batch_size, resume=not args.restart,
+                           max_batches=args.max_batches)
+        status = "已完成" if result['completed'] else "未完成（下次从断点继续）"
+        print(f"[{name}] {status}：本次 {result['batches']} 批，累计处理 {result['processed']} 行")
+        if result['stopped']:
+            break
+
+
+if __name__ == '__main__':
+    main()
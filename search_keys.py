@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+检索键：把姓名、电话、书名等字段预先转换成可以用索引做前缀匹配的形式，写入检索列或检索键表。
+
+- 拼音首字母：“张三” -> "zs"；
+- 全拼：“张三” -> "zhangsan"，需要安装 pypinyin，未安装时为 NULL；
+- 反转电话：按尾号查询 “5678” 变成对 "8765" 的前缀查询；
+- 规范化文本：全角转半角、繁体转简体、小写、去掉标点和空格，“數據結構（第2版）” -> "数据结构第2版"。
+
+首字母优先使用 pypinyin；未安装时按 GB2312 一级汉字的拼音排序区间推算（覆盖常用的 3755 个汉字），
+推算不出的字（二级汉字、未转换的繁体字）不写入首字母键。姓名中姓氏的多音字（单、翟、仇……）按姓氏读音处理。
+繁简转换优先使用 opencc，未安装时只转换 TRADITIONAL_TO_SIMPLIFIED 中的约五百个常用字。
+正式部署应安装 pypinyin 与 opencc：未安装时没有全拼键，生僻字和表外繁体字查不到，只能算尽力而为。
+读者的检索列由 enhanced_library 在写入读者时维护，旧数据用 reader_lookup.py --backfill 补齐；
+图书的检索键见 book_search.py。
+"""
+import bisect
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pypinyin
+except ImportError:  # 可选依赖
+    pypinyin = None
+
+try:
+    import opencc
+    _t2s = opencc.OpenCC('t2s')
+except Exception:  # 可选依赖（未安装或缺少配置文件）
+    _t2s = None
+
+NAME_PINYIN_MAX_LENGTH = 255
+NAME_INITIALS_MAX_LENGTH = 100
+
+# GB2312 一级汉字按拼音排序，每个声母区间的第一个编码
+_GB2312_INITIALS = [
+    ('a', 0xB0A1), ('b', 0xB0C5), ('c', 0xB2C1), ('d', 0xB4EE), ('e', 0xB6EA), ('f', 0xB7A2),
+    ('g', 0xB8C1), ('h', 0xB9FE), ('j', 0xBBF7), ('k', 0xBFA6), ('l', 0xC0AC), ('m', 0xC2E8),
+    ('n', 0xC4C3), ('o', 0xC5B6), ('p', 0xC5BE), ('q', 0xC6DA), ('r', 0xC8BB), ('s', 0xC8F6),
+    ('t', 0xCBFA), ('w', 0xCDDA), ('x', 0xCEF4), ('y', 0xD1B9), ('z', 0xD4D1),
+]
+_GB2312_CODES = [code for _, code in _GB2312_INITIALS]
+_GB2312_LEVEL1_END = 0xD7F9
+
+# 姓氏读音与常用读音不同的多音字，以及不在 GB2312 一级汉字中的常见姓氏
+SURNAME_PINYIN = {
+    '单': 'shan', '翟': 'zhai', '仇': 'qiu', '解': 'xie', '查': 'zha', '区': 'ou', '朴': 'piao',
+    '尉': 'yu', '乐': 'yue', '盖': 'ge', '缪': 'miao', '曾': 'zeng', '覃': 'qin', '闫': 'yan',
+    '邬': 'wu', '邝': 'kuang', '蔺': 'lin', '邸': 'di', '郦': 'li', '芮': 'rui', '佟': 'tong',
+    '褚': 'chu', '鄢': 'yan',
+}
+
+# 未安装 opencc 时使用的常用繁体字（每两个字符为一组：繁体、简体）；只收录在简体中不单独使用的繁体字
+TRADITIONAL_TO_SIMPLIFIED = dict(zip(*[iter(
+    "書书學学國国語语計计機机電电腦脑網网絡络數数據据歷历經经濟济論论設设統统與与實实踐践們们這这個个"
+    "來来時时會会對对說说開开關关發发現现業业點点體体進进過过還还動动問问題题應应當当長长門门華华東东"
+    "車车馬马鳥鸟魚鱼風风飛飞雲云氣气夢梦愛爱戀恋聖圣傳传記记詩诗詞词譯译讀读寫写畫画藝艺術术樂乐劇剧"
+    "員员師师醫医藥药軟软編编碼码庫库資资訊讯號号級级類类識识變变權权戰战爭争軍军農农產产價价貨货銀银"
+    "錢钱買买賣卖廣广場场環环態态觀观視视聽听頭头見见親亲邊边遠远樹树葉叶萬万億亿島岛灣湾陽阳陰阴龍龙"
+    "鳳凤紅红綠绿藍蓝黃黄線线結结構构層层雜杂誌志報报紙纸導导領领區区縣县鄉乡鎮镇讓让給给從从後后裡里"
+    "話话認认證证試试驗验課课講讲練练習习響响聲声圖图館馆檔档齊齐壓压劉刘張张陳陈楊杨趙赵吳吴孫孙鄭郑"
+    "謝谢韓韩馮冯鄧邓蕭萧蘇苏盧卢魯鲁顧顾龔龚嚴严鐘钟羅罗許许鄒邹範范陸陆賈贾韋韦賀贺紀纪義义禮礼讚赞"
+    "貓猫豬猪雞鸡麗丽歲岁壽寿燈灯熱热溫温濕湿漢汉廳厅為为無无幾几樣样將将盡尽擇择選选擴扩處处辦办務务"
+    "質质準准確确專专總总帶带優优異异並并傑杰衛卫鐵铁鋼钢錄录韻韵彈弹觸触簡简單单複复雙双舊旧歡欢聯联"
+    "齡龄邏逻輯辑頁页顯显標标樓楼遊游戲戏俠侠鬥斗劍剑滄沧淚泪憶忆憂忧聞闻獨独亞亚歐欧蘭兰狀状獄狱豐丰"
+    "貴贵賓宾賞赏贏赢敗败財财貿贸費费賬账購购負负貧贫責责間间閱阅闊阔閃闪閉闭陣阵際际險险隨随隱隐難难"
+    "雖虽離离靈灵順顺須须預预頻频顏颜願愿飯饭飲饮餘余驚惊鬧闹鮮鲜鳴鸣麥麦黨党齒齿龜龟兒儿內内兩两劃划"
+    "劑剂勞劳勝胜勢势協协厲厉參参叢丛圍围園园圓圆團团壞坏壯壮奪夺奮奋婦妇媽妈寧宁寶宝尋寻屬属帥帅幣币"
+    "帳帐幫帮廠厂廢废彎弯徑径復复惡恶慣惯慶庆懷怀戶户撲扑擊击擔担擁拥攝摄敵敌斷断昇升晉晋曉晓曆历"
+    "條条極极槍枪橋桥檢检殘残殺杀決决沒没溝沟滅灭漁渔潔洁濃浓災灾烏乌煙烟煩烦燒烧營营爺爷牆墙獎奖獲获"
+    "療疗盜盗監监盤盘眾众礎础禪禅稅税種种穩稳窮穷競竞筆笔節节築筑籃篮糧粮約约純纯紛纷細细終终組组絕绝"
+    "絲丝綜综維维緒绪緣缘績绩織织繼继續续罰罚職职臉脸興兴舉举艱艰莊庄蓋盖蘋苹蟲虫裝装補补製制規规覺觉"
+    "覽览訂订討讨訓训診诊該该誤误誰谁調调談谈請请諸诸謀谋議议護护豈岂貝贝賽赛趕赶跡迹躍跃軌轨輕轻載载"
+    "輪轮輸输轉转辭辞運运達达遲迟遙遥適适遷迁遺遗郵邮釋释針针鈴铃銷销鋒锋錯错鍵键鏡镜閒闲隊队靜静項项"
+    "頓顿養养駕驾騎骑髮发鬆松嶺岭滬沪閩闽粵粤遼辽紐纽偉伟儀仪僅仅債债傷伤備备偵侦側侧倫伦勵励湯汤閻阎"
+    "譚谭鍾钟鄔邬龐庞嶽岳賴赖鄺邝聶聂蔣蒋駱骆"
+)] * 2))
+
+_CJK = re.compile(r'[㐀-鿿]')
+_KEEP = re.compile(r'[0-9a-z]')
+_SEPARATORS = re.compile(r'[^0-9a-z㐀-鿿]+')
+
+
+def pinyin_available() -> bool:
+    return pypinyin is not None
+
+
+def has_cjk(text: str) -> bool:
+    return bool(text and _CJK.search(text))
+
+
+def _gb2312_initial(char: str) -> Optional[str]:
+    try:
+        encoded = char.encode('gb2312')
+    except UnicodeEncodeError:
+        return None
+    if len(encoded) != 2:
+        return None
+    code = encoded[0] << 8 | encoded[1]
+    if code < _GB2312_CODES[0] or code > _GB2312_LEVEL1_END:
+        return None
+    return _GB2312_INITIALS[bisect.bisect_right(_GB2312_CODES, code) - 1][0]
+
+
+def _syllables(text: str, surname: bool = False):
+    """逐字给出拼音（未安装 pypinyin 时汉字为 None），非汉字原样给出；surname 表示首字是姓氏"""
+    if pypinyin is not None:
+        # 书名按词组取读音（“银行”的“行”读 hang），无拼音的字符逐个原样返回，与输入逐字对应
+        syllables = [s[0] for s in pypinyin.pinyin(text, style=pypinyin.Style.NORMAL, errors=lambda chars: list(chars))]
+    else:
+        syllables = [None if _CJK.match(char) else char for char in text]
+    if surname and text and text[0] in SURNAME_PINYIN:
+        syllables[0] = SURNAME_PINYIN[text[0]]
+    return syllables
+
+
+def initials(text: Optional[str], surname: bool = False, max_length: int = NAME_INITIALS_MAX_LENGTH) -> Optional[str]:
+    """拼音首字母（小写），非汉字保留字母和数字；取不到拼音的汉字跳过"""
+    if text is None:
+        return None
+    text = to_simplified(text.strip().lower())
+    result = []
+    for char, syllable in zip(text, _syllables(text, surname)):
+        if _CJK.match(char):
+            initial = syllable[0] if syllable and syllable != char else _gb2312_initial(char)
+            if initial:
+                result.append(initial)
+        elif _KEEP.match(char):
+            result.append(char)
+    return ''.join(result)[:max_length]
+
+
+def full_pinyin(text: Optional[str], surname: bool = False, max_length: int = NAME_PINYIN_MAX_LENGTH) -> Optional[str]:
+    """全拼（小写、无空格）；未安装 pypinyin 时返回 None"""
+    if text is None or pypinyin is None:
+        return None
+    text = to_simplified(text.strip().lower())
+    return ''.join(s for s in _syllables(text, surname) if s and _KEEP.match(s[0]))[:max_length]
+
+
+def reversed_digits(phone: Optional[str]) -> Optional[str]:
+    """电话号码中的数字倒序排列，尾号查询即为前缀查询"""
+    if not phone:
+        return None
+    digits = re.sub(r'\D', '', phone)
+    return digits[::-1] or None
+
+
+def reader_keys(name: Optional[str] = None, phone: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """读者的检索列（列名 -> 值），name/phone 为 None 时不包含对应的列"""
+    keys = {}
+    if name is not None:
+        keys['name_pinyin'] = full_pinyin(name, surname=True)
+        keys['name_initials'] = initials(name, surname=True) or None
+    if phone is not None:
+        keys['phone_reversed'] = reversed_digits(phone)
+    return keys
+
+
+def to_simplified(text: str) -> str:
+    if _t2s is not None:
+        return _t2s.convert(text)
+    return ''.join(TRADITIONAL_TO_SIMPLIFIED.get(char, char) for char in text)
+
+
+def fold(text: Optional[str]) -> str:
+    """全角转半角、繁体转简体、小写，保留标点和空格"""
+    if not text:
+        return ''
+    return to_simplified(unicodedata.normalize('NFKC', text)).lower()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """规范化文本：fold() 之后只保留汉字、字母和数字"""
+    return _SEPARATORS.sub('', fold(text))
+
+
+def text_keys(text: Optional[str], max_length: int) -> List[Tuple[str, str]]:
+    """
+    书名、作者的检索键 [(类型, 键)]，类型为 text/pinyin/initials。
+    从字段开头以及每个标点、空格之后开始各生成一组键，“数据结构：C 语言版” 也能按 “c语言” 查到。
+    """
+    segments = [segment for segment in _SEPARATORS.split(fold(text)) if segment]
+    keys = []
+    for i in range(len(segments)):
+        part = ''.join(segments[i:])
+        keys.append(('text', part[:max_length]))
+        if has_cjk(part):
+            pinyin = full_pinyin(part, max_length=max_length)
+            if pinyin:
+                keys.append(('pinyin', pinyin))
+            initial_key = initials(part, max_length=max_length)
+            if initial_key:
+                keys.append(('initials', initial_key))
+    return list(dict.fromkeys(keys))
+
+
+def like_prefix(text: str) -> str:
+    """前缀匹配的 LIKE 模式，与 ESCAPE '!' 一起使用"""
+    return re.sub(r'([!%_])', r'!\1', text) + '%'
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+web_app 的服务端会话存储。
+
+Cookie 中只保存一个随机的不透明会话 ID，会话内容保存在服务端：
+- 默认保存在进程内 LRU（单进程部署：waitress、开发服务器）；
+- 配置 SESSION_REDIS_URL 后保存在 Redis 兼容的存储中（gunicorn 多进程部署必须使用），
+  进程内 LRU 作为短时本地缓存（SESSION_LOCAL_CACHE_SECONDS）。
+
+读者被冻结/注销或管理员被停用后，其会话在下一次请求时失效：后台线程每隔
+SESSION_REVOCATION_POLL_SECONDS 秒按 updated_at 增量拉取状态变化，请求路径上只查内存集合，
+不访问数据库。
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from flask.sessions import SessionInterface, SessionMixin  # type: ignore
+from werkzeug.datastructures import CallbackDict  # type: ignore
+
+import enhanced_config as config
+import metrics
+from enhanced_database import get_connection
+
+SESSIONS_REVOKED = metrics.counter("lms_sessions_revoked_total", "因账号被冻结或停用而失效的会话数")
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid: Optional[str] = None
+
+    def rotate(self):
+        """更换会话 ID（登录成功后调用，防止会话固定攻击），旧 ID 在保存时删除"""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(24)
+
+# ====================== 存储后端 ======================
+
+
+class MemorySessionBackend:
+    """进程内 LRU：超过 max_entries 时淘汰最久未访问的会话，超过 ttl 秒未访问的会话过期"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # sid -> (过期时间, 会话数据)
+
+    def get(self, sid: str) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return dict(entry[1])
+
+    def set(self, sid: str, data: dict, ttl_seconds: float = None):
+        expires_at = time.monotonic() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._data[sid] = (expires_at, dict(data))
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def touch(self, sid: str):
+        """延长会话有效期（每次请求都会调用，只更新内存，开销很小）"""
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is not None:
+                self._data[sid] = (time.monotonic() + self.ttl_seconds, entry[1])
+                self._data.move_to_end(sid)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisSessionBackend:
+    """Redis 兼容存储（Redis、KeyDB、Valkey 等），会话以 JSON 保存，由存储端负责过期"""
+
+    def __init__(self, url: str, ttl_seconds: float, local_cache_seconds: float, key_prefix: str = 'lms:session:'):
+        import redis  # type: ignore  # 仅在启用 Redis 时需要
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = int(ttl_seconds)
+        self.key_prefix = key_prefix
+        # 本地缓存的时间很短：其他进程删除会话（如退出登录）后，最多延迟这么久生效
+        self.local = MemorySessionBackend(config.SESSION_MEMORY_MAX_ENTRIES, local_cache_seconds) \
+            if local_cache_seconds > 0 else None
+
+    def get(self, sid: str) -> Optional[dict]:
+        if self.local is not None:
+            data = self.local.get(sid)
+            if data is not None:
+                return data
+        raw = self.client.get(self.key_prefix + sid)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        if self.local is not None:
+            self.local.set(sid, data)
+        return data
+
+    def set(self, sid: str, data: dict):
+        self.client.set(self.key_prefix + sid, json.dumps(data, ensure_ascii=False), ex=self.ttl_seconds)
+        if self.local is not None:
+            self.local.set(sid, data)
+
+    def touch(self, sid: str):
+        # 本地缓存命中期间不重复续期，减少对 Redis 的写入
+        if self.local is not None and self.local.get(sid) is not None:
+            return
+        self.client.expire(self.key_prefix + sid, self.ttl_seconds)
+
+    def delete(self, sid: str):
+        self.client.delete(self.key_prefix + sid)
+        if self.local is not None:
+            self.local.delete(sid)
+
+
+def create_backend():
+    if config.SESSION_REDIS_URL:
+        return RedisSessionBackend(config.SESSION_REDIS_URL, config.SESSION_TTL_SECONDS,
+                                   config.SESSION_LOCAL_CACHE_SECONDS)
+    return MemorySessionBackend(config.SESSION_MEMORY_MAX_ENTRIES, config.SESSION_TTL_SECONDS)
+
+# ====================== 会话吊销 ======================
+
+
+class RevocationWatcher:
+    """
+    后台线程：按 updated_at 增量拉取读者状态与管理员启用状态的变化，
+    维护“不允许保持登录”的账号集合。
+    """
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.pid = os.getpid()
+        self.revoked_readers = frozenset()
+        self.revoked_admins = frozenset()
+        self._reader_watermark = None
+        self._admin_watermark = None
+        self._loaded = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lms-session-revocation", daemon=True)
+        self._thread.start()
+
+    def is_revoked(self, user: dict) -> bool:
+        if user.get('role') == 'reader':
+            return user.get('library_card_no') in self.revoked_readers
+        if user.get('role') == 'admin':
+            return user.get('user_id') in self.revoked_admins
+        return False
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                self._loaded.set()
+            except Exception as e:
+                print(f"刷新会话吊销列表失败: {e}")
+            time.sleep(self.poll_seconds)
+
+    def refresh(self):
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                self.revoked_readers, self._reader_watermark = self._apply_changes(
+                    cur, self.revoked_readers, self._reader_watermark,
+                    "SELECT library_card_no AS account, status <> '正常' AS revoked, updated_at FROM readers",
+                    "status <> '正常'")
+                self.revoked_admins, self._admin_watermark = self._apply_changes(
+                    cur, self.revoked_admins, self._admin_watermark,
+                    "SELECT user_id AS account, is_active = FALSE AS revoked, updated_at FROM users",
+                    "is_active = FALSE")
+
+    @staticmethod
+    def _apply_changes(cur, revoked: frozenset, watermark, base_sql: str, initial_filter: str):
+        if watermark is None:
+            # 首次加载只取当前处于停用状态的账号
+            cur.execute(f"{base_sql} WHERE {initial_filter}")
+            rows = cur.fetchall()
+            cur.execute(f"SELECT MAX(updated_at) AS watermark FROM ({base_sql}) t")
+            watermark = cur.fetchone()['watermark']
+            return frozenset(row['account'] for row in rows), watermark
+        # updated_at 精度为秒，用 >= 重新读取同一秒内的变更，重复读取是幂等的
+        cur.execute(f"{base_sql} WHERE updated_at >= %s", (watermark,))
+        changed = set(revoked)
+        for row in cur.fetchall():
+            if row['revoked']:
+                changed.add(row['account'])
+            else:
+                changed.discard(row['account'])
+            if row['updated_at'] and row['updated_at'] > watermark:
+                watermark = row['updated_at']
+        return frozenset(changed), watermark
+
+
+_watcher: Optional[RevocationWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_revocation_watcher() -> RevocationWatcher:
+    """每个进程一个后台线程（线程不能跨 fork 继承，fork 后按需重新创建）"""
+    global _watcher
+    watcher = _watcher
+    if watcher is not None and watcher.pid == os.getpid():
+        return watcher
+    with _watcher_lock:
+        if _watcher is None or _watcher.pid != os.getpid():
+            _watcher = RevocationWatcher(config.SESSION_REVOCATION_POLL_SECONDS)
+        return _watcher
+
+# ====================== Flask 集成 ======================
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """用法：app.session_interface = ServerSideSessionInterface()"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSideSession(sid=new_session_id(), new=True)
+        data = self.backend.get(sid)
+        if data is None:
+            return ServerSideSession(sid=new_session_id(), new=True)
+        user = data.get('user')
+        if user and get_revocation_watcher().is_revoked(user):
+            SESSIONS_REVOKED.inc()
+            self.backend.delete(sid)
+            session = ServerSideSession(sid=new_session_id(), new=True)
+            session.previous_sid = sid
+            session.modified = True  # 触发保存逻辑以清除浏览器中的旧 Cookie
+            return session
+        return ServerSideSession(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid:
+            self.backend.delete(session.previous_sid)
+        if not session:
+            if session.modified and not session.new or session.previous_sid:
+                self.backend.delete(session.sid)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+        if session.modified:
+            self.backend.set(session.sid, dict(session))
+        else:
+            self.backend.touch(session.sid)
+            if not self.should_set_cookie(app, session):
+                return
+        response.set_cookie(
+            cookie_name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
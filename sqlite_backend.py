@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 存储后端：单机前台和测试环境不需要 MySQL 服务器。
+
+DB_BACKEND = 'sqlite' 时 enhanced_database 通过 connect() 建立连接，连接池、get_connection()
+的用法不变。连接与游标模仿 pymysql 的 DictCursor 接口（%s 占位符、字典行、rowcount、
+lastrowid、callproc），执行前把本项目用到的 MySQL 方言改写为 SQLite 语法：
+
+- CURDATE() / NOW() / DATEDIFF / DATE_FORMAT / DATE_ADD / DATE_SUB / CONCAT / GET_LOCK
+  注册为自定义函数；`x - INTERVAL n DAY` 改写为 DATE_SUB(x, n, 'DAY')；
+- ON DUPLICATE KEY UPDATE 改写为 ON CONFLICT DO UPDATE，INSERT IGNORE 改写为 INSERT OR IGNORE；
+- FOR UPDATE / LOCK IN SHARE MODE 去掉，改为在事务开始时取得写锁（BEGIN IMMEDIATE）；
+- SET SESSION 之类的会话设置忽略；存储过程由 PROCEDURES 中的等价查询实现。
+
+表结构见 sqlite_schema.sql。连接使用 WAL 日志（读写互不阻塞）、synchronous=NORMAL
+（WAL 下提交不再每次 fsync，断电时最多丢失最后几个事务，数据库不会损坏）、
+内存临时表、较大的页缓存与 mmap。SQLite 同一时间只有一个写事务，适合单台前台或测试，
+多台前台共用数据库仍应使用 MySQL。asgi_app 的 aiomysql 异步路径只支持 MySQL。
+"""
+import datetime
+import decimal
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import enhanced_config as config
+import metrics
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sqlite_schema.sql")
+
+# 旧版本数据库升级：表名 -> [(列名, 类型)]，sqlite_schema.sql 中的索引会用到这些列，要先补上
+UPGRADE_COLUMNS = {
+    'readers': [('name_pinyin', 'VARCHAR(255)'), ('name_initials', 'VARCHAR(100)'),
+                ('phone_reversed', 'VARCHAR(20)')],
+}
+
+# 存储过程（enhanced_schema.sql）的等价查询，参数顺序与 CALL 相同
+PROCEDURES = {
+    'GetUnreturnedReadersByBook': """
+        SELECT r.name, r.library_card_no, b.borrow_date, b.due_date
+        FROM borrowings b
+        JOIN readers r ON b.library_card_no = r.library_card_no
+        WHERE b.book_number = ?1 AND b.return_date IS NULL
+    """,
+    'GetReaderInfo': """
+        SELECT r.*,
+               GROUP_CONCAT(bc.title || ' (' || b.book_number || ')', ', ') AS unreturned_books
+        FROM readers r
+        LEFT JOIN borrowings br ON r.library_card_no = br.library_card_no AND br.return_date IS NULL
+        LEFT JOIN books b ON br.book_number = b.book_number
+        LEFT JOIN book_categories bc ON b.isbn = bc.isbn
+        WHERE (?1 IS NULL OR r.library_card_no = ?1)
+          AND (?2 IS NULL OR r.name LIKE '%' || ?2 || '%')
+          AND (?3 IS NULL OR r.department LIKE '%' || ?3 || '%')
+        GROUP BY r.library_card_no
+    """,
+    'GetBorrowingStats': """
+        SELECT bc.category, COUNT(*) AS borrow_count
+        FROM (
+            SELECT book_number FROM borrowings WHERE borrow_date BETWEEN ?1 AND ?2
+            UNION ALL
+            SELECT book_number FROM borrowings_archive WHERE borrow_date BETWEEN ?1 AND ?2
+        ) b
+        JOIN books bk ON b.book_number = bk.book_number
+        JOIN book_categories bc ON bk.isbn = bc.isbn
+        GROUP BY bc.category
+        ORDER BY borrow_count DESC
+    """,
+}
+
+# ====================== 方言改写 ======================
+
+_IGNORED = re.compile(r"^\s*SET\s", re.I)
+_ANALYZE = re.compile(r"^\s*ANALYZE\s+TABLE\b.*$", re.I | re.S)
+_LOCKING = re.compile(r"\s+(FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN\s+SHARE\s+MODE)\b", re.I)
+_CURRENT_DATE = re.compile(r"\bCURRENT_DATE\b(\s*\(\s*\))?", re.I)
+_CURRENT_TIMESTAMP = re.compile(r"\bCURRENT_TIMESTAMP\b(\s*\(\s*\))?", re.I)
+_INTERVAL_ARITH = re.compile(
+    r"(CURDATE\(\)|NOW\(\))\s*([-+])\s*INTERVAL\s+(%s|\d+)\s+(DAY|HOUR|MINUTE|SECOND)\b", re.I)
+_INTERVAL_ARG = re.compile(r",\s*INTERVAL\s+(%s|-?\d+)\s+(DAY|HOUR|MINUTE|SECOND)\s*\)", re.I)
+_UPSERT = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_FUNCTION = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+_INSERT_IGNORE = re.compile(r"^(\s*)INSERT\s+IGNORE\b", re.I)
+_SEPARATOR = re.compile(r"\s+SEPARATOR\s+('(?:[^']|'')*')\s*\)", re.I)
+_IF_FUNCTION = re.compile(r"\bIF\s*\(", re.I)
+_PLACEHOLDER = re.compile(r"%([s%])")
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(query: str, has_args: bool) -> Tuple[Optional[str], bool]:
+    """
+    把 MySQL 方言的语句改写为 SQLite 语法，返回 (语句, 是否需要写锁)。
+    语句为 None 表示在 SQLite 中没有对应操作（如 SET SESSION），直接跳过。
+    """
+    if _IGNORED.match(query):
+        return None, False
+    if _ANALYZE.match(query):
+        return "ANALYZE", False
+    sql, locks = _LOCKING.subn("", query)
+    sql = _CURRENT_DATE.sub("CURDATE()", sql)
+    sql = _CURRENT_TIMESTAMP.sub("NOW()", sql)
+    sql = _INTERVAL_ARITH.sub(
+        lambda m: f"{'DATE_SUB' if m.group(2) == '-' else 'DATE_ADD'}({m.group(1)}, {m.group(3)}, "
+                  f"'{m.group(4).upper()}')", sql)
+    sql = _INTERVAL_ARG.sub(lambda m: f", {m.group(1)}, '{m.group(2).upper()}')", sql)
+    sql = _SEPARATOR.sub(r", \1)", sql)
+    sql = _IF_FUNCTION.sub("iif(", sql)
+    sql = sql.replace("<=>", " IS ")
+    sql = _INSERT_IGNORE.sub(r"\1INSERT OR IGNORE", sql)
+    parts = _UPSERT.split(sql, maxsplit=1)
+    if len(parts) == 2:
+        sql = parts[0] + "ON CONFLICT DO UPDATE SET" + _VALUES_FUNCTION.sub(r"excluded.\1", parts[1])
+    if has_args:
+        # 与 pymysql 一致：有参数时 %s 为占位符，%% 表示字面量 %
+        sql = _PLACEHOLDER.sub(lambda m: "?" if m.group(1) == "s" else "%", sql)
+    return sql, bool(locks)
+
+# ====================== 自定义函数 ======================
+
+_INTERVAL_UNITS = {'DAY': 'days', 'HOUR': 'hours', 'MINUTE': 'minutes', 'SECOND': 'seconds'}
+_DATE_FORMAT_CODES = {'%i': '%M', '%s': '%S', '%M': '%B', '%h': '%I', '%k': '%H', '%e': '%d'}
+
+
+def _parse_datetime(value) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    text = str(value)
+    if len(text) == 10:
+        return datetime.datetime.fromisoformat(text)
+    return datetime.datetime.fromisoformat(text[:19])
+
+
+def _curdate() -> str:
+    return datetime.date.today().isoformat()
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _date_add(value, amount, unit, sign=1):
+    moment = _parse_datetime(value)
+    if moment is None or amount is None:
+        return None
+    moment += datetime.timedelta(**{_INTERVAL_UNITS[unit.upper()]: sign * float(amount)})
+    # 日期加减整天仍返回日期，与 MySQL 相同
+    if len(str(value)) == 10 and unit.upper() == 'DAY':
+        return moment.date().isoformat()
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _datediff(a, b) -> Optional[int]:
+    if a is None or b is None:
+        return None
+    return (_parse_datetime(a).date() - _parse_datetime(b).date()).days
+
+
+def _date_format(value, fmt) -> Optional[str]:
+    moment = _parse_datetime(value)
+    if moment is None or fmt is None:
+        return None
+    return moment.strftime(re.sub(r"%[a-zA-Z]", lambda m: _DATE_FORMAT_CODES.get(m.group(0), m.group(0)), fmt))
+
+
+def _concat(*args) -> Optional[str]:
+    if any(arg is None for arg in args):
+        return None
+    return ''.join(str(arg) for arg in args)
+
+
+class _NamedLocks:
+    """GET_LOCK / RELEASE_LOCK 的进程内实现（SQLite 数据库只在一台机器上使用）"""
+
+    def __init__(self):
+        self._owners: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def get(self, owner: int, name: str, timeout) -> int:
+        deadline = time.monotonic() + max(float(timeout or 0), 0)
+        with self._condition:
+            while self._owners.get(name, owner) != owner:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return 0
+                self._condition.wait(remaining)
+            self._owners[name] = owner
+            return 1
+
+    def release(self, owner: int, name: str) -> Optional[int]:
+        with self._condition:
+            if name not in self._owners:
+                return None
+            if self._owners[name] != owner:
+                return 0
+            del self._owners[name]
+            self._condition.notify_all()
+            return 1
+
+
+_named_locks = _NamedLocks()
+
+
+def _register_functions(raw: sqlite3.Connection):
+    owner = id(raw)
+    raw.create_function("CURDATE", 0, _curdate)
+    raw.create_function("NOW", 0, _now)
+    raw.create_function("DATE_ADD", 3, _date_add)
+    raw.create_function("DATE_SUB", 3, lambda value, amount, unit: _date_add(value, amount, unit, -1))
+    raw.create_function("DATEDIFF", 2, _datediff, deterministic=True)
+    raw.create_function("DATE_FORMAT", 2, _date_format, deterministic=True)
+    raw.create_function("CONCAT", -1, _concat, deterministic=True)
+    raw.create_function("GET_LOCK", 2, lambda name, timeout: _named_locks.get(owner, name, timeout))
+    raw.create_function("RELEASE_LOCK", 1, lambda name: _named_locks.release(owner, name))
+
+# ====================== 类型转换 ======================
+
+def _convert_date(value: bytes):
+    text = value.decode()
+    try:
+        return datetime.date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+def _convert_timestamp(value: bytes):
+    text = value.decode()
+    try:
+        return datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+# 与 pymysql 一致：DATE 列返回 date，TIMESTAMP 列返回 datetime，DECIMAL 列返回 Decimal
+sqlite3.register_converter("DATE", _convert_date)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("DATETIME", _convert_timestamp)
+sqlite3.register_converter("DECIMAL", lambda value: decimal.Decimal(value.decode()))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(decimal.Decimal, str)
+
+# ====================== 连接与游标 ======================
+
+class SQLiteCursor:
+    """模仿 pymysql DictCursor：结果一次读入内存，行为字典"""
+
+    def __init__(self, connection: 'SQLiteConnection'):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._rows: List[Dict] = []
+        self._position = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def execute(self, query: str, args=None) -> int:
+        start = time.perf_counter()
+        try:
+            sql, needs_lock = translate(query, args is not None)
+            if sql is None:
+                self._set_result(None)
+                return 0
+            if needs_lock:
+                self.connection.begin_immediate()
+            self._cursor.execute(sql, _params(args))
+            return self._set_result(self._cursor)
+        except sqlite3.Error:
+            metrics.DB_ERRORS.inc("execute")
+            raise
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "execute")
+
+    def executemany(self, query: str, args) -> int:
+        start = time.perf_counter()
+        try:
+            sql, needs_lock = translate(query, True)
+            if sql is None:
+                return 0
+            if needs_lock:
+                self.connection.begin_immediate()
+            self._cursor.executemany(sql, [_params(row) for row in args])
+            return self._set_result(self._cursor)
+        except sqlite3.Error:
+            metrics.DB_ERRORS.inc("execute")
+            raise
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "execute")
+
+    def callproc(self, procname: str, args=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(PROCEDURES[procname], tuple(args))
+            self._set_result(self._cursor)
+            return args
+        except sqlite3.Error:
+            metrics.DB_ERRORS.inc("callproc")
+            raise
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, "callproc")
+
+    def _set_result(self, cursor) -> int:
+        self._position = 0
+        if cursor is None or cursor.description is None:
+            self._rows = []
+            self.description = None
+            self.rowcount = cursor.rowcount if cursor is not None else 0
+            self.lastrowid = cursor.lastrowid if cursor is not None else None
+            return self.rowcount
+        self.description = cursor.description
+        names = [column[0] for column in cursor.description]
+        self._rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+        self.rowcount = len(self._rows)
+        return self.rowcount
+
+    def fetchone(self) -> Optional[Dict]:
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size: int = 1) -> List[Dict]:
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self) -> List[Dict]:
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _params(args):
+    if args is None:
+        return ()
+    if isinstance(args, (list, tuple)):
+        return tuple(args)
+    return (args,)
+
+
+class SQLiteConnection:
+    """模仿 pymysql 连接的 commit / rollback / cursor / open 接口"""
+
+    def __init__(self, raw: sqlite3.Connection):
+        self.raw = raw
+        self._closed = False
+
+    @property
+    def open(self) -> bool:
+        return not self._closed
+
+    def cursor(self, cursor=None) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def begin(self):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN")
+
+    def begin_immediate(self):
+        """FOR UPDATE 之前取得写锁，避免读后写时升级锁失败"""
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        if not self._closed:
+            self.raw.rollback()
+
+    def ping(self, reconnect: bool = True):
+        pass
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.raw.close()
+
+
+def database_path() -> str:
+    path = config.SQLITE_PATH
+    if path == ':memory:' or os.path.isabs(path):
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def connect() -> SQLiteConnection:
+    """建立一条新连接；数据库文件为空时先创建表结构，旧数据库先补上缺少的列"""
+    start = time.perf_counter()
+    path = database_path()
+    try:
+        if path == ':memory:':
+            # 同一进程内的连接共享一个内存数据库（测试用）
+            raw = sqlite3.connect("file:lms_memory?mode=memory&cache=shared", uri=True,
+                                  detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                                  timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        else:
+            raw = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                                  timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        for pragma in _pragmas():
+            raw.execute(pragma)
+        _register_functions(raw)
+    except sqlite3.Error:
+        metrics.DB_ERRORS.inc("connect")
+        raise
+    conn = SQLiteConnection(raw)
+    if path not in _schema_ready:
+        with _schema_lock:
+            if path not in _schema_ready:
+                if raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'readers'").fetchone() is None:
+                    init_schema(conn)
+                else:
+                    upgrade_columns(conn)
+                _schema_ready.add(path)
+    metrics.DB_CONNECT_SECONDS.observe(time.perf_counter() - start)
+    return conn
+
+
+def _pragmas() -> List[str]:
+    return [
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA temp_store = MEMORY",
+        f"PRAGMA cache_size = -{int(config.SQLITE_CACHE_SIZE_MB * 1024)}",
+        f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE_MB * 1024 * 1024)}",
+        f"PRAGMA busy_timeout = {int(config.SQLITE_BUSY_TIMEOUT_MS)}",
+    ]
+
+
+def upgrade_columns(conn: SQLiteConnection):
+    """给旧数据库中已存在的表补上 UPGRADE_COLUMNS 中缺少的列"""
+    for table, columns in UPGRADE_COLUMNS.items():
+        existing = {row[1] for row in conn.raw.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            continue  # 表还不存在，由 sqlite_schema.sql 创建
+        for name, column_type in columns:
+            if name not in existing:
+                conn.raw.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def init_schema(conn: SQLiteConnection):
+    """执行 sqlite_schema.sql（可重复执行：表和索引 IF NOT EXISTS，视图和触发器先删后建）"""
+    upgrade_columns(conn)
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+        conn.raw.executescript(f.read())
+    conn.commit()
+
+
+def check_health() -> dict:
+    start = time.perf_counter()
+    try:
+        conn = connect()
+        try:
+            conn.raw.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+        return {'ok': True, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': None}
+    except Exception as e:
+        metrics.DB_ERRORS.inc("healthcheck")
+        return {'ok': False, 'latency_ms': (time.perf_counter() - start) * 1000, 'error': str(e)}
@@ -0,0 +1,454 @@
+-- SQLite 版表结构（DB_BACKEND = 'sqlite' 时由 sqlite_backend.init_schema 执行）
+-- 与 enhanced_schema.sql 保持一致：表、索引、视图、触发器一一对应；
+-- 存储过程在 sqlite_backend.PROCEDURES 中用等价的查询实现。
+-- 差异：
+--   ENUM 改为 TEXT + CHECK；ON UPDATE CURRENT_TIMESTAMP 改为 updated_at 触发器；
+--   时间取本地时间（与 MySQL 会话时区一致），不用 SQLite 默认的 UTC；
+--   SQLite 的外键级联删除会触发子表的触发器（MySQL 不会），删除类别时不再重复记录副本的删除；
+--   LIKE 前缀查询只能使用 NOCASE 排序的索引，读者快速查找和 ISBN/书名轻量查询用到的列另建 COLLATE NOCASE 索引；
+--   旧数据库缺少的列由 sqlite_backend.UPGRADE_COLUMNS 在执行本文件之前补上。
+
+-- 1. 图书ISBN类别信息表
+CREATE TABLE IF NOT EXISTS book_categories (
+    isbn VARCHAR(20) PRIMARY KEY,
+    category VARCHAR(100) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    author VARCHAR(255) NOT NULL,
+    publisher VARCHAR(255),
+    publish_date DATE,
+    price DECIMAL(10,2),
+    total_copies INTEGER NOT NULL DEFAULT 0,
+    available_copies INTEGER NOT NULL DEFAULT 0,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    CONSTRAINT chk_available_copies CHECK (available_copies <= total_copies),
+    CONSTRAINT chk_total_copies CHECK (total_copies >= 0),
+    CONSTRAINT chk_price CHECK (price >= 0)
+);
+
+-- 2. 图书信息表（具体到每一本书）
+CREATE TABLE IF NOT EXISTS books (
+    book_number VARCHAR(20) PRIMARY KEY,
+    isbn VARCHAR(20) NOT NULL REFERENCES book_categories(isbn) ON DELETE CASCADE,
+    is_available TEXT NOT NULL DEFAULT '可借' CHECK (is_available IN ('可借', '不可借')),
+    status TEXT NOT NULL DEFAULT '正常' CHECK (status IN ('正常', '损坏', '遗失')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 3. 读者信息表
+CREATE TABLE IF NOT EXISTS readers (
+    library_card_no VARCHAR(20) PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    gender TEXT NOT NULL DEFAULT '男' CHECK (gender IN ('男', '女')),
+    birth_date DATE,
+    id_card VARCHAR(18) UNIQUE,
+    title VARCHAR(50),
+    max_borrow_count INTEGER NOT NULL DEFAULT 5,
+    current_borrow_count INTEGER NOT NULL DEFAULT 0,
+    department VARCHAR(100),
+    address VARCHAR(255),
+    phone VARCHAR(20),
+    registration_date DATE DEFAULT (date('now', 'localtime')),
+    status TEXT NOT NULL DEFAULT '正常' CHECK (status IN ('正常', '冻结', '注销')),
+    password_hash VARCHAR(255),
+    name_pinyin VARCHAR(255),
+    name_initials VARCHAR(100),
+    phone_reversed VARCHAR(20),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    CONSTRAINT chk_current_borrow CHECK (current_borrow_count <= max_borrow_count),
+    CONSTRAINT chk_id_card_length CHECK (LENGTH(id_card) IN (15, 18)),
+    CONSTRAINT chk_max_borrow CHECK (max_borrow_count > 0)
+);
+
+-- 4. 借阅信息表（AUTOINCREMENT：编号不重用，已归档记录的编号不会被新借阅占用）
+CREATE TABLE IF NOT EXISTS borrowings (
+    borrowing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    library_card_no VARCHAR(20) NOT NULL REFERENCES readers(library_card_no) ON DELETE CASCADE,
+    book_number VARCHAR(20) NOT NULL REFERENCES books(book_number) ON DELETE CASCADE,
+    borrow_date DATE DEFAULT (date('now', 'localtime')),
+    due_date DATE NOT NULL,
+    return_date DATE,
+    fine_amount DECIMAL(10,2) DEFAULT 0,
+    status TEXT NOT NULL DEFAULT '借阅中' CHECK (status IN ('借阅中', '已归还', '逾期', '遗失')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    CONSTRAINT chk_dates CHECK (due_date >= borrow_date),
+    CONSTRAINT chk_return_date CHECK (return_date IS NULL OR return_date >= borrow_date)
+);
+
+-- 4a. 借阅归档表（见 borrowing_archiver.py）
+CREATE TABLE IF NOT EXISTS borrowings_archive (
+    borrowing_id INTEGER PRIMARY KEY,
+    library_card_no VARCHAR(20) NOT NULL,
+    book_number VARCHAR(20) NOT NULL,
+    borrow_date DATE,
+    due_date DATE NOT NULL,
+    return_date DATE NOT NULL,
+    fine_amount DECIMAL(10,2) DEFAULT 0,
+    status TEXT NOT NULL CHECK (status IN ('借阅中', '已归还', '逾期', '遗失')),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 4b. 归档借阅次数汇总
+CREATE TABLE IF NOT EXISTS borrowing_archive_totals (
+    kind TEXT NOT NULL CHECK (kind IN ('reader', 'book')),
+    row_key VARCHAR(20) NOT NULL,
+    borrow_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, row_key)
+);
+
+-- 用户表 (主要用于管理员)
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    role TEXT NOT NULL CHECK (role IN ('admin', 'reader')),
+    full_name VARCHAR(100),
+    email VARCHAR(100) UNIQUE,
+    is_active BOOLEAN DEFAULT 1,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 删除记录表（见 delta_sync.py）
+CREATE TABLE IF NOT EXISTS row_tombstones (
+    tombstone_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name VARCHAR(64) NOT NULL,
+    row_key VARCHAR(64) NOT NULL,
+    deleted_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 变更日志（见 change_notifier.py）；SQLite 同一时间只有一个写事务，序号按提交顺序递增
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name VARCHAR(64) NOT NULL,
+    row_key VARCHAR(64) NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('insert', 'update', 'delete')),
+    changed_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 后台维护任务的断点（见 job_checkpoints.py）
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_name VARCHAR(64) PRIMARY KEY,
+    position VARCHAR(255) NOT NULL,
+    stats TEXT,
+    started_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- 图书检索键（见 book_search.py）；NOCASE 使 LIKE 前缀查询可以使用索引
+CREATE TABLE IF NOT EXISTS book_search_keys (
+    isbn VARCHAR(20) NOT NULL REFERENCES book_categories(isbn) ON DELETE CASCADE,
+    field_name TEXT NOT NULL CHECK (field_name IN ('title', 'author')),
+    kind TEXT NOT NULL CHECK (kind IN ('text', 'pinyin', 'initials')),
+    search_key VARCHAR(100) NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (isbn, field_name, kind, search_key)
+);
+
+-- 索引
+CREATE INDEX IF NOT EXISTS idx_book_title ON book_categories(title);
+CREATE INDEX IF NOT EXISTS idx_book_author ON book_categories(author);
+CREATE INDEX IF NOT EXISTS idx_book_category ON book_categories(category);
+CREATE INDEX IF NOT EXISTS idx_book_isbn ON books(isbn);
+CREATE INDEX IF NOT EXISTS idx_reader_name ON readers(name);
+CREATE INDEX IF NOT EXISTS idx_borrowing_reader ON borrowings(library_card_no);
+CREATE INDEX IF NOT EXISTS idx_borrowing_book ON borrowings(book_number);
+CREATE INDEX IF NOT EXISTS idx_borrowing_dates ON borrowings(borrow_date, due_date);
+CREATE INDEX IF NOT EXISTS idx_borrowing_return_date ON borrowings(return_date);
+CREATE INDEX IF NOT EXISTS idx_archive_reader_date ON borrowings_archive(library_card_no, borrow_date);
+CREATE INDEX IF NOT EXISTS idx_archive_book_date ON borrowings_archive(book_number, borrow_date);
+CREATE INDEX IF NOT EXISTS idx_archive_borrow_date ON borrowings_archive(borrow_date);
+CREATE INDEX IF NOT EXISTS idx_reader_updated_at ON readers(updated_at);
+CREATE INDEX IF NOT EXISTS idx_user_updated_at ON users(updated_at);
+CREATE INDEX IF NOT EXISTS idx_category_updated_at ON book_categories(updated_at);
+CREATE INDEX IF NOT EXISTS idx_book_updated_at ON books(updated_at);
+CREATE INDEX IF NOT EXISTS idx_tombstone_table_time ON row_tombstones(table_name, deleted_at);
+CREATE INDEX IF NOT EXISTS idx_change_log_time ON change_log(changed_at);
+CREATE INDEX IF NOT EXISTS idx_reader_card_nocase ON readers(library_card_no COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_reader_name_nocase ON readers(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_reader_name_pinyin ON readers(name_pinyin COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_reader_name_initials ON readers(name_initials COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_reader_phone_reversed ON readers(phone_reversed COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_book_isbn_nocase ON book_categories(isbn COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_book_title_nocase ON book_categories(title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_book_search_key ON book_search_keys(search_key);
+
+-- 视图：到期未归还图书信息
+DROP VIEW IF EXISTS overdue_books;
+CREATE VIEW overdue_books AS
+SELECT
+    b.borrowing_id,
+    b.book_number,
+    bc.title AS book_title,
+    r.name AS reader_name,
+    r.library_card_no,
+    b.borrow_date,
+    b.due_date,
+    CAST(julianday(date('now', 'localtime')) - julianday(b.due_date) AS INTEGER) AS overdue_days
+FROM borrowings b
+JOIN books bk ON b.book_number = bk.book_number
+JOIN book_categories bc ON bk.isbn = bc.isbn
+JOIN readers r ON b.library_card_no = r.library_card_no
+WHERE b.return_date IS NULL
+AND b.due_date < date('now', 'localtime');
+
+-- 视图：统一登录身份（管理员与读者）
+DROP VIEW IF EXISTS auth_principals;
+CREATE VIEW auth_principals AS
+SELECT
+    'admin' AS principal_type,
+    u.username AS login_name,
+    u.password_hash,
+    (u.is_active = 1) AS is_enabled,
+    u.user_id,
+    u.username,
+    u.full_name,
+    u.email,
+    NULL AS library_card_no,
+    NULL AS name
+FROM users u
+WHERE u.role = 'admin'
+UNION ALL
+SELECT
+    'reader' AS principal_type,
+    r.library_card_no AS login_name,
+    r.password_hash,
+    (r.status = '正常' AND r.password_hash IS NOT NULL) AS is_enabled,
+    NULL AS user_id,
+    NULL AS username,
+    NULL AS full_name,
+    NULL AS email,
+    r.library_card_no,
+    r.name
+FROM readers r;
+
+-- 触发器：维护 updated_at（对应 MySQL 的 ON UPDATE CURRENT_TIMESTAMP）
+-- 未开启 recursive_triggers，触发器内的 UPDATE 不会再次触发自身
+DROP TRIGGER IF EXISTS tr_book_categories_touch;
+CREATE TRIGGER tr_book_categories_touch
+AFTER UPDATE ON book_categories
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE book_categories SET updated_at = datetime('now', 'localtime') WHERE isbn = NEW.isbn;
+END;
+
+DROP TRIGGER IF EXISTS tr_books_touch;
+CREATE TRIGGER tr_books_touch
+AFTER UPDATE ON books
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE books SET updated_at = datetime('now', 'localtime') WHERE book_number = NEW.book_number;
+END;
+
+DROP TRIGGER IF EXISTS tr_readers_touch;
+CREATE TRIGGER tr_readers_touch
+AFTER UPDATE ON readers
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE readers SET updated_at = datetime('now', 'localtime') WHERE library_card_no = NEW.library_card_no;
+END;
+
+DROP TRIGGER IF EXISTS tr_borrowings_touch;
+CREATE TRIGGER tr_borrowings_touch
+AFTER UPDATE ON borrowings
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE borrowings SET updated_at = datetime('now', 'localtime') WHERE borrowing_id = NEW.borrowing_id;
+END;
+
+DROP TRIGGER IF EXISTS tr_users_touch;
+CREATE TRIGGER tr_users_touch
+AFTER UPDATE ON users
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE users SET updated_at = datetime('now', 'localtime') WHERE user_id = NEW.user_id;
+END;
+
+DROP TRIGGER IF EXISTS tr_job_checkpoints_touch;
+CREATE TRIGGER tr_job_checkpoints_touch
+AFTER UPDATE ON job_checkpoints
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE job_checkpoints SET updated_at = datetime('now', 'localtime') WHERE job_name = NEW.job_name;
+END;
+
+-- 触发器：借书时更新相关表
+DROP TRIGGER IF EXISTS tr_after_borrow_insert;
+CREATE TRIGGER tr_after_borrow_insert
+AFTER INSERT ON borrowings
+FOR EACH ROW
+BEGIN
+    UPDATE books SET is_available = '不可借' WHERE book_number = NEW.book_number;
+    UPDATE readers SET current_borrow_count = current_borrow_count + 1
+    WHERE library_card_no = NEW.library_card_no;
+END;
+
+-- 触发器：还书时更新相关表
+DROP TRIGGER IF EXISTS tr_after_return_update;
+CREATE TRIGGER tr_after_return_update
+AFTER UPDATE ON borrowings
+FOR EACH ROW WHEN OLD.return_date IS NULL AND NEW.return_date IS NOT NULL
+BEGIN
+    UPDATE books SET is_available = '可借' WHERE book_number = NEW.book_number;
+    UPDATE readers SET current_borrow_count = current_borrow_count - 1
+    WHERE library_card_no = NEW.library_card_no;
+END;
+
+-- 触发器：维护类别表的馆藏数量与可借数量
+DROP TRIGGER IF EXISTS tr_after_book_insert_counts;
+CREATE TRIGGER tr_after_book_insert_counts
+AFTER INSERT ON books
+FOR EACH ROW
+BEGIN
+    UPDATE book_categories
+    SET total_copies = total_copies + 1,
+        available_copies = available_copies + (CASE WHEN NEW.is_available = '可借' THEN 1 ELSE 0 END)
+    WHERE isbn = NEW.isbn;
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_update_counts_move;
+CREATE TRIGGER tr_after_book_update_counts_move
+AFTER UPDATE ON books
+FOR EACH ROW WHEN OLD.isbn IS NOT NEW.isbn
+BEGIN
+    UPDATE book_categories
+    SET total_copies = total_copies - 1,
+        available_copies = available_copies - (CASE WHEN OLD.is_available = '可借' THEN 1 ELSE 0 END)
+    WHERE isbn = OLD.isbn;
+    UPDATE book_categories
+    SET total_copies = total_copies + 1,
+        available_copies = available_copies + (CASE WHEN NEW.is_available = '可借' THEN 1 ELSE 0 END)
+    WHERE isbn = NEW.isbn;
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_update_counts;
+CREATE TRIGGER tr_after_book_update_counts
+AFTER UPDATE ON books
+FOR EACH ROW WHEN OLD.isbn IS NEW.isbn AND OLD.is_available IS NOT NEW.is_available
+BEGIN
+    UPDATE book_categories
+    SET available_copies = available_copies + (CASE WHEN NEW.is_available = '可借' THEN 1 ELSE -1 END)
+    WHERE isbn = NEW.isbn;
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_delete_counts;
+CREATE TRIGGER tr_after_book_delete_counts
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    UPDATE book_categories
+    SET total_copies = total_copies - 1,
+        available_copies = available_copies - (CASE WHEN OLD.is_available = '可借' THEN 1 ELSE 0 END)
+    WHERE isbn = OLD.isbn;
+END;
+
+-- 触发器：删除读者前检查是否有未归还图书
+DROP TRIGGER IF EXISTS tr_before_reader_delete;
+CREATE TRIGGER tr_before_reader_delete
+BEFORE DELETE ON readers
+FOR EACH ROW WHEN EXISTS (SELECT 1 FROM borrowings
+                          WHERE library_card_no = OLD.library_card_no AND return_date IS NULL)
+BEGIN
+    SELECT RAISE(ABORT, '该读者有未归还图书，不能删除');
+END;
+
+-- 触发器：删除记录（级联删除的副本由 books 自己的触发器记录）
+DROP TRIGGER IF EXISTS tr_before_category_delete_tombstone;
+CREATE TRIGGER tr_before_category_delete_tombstone
+BEFORE DELETE ON book_categories
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('book_categories', OLD.isbn);
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_delete_tombstone;
+CREATE TRIGGER tr_after_book_delete_tombstone
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('books', OLD.book_number);
+END;
+
+DROP TRIGGER IF EXISTS tr_after_reader_delete_tombstone;
+CREATE TRIGGER tr_after_reader_delete_tombstone
+AFTER DELETE ON readers
+FOR EACH ROW
+BEGIN
+    INSERT INTO row_tombstones (table_name, row_key) VALUES ('readers', OLD.library_card_no);
+END;
+
+-- 触发器：变更日志（维护 updated_at 的二次 UPDATE 不再重复记录）
+DROP TRIGGER IF EXISTS tr_after_borrow_insert_log;
+CREATE TRIGGER tr_after_borrow_insert_log
+AFTER INSERT ON borrowings
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('borrowings', NEW.borrowing_id, 'insert'),
+        ('readers', NEW.library_card_no, 'update');
+END;
+
+DROP TRIGGER IF EXISTS tr_after_borrow_update_log;
+CREATE TRIGGER tr_after_borrow_update_log
+AFTER UPDATE ON borrowings
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('borrowings', NEW.borrowing_id, 'update'),
+        ('readers', NEW.library_card_no, 'update');
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_insert_log;
+CREATE TRIGGER tr_after_book_insert_log
+AFTER INSERT ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('books', NEW.book_number, 'insert'),
+        ('book_categories', NEW.isbn, 'update');
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_update_log;
+CREATE TRIGGER tr_after_book_update_log
+AFTER UPDATE ON books
+FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES ('books', NEW.book_number, 'update');
+    INSERT INTO change_log (table_name, row_key, action)
+    SELECT 'book_categories', NEW.isbn, 'update'
+    WHERE OLD.is_available IS NOT NEW.is_available OR OLD.isbn IS NOT NEW.isbn;
+    INSERT INTO change_log (table_name, row_key, action)
+    SELECT 'book_categories', OLD.isbn, 'update'
+    WHERE OLD.isbn IS NOT NEW.isbn;
+END;
+
+DROP TRIGGER IF EXISTS tr_after_book_delete_log;
+CREATE TRIGGER tr_after_book_delete_log
+AFTER DELETE ON books
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_key, action) VALUES
+        ('books', OLD.book_number, 'delete'),
+        ('book_categories', OLD.isbn, 'update');
+END;
+
+-- 示例数据
+INSERT OR IGNORE INTO book_categories (isbn, category, title, author, publisher, publish_date, price, total_copies, available_copies, description) VALUES
+('9787111421900', '计算机', 'Java核心技术', '凯·霍斯特曼', '机械工业出版社', '2020-01-01', 89.90, 0, 0, 'Java编程经典教材'),
+('9787121315633', '计算机', 'Python编程从入门到实践', '埃里克·马瑟斯', '人民邮电出版社', '2019-03-01', 69.90, 0, 0, 'Python入门首选'),
+('9787508688923', '文学', '百年孤独', '加西亚·马尔克斯', '中信出版社', '2017-08-01', 45.00, 0, 0, '魔幻现实主义代表作');
+
+INSERT OR IGNORE INTO books (book_number, isbn, is_available, status) VALUES
+('BK001', '9787111421900', '可借', '正常'),
+('BK002', '9787111421900', '可借', '正常'),
+('BK003', '9787121315633', '可借', '正常'),
+('BK004', '9787508688923', '可借', '正常');
+
+INSERT OR IGNORE INTO readers (library_card_no, name, gender, birth_date, id_card, title, max_borrow_count, current_borrow_count, department, address, phone, registration_date, status) VALUES
+('R001', '张三', '男', '1990-01-01', '110101199001011234', '程序员', 5, 0, '技术部', '北京市朝阳区', '13800138000', date('now', 'localtime'), '正常'),
+('R002', '李四', '女', '1985-05-15', '110101198505155678', '经理', 10, 0, '管理部', '北京市海淀区', '13900139000', date('now', 'localtime'), '正常');
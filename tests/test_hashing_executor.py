@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""hashing_executor 的排队上限与等待超时：两种情况都抛出 HashingBusyError（登录页据此返回 503）"""
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashing_executor  # noqa: E402
+
+
+class HashingExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.executor = hashing_executor.HashingExecutor(workers=1, queue_limit=1)
+        self.saved_executor = hashing_executor._executor
+        hashing_executor._executor = self.executor
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+        hashing_executor._executor = self.saved_executor
+
+    def test_run_timeout_raises_busy(self):
+        with self.assertRaises(hashing_executor.HashingBusyError):
+            hashing_executor.run(self.release.wait, timeout=0.05)
+
+    def test_wait_async_timeout_raises_busy(self):
+        future = hashing_executor.submit(self.release.wait)
+        with self.assertRaises(hashing_executor.HashingBusyError):
+            asyncio.run(hashing_executor.wait_async(future, timeout=0.05))
+
+    def test_queue_limit_raises_busy(self):
+        hashing_executor.submit(self.release.wait)
+        hashing_executor.submit(self.release.wait)
+        with self.assertRaises(hashing_executor.HashingBusyError):
+            hashing_executor.submit(self.release.wait)
+
+    def test_run_returns_result(self):
+        self.assertEqual(hashing_executor.run(sum, [1, 2, 3]), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
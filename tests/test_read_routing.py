@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""读写分离的读己之写：请求范围内的 pin_primary 只影响同一会话，没有请求范围时按进程生效"""
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import enhanced_database as db  # noqa: E402
+
+
+class ReadRoutingTest(unittest.TestCase):
+    def setUp(self):
+        patches = (mock.patch.object(db, 'replica_enabled', return_value=True),
+                   mock.patch.object(db, 'replica_status', return_value={'lag': 0.0, 'error': None}),
+                   mock.patch.object(db, '_process_pin', {'until': 0.0}))
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_pin_is_scoped_to_the_request(self):
+        token = db.begin_pin_scope()
+        db.pin_primary()
+        self.assertEqual(db._read_target(), (False, "pinned"))
+        pinned_until = db.current_pin_deadline()
+        db.end_pin_scope(token)
+
+        # 其他会话的请求、没有请求范围的代码不受影响
+        token = db.begin_pin_scope()
+        self.assertEqual(db._read_target(), (True, "ok"))
+        db.end_pin_scope(token)
+        self.assertEqual(db._read_target(), (True, "ok"))
+
+        # 同一会话的下一个请求带着会话中保存的期限
+        token = db.begin_pin_scope(pinned_until)
+        self.assertEqual(db._read_target(), (False, "pinned"))
+        db.end_pin_scope(token)
+
+    def test_pin_from_worker_thread_reaches_the_request(self):
+        async def request():
+            token = db.begin_pin_scope()
+            try:
+                await asyncio.to_thread(db.pin_primary)
+                return db._read_target()
+            finally:
+                db.end_pin_scope(token)
+
+        self.assertEqual(asyncio.run(request()), (False, "pinned"))
+        self.assertEqual(db._read_target(), (True, "ok"))
+
+    def test_pin_without_scope_is_process_wide(self):
+        db.pin_primary()
+        self.assertEqual(db._read_target(), (False, "pinned"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+enhanced_library 在 SQLite 后端上的回归测试：每个用例使用一个新的临时数据库文件（含示例数据），
+不需要 MySQL 服务。
+
+运行：python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import book_search  # noqa: E402
+import catalog_snapshot  # noqa: E402
+import borrowing_archiver  # noqa: E402
+import enhanced_config as config  # noqa: E402
+import enhanced_database as db  # noqa: E402
+import enhanced_library as lib  # noqa: E402
+import offline_journal  # noqa: E402
+import reader_lookup  # noqa: E402
+import retention_job  # noqa: E402
+import search_keys  # noqa: E402
+
+
+class SQLiteLibraryTestCase(unittest.TestCase):
+    CONFIG_NAMES = ('DB_BACKEND', 'SQLITE_PATH', 'CATALOG_CACHE_ENABLED', 'RETENTION_BORROWING_DAYS',
+                    'RETENTION_PAUSE_SECONDS')
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved_config = {name: getattr(config, name) for name in self.CONFIG_NAMES}
+        config.DB_BACKEND = 'sqlite'
+        config.SQLITE_PATH = os.path.join(self.tmp.name, 'lms_test.db')
+        config.CATALOG_CACHE_ENABLED = False
+        config.RETENTION_PAUSE_SECONDS = 0
+        db.init_db()
+
+    def tearDown(self):
+        db.close_pool()
+        for name, value in self.saved_config.items():
+            setattr(config, name, value)
+        self.tmp.cleanup()
+
+    def borrow_and_return(self, library_card_no: str, book_number: str, days_ago: int) -> int:
+        borrow_date = date.today() - timedelta(days=days_ago)
+        success, message = lib.borrow_book(library_card_no, book_number, borrow_date=borrow_date)
+        self.assertTrue(success, message)
+        borrowing_id = max(row['borrowing_id'] for row in lib.get_reader_borrowing_history(library_card_no))
+        success, message = lib.return_book(borrowing_id, borrow_date + timedelta(days=7))
+        self.assertTrue(success, message)
+        return borrowing_id
+
+
+class CatalogTest(SQLiteLibraryTestCase):
+    def test_search_books_reads_seed_data(self):
+        books = lib.search_books(title='百年孤独')
+        self.assertEqual([book['isbn'] for book in books], ['9787508688923'])
+        self.assertEqual(books[0]['total_copies'], 1)
+
+    def test_add_copy_updates_counters(self):
+        lib.add_book_copy('9787508688923', 'BK100')
+        book = lib.search_books(isbn='9787508688923')[0]
+        self.assertEqual((book['total_copies'], book['available_copies']), (2, 2))
+
+
+    def test_new_category_counts_only_added_copies(self):
+        lib.add_book_category('9787302000001', '计算机', '编译原理', '陈火旺', price=39.0, description='教材')
+        book = lib.search_books(isbn='9787302000001')[0]
+        self.assertEqual((book['total_copies'], book['available_copies'], book['description']), (0, 0, '教材'))
+        lib.add_book_copy('9787302000001', 'BK200')
+        book = lib.search_books(isbn='9787302000001')[0]
+        self.assertEqual((book['total_copies'], book['available_copies']), (1, 1))
+
+
+class BookSearchTest(SQLiteLibraryTestCase):
+    def test_seed_categories_are_indexed_by_init_db(self):
+        self.assertEqual([book['isbn'] for book in book_search.search('bngd')], ['9787508688923'])
+
+    def test_traditional_title_matches_simplified_and_initials(self):
+        lib.import_book_categories([{'isbn': '9787020002207', 'category': '文学', 'title': '紅樓夢', 'author': '曹雪芹'}])
+        for text in ('红楼', '紅樓', 'hlm'):
+            results = book_search.search(text)
+            self.assertEqual([book['isbn'] for book in results], ['9787020002207'], text)
+            self.assertEqual(results[0]['match_distance'], 0, text)
+
+    def test_search_books_falls_back_to_search_keys(self):
+        self.assertEqual([book['isbn'] for book in lib.search_books(title='百年孤獨')], ['9787508688923'])
+        results = lib.search_books(title='bngd')
+        self.assertEqual([(book['isbn'], book['match_distance']) for book in results], [('9787508688923', 0)])
+        self.assertEqual(results[0]['total_copies'], 1)
+        self.assertEqual(lib.search_books(title='bngd', category='文学'), [])
+        self.assertNotIn('match_distance', lib.search_books(title='百年')[0])
+
+    def test_snapshot_search_falls_back_to_search_keys(self):
+        snapshot = catalog_snapshot.CatalogSnapshot()
+        snapshot.refresh(full=True)
+        with mock.patch.object(catalog_snapshot, '_snapshot', snapshot):
+            self.assertEqual([book['isbn'] for book in catalog_snapshot.search_books(author='加西亚')],
+                             ['9787508688923'])
+            self.assertEqual([book['isbn'] for book in catalog_snapshot.search_books(title='bngd')],
+                             ['9787508688923'])
+
+    @unittest.skipUnless(search_keys.pinyin_available(), "需要 pypinyin")
+    def test_full_pinyin(self):
+        lib.import_book_categories([{'isbn': '9787020002207', 'category': '文学', 'title': '紅樓夢', 'author': '曹雪芹'}])
+        self.assertEqual([book['isbn'] for book in book_search.search('honglou')], ['9787020002207'])
+
+
+class ReaderLookupTest(SQLiteLibraryTestCase):
+    def test_seed_readers_have_search_keys(self):
+        self.assertEqual([(r['library_card_no'], r['match']) for r in reader_lookup.lookup('zs')], [('R001', 'initials')])
+        self.assertEqual([(r['library_card_no'], r['match']) for r in reader_lookup.lookup('9000')], [('R002', 'phone')])
+
+    def test_new_reader_is_found_by_initials(self):
+        lib.add_reader('R100', '王小明', phone='13700001234')
+        self.assertEqual([r['library_card_no'] for r in reader_lookup.lookup('wxm')], ['R100'])
+
+    def test_table_limit_returns_more_than_completer_limit(self):
+        for i in range(config.READER_LOOKUP_LIMIT + 5):
+            lib.add_reader(f'T{i:03d}', f'测试读者{i}')
+        self.assertEqual(len(reader_lookup.lookup('T')), config.READER_LOOKUP_LIMIT)
+        self.assertEqual(len(reader_lookup.lookup('T', config.READER_LOOKUP_TABLE_LIMIT)), config.READER_LOOKUP_LIMIT + 5)
+
+
+class BorrowingTest(SQLiteLibraryTestCase):
+    def test_borrow_and_return(self):
+        success, message = lib.borrow_book('R001', 'BK004')
+        self.assertTrue(success, message)
+        self.assertEqual(lib.get_reader_current_borrow_count('R001'), 1)
+        self.assertEqual(len(lib.get_current_borrowings()), 1)
+        borrowing_id = lib.get_reader_borrowing_history('R001')[0]['borrowing_id']
+        success, message = lib.return_book(borrowing_id)
+        self.assertTrue(success, message)
+        self.assertEqual(lib.get_reader_current_borrow_count('R001'), 0)
+
+    def test_statistics_summary_includes_archived_borrowings(self):
+        self.borrow_and_return('R001', 'BK004', days_ago=400)
+        self.borrow_and_return('R001', 'BK003', days_ago=200)
+        result = borrowing_archiver.archive(days=365, pause_seconds=0)
+        self.assertEqual(result['archived'], 1)
+
+        summary = lib.get_reader_statistics_summary('R001')
+        self.assertEqual(summary['total_borrowings'], 2)
+        self.assertEqual(summary['current_borrowings'], 0)
+        self.assertEqual(summary['latest_borrow_title'], 'Python编程从入门到实践')
+        self.assertEqual(lib.get_reader_statistics_summary()['total_borrowings'], 2)
+        self.assertEqual(len(lib.get_reader_borrowing_history('R001')), 2)
+
+    def test_latest_borrow_can_come_from_archive(self):
+        self.borrow_and_return('R002', 'BK004', days_ago=400)
+        borrowing_archiver.archive(days=365, pause_seconds=0)
+        summary = lib.get_reader_statistics_summary('R002')
+        self.assertEqual(summary['latest_borrow_title'], '百年孤独')
+        self.assertEqual(summary['latest_borrow_date'], date.today() - timedelta(days=400))
+
+    def test_borrowing_ranks(self):
+        self.borrow_and_return('R001', 'BK004', days_ago=10)
+        self.assertEqual(lib.get_reader_borrowing_ranks()[0]['library_card_no'], 'R001')
+        self.assertEqual(lib.get_book_borrowing_ranks()[0]['isbn'], '9787508688923')
+
+    def test_retention_purge_keeps_rankings(self):
+        self.borrow_and_return('R001', 'BK004', days_ago=1000)
+        self.borrow_and_return('R001', 'BK003', days_ago=900)
+        self.borrow_and_return('R002', 'BK004', days_ago=800)
+        borrowing_archiver.archive(days=850, pause_seconds=0)  # 前两条先归档，R002 的一条仍在借阅信息表
+        ranks = lambda: ({r['library_card_no']: r['borrow_count'] for r in lib.get_reader_borrowing_ranks()},
+                         {r['isbn']: r['borrow_count'] for r in lib.get_book_borrowing_ranks()})
+        before = ranks()
+        self.assertEqual(before[0], {'R001': 2, 'R002': 1})
+
+        config.RETENTION_BORROWING_DAYS = 365
+        for phase in (retention_job.BORROWINGS_ARCHIVE_PHASE, retention_job.BORROWINGS_PHASE):
+            self.assertTrue(retention_job.run_phase(phase)['completed'])
+        self.assertEqual(lib.get_reader_borrowing_history('R001'), [])
+        self.assertEqual(ranks(), before)
+
+
+class OfflineJournalTest(SQLiteLibraryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal = offline_journal.OfflineJournal(os.path.join(self.tmp.name, 'journal.db'))
+        self.assertTrue(self.journal.refresh_snapshot())
+
+    def test_offline_loan_uses_negative_id(self):
+        success, message = self.journal.enqueue_borrow('R001', 'BK003')
+        self.assertTrue(success, message)
+        loans = self.journal.pending_loans('R001')
+        self.assertEqual([(loan['book_number'], loan['book_title']) for loan in loans],
+                         [('BK003', 'Python编程从入门到实践')])
+        offline_id = loans[0]['borrowing_id']
+        self.assertLess(offline_id, 0)
+        self.assertIn(f"借阅编号: {offline_id}", message)
+        success, message = self.journal.enqueue_borrow('R002', 'BK003')
+        self.assertFalse(success, message)
+
+        # 漏掉负号的编号不是快照中的借阅，不能受理
+        success, _ = self.journal.enqueue_return(-offline_id)
+        self.assertFalse(success)
+        success, message = self.journal.enqueue_return(offline_id)
+        self.assertTrue(success, message)
+        self.assertEqual(self.journal.pending_loans(), [])
+
+        self.assertEqual(self.journal.replay()['remaining'], 0)
+        self.assertEqual(lib.get_reader_current_borrow_count('R001'), 0)
+        self.assertEqual(lib.get_book_borrowing_ranks()[0]['isbn'], '9787121315633')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,16 @@
-from flask import Flask, request, session, redirect, url_for, render_template_string
+from flask import Flask, request, session, redirect, url_for, render_template_string, g, jsonify, Response
+import time
+import enhanced_config as config
 import enhanced_library as lib
+import hashing_executor as hashing
+import enhanced_database as db
+import metrics
+from session_store import ServerSideSessionInterface
 
 app = Flask(__name__)
 app.secret_key = 'replace-with-a-secure-secret'
+# Cookie 中只保存会话 ID，用户信息保存在服务端
+app.session_interface = ServerSideSessionInterface()
 
 REGISTER_FORM = '''
 <h2>读者注册</h2>
@@ -46,6 +54,45 @@ BOOK_LIST_PAGE = '''
 <a href="{{ url_for('dashboard') }}">返回</a>
 '''
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def begin_primary_pin():
+    # 读己之写按会话生效：本会话最近写入过时，本请求的只读查询读主库（见 enhanced_database）
+    g.pinned_until = session.get('pinned_until', 0.0)
+    g.pin_token = db.begin_pin_scope(g.pinned_until)
+
+@app.teardown_request
+def end_primary_pin(exc=None):
+    token = g.pop('pin_token', None)
+    if token is not None:
+        db.end_pin_scope(token)
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        # 使用路由模板而不是实际路径作为标签，避免标签基数失控
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    # 本请求写入过：把读主库期限存入会话（在会话保存之前执行）
+    if g.get('pin_token') is not None:
+        pinned_until = db.current_pin_deadline()
+        if pinned_until > g.pinned_until:
+            session['pinned_until'] = pinned_until
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/healthz')
+def healthz():
+    result = db.check_health()
+    return jsonify({'status': 'ok' if result['ok'] else 'unavailable', 'database': result}), (200 if result['ok'] else 503)
+
 @app.route('/')
 def index():
     if 'user' in session:
@@ -74,10 +121,21 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
-        user = lib.authenticate_user(username, password)
+        # 先限流再校验密码，被限流的请求不消耗 bcrypt 算力
+        retry_after = hashing.LOGIN_THROTTLE.check(username, request.remote_addr)
+        if retry_after:
+            message = f'登录失败次数过多，请 {int(retry_after) + 1} 秒后再试'
+            return render_template_string(LOGIN_FORM, message=message), 429
+        try:
+            user = lib.authenticate_user(username, password)
+        except hashing.HashingBusyError as e:
+            return render_template_string(LOGIN_FORM, message=str(e)), 503
         if user:
+            hashing.LOGIN_THROTTLE.reset_account(username)
+            session.rotate()
             session['user'] = user
             return redirect(url_for('dashboard'))
+        hashing.LOGIN_THROTTLE.record_failure(username, request.remote_addr)
         message = '用户名或密码错误'
     return render_template_string(LOGIN_FORM, message=message)
 
@@ -96,6 +154,28 @@ def books():
     book_list = lib.search_books()
     return render_template_string(BOOK_LIST_PAGE, books=book_list)
 
+def isbn_lookup_args(args):
+    """解析 /api/isbn-lookup 的查询参数，返回 (prefix, after, limit)"""
+    after = {'isbn': args['after_isbn'], 'title': args.get('after_title', '')} if args.get('after_isbn') else None
+    try:
+        limit = int(args.get('limit', config.ISBN_LOOKUP_PAGE_SIZE))
+    except ValueError:
+        limit = config.ISBN_LOOKUP_PAGE_SIZE
+    limit = max(1, min(limit, config.ISBN_LOOKUP_MAX_PAGE_SIZE))
+    return args.get('prefix') or None, after, limit
+
+@app.route('/api/isbn-lookup')
+def isbn_lookup():
+    """
+    ISBN/书名轻量查询：?prefix=ISBN 或书名前缀&limit=页大小，
+    取下一页时带上上一页最后一行的 after_isbn、after_title。返回 {"items": [{isbn, title}], "has_more"}。
+    """
+    if not session.get('user'):
+        return jsonify({'error': '请先登录'}), 401
+    prefix, after, limit = isbn_lookup_args(request.args)
+    items = lib.lookup_isbn_titles(prefix, after, limit)
+    return jsonify({'items': items, 'has_more': len(items) >= limit})
+
 @app.route('/logout')
 def logout():
     session.pop('user', None)
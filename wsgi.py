@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+web_app 的生产环境入口。
+
+Linux:   gunicorn -c gunicorn.conf.py wsgi:application
+Windows: python wsgi.py    （使用 waitress，多线程单进程）
+
+并发模型见 README.md 的“生产部署”一节。
+"""
+import enhanced_config as config
+import borrowing_archiver
+import counter_reconciliation
+import retention_job
+import enhanced_database as db
+from web_app import app
+
+application = app
+
+def serve_with_waitress():
+    """gunicorn 不支持 Windows，图书馆前台电脑上用 waitress 以多线程方式运行"""
+    from waitress import serve  # type: ignore
+    db.init_pool(max(config.DB_POOL_SIZE, config.WEB_THREADS))
+    counter_reconciliation.start_background()
+    borrowing_archiver.start_background()
+    retention_job.start_background()
+    host, _, port = config.WEB_BIND.rpartition(':')
+    print(f"使用 waitress 启动: http://{host}:{port} ({config.WEB_THREADS} 个线程)")
+    serve(application, host=host, port=int(port), threads=config.WEB_THREADS)
+
+if __name__ == '__main__':
+    serve_with_waitress()